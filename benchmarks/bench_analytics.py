@@ -0,0 +1,151 @@
+"""Times the spending statistics as dict loops over row tuples and as analytics.py's NumPy passes.
+
+    python benchmarks/bench_analytics.py --rows 1000000
+
+'loops' works the way main.py's charts and tips did: one Python loop over the
+fetched rows per statistic, parsing dates with strptime and summing into dicts.
+'numpy' converts the rows to arrays once (timed on its own line) and then runs
+analytics.py. Rows are generated in memory, so neither side pays for SQLite.
+Needs numpy.
+"""
+import argparse
+import datetime
+import math
+import time
+
+from seed_data import generate_rows
+from expense_tracker.core import analytics
+
+EPOCH = datetime.date(1970, 1, 1)
+
+
+# --- Loops ---
+# rows are (ID, Date, Payee, Description, Amount, ModeOfPayment, Category, Tags), as the table fetched them
+
+def loop_category_totals(rows):
+    category_spending = {}
+    for row in rows:
+        category = row[6] if row[6] else "Uncategorized"
+        category_spending[category] = category_spending.get(category, 0) + float(row[4] if row[4] else 0)
+    return sorted(category_spending.items(), key=lambda item: item[1], reverse=True)
+
+
+def loop_monthly_totals(rows):
+    monthly_spending = {}
+    for row in rows:
+        month_year = datetime.datetime.strptime(row[1].split(" ")[0], '%Y-%m-%d').strftime("%Y-%m")
+        monthly_spending[month_year] = monthly_spending.get(month_year, 0) + float(row[4] if row[4] else 0)
+    return [(month, monthly_spending[month]) for month in sorted(monthly_spending)]
+
+
+def loop_rolling_mean(rows, window):
+    daily_spending = {}
+    for row in rows:
+        day = datetime.datetime.strptime(row[1].split(" ")[0], '%Y-%m-%d').date()
+        daily_spending[day] = daily_spending.get(day, 0) + float(row[4] if row[4] else 0)
+    first, last = min(daily_spending), max(daily_spending)
+    days = [first + datetime.timedelta(days=i) for i in range((last - first).days + 1)]
+    means = []
+    for i in range(len(days)):
+        if i < window - 1:
+            means.append(math.nan)
+        else:
+            means.append(sum(daily_spending.get(day, 0) for day in days[i - window + 1:i + 1]) / window)
+    return means
+
+
+def loop_month_over_month(rows):
+    changes = []
+    previous = None
+    for month, amount in loop_monthly_totals(rows):
+        changes.append((amount - previous) / previous if previous else math.nan)
+        previous = amount
+    return changes
+
+
+def loop_category_percentiles(rows, percentiles):
+    amounts_by_category = {}
+    for row in rows:
+        amounts_by_category.setdefault(row[6] or "Uncategorized", []).append(float(row[4] if row[4] else 0))
+    result = {}
+    for category, amounts in amounts_by_category.items():
+        amounts.sort()
+        values = []
+        for percentile in percentiles:
+            position = (len(amounts) - 1) * percentile / 100
+            below = int(position)
+            above = min(below + 1, len(amounts) - 1)
+            values.append(amounts[below] + (amounts[above] - amounts[below]) * (position - below))
+        result[category] = values
+    return result
+
+
+def loop_anomalies(rows, threshold):
+    sums, counts = {}, {}
+    for row in rows:
+        category = row[6] or "Uncategorized"
+        sums[category] = sums.get(category, 0) + float(row[4] if row[4] else 0)
+        counts[category] = counts.get(category, 0) + 1
+    means = {category: sums[category] / counts[category] for category in sums}
+    squares = {}
+    for row in rows:
+        category = row[6] or "Uncategorized"
+        squares[category] = squares.get(category, 0) + (float(row[4] if row[4] else 0) - means[category]) ** 2
+    stds = {category: math.sqrt(squares[category] / counts[category]) for category in squares}
+    flagged = []
+    for row in rows:
+        category = row[6] or "Uncategorized"
+        if stds[category] and (float(row[4] if row[4] else 0) - means[category]) / stds[category] > threshold:
+            flagged.append(row[0])
+    return flagged
+
+
+def best_ms(function, *args, repeat=3):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(*args)
+        times.append(time.perf_counter() - start)
+    return min(times) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--window', type=int, default=7, help="days in the rolling mean")
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    table_rows = [(i, *row) for i, row in enumerate(generate_rows(args.rows), start=1)]
+    column_rows = [(row[0], (datetime.date.fromisoformat(row[1]) - EPOCH).days, row[4], row[6]) for row in table_rows]
+    columns = analytics.columns_from_rows(column_rows)
+
+    cases = [
+        ("category totals", lambda: loop_category_totals(table_rows), lambda: analytics.category_totals(columns)),
+        ("monthly totals", lambda: loop_monthly_totals(table_rows), lambda: analytics.monthly_totals(columns)),
+        (f"{args.window}-day rolling mean", lambda: loop_rolling_mean(table_rows, args.window),
+         lambda: analytics.rolling_mean(analytics.daily_totals(columns)[1], args.window)),
+        ("month-over-month change", lambda: loop_month_over_month(table_rows),
+         lambda: analytics.month_over_month(analytics.monthly_totals(columns)[1])),
+        ("category percentiles", lambda: loop_category_percentiles(table_rows, analytics.PERCENTILES),
+         lambda: analytics.category_percentiles(columns)),
+        ("z-score anomalies", lambda: loop_anomalies(table_rows, analytics.ANOMALY_Z),
+         lambda: analytics.anomalies(columns)),
+    ]
+
+    print(f"{'case':<28}{'loops (ms)':>12}{'numpy (ms)':>12}{'speedup':>9}")
+    load_ms = best_ms(analytics.columns_from_rows, column_rows, repeat=args.repeat)
+    print(f"{'load rows into arrays':<28}{'-':>12}{load_ms:>12.1f}")
+    loop_total = numpy_total = 0.0
+    for label, loop, vectorized in cases:
+        loop_ms = best_ms(loop, repeat=args.repeat)
+        numpy_ms = best_ms(vectorized, repeat=args.repeat)
+        loop_total += loop_ms
+        numpy_total += numpy_ms
+        print(f"{label:<28}{loop_ms:>12.1f}{numpy_ms:>12.1f}{loop_ms / numpy_ms:>8.0f}x")
+    numpy_total += load_ms
+    print(f"{'all of the above':<28}{loop_total:>12.1f}{numpy_total:>12.1f}{loop_total / numpy_total:>8.0f}x")
+
+
+if __name__ == "__main__":
+    main()
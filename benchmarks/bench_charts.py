@@ -0,0 +1,97 @@
+"""Times redrawing the Reports tab's charts each time a filter is applied.
+
+    python benchmarks/bench_charts.py --categories 10 --months 24
+
+'old' is what main.py did on every apply: clear both axes, build new wedges and
+bars, run the global tight_layout and draw both canvases. 'new' is
+charts.ChartManager. Cases: the same aggregates applied again, new values with
+the same categories and months, and applies while the Reports tab is hidden.
+Uses Matplotlib's Agg canvas, so it needs no display; draw_idle draws at once there.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from matplotlib.backends.backend_agg import FigureCanvasAgg # noqa: E402
+from matplotlib.figure import Figure # noqa: E402
+import matplotlib.pyplot as plt # noqa: E402
+
+from charts import ChartManager, chart_palette # noqa: E402
+
+TEXT, FACE, BAR = '#333333', '#ffffff', '#4a90e2'
+
+
+def new_axes():
+    axes = []
+    for _ in range(2):
+        figure = Figure(figsize=(5, 4), dpi=100)
+        FigureCanvasAgg(figure)
+        axes.append(figure.add_subplot(111))
+    return axes
+
+
+def old_apply(pie_ax, bar_ax, by_category, by_month):
+    pie_ax.clear()
+    labels = [category for category, _ in by_category]
+    pie_ax.pie([amount for _, amount in by_category], labels=labels, autopct='%1.1f%%', startangle=90,
+               colors=chart_palette(len(labels)))
+    pie_ax.axis('equal')
+    pie_ax.set_title("Spending by Category", fontsize=10, color=TEXT)
+    pie_ax.figure.canvas.draw()
+    bar_ax.clear()
+    bar_ax.bar([month for month, _ in by_month], [amount for _, amount in by_month], color=BAR)
+    bar_ax.set_xlabel("Month (YYYY-MM)", fontsize=8, color=TEXT)
+    bar_ax.set_ylabel("Total Spending (₹)", fontsize=8, color=TEXT)
+    bar_ax.set_title("Monthly Spending Trend", fontsize=10, color=TEXT)
+    bar_ax.tick_params(axis='x', rotation=45, labelsize=7, colors=TEXT)
+    bar_ax.tick_params(axis='y', labelsize=7, colors=TEXT)
+    bar_ax.grid(axis='y', linestyle='--', alpha=0.7, color=TEXT)
+    plt.tight_layout() # As before: the current pyplot figure, not this one
+    bar_ax.figure.canvas.draw()
+
+
+def aggregates(rng, categories, months):
+    by_category = [(f"Category {i}", round(rng.uniform(10, 5000), 2)) for i in range(categories)]
+    by_month = [(f"{2023 + i // 12}-{i % 12 + 1:02d}", round(rng.uniform(100, 50000), 2)) for i in range(months)]
+    return by_category, by_month
+
+
+def per_apply_ms(apply, inputs):
+    start = time.perf_counter()
+    for by_category, by_month in inputs:
+        apply(by_category, by_month)
+    return (time.perf_counter() - start) / len(inputs) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--categories', type=int, default=10)
+    parser.add_argument('--months', type=int, default=24)
+    parser.add_argument('--applies', type=int, default=30)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    same = [aggregates(random.Random(0), args.categories, args.months)] * args.applies
+    changed = [aggregates(rng, args.categories, args.months) for _ in range(args.applies)]
+
+    print(f"{'case':<28}{'old (ms)':>10}{'new (ms)':>10}")
+    for label, inputs, visible in (("same aggregates again", same, True),
+                                   ("new values, same shape", changed, True),
+                                   ("tab hidden", changed, False)):
+        old_axes = new_axes()
+        old_apply(*old_axes, *inputs[0])
+        old_ms = per_apply_ms(lambda c, m: old_apply(*old_axes, c, m), inputs)
+
+        manager = ChartManager(*new_axes(), TEXT, FACE, BAR)
+        manager.set_visible(True)
+        manager.update(*inputs[0]) # Builds the artists
+        manager.set_visible(visible)
+        new_ms = per_apply_ms(manager.update, inputs)
+        print(f"{label:<28}{old_ms:>10.2f}{new_ms:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""Profiles the CPU cost of the login window's animated gradient.
+
+    python benchmarks/bench_gradient.py --seconds 5
+
+'old' deletes and recreates every band with freshly computed colours each frame
+(the renderer register.py used before); 'new' is register.GradientBackground,
+which recolours existing bands from cached colours. Per-frame times include Tk
+redrawing the canvas; the loop rows are process CPU time as a share of wall time
+while the animation runs on its own. Needs a display.
+"""
+import argparse
+import colorsys
+import os
+import sys
+import time
+import tkinter as tk
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import register # noqa: E402
+
+OLD_INTERVAL_MS = 100
+
+
+def old_draw(root, canvas, step, lines=register.GRADIENT_LINES):
+    canvas.delete("all")
+    width, height = root.winfo_width(), root.winfo_height()
+    h1, h2 = (step % 360) / 360, ((step + 60) % 360) / 360
+    r1, g1, b1 = [int(x * 255) for x in colorsys.hsv_to_rgb(h1, 0.4, 1)]
+    r2, g2, b2 = [int(x * 255) for x in colorsys.hsv_to_rgb(h2, 0.4, 1)]
+    for i in range(lines):
+        color = f'#{int(r1 + (r2 - r1) * i / lines):02x}{int(g1 + (g2 - g1) * i / lines):02x}{int(b1 + (b2 - b1) * i / lines):02x}'
+        canvas.create_rectangle(0, int(i * height / lines), width, int((i + 1) * height / lines), outline="", fill=color)
+
+
+def per_frame(root, draw, frames):
+    """CPU milliseconds per frame, best of three runs."""
+    best = float('inf')
+    for _ in range(3):
+        start = time.process_time()
+        for step in range(frames):
+            draw(step)
+            root.update_idletasks()
+        best = min(best, time.process_time() - start)
+    return best / frames * 1000
+
+
+def cpu_share(root, seconds):
+    """Runs the event loop for `seconds` and returns the process CPU time / wall time."""
+    wall, cpu = time.perf_counter(), time.process_time()
+    deadline = wall + seconds
+    while time.perf_counter() < deadline:
+        root.update()
+        time.sleep(0.002)
+    return (time.process_time() - cpu) / (time.perf_counter() - wall)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--seconds', type=float, default=5.0)
+    parser.add_argument('--frames', type=int, default=360)
+    args = parser.parse_args()
+
+    try:
+        root = tk.Tk()
+    except tk.TclError as e:
+        print(f"Needs a display: {e}")
+        sys.exit(1)
+    root.geometry("420x420")
+    root.update()
+
+    old_canvas = tk.Canvas(root, highlightthickness=0)
+    old_canvas.place(x=0, y=0, relwidth=1, relheight=1)
+    root.update()
+    old_ms = per_frame(root, lambda step: old_draw(root, old_canvas, step), args.frames)
+
+    def old_loop(step=0):
+        old_draw(root, old_canvas, step)
+        root.after(OLD_INTERVAL_MS, lambda: old_loop(step + 1))
+    old_loop()
+    old_share = cpu_share(root, args.seconds)
+    old_canvas.destroy()
+    for job in root.tk.call('after', 'info'):
+        root.after_cancel(job)
+
+    gradient = register.GradientBackground(root)
+    gradient.layout()
+
+    def new_draw(step):
+        gradient.step = step
+        gradient.draw()
+    register.gradient_band_colors.cache_clear()
+    start = time.process_time() # One uncached cycle; per_frame's runs then hit the cache
+    for step in range(args.frames):
+        new_draw(step)
+        root.update_idletasks()
+    first_cycle_ms = (time.process_time() - start) / args.frames * 1000
+    new_ms = per_frame(root, new_draw, args.frames)
+
+    gradient.update_running()
+    frames_before = gradient.frames
+    new_share = cpu_share(root, args.seconds)
+    fps = (gradient.frames - frames_before) / args.seconds
+    gradient.focused = False # What losing focus does
+    gradient.update_running()
+    paused_share = cpu_share(root, args.seconds)
+    root.destroy()
+
+    print(f"{'case':<36}{'old':>10}{'new':>10}")
+    print(f"{'ms per frame (first hue cycle)':<36}{old_ms:>10.2f}{first_cycle_ms:>10.2f}")
+    print(f"{'ms per frame (cached colours)':<36}{old_ms:>10.2f}{new_ms:>10.2f}")
+    print(f"{'CPU while animating':<36}{old_share:>10.1%}{new_share:>10.1%}   ({fps:.1f} fps)")
+    print(f"{'CPU while unfocused':<36}{old_share:>10.1%}{paused_share:>10.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Times importing statement files into an empty ledger.
+
+    python benchmarks/bench_import.py --rows 1000000
+
+Writes --rows synthetic expenses (seed_data.generate_rows) three ways: a CSV
+like the app's own export (ISO dates, positive amounts), a bank statement CSV
+(DD/MM/YYYY dates, signed amounts, a credit after every ninth debit, which the
+import skips) and JSON Lines. Each is imported with importer.import_file into a
+fresh ledger, as `python -m expense_tracker import` does.
+"""
+import argparse
+import csv
+import datetime
+import json
+import os
+import tempfile
+import time
+
+from seed_data import create_ledger, generate_rows
+from expense_tracker.core.importer import import_file
+
+FIELDS = ('Date', 'Payee', 'Description', 'Amount', 'ModeOfPayment', 'Category', 'Tags')
+CREDIT_EVERY = 10
+
+
+def write_export_csv(path, rows):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(FIELDS)
+        writer.writerows(generate_rows(rows))
+
+
+def write_statement_csv(path, rows):
+    """Bank statement layout: debits negative, credits (salary, refunds) positive."""
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(('Txn Date', 'Narration', 'Amount', 'Payment Method'))
+        for i, (date, payee, description, amount, mop, _, _) in enumerate(generate_rows(rows)):
+            day = datetime.date.fromisoformat(date).strftime('%d/%m/%Y')
+            signed = amount if i % CREDIT_EVERY == CREDIT_EVERY - 1 else -amount
+            writer.writerow((day, f"{payee} {description}", f"{signed:.2f}", mop))
+
+
+def write_jsonl(path, rows):
+    with open(path, 'w', encoding='utf-8') as f:
+        for row in generate_rows(rows):
+            f.write(json.dumps(dict(zip(FIELDS, row))) + "\n")
+
+
+CASES = [
+    ("export CSV (ISO dates)", 'export.csv', write_export_csv),
+    ("statement CSV (DD/MM/YYYY)", 'statement.csv', write_statement_csv),
+    ("JSON Lines", 'expenses.jsonl', write_jsonl),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    print(f"{'file':<28}{'seconds':>9}{'imported':>10}{'skipped':>9}{'rows/s':>10}{'per 1M (s)':>12}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, name, write in CASES:
+            path = os.path.join(tmp, name)
+            write(path, args.rows)
+            connector = create_ledger(os.path.join(tmp, 'bench.db'), 0)
+            start = time.perf_counter()
+            summary = import_file(connector, path)
+            seconds = time.perf_counter() - start
+            connector.close()
+            os.remove(path)
+            rate = args.rows / seconds
+            print(f"{label:<28}{seconds:>9.1f}{summary['imported']:>10}{summary['skipped']:>9}{rate:>10.0f}"
+                  f"{1_000_000 / rate:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
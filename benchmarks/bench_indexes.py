@@ -0,0 +1,71 @@
+"""Compares the app's filter queries on an unindexed (schema v1) ledger against
+the migrated schema with DateDay and the composite indexes.
+
+    python benchmarks/bench_indexes.py --rows 1000000
+"""
+import argparse
+import datetime
+import os
+import tempfile
+import time
+
+from seed_data import create_ledger
+from expense_tracker.core.migrations import day_number, migrate
+
+START = datetime.date(2023, 3, 1)
+END = datetime.date(2023, 3, 31)
+
+# (label, v1 query + params, v2 query + params)
+QUERIES = [
+    ("month range",
+     ("SELECT COUNT(*), SUM(Amount) FROM ExpenseTracker WHERE Date BETWEEN ? AND ?", ('2023-03-01', '2023-03-31 23:59:59')),
+     ("SELECT COUNT(*), SUM(Amount) FROM ExpenseTracker WHERE DateDay BETWEEN ? AND ?", (day_number(START), day_number(END)))),
+    ("month + category",
+     ("SELECT COUNT(*), SUM(Amount) FROM ExpenseTracker WHERE Date BETWEEN ? AND ? AND Category = ?", ('2023-03-01', '2023-03-31 23:59:59', 'Food')),
+     ("SELECT COUNT(*), SUM(Amount) FROM ExpenseTracker WHERE DateDay BETWEEN ? AND ? AND Category = ?", (day_number(START), day_number(END), 'Food'))),
+    ("month + mop",
+     ("SELECT COUNT(*), SUM(Amount) FROM ExpenseTracker WHERE Date BETWEEN ? AND ? AND ModeOfPayment = ?", ('2023-03-01', '2023-03-31 23:59:59', 'UPI')),
+     ("SELECT COUNT(*), SUM(Amount) FROM ExpenseTracker WHERE DateDay BETWEEN ? AND ? AND ModeOfPayment = ?", (day_number(START), day_number(END), 'UPI'))),
+    ("first page by amount",
+     ("SELECT * FROM ExpenseTracker ORDER BY Amount DESC, ID DESC LIMIT 200", ()),
+     ("SELECT * FROM ExpenseTracker ORDER BY Amount DESC, ID DESC LIMIT 200", ())),
+]
+
+
+def time_query(connector, query, params, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        connector.execute(query, params).fetchall()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.db')
+        start = time.perf_counter()
+        connector = create_ledger(path, args.rows, schema_version=1)
+        print(f"Seeded {args.rows} rows in {time.perf_counter() - start:.1f}s")
+
+        before = [time_query(connector, q[0], q[1], args.repeat) for _, q, _ in QUERIES]
+
+        start = time.perf_counter()
+        migrate(connector)
+        print(f"Migrated to the indexed schema in {time.perf_counter() - start:.1f}s")
+
+        after = [time_query(connector, q[0], q[1], args.repeat) for _, _, q in QUERIES]
+        connector.close()
+
+    print(f"\n{'query':<24}{'v1 (ms)':>12}{'indexed (ms)':>14}{'speedup':>10}")
+    for (label, _, _), b, a in zip(QUERIES, before, after):
+        print(f"{label:<24}{b * 1000:>12.2f}{a * 1000:>14.2f}{b / a:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
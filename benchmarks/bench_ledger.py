@@ -0,0 +1,83 @@
+"""Compares balance and cash-flow lookups in the ledger's running totals with SUMs
+over the transactions, and the write cost of keeping the totals up to date.
+
+    python benchmarks/bench_ledger.py --rows 1000000
+
+'old' is a SUM over the transactions for lookups, and an insert without the
+ledger trigger for writes.
+"""
+import argparse
+import datetime
+import os
+import random
+import tempfile
+import time
+
+from seed_data import create_ledger
+from expense_tracker.core import ledger
+
+SUM_BALANCE = ("SELECT (SELECT COALESCE(SUM(Amount), 0) FROM Income WHERE DateDay <= ?) - "
+               "(SELECT COALESCE(SUM(Amount), 0) FROM ExpenseTracker WHERE DateDay <= ?)")
+SUM_MONTHLY = ("SELECT Month, SUM(Inflow), SUM(Outflow) FROM ("
+               "SELECT substr(Date, 1, 7) AS Month, Amount AS Inflow, 0 AS Outflow FROM Income "
+               "UNION ALL SELECT substr(Date, 1, 7), 0, Amount FROM ExpenseTracker) GROUP BY Month")
+
+
+def best_of(repeat, fn):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        connector = create_ledger(os.path.join(tmp, 'bench.db'), args.rows)
+        rng = random.Random(7)
+        start = datetime.date(2020, 1, 1)
+        connector.executemany(
+            "INSERT INTO Income (Date, Source, Amount, Category, Account) VALUES (?, 'Employer', ?, 'Salary', 'Bank')",
+            [((start + datetime.timedelta(days=30 * i)).isoformat(), rng.uniform(50_000, 90_000)) for i in range(60)])
+        connector.commit()
+        dates = [start + datetime.timedelta(days=rng.randrange(5 * 365)) for _ in range(100)]
+
+        def sum_balances():
+            for date in dates:
+                day = (date - datetime.date(1970, 1, 1)).days
+                connector.execute(SUM_BALANCE, (day, day)).fetchone()
+
+        def ledger_balances():
+            for date in dates:
+                ledger.net_worth(connector, date)
+
+        print(f"{'case':<32}{'old (ms)':>10}{'ledger (ms)':>13}")
+        sum_time = best_of(args.repeat, sum_balances)
+        ledger_time = best_of(args.repeat, ledger_balances)
+        print(f"{'net worth at 100 dates':<32}{sum_time * 1000:>10.1f}{ledger_time * 1000:>13.2f}")
+        sum_time = best_of(args.repeat, lambda: connector.execute(SUM_MONTHLY).fetchall())
+        ledger_time = best_of(args.repeat, lambda: ledger.monthly_cash_flow(connector))
+        print(f"{'monthly cash flow':<32}{sum_time * 1000:>10.1f}{ledger_time * 1000:>13.2f}")
+
+        insert = ('INSERT INTO ExpenseTracker (Date, Payee, Description, Amount, ModeOfPayment, Category, Tags) '
+                  "VALUES (?, 'Bench', 'bench', 10, 'Cash', 'Other', '')")
+        for label, date in (("insert on the latest day", "2024-12-29"), ("insert back-dated 4 years", "2020-12-01")):
+            timings = []
+            for trigger_on in (False, True):
+                if not trigger_on:
+                    ledger.drop_ledger_insert_trigger(connector)
+                timings.append(best_of(args.repeat, lambda: connector.execute(insert, (date,))) * 1000)
+                connector.rollback()
+                ledger.create_ledger_triggers(connector)
+            print(f"{label:<32}{timings[0]:>10.3f}{timings[1]:>13.3f}")
+        connector.close()
+
+
+if __name__ == "__main__":
+    main()
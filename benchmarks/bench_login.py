@@ -0,0 +1,98 @@
+"""Times the database side of going from the login screen to the dashboard.
+
+    python benchmarks/bench_login.py --rows 100000 --users 10000
+
+'old' opens a fresh connection for the login (running CREATE TABLE IF NOT EXISTS
+users first, as register.py did) and another for the main app, which then
+migrates. 'new' is auth.py on the login worker's long-lived pooled connection,
+whose schema setup already ran while the login screen was up, and the main app
+reusing that connection from the pool. Password hashing is left out of both: it
+is slow on purpose and costs the same either way (see bench_passwords.py).
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+
+from seed_data import create_ledger
+from expense_tracker.core import auth
+from expense_tracker.core.connection_pool import ConnectionPool
+from expense_tracker.core.fts_search import fts_available
+from expense_tracker.core.migrations import migrate
+
+USERS_TABLE_SQL = ("CREATE TABLE IF NOT EXISTS users (id INTEGER PRIMARY KEY AUTOINCREMENT, email TEXT UNIQUE NOT NULL, "
+                   "password TEXT NOT NULL, marital_status TEXT NOT NULL, role TEXT)")
+CATEGORIES_SQL = "SELECT DISTINCT Category FROM ExpenseTracker WHERE Category IS NOT NULL AND Category != ''"
+
+
+def main_app_startup(connector):
+    """The database work main.py does before its window is built."""
+    migrate(connector)
+    fts_available(connector)
+    connector.execute(CATEGORIES_SQL).fetchall()
+
+
+def old_login(db_path, email, stored):
+    conn = sqlite3.connect(db_path)
+    conn.execute(USERS_TABLE_SQL)
+    conn.execute("SELECT * FROM users WHERE email = ? AND password = ?", (email, stored)).fetchone()
+    conn.close()
+    conn = sqlite3.connect(db_path)
+    main_app_startup(conn)
+    conn.close()
+
+
+def new_login(pool, worker_connection, email):
+    worker_connection.execute(auth.LOOKUP_SQL, (email,)).fetchone()
+    pool.release(worker_connection) # The handoff
+    connector = pool.acquire()
+    main_app_startup(connector)
+    return connector # Becomes the next login's worker connection
+
+
+def median_ms(times):
+    times = sorted(times)
+    return times[len(times) // 2] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--users', type=int, default=10_000)
+    parser.add_argument('--repeat', type=int, default=51)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.db')
+        connector = create_ledger(db_path, args.rows)
+        connector.executemany("INSERT INTO users (email, password, marital_status) VALUES (?, ?, 'Single')",
+                              ((f"user{i}@example.com", f"{i:064x}") for i in range(args.users)))
+        connector.commit()
+        connector.close()
+        email, stored = "user4242@example.com", f"{4242:064x}"
+
+        old_times = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            old_login(db_path, email, stored)
+            old_times.append(time.perf_counter() - start)
+
+        pool = ConnectionPool(db_path)
+        worker_connection = pool.acquire()
+        auth.setup(worker_connection) # While the login screen is shown
+        new_times = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            worker_connection = new_login(pool, worker_connection, email)
+            new_times.append(time.perf_counter() - start)
+        pool.release(worker_connection)
+        pool.close()
+
+        print(f"{'case':<36}{'median (ms)':>12}")
+        print(f"{'old: fresh connections':<36}{median_ms(old_times):>12.2f}")
+        print(f"{'new: pooled, schema set up earlier':<36}{median_ms(new_times):>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Shows that a filter's cost follows one user's rows rather than the whole household's.
+
+    python benchmarks/bench_partitions.py --rows 200000 --users 10
+
+The same ledger is queried twice: first with every expense belonging to one
+account (what each user scanned before expenses had a UserID), then spread over
+--users accounts, querying one of them. Each case runs the app's own filter path:
+query_builder's WHERE clause, the aggregates behind the totals and charts, and
+the first page of the table.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from seed_data import create_ledger
+from expense_tracker.core.query_builder import build_filter_clause
+from expense_tracker.core.query_results import run_expense_query
+from expense_tracker.core.rollups import create_rollup_triggers, populate_rollup
+
+# (label, search, filters, sort column)
+CASES = [
+    ("all, by amount", None, None, 'Amount'),
+    ("category, by date", None, {'category': "Food"}, 'Date'),
+    ("custom month", None, {'date_range': "Custom Range", 'custom_start': "2023-06-01", 'custom_end': "2023-06-30"}, 'ID'),
+    ("word search", "coffee", None, 'ID'),
+    ("tag + amount", "tag:car amount:>1000", None, 'Amount'),
+]
+
+
+def run_case(connector, user_id, search, filters, sort_column):
+    where_sql, params = build_filter_clause(search, filters, True, user_id)
+    result = run_expense_query(connector, where_sql, params, sort_column, 'DESC', from_rollup=not search)
+    result.pager.next_page()
+    return result.count
+
+
+def median_ms(connector, user_id, case, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        count = run_case(connector, user_id, *case[1:])
+        times.append(time.perf_counter() - start)
+    return sorted(times)[len(times) // 2] * 1000, count
+
+
+def assign_users(connector, users):
+    """Spreads the expenses over users accounts (IDs 1..users), as adopt_unowned would move them."""
+    connector.execute("DROP TRIGGER IF EXISTS trg_expense_rollup_update")
+    connector.execute("UPDATE ExpenseTracker SET UserID = ID % ? + 1", (users,))
+    populate_rollup(connector)
+    create_rollup_triggers(connector)
+    connector.commit()
+    connector.execute("ANALYZE")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=200_000)
+    parser.add_argument('--users', type=int, default=10)
+    parser.add_argument('--repeat', type=int, default=11)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        connector = create_ledger(os.path.join(tmp, 'bench.db'), args.rows)
+        assign_users(connector, 1)
+        household = [median_ms(connector, 1, case, args.repeat) for case in CASES]
+        assign_users(connector, args.users)
+        partitioned = [median_ms(connector, 1, case, args.repeat) for case in CASES]
+        connector.close()
+
+    print(f"{'case':<20}{'household (ms)':>16}{'rows':>8}{f'1 of {args.users} (ms)':>16}{'rows':>8}{'speedup':>9}")
+    for (label, *_), (whole_ms, whole_rows), (one_ms, one_rows) in zip(CASES, household, partitioned):
+        print(f"{label:<20}{whole_ms:>16.2f}{whole_rows:>8}{one_ms:>16.2f}{one_rows:>8}{whole_ms / one_ms:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
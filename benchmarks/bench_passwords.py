@@ -0,0 +1,68 @@
+"""Reports password hashes per second for each cost setting, to size the cost to a machine.
+
+    python benchmarks/bench_passwords.py
+    python benchmarks/bench_passwords.py --cost "scrypt$n=65536,r=8,p=1" --threads 4
+
+Pick the highest cost whose time per hash is still acceptable for a login, then set
+it with EXPENSE_TRACKER_PASSWORD_COST. --threads hashes on several threads at once
+(both algorithms release the GIL), as a server handling concurrent logins would.
+"""
+import argparse
+import hashlib
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from expense_tracker.core import passwords # noqa: E402
+
+COSTS = (
+    "sha256 (legacy, unsalted)",
+    "pbkdf2_sha256$i=100000",
+    "pbkdf2_sha256$i=600000",
+    "scrypt$n=8192,r=8,p=1",
+    "scrypt$n=16384,r=8,p=1",
+    "scrypt$n=32768,r=8,p=1",
+    "scrypt$n=65536,r=8,p=1",
+)
+
+
+def memory(cost):
+    algorithm, values = passwords.parse_cost(cost)
+    if algorithm != passwords.SCRYPT:
+        return "-"
+    return f"{128 * values['n'] * values['r'] * values['p'] / 2 ** 20:.0f} MB"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--cost', action='append', help="a cost setting to measure (repeatable; default: a range)")
+    parser.add_argument('--seconds', type=float, default=2.0, help="time spent on each setting")
+    parser.add_argument('--threads', type=int, default=1)
+    args = parser.parse_args()
+
+    print(f"{'cost':<28}{'memory':>8}{'ms/hash':>10}{'hashes/s':>10}")
+    with ThreadPoolExecutor(args.threads) as pool:
+        for cost in args.cost or COSTS:
+            if cost.startswith("sha256"):
+                work = lambda: hashlib.sha256(b"correct horse battery").hexdigest()
+                mem = "-"
+            else:
+                work = lambda: passwords.hash_password("correct horse battery", cost)
+                mem = memory(cost)
+            work() # Warm up
+            hashes, single = 0, []
+            start = time.perf_counter()
+            while time.perf_counter() - start < args.seconds:
+                batch_start = time.perf_counter()
+                for future in [pool.submit(work) for _ in range(args.threads)]:
+                    future.result()
+                single.append(time.perf_counter() - batch_start)
+                hashes += args.threads
+            elapsed = time.perf_counter() - start
+            print(f"{cost:<28}{mem:>8}{min(single) * 1000:>10.2f}{hashes / elapsed:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Times representative searches through the search language planner.
+
+    python benchmarks/bench_query_planner.py --rows 1000000
+
+For each search it reports the planned SQL with the FTS5 index and with the LIKE
+fallback, the SQL the old split(' AND ') builder produced where the old syntax
+could express it (LOWER() on every column, Amount included), the indexes SQLite
+picked for the planned query, and how long the in-memory matcher (used to refine
+cached results) takes over the same rows.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from seed_data import create_ledger
+from expense_tracker.core.paged_table import EXPENSE_COLUMNS
+from expense_tracker.core.query_builder import build_filter_clause, row_matcher
+from expense_tracker.core.search_parser import conjuncts, parse
+
+OLD_GENERAL = "(" + " OR ".join(f"LOWER({f}) LIKE ?" for f in ['Payee', 'Description', 'Amount', 'Category', 'Tags', 'ModeOfPayment']) + ")"
+
+# (label, search, old builder's WHERE clause and params or None)
+SEARCHES = [
+    ("word", "coffee", (OLD_GENERAL, ['%coffee%'] * 6)),
+    ("number", "42", (OLD_GENERAL, ['%42%'] * 6)),
+    ("field + word", "payee:big bazaar AND groceries",
+     ("LOWER(payee) LIKE ? AND " + OLD_GENERAL, ['%big bazaar%'] + ['%groceries%'] * 6)),
+    ("amount range", "amount:100..200", ("Amount >= ? AND Amount <= ?", [100.0, 200.0])),
+    ("month", "date:2023-06", ("DateDay >= ? AND DateDay <= ?", [19509, 19538])),
+    ("exact payee", "payee:=uber", ("LOWER(payee) LIKE ?", ['%uber%'])),
+    ("tag", "tag:car", ("LOWER(tags) LIKE ?", ['%car%'])),
+    ("OR", "uber OR ola", None),
+    ("NOT", "coffee -starbucks", None),
+    ("mixed", "(uber OR ola) amount:>500 date:2024 -tag:work", None),
+    ("OR of fields", "category:=food OR category:=travel", None),
+]
+
+
+def time_query(connector, where_sql, params, repeat):
+    query = "SELECT COUNT(*) FROM ExpenseTracker" + (f" WHERE {where_sql}" if where_sql else "")
+    best, count = float('inf'), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        count = connector.execute(query, params).fetchone()[0]
+        best = min(best, time.perf_counter() - start)
+    return best, count
+
+
+def indexes_used(connector, where_sql, params):
+    plan = connector.execute(f"EXPLAIN QUERY PLAN SELECT ID FROM ExpenseTracker WHERE {where_sql}", params).fetchall()
+    used = []
+    for *_, detail in plan:
+        if 'VIRTUAL TABLE' in detail:
+            used.append('fts')
+        elif 'INDEX' in detail:
+            used.append(detail.split('INDEX ')[1].split(' ')[0])
+        elif detail.startswith('SCAN ExpenseTracker'):
+            used.append('scan')
+    return ",".join(dict.fromkeys(used))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        connector = create_ledger(os.path.join(tmp, 'bench.db'), args.rows)
+        connector.execute("ANALYZE")
+        print(f"Seeded {args.rows} rows in {time.perf_counter() - start:.1f}s\n")
+        rows = connector.execute(f"SELECT {', '.join(EXPENSE_COLUMNS)} FROM ExpenseTracker").fetchall()
+
+        print(f"{'search':<15}{'FTS (ms)':>10}{'LIKE (ms)':>11}{'old (ms)':>10}{'memory (ms)':>13}{'matches':>9}  plan")
+        for label, search, old in SEARCHES:
+            where_sql, params = build_filter_clause(search, None, use_fts=True)
+            fts_time, count = time_query(connector, where_sql, params, args.repeat)
+            like_time, like_count = time_query(connector, *build_filter_clause(search, None, use_fts=False), args.repeat)
+            old_time = time_query(connector, old[0], old[1], args.repeat)[0] if old else None
+
+            match = row_matcher(conjuncts(parse(search)))
+            start = time.perf_counter()
+            memory_count = sum(1 for row in rows if match(row))
+            memory_time = time.perf_counter() - start
+
+            old_text = f"{old_time * 1000:>10.1f}" if old_time is not None else f"{'-':>10}"
+            note = "" if count == memory_count else f"  (memory matched {memory_count})"
+            if like_count != count:
+                note += f"  (LIKE matched {like_count})"
+            print(f"{label:<15}{fts_time * 1000:>10.1f}{like_time * 1000:>11.1f}{old_text}{memory_time * 1000:>13.1f}"
+                  f"{count:>9}  {indexes_used(connector, where_sql, params)}{note}")
+        connector.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Compares the old LIKE-based free-text search with the FTS5 index.
+
+    python benchmarks/bench_search.py --rows 1000000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from seed_data import create_ledger
+from expense_tracker.core.fts_search import FTS_MATCH_CONDITION, compile_match, match_phrase
+
+LIKE_FIELDS = ['Payee', 'Description', 'Amount', 'Category', 'Tags', 'ModeOfPayment']
+
+# (label, search words, field-specific (field, value) pairs)
+SEARCHES = [
+    ("single word", ["coffee"], []),
+    ("prefix", ["starb"], []),
+    ("two words AND", ["uber", "taxi"], []),
+    ("payee: + word", ["groceries"], [("Payee", "big bazaar")]),
+]
+
+
+def like_query(words, fields):
+    conditions, params = [], []
+    for word in words:
+        conditions.append("(" + " OR ".join(f"LOWER({f}) LIKE ?" for f in LIKE_FIELDS) + ")")
+        params.extend([f'%{word}%'] * len(LIKE_FIELDS))
+    for field, value in fields:
+        conditions.append(f"LOWER({field}) LIKE ?")
+        params.append(f'%{value}%')
+    return "SELECT COUNT(*) FROM ExpenseTracker WHERE " + " AND ".join(conditions), params
+
+
+def fts_query(words, fields):
+    terms = [match_phrase(w) for w in words] + [match_phrase(v, column=f) for f, v in fields]
+    return f"SELECT COUNT(*) FROM ExpenseTracker WHERE {FTS_MATCH_CONDITION}", [compile_match(terms)]
+
+
+def time_query(connector, query, params, repeat):
+    best, result = float('inf'), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = connector.execute(query, params).fetchone()[0]
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        connector = create_ledger(os.path.join(tmp, 'bench.db'), args.rows)
+        print(f"Seeded {args.rows} rows (with search index) in {time.perf_counter() - start:.1f}s\n")
+
+        print(f"{'search':<18}{'LIKE (ms)':>12}{'FTS5 (ms)':>12}{'matches':>10}{'speedup':>10}")
+        for label, words, fields in SEARCHES:
+            like_time, like_count = time_query(connector, *like_query(words, fields), args.repeat)
+            fts_time, fts_count = time_query(connector, *fts_query(words, fields), args.repeat)
+            print(f"{label:<18}{like_time * 1000:>12.2f}{fts_time * 1000:>12.2f}{fts_count:>10}{like_time / fts_time:>9.1f}x"
+                  + ("" if like_count == fts_count else f"  (LIKE matched {like_count})"))
+        connector.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""Times the expense table's filters against SQLite and against the in-memory snapshot.
+
+    python benchmarks/bench_snapshot.py --rows 1000000
+
+'sqlite' is the app's path without the snapshot: query_builder's WHERE clause,
+the aggregates behind the totals and charts, and the first page of the table.
+'snapshot' answers the same from snapshot.LedgerSnapshot. Also timed: category
+x month and payment mode x category pivots of the whole ledger against SQL's
+GROUP BY, loading the snapshot, and patching it after an add and an edit.
+The default is 1M rows; building them takes a couple of minutes. Needs numpy.
+"""
+import argparse
+import datetime
+import os
+import tempfile
+import time
+
+from seed_data import create_ledger, generate_rows
+from expense_tracker.core import repository
+from expense_tracker.core.importer import import_expenses
+from expense_tracker.core.query_builder import build_filter_clause
+from expense_tracker.core.query_results import run_expense_query
+from expense_tracker.core.snapshot import LedgerSnapshot
+
+FIELDS = ('Date', 'Payee', 'Description', 'Amount', 'ModeOfPayment', 'Category', 'Tags')
+PAGE_ROWS = 200 # First page plus prefetch, as main.py fetches it
+
+# (label, search, filters, sort column)
+CASES = [
+    ("all, by ID", None, None, 'ID'),
+    ("all, by payee", None, None, 'Payee'),
+    ("category, by date", None, {'category': "Food"}, 'Date'),
+    ("custom month", None, {'date_range': "Custom Range", 'custom_start': "2023-06-01", 'custom_end': "2023-06-30"}, 'Amount'),
+    ("word search", "coffee", None, 'ID'),
+    ("tag + amount", "tag:car amount:>1000", None, 'Amount'),
+]
+
+# (label, SQL GROUP BY columns, LedgerSnapshot.pivot dimensions), over every expense
+PIVOTS = [
+    ("pivot category x month", ('Category', 'substr(Date, 1, 7)'), ('Category', 'Month')),
+    ("pivot mop x category", ('ModeOfPayment', 'Category'), ('ModeOfPayment', 'Category')),
+]
+
+
+def sqlite_case(connector, search, filters, sort_column):
+    where_sql, params = build_filter_clause(search, filters, True)
+    result = run_expense_query(connector, where_sql, params, sort_column, 'DESC', from_rollup=not search)
+    result.pager.next_page(PAGE_ROWS)
+    return result.count
+
+
+def snapshot_case(snapshot, search, filters, sort_column):
+    result = snapshot.query(search, filters, sort_column, 'DESC')
+    result.pager.next_page(PAGE_ROWS)
+    return result.count
+
+
+def sqlite_pivot(connector, rows, columns):
+    return connector.execute(f"SELECT {rows}, {columns}, SUM(Amount), COUNT(*) FROM ExpenseTracker "
+                             f"GROUP BY {rows}, {columns}").fetchall()
+
+
+def snapshot_pivot(snapshot, rows, columns):
+    return snapshot.pivot(None, rows, columns)
+
+
+def median_ms(function, *args, repeat=5):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        value = function(*args)
+        times.append(time.perf_counter() - start)
+    return sorted(times)[len(times) // 2] * 1000, value
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--repeat', type=int, default=11)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # An empty ledger filled by the importer: much faster than create_ledger's row-by-row inserts
+        connector = create_ledger(os.path.join(tmp, 'bench.db'), 0)
+        import_expenses(connector, (dict(zip(FIELDS, row)) for row in generate_rows(args.rows)))
+        connector.execute("ANALYZE")
+
+        load_ms, snapshot = median_ms(LedgerSnapshot.load, connector, repeat=1)
+        print(f"{'case':<24}{'sqlite (ms)':>12}{'snapshot (ms)':>14}{'rows':>10}{'speedup':>9}")
+        print(f"{'load snapshot':<24}{'-':>12}{load_ms:>14.1f}{len(snapshot):>10}")
+        for label, *case in CASES:
+            sqlite_ms, count = median_ms(sqlite_case, connector, *case, repeat=args.repeat)
+            memory_ms, memory_count = median_ms(snapshot_case, snapshot, *case, repeat=args.repeat)
+            assert count == memory_count, (label, count, memory_count)
+            print(f"{label:<24}{sqlite_ms:>12.2f}{memory_ms:>14.2f}{count:>10}{sqlite_ms / memory_ms:>8.1f}x")
+        for label, sql_columns, columns in PIVOTS:
+            sqlite_ms, _ = median_ms(sqlite_pivot, connector, *sql_columns, repeat=args.repeat)
+            memory_ms, _ = median_ms(snapshot_pivot, snapshot, *columns, repeat=args.repeat)
+            print(f"{label:<24}{sqlite_ms:>12.2f}{memory_ms:>14.2f}{'':>10}{sqlite_ms / memory_ms:>8.1f}x")
+
+        snapshot.query(None, None, 'Amount') # Builds the Amount order, which patches then keep up to date
+        start = time.perf_counter()
+        expense_id = repository.add_expense(connector, datetime.date(2024, 5, 1), "Bench", "patch", 42.0, "Cash", "Food")
+        write_ms = (time.perf_counter() - start) * 1000
+        add_ms, _ = median_ms(snapshot.expenses_added, connector, repeat=1)
+        repository.update_expense(connector, expense_id, datetime.date(2024, 5, 2), "Bench", "patch", 43.0, "Cash", "Food")
+        edit_ms, _ = median_ms(snapshot.expense_updated, connector, expense_id, repeat=1)
+        print(f"patch after add {add_ms:.2f} ms, after edit {edit_ms:.2f} ms (the add itself: {write_ms:.2f} ms); "
+              f"current: {snapshot.is_current()}")
+        connector.close()
+
+
+if __name__ == "__main__":
+    main()
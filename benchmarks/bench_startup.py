@@ -0,0 +1,88 @@
+"""Measures cold start time of the CLI, the core package and the desktop app.
+
+    python benchmarks/bench_startup.py --rows 100000
+
+Each case runs in a fresh interpreter and the median wall time is reported.
+The desktop case needs a display; it patches Tk's mainloop to draw the first
+frame and exit, so it measures the time until the window is first shown.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from seed_data import create_ledger
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs main.py until the window has been drawn once, then reports which heavy modules were loaded
+GUI_SNIPPET = f"""
+import sys, tkinter
+sys.path.insert(0, {REPO_ROOT!r})
+tkinter.Misc.mainloop = lambda self, n=0: self.update()
+import runpy
+runpy.run_path({os.path.join(REPO_ROOT, 'main.py')!r}, run_name='__main__')
+print('loaded:', ','.join(m for m in ('matplotlib', 'tkcalendar') if m in sys.modules) or 'none')
+"""
+
+
+def time_command(command, cwd, repeat):
+    """Returns (median seconds, stdout of the last run)."""
+    env = dict(os.environ, PYTHONPATH=REPO_ROOT)
+    times, output = [], ""
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = subprocess.run(command, cwd=cwd, env=env, capture_output=True, text=True)
+        times.append(time.perf_counter() - start)
+        if result.returncode != 0:
+            raise RuntimeError(f"{' '.join(command)} failed:\n{result.stderr}")
+        output = result.stdout
+    return statistics.median(times), output
+
+
+def gui_available():
+    if sys.platform.startswith('linux') and not os.environ.get('DISPLAY'):
+        return False
+    try:
+        import tkcalendar, matplotlib # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--repeat', type=int, default=7)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'Expense Tracker.db') # The name main.py opens
+        create_ledger(db_path, args.rows).close()
+        print(f"Seeded {args.rows} rows\n")
+
+        python = sys.executable
+        cases = [
+            ("interpreter only", [python, '-c', 'pass']),
+            ("import expense_tracker.core", [python, '-c', 'import expense_tracker.core.query_results, expense_tracker.core.query_builder']),
+            ("CLI --help", [python, '-m', 'expense_tracker', '--help']),
+            ("CLI report", [python, '-m', 'expense_tracker', '--db', db_path, 'report']),
+            ("CLI budget show", [python, '-m', 'expense_tracker', '--db', db_path, 'budget', 'show']),
+        ]
+        if gui_available():
+            cases.append(("desktop app, first frame", [python, '-c', GUI_SNIPPET]))
+        else:
+            print("(desktop app skipped: needs a display, tkcalendar and matplotlib)\n")
+
+        print(f"{'case':<30}{'median (ms)':>12}")
+        for label, command in cases:
+            seconds, output = time_command(command, tmp, args.repeat)
+            note = output.strip().splitlines()[-1] if label.startswith("desktop") else ""
+            print(f"{label:<30}{seconds * 1000:>12.0f}  {note}")
+
+
+if __name__ == "__main__":
+    main()
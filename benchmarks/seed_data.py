@@ -0,0 +1,48 @@
+"""Synthetic ledger generator shared by the benchmark scripts."""
+import datetime
+import os
+import random
+import sqlite3
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from expense_tracker.core.migrations import MIGRATIONS, migrate
+
+CATEGORIES = ["Food", "Travel", "Utilities", "Entertainment", "Education", "Shopping", "Health", "Salary", "Gifts", "Other"]
+MOPS = ["Cash", "Cheque", "Credit Card", "Debit Card", "Online Transfer", "UPI", "Paytm", "Google Pay", "PhonePe", "Other"]
+PAYEES = ["Starbucks", "Amazon", "Uber", "Electricity Board", "Big Bazaar", "Apollo Pharmacy", "Netflix", "Swiggy",
+          "Zomato", "Indian Railways", "Airtel", "Flipkart", "Reliance Fresh", "PVR Cinemas", "Ola"]
+WORDS = ["coffee", "groceries", "monthly bill", "movie night", "train ticket", "medicine", "books", "dinner",
+         "lunch", "taxi", "gift", "subscription", "recharge", "snacks", "fuel"]
+TAGS = ["work", "family", "vacation", "car", "carpool", "home", "weekend", "office", "kids", "health"]
+
+
+def generate_rows(count, seed=42, start=datetime.date(2020, 1, 1), days=5 * 365):
+    """Yields (Date, Payee, Description, Amount, ModeOfPayment, Category, Tags) tuples."""
+    rng = random.Random(seed)
+    for _ in range(count):
+        date = start + datetime.timedelta(days=rng.randrange(days))
+        yield (date.strftime('%Y-%m-%d'), rng.choice(PAYEES), rng.choice(WORDS),
+               round(rng.uniform(10, 5000), 2), rng.choice(MOPS), rng.choice(CATEGORIES),
+               ", ".join(rng.sample(TAGS, rng.randint(0, 3))))
+
+
+def create_ledger(path, rows, schema_version=None, seed=42):
+    """Creates a fresh database at path with the given number of synthetic expenses.
+       schema_version limits how far the schema is migrated (None = latest)."""
+    if os.path.exists(path):
+        os.remove(path)
+    connector = sqlite3.connect(path)
+    if schema_version is None:
+        migrate(connector)
+    else:
+        for target_version in range(1, schema_version + 1):
+            MIGRATIONS[target_version - 1](connector)
+            connector.execute(f"PRAGMA user_version = {target_version}")
+        connector.commit()
+    connector.executemany(
+        'INSERT INTO ExpenseTracker (Date, Payee, Description, Amount, ModeOfPayment, Category, Tags) VALUES (?, ?, ?, ?, ?, ?, ?)',
+        generate_rows(rows, seed))
+    connector.commit()
+    return connector
@@ -1,41 +1,184 @@
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-import tkinter as tk
-
-def create_pie_chart(parent, data, labels, title):
-    fig, ax = plt.subplots()
-    ax.pie(data, labels=labels, autopct='%1.1f%%', startangle=90)
-    ax.set_title(title)
-    canvas = FigureCanvasTkAgg(fig, master=parent)
-    canvas.draw()
-    canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
-
-def plot_expenses_pie():
-    import sqlite3
-    conn = sqlite3.connect("expense_tracker.db")
-    cur = conn.cursor()
-    cur.execute("SELECT category, SUM(amount) FROM expenses GROUP BY category")
-    data = cur.fetchall()
-    if not data:
-        print("No expense data to plot.")
-        return
-    categories, amounts = zip(*data)
-    plt.figure(figsize=(6,6))
-    plt.pie(amounts, labels=categories, autopct='%1.1f%%', startangle=90)
-    plt.title("Expense Breakdown")
-    plt.show()
-
-def plot_income_vs_expense():
-    import sqlite3
-    conn = sqlite3.connect("expense_tracker.db")
-    cur = conn.cursor()
-    cur.execute("SELECT SUM(amount) FROM income")
-    income = cur.fetchone()[0] or 0
-    cur.execute("SELECT SUM(amount) FROM expenses")
-    expense = cur.fetchone()[0] or 0
-
-    plt.figure(figsize=(6,4))
-    plt.bar(["Income", "Expenses"], [income, expense], color=["green", "red"])
-    plt.title("Income vs Expenses")
-    plt.ylabel("Amount")
-    plt.show()
\ No newline at end of file
+import functools
+import math
+import matplotlib
+import matplotlib.pyplot as plt
+from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+import tkinter as tk
+from expense_tracker.core import ledger
+from expense_tracker.core.connection_pool import DB_PATH, get_pool
+
+def create_pie_chart(parent, data, labels, title):
+    fig, ax = plt.subplots()
+    ax.pie(data, labels=labels, autopct='%1.1f%%', startangle=90)
+    ax.set_title(title)
+    canvas = FigureCanvasTkAgg(fig, master=parent)
+    canvas.draw()
+    canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+
+def plot_expenses_pie():
+    with get_pool(DB_PATH).connection() as conn:
+        data = conn.execute("SELECT Category, SUM(Amount) FROM ExpenseTracker GROUP BY Category").fetchall()
+    if not data:
+        print("No expense data to plot.")
+        return
+    categories, amounts = zip(*data)
+    plt.figure(figsize=(6,6))
+    plt.pie(amounts, labels=categories, autopct='%1.1f%%', startangle=90)
+    plt.title("Expense Breakdown")
+    plt.show()
+
+def plot_income_vs_expense():
+    with get_pool(DB_PATH).connection() as conn:
+        income, expense = ledger.cash_flow(conn) # Running totals: no scan of either table
+
+    plt.figure(figsize=(6,4))
+    plt.bar(["Income", "Expenses"], [income, expense], color=["green", "red"])
+    plt.title("Income vs Expenses")
+    plt.ylabel("Amount")
+    plt.show()
+
+
+# --- Reports tab charts ---
+
+PIE_START_ANGLE = 90
+PIE_LABEL_DISTANCE = 1.1 # Matplotlib's defaults for pie()
+PIE_PCT_DISTANCE = 0.6
+
+
+@functools.lru_cache(maxsize=32)
+def chart_palette(count):
+    """count colours spread evenly over viridis (what get_cmap('viridis', count) gave)."""
+    cmap = matplotlib.colormaps['viridis']
+    return tuple(cmap(i / max(count - 1, 1)) for i in range(count))
+
+
+class ChartManager:
+    """Keeps the Reports tab's pie and bar charts in step with the current filter,
+    doing as little as it can each time a filter is applied:
+
+    - nothing, if a chart's aggregates hash the same as the ones it shows
+    - if only the values changed (same number of categories or months), the
+      existing wedges, bars and labels are moved in place; the axes are only
+      cleared and rebuilt when the number of artists or the theme changes
+    - nothing while the Reports tab is hidden: the latest aggregates are kept
+      and drawn once it is shown (set_visible)
+
+    Canvases are redrawn with draw_idle, so updates arriving in one Tk event
+    cycle render once.
+    """
+
+    def __init__(self, pie_ax, bar_ax, text_color, face_color, bar_color):
+        self.pie_ax = pie_ax
+        self.bar_ax = bar_ax
+        self.colors = (text_color, face_color, bar_color)
+        self.visible = False
+        self.pending = None # (by_category, by_month) to show
+        self.shown = (None, None) # Hashes of what the pie and bar charts show
+        self.wedges = self.labels = self.percents = self.pie_colors = None
+        self.bars = self.months = self.bar_colors = None
+        self.renders = self.skipped = 0 # For profiling
+
+    def update(self, by_category, by_month):
+        """Shows [(category, amount)] in the pie and [('YYYY-MM', amount)] in the bar chart."""
+        self.pending = (tuple((category, amount) for category, amount in by_category if amount), tuple(by_month))
+        self.render()
+
+    def set_visible(self, visible):
+        self.visible = visible
+        self.render()
+
+    def set_colors(self, text_color, face_color, bar_color):
+        self.colors = (text_color, face_color, bar_color)
+        self.render()
+
+    def render(self):
+        if not self.visible or self.pending is None:
+            return
+        by_category, by_month = self.pending
+        pie_key, bar_key = hash((by_category, self.colors)), hash((by_month, self.colors))
+        if (pie_key, bar_key) == self.shown:
+            self.skipped += 1
+            return
+        if pie_key != self.shown[0]:
+            self._draw_pie(by_category)
+            self.pie_ax.figure.canvas.draw_idle()
+        if bar_key != self.shown[1]:
+            self._draw_bars(by_month)
+            self.bar_ax.figure.canvas.draw_idle()
+        self.shown = (pie_key, bar_key)
+        self.renders += 1
+
+    def _draw_pie(self, by_category):
+        if self.wedges is not None and len(self.wedges) == len(by_category) and self.pie_colors == self.colors:
+            self._move_wedges(by_category)
+            return
+        text_color, face_color, _ = self.colors
+        ax = self.pie_ax
+        ax.clear()
+        ax.set_facecolor(face_color)
+        ax.tick_params(colors=text_color)
+        self.pie_colors = self.colors
+        self.wedges = None
+        if not by_category:
+            ax.text(0.5, 0.5, "No category spending to display.", ha='center', va='center', color=text_color)
+            return
+        labels = [category for category, _ in by_category]
+        sizes = [amount for _, amount in by_category]
+        self.wedges, self.labels, self.percents = ax.pie(
+            sizes, labels=labels, autopct='%1.1f%%', startangle=PIE_START_ANGLE, colors=chart_palette(len(labels)),
+            labeldistance=PIE_LABEL_DISTANCE, pctdistance=PIE_PCT_DISTANCE)
+        ax.axis('equal') # Equal aspect ratio ensures that pie is drawn as a circle
+        ax.set_title("Spending by Category", fontsize=10, color=text_color)
+
+    def _move_wedges(self, by_category):
+        """Re-angles the existing wedges and moves their labels, as pie() would place them."""
+        total = sum(amount for _, amount in by_category)
+        start = PIE_START_ANGLE / 360
+        for wedge, label, percent, (category, amount) in zip(self.wedges, self.labels, self.percents, by_category):
+            end = start + amount / total
+            wedge.set_theta1(360 * start)
+            wedge.set_theta2(360 * end)
+            middle = math.pi * (start + end)
+            x, y = math.cos(middle), math.sin(middle)
+            label.set_text(category)
+            label.set_position((PIE_LABEL_DISTANCE * x, PIE_LABEL_DISTANCE * y))
+            label.set_horizontalalignment('left' if x > 0 else 'right')
+            percent.set_text(f"{100 * amount / total:1.1f}%")
+            percent.set_position((PIE_PCT_DISTANCE * x, PIE_PCT_DISTANCE * y))
+            start = end
+
+    def _draw_bars(self, by_month):
+        months = [month for month, _ in by_month]
+        amounts = [amount for _, amount in by_month]
+        ax = self.bar_ax
+        if self.bars is not None and len(self.bars) == len(by_month) and self.bar_colors == self.colors:
+            for bar, amount in zip(self.bars, amounts):
+                bar.set_height(amount)
+            if months != self.months:
+                ax.set_xticklabels(months)
+                self.months = months
+            ax.relim()
+            ax.autoscale_view()
+            return
+        text_color, face_color, bar_color = self.colors
+        ax.clear()
+        ax.set_facecolor(face_color)
+        self.bar_colors = self.colors
+        self.bars = None
+        if not by_month:
+            ax.text(0.5, 0.5, "No monthly spending to display.", ha='center', va='center', color=text_color)
+            return
+        # Bars at 0..n-1 with the months as tick labels: a categorical axis would keep
+        # every month it has ever seen, so bars couldn't be reused for other months
+        positions = range(len(months))
+        self.bars = ax.bar(positions, amounts, color=bar_color)
+        self.months = months
+        ax.set_xticks(positions)
+        ax.set_xticklabels(months)
+        ax.set_xlabel("Month (YYYY-MM)", fontsize=8, color=text_color)
+        ax.set_ylabel("Total Spending (₹)", fontsize=8, color=text_color)
+        ax.set_title("Monthly Spending Trend", fontsize=10, color=text_color)
+        ax.tick_params(axis='x', rotation=45, labelsize=7, colors=text_color)
+        ax.tick_params(axis='y', labelsize=7, colors=text_color)
+        ax.grid(axis='y', linestyle='--', alpha=0.7, color=text_color)
+        ax.figure.tight_layout() # This chart's figure; labels only change size when the bars are rebuilt
@@ -0,0 +1,5 @@
+"""Headless entry point for the expense tracker: `python -m expense_tracker --help`.
+
+Nothing in this package imports tkinter or matplotlib, so it is safe to use
+from cron jobs and servers without a display.
+"""
@@ -0,0 +1,5 @@
+import sys
+
+from expense_tracker.cli import main
+
+sys.exit(main())
@@ -0,0 +1,353 @@
+import argparse
+import csv
+import datetime
+import os
+import sqlite3
+import sys
+
+from .core import analytics, auth, budgets, ledger, query_builder, reports, repository, tags
+from .core.connection_pool import DB_PATH, get_pool
+from .core.consolidate import LEGACY_FILES, consolidate
+from .core.fts_search import fts_available
+from .core.migrations import migrate
+from .core.paged_table import EXPENSE_COLUMNS
+from .core.partitions import UNOWNED, adopt_unowned, database_path
+
+# Heavier modules (importer, exporter, query_results) are imported inside the
+# commands that need them, so `--help` and simple commands start instantly.
+
+DEFAULT_DB = DB_PATH
+DATE_RANGES = {'all': "All Time", 'today': "Today", 'week': "This Week", 'month': "This Month", 'year': "This Year"}
+
+
+def connect(args):
+    """Opens the database and resolves --user to args.user_id. In file-per-user mode
+       (see partitions.py) the connection is to that user's file and args.db is changed to match."""
+    connector = get_pool(args.db).acquire()
+    migrate(connector)
+    args.user_id = UNOWNED
+    if args.user:
+        session = auth.lookup(connector, args.user)
+        if session is None:
+            get_pool(args.db).release(connector)
+            raise ValueError(f"No account with the email {args.user}.")
+        args.user_id = session.user_id
+    user_db = database_path(args.db, args.user_id)
+    if user_db != args.db:
+        shared = get_pool(args.db)
+        shared.release(connector)
+        shared.close()
+        args.db = user_db
+        connector = get_pool(args.db).acquire()
+        migrate(connector)
+    return connector
+
+
+def filters_from_args(args):
+    """Turns the shared filter options into the (search_term, filters) pair the GUI uses."""
+    filters = {'date_range': DATE_RANGES[args.period], 'mop': args.mop or "All", 'category': args.category or "All"}
+    if args.start or args.end:
+        filters.update(date_range="Custom Range", custom_start=args.start or "0001-01-01",
+                       custom_end=args.end or datetime.date.today().strftime('%Y-%m-%d'))
+    return args.search, filters
+
+
+def filtered_query(connector, args):
+    search_term, filters = filters_from_args(args)
+    return query_builder.build_query_and_params(search_term, filters, args.sort, 'DESC' if args.desc else 'ASC',
+                                                fts_available(connector), args.user_id)
+
+
+# --- Commands ---
+
+def cmd_add(connector, args):
+    expense_id = repository.add_expense(connector, args.date, args.payee, args.description or args.payee, args.amount,
+                                        args.mop, args.category, args.tags, args.user_id)
+    print(f"Added expense {expense_id}.")
+
+
+def cmd_income(connector, args):
+    income_id = repository.add_income(connector, args.date, args.source, args.amount, args.category,
+                                      args.account, args.description or '', args.user_id)
+    print(f"Added income {income_id}.")
+
+
+def cmd_transfer(connector, args):
+    transfer_id = repository.add_transfer(connector, args.date, args.from_account, args.to_account, args.amount,
+                                          args.description or '', args.user_id)
+    print(f"Added transfer {transfer_id}.")
+
+
+def cmd_cashflow(connector, args):
+    print(f"{'Month':<10}{'In':>14}{'Out':>14}{'Net':>14}{'Balance':>15}{'Saved':>7}")
+    for month, inflow, outflow, net, closing, rate in ledger.monthly_cash_flow(connector, args.start, args.end, args.user_id):
+        saved = f"{rate:>6.0%}" if rate is not None else f"{'-':>6}"
+        print(f"{month or '(no date)':<10} ₹{inflow:>12.2f} ₹{outflow:>12.2f} ₹{net:>12.2f} ₹{closing:>13.2f} {saved}")
+    print(f"\nNet worth{' on ' + args.end if args.end else ''}: ₹{ledger.net_worth(connector, args.end, user_id=args.user_id):.2f}")
+    for account, balance in ledger.account_balances(connector, args.end, args.user_id):
+        print(f"  {account or '(no account)':<20} ₹{balance:>12.2f}")
+
+
+def cmd_import(connector, args):
+    from .core.importer import import_file
+    summary = import_file(connector, args.file, batch_size=args.batch_size, user_id=args.user_id)
+    print(f"Imported {summary['imported']} expenses ({summary['skipped']} rows skipped).")
+
+
+def cmd_query(connector, args):
+    from .core.exporter import iter_rows
+    query, params = filtered_query(connector, args)
+    if args.limit:
+        query += f" LIMIT {int(args.limit)}"
+    if args.csv:
+        writer = csv.writer(sys.stdout)
+        writer.writerow(EXPENSE_COLUMNS)
+        writer.writerows(iter_rows(connector, query, params))
+        return
+    for expense_id, date, payee, description, amount, mop, category, expense_tags in iter_rows(connector, query, params):
+        print(f"{expense_id:>7}  {date}  ₹{float(amount or 0):>10.2f}  {payee} - {description} [{category}, {mop}]"
+              + (f" #{expense_tags}" if expense_tags else ""))
+
+
+def cmd_report(connector, args):
+    from .core.query_results import run_expense_query
+    search_term, filters = filters_from_args(args)
+    where_sql, params = query_builder.build_filter_clause(search_term, filters, fts_available(connector), args.user_id)
+    result = run_expense_query(connector, where_sql, params, from_rollup=not (search_term and search_term.strip()))
+    print(f"Total Expenses: ₹{result.total:.2f} ({result.count} entries)")
+    print("\nBy category:")
+    for category, amount in result.by_category:
+        print(f"  {category:<20} ₹{amount:>12.2f}")
+    print("\nBy month:")
+    for month, amount in result.by_month:
+        print(f"  {month:<20} ₹{amount:>12.2f}")
+    by_tag = reports.spending_by_tag(connector, where_sql, params)
+    if by_tag:
+        print("\nBy tag:")
+        for tag, count, amount in by_tag:
+            print(f"  {tag:<20} ₹{amount:>12.2f} ({count})")
+
+
+def cmd_trends(connector, args):
+    search_term, filters = filters_from_args(args)
+    where_sql, params = query_builder.build_filter_clause(search_term, filters, fts_available(connector), args.user_id)
+    columns = analytics.load_columns(connector, where_sql, params)
+    if not len(columns):
+        print("No matching expenses.")
+        return
+    months, totals = analytics.monthly_totals(columns)
+    _, changes = analytics.month_over_month(totals)
+    averages = analytics.rolling_mean(totals, args.window)
+    print(f"{'Month':<10}{'Spent':>14}{'Change':>9}{f'{args.window}-mo avg':>15}")
+    for month, total, change, average in zip(months, totals, changes, averages):
+        change = f"{change:>+8.0%}" if change == change else f"{'-':>8}" # NaN: first month, or after a month of 0
+        average = f" ₹{average:>13.2f}" if average == average else f"{'-':>15}"
+        print(f"{str(month):<10}₹{total:>13.2f} {change}{average}")
+
+    print(f"\n{'Category':<20}" + "".join(f"{f'p{p}':>12}" for p in analytics.PERCENTILES))
+    for category, row in zip(columns.categories, analytics.category_percentiles(columns)):
+        print(f"{category:<20}" + "".join(f" ₹{value:>10.2f}" for value in row))
+
+    z_scores = analytics.category_z_scores(columns)
+    flagged = [int(i) for i in (-z_scores).argsort(kind='stable')[:args.limit] if z_scores[i] > args.z]
+    if flagged:
+        print(f"\nUnusual expenses (more than {args.z:g} standard deviations above their category's mean):")
+        details = {row[0]: row[1:] for row in connector.execute(
+            f"SELECT ID, Date, Payee, Amount, Category FROM ExpenseTracker WHERE ID IN ({', '.join('?' * len(flagged))})",
+            [int(columns.ids[i]) for i in flagged])}
+        for i in flagged:
+            date, payee, amount, category = details[int(columns.ids[i])]
+            print(f"{int(columns.ids[i]):>7}  {date}  ₹{float(amount or 0):>10.2f}  {payee} [{category}]  z={z_scores[i]:.1f}")
+
+
+def cmd_budget(connector, args):
+    if args.action == 'set':
+        amount = budgets.set_budget(connector, args.category, args.period, args.amount, args.recurring, args.user_id)
+        every = " and every month after" if args.recurring else ""
+        print(f"Budget for {args.category} in {args.period}{every} set to ₹{amount:.2f}.")
+        return
+    if args.action == 'delete':
+        if not budgets.delete_budget(connector, args.category, args.period, args.user_id):
+            raise ValueError(f"No budget set for {args.category} in {args.period}.")
+        print(f"Budget for {args.category} in {args.period} deleted.")
+        return
+    if args.action == 'list':
+        for category, period, amount, recurring in budgets.list_budgets(connector, args.user_id):
+            print(f"{category:<20} {period}{'+' if recurring else ' '} ₹{amount:>10.2f}")
+        return
+    if args.action == 'alerts':
+        alerts = budgets.unseen_alerts(connector, user_id=args.user_id)
+        if not alerts:
+            print("No new budget alerts.")
+        for alert in alerts:
+            print(budgets.describe_alert(*alert))
+        return
+    period = args.period or datetime.date.today().strftime('%Y-%m')
+    status = budgets.budget_vs_actual(connector, period, args.to, args.user_id)
+    if not status:
+        print(f"No budgets set for {period}.")
+    for month, category, budget, spent in status:
+        flag = "  OVER BUDGET" if spent > budget else ""
+        print(f"{month}  {category:<20} ₹{spent:>10.2f} / ₹{budget:>10.2f}{flag}")
+
+
+def cmd_tags(connector, args):
+    if args.prefix:
+        for name in tags.TagTrie.from_connector(connector, args.limit, args.user_id).complete(args.prefix):
+            print(name)
+        return
+    for name, count in tags.tag_counts(connector, args.user_id)[:args.limit]:
+        print(f"{name:<20} {count:>8}")
+
+
+def cmd_consolidate(connector, args):
+    progress = lambda source, table, rows: print(f"  {source} {table}: {rows} rows copied", file=sys.stderr)
+    checks = consolidate(connector, args.files, batch_size=args.batch_size, progress=progress)
+    for check in checks:
+        status = "OK" if check.ok else f"MISMATCH (checksum {check.source_checksum[:12]} vs {check.target_checksum[:12]})"
+        print(f"{check.source:<20} {check.table:<13} {check.copied_rows:>7}/{check.source_rows:<7} {status}")
+    if not all(check.ok for check in checks):
+        raise RuntimeError("Some tables did not validate (see above).")
+
+
+def cmd_adopt(connector, args):
+    if args.user_id == UNOWNED:
+        raise ValueError("Name the account that takes the expenses over with --user.")
+    print(f"{adopt_unowned(connector, args.user_id)} expenses moved to {args.user}.")
+
+
+def cmd_export(connector, args):
+    from .core.exporter import export_query
+    query, params = filtered_query(connector, args)
+    count = export_query(connector, query, params, args.output, args.format)
+    print(f"Exported {count} expenses to {args.output}.")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m expense_tracker", description="Expense Tracker command-line interface.")
+    parser.add_argument('--db', default=DEFAULT_DB, help=f"database file (default: {DEFAULT_DB})")
+    parser.add_argument('--user', metavar='EMAIL', help="work on this account's data (default: what was entered without one)")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    # Search and filter options shared by query, report and export; same syntax as the search box
+    filters = argparse.ArgumentParser(add_help=False)
+    filters.add_argument('search', nargs='?', default='', help="search text, e.g. 'category:food AND amount:>100'")
+    filters.add_argument('--period', choices=sorted(DATE_RANGES), default='all')
+    filters.add_argument('--from', dest='start', metavar='YYYY-MM-DD', help="start of a custom date range")
+    filters.add_argument('--to', dest='end', metavar='YYYY-MM-DD', help="end of a custom date range")
+    filters.add_argument('--mop', help="mode of payment")
+    filters.add_argument('--category')
+    sorting = argparse.ArgumentParser(add_help=False)
+    sorting.add_argument('--sort', choices=EXPENSE_COLUMNS, default='ID')
+    sorting.add_argument('--desc', action='store_true', help="sort descending")
+
+    add = commands.add_parser('add', help="add an expense")
+    add.add_argument('amount', type=float)
+    add.add_argument('payee')
+    add.add_argument('--description')
+    add.add_argument('--date', default=datetime.date.today().strftime('%Y-%m-%d'), help="YYYY-MM-DD (default: today)")
+    add.add_argument('--mop', default='Cash')
+    add.add_argument('--category', default='Other')
+    add.add_argument('--tags', default='', help="comma-separated tags")
+    add.set_defaults(func=cmd_add)
+
+    today = datetime.date.today().strftime('%Y-%m-%d')
+    income = commands.add_parser('income', help="add income")
+    income.add_argument('amount', type=float)
+    income.add_argument('source', help="who paid, e.g. an employer")
+    income.add_argument('--date', default=today, help="YYYY-MM-DD (default: today)")
+    income.add_argument('--category', default='Salary')
+    income.add_argument('--account', default='', help="account it was paid into")
+    income.add_argument('--description')
+    income.set_defaults(func=cmd_income)
+
+    transfer = commands.add_parser('transfer', help="move money between accounts")
+    transfer.add_argument('amount', type=float)
+    transfer.add_argument('from_account')
+    transfer.add_argument('to_account')
+    transfer.add_argument('--date', default=today, help="YYYY-MM-DD (default: today)")
+    transfer.add_argument('--description')
+    transfer.set_defaults(func=cmd_transfer)
+
+    cashflow = commands.add_parser('cashflow', help="monthly income, spending and balances")
+    cashflow.add_argument('--from', dest='start', metavar='YYYY-MM-DD')
+    cashflow.add_argument('--to', dest='end', metavar='YYYY-MM-DD', help="also the date balances are shown for")
+    cashflow.set_defaults(func=cmd_cashflow)
+
+    imp = commands.add_parser('import', help="import a CSV, JSON Lines, OFX or QFX file")
+    imp.add_argument('file')
+    imp.add_argument('--batch-size', type=int, default=5000)
+    imp.set_defaults(func=cmd_import)
+
+    query = commands.add_parser('query', parents=[filters, sorting], help="list matching expenses")
+    query.add_argument('--limit', type=int)
+    query.add_argument('--csv', action='store_true', help="write CSV to stdout")
+    query.set_defaults(func=cmd_query)
+
+    report = commands.add_parser('report', parents=[filters], help="totals by category, month and tag")
+    report.set_defaults(func=cmd_report)
+
+    trends = commands.add_parser('trends', parents=[filters], help="monthly trend, category percentiles and unusual expenses (needs numpy)")
+    trends.add_argument('--window', type=int, default=3, help="months in the moving average (default: 3)")
+    trends.add_argument('--z', type=float, default=analytics.ANOMALY_Z, help=f"z-score above which an expense is unusual (default: {analytics.ANOMALY_Z:g})")
+    trends.add_argument('--limit', type=int, default=10, help="most unusual expenses to list (default: 10)")
+    trends.set_defaults(func=cmd_trends)
+
+    budget = commands.add_parser('budget', help="set, show and check monthly budgets")
+    budget_actions = budget.add_subparsers(dest='action', required=True)
+    budget_set = budget_actions.add_parser('set', help="set a budget")
+    budget_set.add_argument('category', help="category, or 'Overall'")
+    budget_set.add_argument('period', metavar='YYYY-MM')
+    budget_set.add_argument('amount', type=float)
+    budget_set.add_argument('--recurring', action='store_true', help="also for every later month without its own budget")
+    budget_show = budget_actions.add_parser('show', help="budgets vs. spending for a month or range of months")
+    budget_show.add_argument('period', nargs='?', metavar='YYYY-MM', help="default: this month")
+    budget_show.add_argument('--to', metavar='YYYY-MM', help="last month of a range")
+    budget_delete = budget_actions.add_parser('delete', help="delete the budget set for a month")
+    budget_delete.add_argument('category')
+    budget_delete.add_argument('period', metavar='YYYY-MM')
+    budget_actions.add_parser('list', help="every budget set ('+': recurring)")
+    budget_actions.add_parser('alerts', help="budget alerts raised since the last check")
+    budget.set_defaults(func=cmd_budget)
+
+    tag_list = commands.add_parser('tags', help="list tags by use, or complete a tag prefix")
+    tag_list.add_argument('prefix', nargs='?')
+    tag_list.add_argument('--limit', type=int, default=20)
+    tag_list.set_defaults(func=cmd_tags)
+
+    merge = commands.add_parser('consolidate', help="copy the older database files into this one (resumable)")
+    merge.add_argument('files', nargs='*', default=list(LEGACY_FILES), help=f"default: {' '.join(LEGACY_FILES)}")
+    merge.add_argument('--batch-size', type=int, default=500)
+    merge.set_defaults(func=cmd_consolidate)
+
+    adopt = commands.add_parser('adopt', help="give what was entered without an account to --user")
+    adopt.set_defaults(func=cmd_adopt)
+
+    export = commands.add_parser('export', parents=[filters, sorting], help="export matching expenses to a file")
+    export.add_argument('-o', '--output', required=True, help="output file; the format follows the extension (.csv, .jsonl, .parquet, .txt)")
+    export.add_argument('--format', choices=['csv', 'jsonl', 'parquet', 'text'])
+    export.set_defaults(func=cmd_export)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    connector = None
+    try:
+        connector = connect(args)
+        args.func(connector, args)
+    except BrokenPipeError: # e.g. piped into `head`; an OSError, so it has to come first
+        # Point stdout at devnull so the interpreter's final flush doesn't fail again
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 0
+    except (ValueError, RuntimeError, OSError, sqlite3.Error) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    finally:
+        pool = get_pool(args.db)
+        if connector is not None:
+            pool.release(connector)
+        if pool.profile: # EXPENSE_TRACKER_SQL_STATS=1
+            print(pool.stats.report(), file=sys.stderr)
+        pool.close()
+    return 0
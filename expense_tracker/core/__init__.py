@@ -0,0 +1,28 @@
+"""Data and service layer of the expense tracker, shared by the desktop app and the CLI.
+
+Modules:
+    migrations       schema creation and upgrades (migrate)
+    connection_pool  pooled, tuned SQLite connections and statement timing
+    consolidate      resumable copy of the older database files into this one
+    repository       expense, income and transfer writes
+    passwords        salted scrypt / PBKDF2 password hashes
+    partitions       per-user expenses (UserID) and the file-per-user mode
+    auth             registration, login and the logged-in session
+    budgets          monthly and recurring budgets, budget-vs-actual and alerts
+    budget_tracking  per-category monthly spending and alert triggers
+    ledger           income, transfers and running balances
+    achievements     event-driven achievements, counters and daily streaks
+    search_parser    the search box language, parsed into an AST
+    query_builder    SQL (and in-memory matching) for searches and filters
+    query_cache      cache of recent query results
+    tags             normalized tags and tag autocompletion
+    query_results    filtered totals, chart aggregates and paged rows
+    reports          spending summaries and the text report
+    analytics        NumPy trends, percentiles and unusual expenses (optional numpy)
+    snapshot         in-memory columnar copy of the expenses for filters and pivots (optional numpy)
+    importer         streaming CSV / JSON Lines / OFX import
+    exporter         streaming CSV / JSON Lines / Parquet / text export
+    db_worker        background database thread for GUIs
+
+Nothing here imports tkinter or matplotlib.
+"""
@@ -0,0 +1,288 @@
+import datetime
+import sqlite3
+import sys
+from collections import namedtuple
+
+from .rollups import GROUPS_TABLE, UNOWNED, partitioned, user_sql
+
+# Event-driven achievements, earned by each account on its own (see partitions.py).
+# Triggers keep two small tables in step with every write:
+#
+#   AchievementState  named counters per user ('expenses', 'budgets'), +1/-1 per row
+#   ExpenseDays       one row per user and day with at least one expense, and its count
+#
+# so checking an achievement never counts or scans ExpenseTracker. Each achievement
+# lists the events that can change its outcome; evaluate() only checks those, skips
+# the ones already earned, and reads all of the user's counters in one query.
+
+STATE_TABLE = 'AchievementState'
+DAYS_TABLE = 'ExpenseDays'
+COUNTERS = ('expenses', 'budgets')
+
+# Events passed to evaluate()
+EXPENSE_ADDED = 'expense_added'
+EXPENSE_EDITED = 'expense_edited'
+EXPENSE_DELETED = 'expense_deleted'
+EXPENSES_IMPORTED = 'expenses_imported'
+BUDGET_SET = 'budget_set'
+STARTUP = 'startup' # Checks every achievement
+
+
+def _day(date_value):
+    from .migrations import day_number # Not at the top: migrations imports this module
+    return day_number(date_value)
+
+
+# --- Streaks ---
+
+def streak_around(connector, day, limit, user_id=UNOWNED):
+    """Length of the run of consecutive logged days that includes `day`, counting at most
+       `limit` days either side of it (0 if nothing was logged that day). Reads at most
+       2 * limit + 1 rows of ExpenseDays' primary key."""
+    row = connector.execute(
+        f"""WITH Days AS (
+                SELECT DateDay, DateDay - ROW_NUMBER() OVER (ORDER BY DateDay) AS Island
+                FROM {DAYS_TABLE} WHERE UserID = ?3 AND DateDay BETWEEN ?1 - ?2 AND ?1 + ?2
+            )
+            SELECT COUNT(*) FROM Days WHERE Island = (SELECT Island FROM Days WHERE DateDay = ?1)""",
+        (day, limit, user_id)).fetchone()
+    return row[0]
+
+
+def longest_streak(connector, user_id=UNOWNED):
+    """Length of the longest run of consecutive logged days."""
+    row = connector.execute(
+        f"""SELECT MAX(Days) FROM (
+                SELECT COUNT(*) AS Days FROM (
+                    SELECT DateDay - ROW_NUMBER() OVER (ORDER BY DateDay) AS Island FROM {DAYS_TABLE} WHERE UserID = ?
+                ) GROUP BY Island
+            )""", (user_id,)).fetchone()
+    return row[0] or 0
+
+
+# --- Achievements ---
+
+class Check(namedtuple('Check', 'connector user_id counters day')):
+    """What a condition gets: the user's counters, and the day the event touched (None
+       if the event isn't about one day, e.g. at startup or after an import)."""
+
+    def streak(self, days):
+        if self.day is None:
+            return longest_streak(self.connector, self.user_id)
+        return streak_around(self.connector, self.day, days - 1, self.user_id)
+
+
+Achievement = namedtuple('Achievement', 'name description events condition')
+
+_EXPENSE_WRITES = (EXPENSE_ADDED, EXPENSES_IMPORTED)
+
+ACHIEVEMENTS = (
+    Achievement("First Step", "Add your first expense.", _EXPENSE_WRITES,
+                lambda check: check.counters['expenses'] >= 1),
+    Achievement("Budget Setter", "Set your first budget.", (BUDGET_SET,),
+                lambda check: check.counters['budgets'] >= 1),
+    Achievement("Fifty Expenses", "Log 50 expenses.", _EXPENSE_WRITES,
+                lambda check: check.counters['expenses'] >= 50),
+    Achievement("Monthly Tracker", "Log expenses for 30 consecutive days (at least one per day).",
+                _EXPENSE_WRITES + (EXPENSE_EDITED,), lambda check: check.streak(30) >= 30),
+    Achievement("Zero Debt Day", "Have zero expenses for a day (requires no expenses logged today).",
+                (EXPENSE_DELETED, EXPENSE_EDITED),
+                lambda check: check.connector.execute(f"SELECT 1 FROM {DAYS_TABLE} WHERE UserID = ? AND DateDay = ?",
+                                                      (check.user_id, _day(datetime.date.today()))).fetchone() is None),
+)
+
+
+def evaluate(connector, event, date=None, user_id=UNOWNED):
+    """Checks the achievements `event` can affect for a user and records the ones now
+       earned. `date` is the expense date an add or edit touched. Returns
+       [(name, description)] for the newly earned achievements."""
+    candidates = [a for a in ACHIEVEMENTS if event in a.events or event == STARTUP]
+    if not candidates:
+        return []
+    placeholders = ", ".join("?" * len(candidates))
+    earned = {row[0] for row in connector.execute(
+        f"SELECT Name FROM Achievements WHERE UserID = ? AND Name IN ({placeholders})",
+        [user_id] + [a.name for a in candidates])}
+    pending = [a for a in candidates if a.name not in earned]
+    if not pending:
+        return []
+    counters = dict.fromkeys(COUNTERS, 0)
+    counters.update(connector.execute(f"SELECT Name, Value FROM {STATE_TABLE} WHERE UserID = ?", (user_id,)))
+    check = Check(connector, user_id, counters, _day(date) if date is not None and event != STARTUP else None)
+
+    awarded = []
+    achieved_date = datetime.date.today().strftime('%Y-%m-%d')
+    for achievement in pending:
+        if achievement.condition(check):
+            connector.execute("INSERT OR IGNORE INTO Achievements (UserID, Name, Description, AchievedDate) VALUES (?, ?, ?, ?)",
+                              (user_id, achievement.name, achievement.description, achieved_date))
+            awarded.append((achievement.name, achievement.description))
+    if awarded:
+        connector.commit()
+    return awarded
+
+
+# --- Schema ---
+
+def _count_sql(counter, user, delta):
+    return (f"INSERT INTO {STATE_TABLE} (UserID, Name, Value) VALUES ({user}, '{counter}', {delta}) "
+            "ON CONFLICT (UserID, Name) DO UPDATE SET Value = Value + excluded.Value;")
+
+
+def _add_day_sql(prefix, user):
+    return (f"INSERT INTO {DAYS_TABLE} (UserID, DateDay, Count) SELECT {user}, {prefix}DateDay, 1 "
+            f"WHERE {prefix}DateDay IS NOT NULL ON CONFLICT (UserID, DateDay) DO UPDATE SET Count = Count + 1;")
+
+
+def _remove_day_sql(prefix, user):
+    key = f"UserID = {user} AND DateDay = {prefix}DateDay"
+    return (f"UPDATE {DAYS_TABLE} SET Count = Count - 1 WHERE {key};"
+            f"DELETE FROM {DAYS_TABLE} WHERE {key} AND Count <= 0;")
+
+
+def create_achievement_triggers(connector):
+    """(Re)creates the triggers that keep the counters and ExpenseDays up to date."""
+    by_user = partitioned(connector)
+    new, old = user_sql('new.', by_user), user_sql('old.', by_user)
+    connector.execute(
+        f"CREATE TRIGGER IF NOT EXISTS trg_expense_achievement_insert AFTER INSERT ON ExpenseTracker BEGIN "
+        f"{_count_sql('expenses', new, 1)} {_add_day_sql('new.', new)} END"
+    )
+    connector.execute(
+        f"CREATE TRIGGER IF NOT EXISTS trg_expense_achievement_delete AFTER DELETE ON ExpenseTracker BEGIN "
+        f"{_count_sql('expenses', old, -1)} {_remove_day_sql('old.', old)} END"
+    )
+    connector.execute(
+        f"CREATE TRIGGER IF NOT EXISTS trg_expense_achievement_update AFTER UPDATE OF Date{', UserID' if by_user else ''} "
+        f"ON ExpenseTracker WHEN new.DateDay IS NOT old.DateDay OR {new} <> {old} BEGIN "
+        f"{_count_sql('expenses', old, -1)} {_remove_day_sql('old.', old)} "
+        f"{_count_sql('expenses', new, 1)} {_add_day_sql('new.', new)} END"
+    )
+    connector.execute(
+        f"CREATE TRIGGER IF NOT EXISTS trg_budget_achievement_insert AFTER INSERT ON Budgets BEGIN "
+        f"{_count_sql('budgets', new, 1)} END"
+    )
+    connector.execute(
+        f"CREATE TRIGGER IF NOT EXISTS trg_budget_achievement_delete AFTER DELETE ON Budgets BEGIN "
+        f"{_count_sql('budgets', old, -1)} END"
+    )
+
+
+def drop_achievement_triggers(connector):
+    for trigger in ('trg_expense_achievement_insert', 'trg_expense_achievement_delete', 'trg_expense_achievement_update',
+                    'trg_budget_achievement_insert', 'trg_budget_achievement_delete'):
+        connector.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+
+
+def drop_achievement_insert_trigger(connector):
+    """Drops the expense insert trigger for a bulk load; call count_groups() and
+       create_achievement_triggers() afterwards to catch the tables up."""
+    connector.execute("DROP TRIGGER IF EXISTS trg_expense_achievement_insert")
+
+
+def create_achievement_schema(connector):
+    connector.execute(
+        f'''CREATE TABLE IF NOT EXISTS {STATE_TABLE} (
+            UserID INTEGER NOT NULL,
+            Name TEXT NOT NULL,
+            Value INTEGER NOT NULL,
+            PRIMARY KEY (UserID, Name)
+        ) WITHOUT ROWID'''
+    )
+    connector.execute(
+        f'''CREATE TABLE IF NOT EXISTS {DAYS_TABLE} (
+            UserID INTEGER NOT NULL,
+            DateDay INTEGER NOT NULL, -- same day number as ExpenseTracker.DateDay
+            Count INTEGER NOT NULL,
+            PRIMARY KEY (UserID, DateDay)
+        ) WITHOUT ROWID'''
+    )
+    create_achievement_triggers(connector)
+
+
+def _expected_counters(connector, by_user):
+    """{(user, counter): value} for every user with expenses or budgets."""
+    user = user_sql('', by_user)
+    counters = {}
+    for name, table in (('expenses', 'ExpenseTracker'), ('budgets', 'Budgets')):
+        for user_id, value in connector.execute(f"SELECT {user} AS User, COUNT(*) FROM {table} GROUP BY User"):
+            counters[user_id, name] = value
+    return counters
+
+
+def _days_sql(by_user):
+    return (f"SELECT {user_sql('', by_user)} AS User, DateDay, COUNT(*) FROM ExpenseTracker "
+            "WHERE DateDay IS NOT NULL GROUP BY User, DateDay")
+
+
+def populate_state(connector):
+    """Recomputes the counters and ExpenseDays, inside the caller's transaction."""
+    by_user = partitioned(connector)
+    connector.execute(f"DELETE FROM {STATE_TABLE}")
+    connector.executemany(f"INSERT INTO {STATE_TABLE} (UserID, Name, Value) VALUES (?, ?, ?)",
+                          [key + (value,) for key, value in _expected_counters(connector, by_user).items()])
+    connector.execute(f"DELETE FROM {DAYS_TABLE}")
+    connector.execute(f"INSERT INTO {DAYS_TABLE} (UserID, DateDay, Count) " + _days_sql(by_user))
+
+
+def count_groups(connector):
+    """Counts a bulk insert's expenses from rollups.GROUPS_TABLE. Used after bulk
+       inserts made with the insert trigger dropped."""
+    # ORDER BY keeps 'ON CONFLICT' from being parsed as part of the SELECT (see rollups.py)
+    connector.execute(
+        f"INSERT INTO {STATE_TABLE} (UserID, Name, Value) "
+        f"SELECT UserID, 'expenses', SUM(Count) FROM {GROUPS_TABLE} GROUP BY UserID "
+        "ORDER BY UserID ON CONFLICT (UserID, Name) DO UPDATE SET Value = Value + excluded.Value")
+    connector.execute(
+        f"INSERT INTO {DAYS_TABLE} (UserID, DateDay, Count) "
+        f"SELECT UserID, DateDay, SUM(Count) FROM {GROUPS_TABLE} WHERE DateDay IS NOT NULL GROUP BY UserID, DateDay "
+        "ORDER BY UserID ON CONFLICT (UserID, DateDay) DO UPDATE SET Count = Count + excluded.Count")
+
+
+def rebuild_state(connector):
+    populate_state(connector)
+    connector.commit()
+
+
+def verify_state(connector):
+    """Compares the counters and ExpenseDays with ExpenseTracker and Budgets.
+       Returns a list of (key, expected, actual) for everything that drifted."""
+    by_user = partitioned(connector)
+    drift = []
+    # A counter back at 0 may keep its row; a missing row counts as 0 too
+    expected = _expected_counters(connector, by_user)
+    actual = {(user_id, name): value for user_id, name, value in connector.execute(
+        f"SELECT UserID, Name, Value FROM {STATE_TABLE}")}
+    for key in sorted(set(expected) | set(actual)):
+        if expected.get(key, 0) != actual.get(key, 0):
+            drift.append((key, expected.get(key, 0), actual.get(key)))
+    expected_days = {(user_id, day): count for user_id, day, count in connector.execute(_days_sql(by_user))}
+    actual_days = {(user_id, day): count for user_id, day, count in connector.execute(
+        f"SELECT UserID, DateDay, Count FROM {DAYS_TABLE}")}
+    for key in sorted(set(expected_days) | set(actual_days)):
+        if expected_days.get(key) != actual_days.get(key):
+            drift.append((key, expected_days.get(key), actual_days.get(key)))
+    return drift
+
+
+if __name__ == "__main__":
+    # Usage: python -m expense_tracker.core.achievements [verify|rebuild] [database file]
+    command = sys.argv[1] if len(sys.argv) > 1 else "verify"
+    db_path = sys.argv[2] if len(sys.argv) > 2 else "Expense Tracker.db"
+    connector = sqlite3.connect(db_path)
+    try:
+        if command == "rebuild":
+            rebuild_state(connector)
+            print("Achievement counters rebuilt.")
+        elif command == "verify":
+            drift = verify_state(connector)
+            for key, exp, act in drift:
+                print(f"Drift in {key}: expected {exp}, found {act}")
+            print("Achievement counters are consistent." if not drift else
+                  f"{len(drift)} value(s) drifted. Run 'python -m expense_tracker.core.achievements rebuild'.")
+            sys.exit(1 if drift else 0)
+        else:
+            print(f"Unknown command '{command}'. Use 'verify' or 'rebuild'.")
+            sys.exit(2)
+    finally:
+        connector.close()
@@ -0,0 +1,193 @@
+from operator import itemgetter
+
+from .migrations import day_number
+from .partitions import UNOWNED, user_filter
+
+# Spending analytics over NumPy arrays. The expenses a filter matches are loaded
+# once as columns (dates as datetime64[D], amounts as float64, categories as
+# int32 codes into a sorted list of names) and every statistic is then a few
+# whole-array passes: np.bincount for per-day, per-month and per-category sums,
+# cumulative sums for rolling means, one sort for per-category percentiles.
+# NumPy is optional and imported on first use; without it these functions raise
+# RuntimeError, and the app's tips go without them.
+#
+# Rows whose date could not be parsed (DateDay is NULL) are left out.
+
+UNCATEGORIZED = "Uncategorized"
+ANOMALY_Z = 3.0 # Flag expenses more than this many standard deviations above their category's mean
+PERCENTILES = (25, 50, 75, 90)
+
+LOAD_SQL = ("SELECT ID, DateDay, COALESCE(CAST(Amount AS REAL), 0), COALESCE(NULLIF(Category, ''), ?) "
+            "FROM ExpenseTracker WHERE DateDay IS NOT NULL")
+
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise RuntimeError("Spending analytics need numpy. Please install it: pip install numpy")
+    return numpy
+
+
+class ExpenseColumns:
+    """One array per column of the loaded expenses; row i of each belongs to the same expense."""
+
+    def __init__(self, ids, dates, amounts, codes, categories):
+        self.ids = ids # int64
+        self.dates = dates # datetime64[D]
+        self.amounts = amounts # float64
+        self.codes = codes # int32 index into categories
+        self.categories = categories # Category names, sorted
+
+    def __len__(self):
+        return len(self.ids)
+
+
+def columns_from_rows(rows):
+    """Builds ExpenseColumns from (ID, DateDay, Amount, Category) tuples.
+       Each column is read straight into its array; zip(*rows) is several times slower on big results."""
+    np = _numpy()
+    rows = rows if isinstance(rows, list) else list(rows)
+    count = len(rows)
+    names = list(map(itemgetter(3), rows))
+    categories = sorted(set(names))
+    code_of = {name: code for code, name in enumerate(categories)}
+    return ExpenseColumns(np.fromiter(map(itemgetter(0), rows), dtype=np.int64, count=count),
+                          np.fromiter(map(itemgetter(1), rows), dtype=np.int64, count=count).astype('datetime64[D]'),
+                          np.fromiter(map(itemgetter(2), rows), dtype=np.float64, count=count),
+                          np.fromiter(map(code_of.__getitem__, names), dtype=np.int32, count=count),
+                          categories)
+
+
+def load_columns(connector, where_sql='', params=()):
+    """Loads the expenses matching where_sql (as built by query_builder.build_filter_clause)."""
+    where = f" AND ({where_sql})" if where_sql else ""
+    return columns_from_rows(connector.execute(LOAD_SQL + where, (UNCATEGORIZED, *params)).fetchall())
+
+
+def load_user_columns(connector, start_date, end_date, user_id=UNOWNED):
+    """Loads user_id's expenses dated start_date..end_date (inclusive)."""
+    user_sql, user_params = user_filter(user_id)
+    return load_columns(connector, f"{user_sql} AND DateDay BETWEEN ? AND ?",
+                        (*user_params, day_number(start_date), day_number(end_date)))
+
+
+# --- Totals ---
+
+def daily_totals(columns):
+    """(days, totals) for every day from the first expense to the last, days without any included as 0."""
+    np = _numpy()
+    if not len(columns):
+        return np.empty(0, 'datetime64[D]'), np.empty(0, np.float64)
+    first = columns.dates.min()
+    offsets = (columns.dates - first).astype(np.int64)
+    totals = np.bincount(offsets, weights=columns.amounts)
+    return first + np.arange(len(totals)), totals
+
+
+def monthly_totals(columns):
+    """(months, totals) for every month from the first expense to the last, as datetime64[M]."""
+    np = _numpy()
+    if not len(columns):
+        return np.empty(0, 'datetime64[M]'), np.empty(0, np.float64)
+    # Day totals first: converting days to months is a calendar computation, cheaper on a few thousand days than per row
+    days, day_totals = daily_totals(columns)
+    months = days.astype('datetime64[M]')
+    totals = np.bincount((months - months[0]).astype(np.int64), weights=day_totals)
+    return months[0] + np.arange(len(totals)), totals
+
+
+def category_totals(columns):
+    """[(category, total)], largest first."""
+    np = _numpy()
+    totals = np.bincount(columns.codes, weights=columns.amounts, minlength=len(columns.categories))
+    order = np.argsort(-totals, kind='stable')
+    return [(columns.categories[code], float(totals[code])) for code in order]
+
+
+# --- Trends ---
+
+def rolling_mean(values, window):
+    """Mean of each value and the window - 1 before it; NaN until a full window is available."""
+    np = _numpy()
+    values = np.asarray(values, dtype=np.float64)
+    if window < 1:
+        raise ValueError("The rolling window must be at least 1.")
+    means = np.full(len(values), np.nan)
+    if len(values) >= window:
+        sums = np.cumsum(np.concatenate(([0.0], values)))
+        means[window - 1:] = (sums[window:] - sums[:-window]) / window
+    return means
+
+
+def month_over_month(totals):
+    """(deltas, changes) between each month and the one before: the difference, and it as a
+       fraction of the earlier month. Both are NaN for the first month; changes are NaN after a month of 0."""
+    np = _numpy()
+    totals = np.asarray(totals, dtype=np.float64)
+    deltas = np.full(len(totals), np.nan)
+    changes = np.full(len(totals), np.nan)
+    if len(totals) > 1:
+        deltas[1:] = np.diff(totals)
+        np.divide(deltas[1:], totals[:-1], out=changes[1:], where=totals[:-1] != 0)
+    return deltas, changes
+
+
+# --- Distributions ---
+
+def category_percentiles(columns, percentiles=PERCENTILES):
+    """(len(categories), len(percentiles)) array: each category's amount percentiles, linearly
+       interpolated like np.percentile. Categories sort once together instead of one at a time."""
+    np = _numpy()
+    fractions = np.asarray(percentiles, dtype=np.float64) / 100
+    result = np.full((len(columns.categories), len(fractions)), np.nan)
+    if not len(columns):
+        return result
+    # Sorted by amount, then stably by category: lexsort's order, but the second sort is a
+    # radix sort over small integer codes, a few times faster on large inputs
+    by_amount = np.argsort(columns.amounts)
+    code_type = np.int16 if len(columns.categories) <= np.iinfo(np.int16).max else np.int32
+    ordered = columns.amounts[by_amount][np.argsort(columns.codes[by_amount].astype(code_type), kind='stable')]
+    counts = np.bincount(columns.codes, minlength=len(columns.categories))
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    present = counts > 0
+    # Position of each percentile inside its category's run of sorted amounts
+    positions = (counts[present, None] - 1) * fractions
+    below = np.floor(positions).astype(np.int64)
+    above = np.minimum(below + 1, counts[present, None] - 1)
+    low = ordered[starts[present, None] + below]
+    high = ordered[starts[present, None] + above]
+    result[present] = low + (high - low) * (positions - below)
+    return result
+
+
+def category_z_scores(columns):
+    """Each expense's z-score against its category's mean and (population) standard deviation.
+       0 in categories whose amounts are all equal."""
+    np = _numpy()
+    if not len(columns):
+        return np.empty(0, np.float64)
+    minlength = len(columns.categories)
+    counts = np.bincount(columns.codes, minlength=minlength)
+    means = np.bincount(columns.codes, weights=columns.amounts, minlength=minlength) / np.maximum(counts, 1)
+    deviations = columns.amounts - means[columns.codes]
+    stds = np.sqrt(np.bincount(columns.codes, weights=deviations * deviations, minlength=minlength)
+                   / np.maximum(counts, 1))
+    scale = stds[columns.codes]
+    return np.divide(deviations, scale, out=np.zeros_like(deviations), where=scale > 0)
+
+
+def anomalies(columns, threshold=ANOMALY_Z):
+    """Boolean mask of the expenses whose z-score within their category is above threshold."""
+    return category_z_scores(columns) > threshold
+
+
+def most_unusual(columns, since=None, threshold=ANOMALY_Z):
+    """Index of the expense (dated since or later) with the highest z-score above threshold, or None."""
+    np = _numpy()
+    z_scores = category_z_scores(columns)
+    if since is not None:
+        z_scores = np.where(columns.dates >= np.datetime64(since, 'D'), z_scores, -np.inf)
+    if not len(z_scores) or z_scores.max() <= threshold:
+        return None
+    return int(z_scores.argmax())
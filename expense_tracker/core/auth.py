@@ -0,0 +1,83 @@
+from collections import namedtuple
+
+from .migrations import migrate
+from .partitions import adopt_unowned
+from .passwords import hash_password, needs_rehash, verify_password
+
+# Registration, login and the logged-in session. The functions take a connection
+# and are meant to run on one long-lived worker (register.py's DBExecutor), so
+# the login screen holds a single pooled connection: setup() brings the schema up
+# to date once when the screen opens, and every lookup after that reuses the
+# connection's prepared statements. Emails compare without case, using the NOCASE
+# index on users.email.
+
+USER_COLUMNS = "id, email, password, marital_status, role"
+LOOKUP_SQL = f"SELECT {USER_COLUMNS} FROM users WHERE email = ? COLLATE NOCASE"
+
+Session = namedtuple('Session', 'user_id email marital_status role')
+
+_session = None
+
+
+def setup(connector):
+    """Creates or upgrades the schema (users table and email index included).
+       Run once, in the background, while the login screen is shown; the main app's
+       own migrate() then finds nothing to do."""
+    return migrate(connector)
+
+
+def create_account(connector, email, password, marital_status):
+    """Adds a user unless the email is taken (ignoring case). Returns True if added.
+       The first account takes over the expenses entered before there were any
+       (see partitions.py). Raises ValueError for bad input."""
+    email = (email or '').strip()
+    if "@" not in email or "." not in email:
+        raise ValueError("Invalid email format")
+    if len(password or '') < 8:
+        raise ValueError("Password must be at least 8 characters")
+    if connector.execute(LOOKUP_SQL, (email,)).fetchone():
+        return False
+    first = connector.execute("SELECT NOT EXISTS (SELECT 1 FROM users)").fetchone()[0]
+    cursor = connector.execute("INSERT INTO users (email, password, marital_status, role) VALUES (?, ?, ?, ?)",
+                               (email, hash_password(password), marital_status, None))
+    if first:
+        adopt_unowned(connector, cursor.lastrowid) # Commits the new account too
+    else:
+        connector.commit()
+    return True
+
+
+def authenticate(connector, email, password):
+    """Returns a Session if the password matches, else None. A hash made the old way
+       (or at another cost) is replaced with a current one."""
+    user = connector.execute(LOOKUP_SQL, ((email or '').strip(),)).fetchone()
+    if user is None or not verify_password(password, user[2]):
+        return None
+    if needs_rehash(user[2]):
+        connector.execute("UPDATE users SET password = ? WHERE id = ?", (hash_password(password), user[0]))
+        connector.commit()
+    return Session(user[0], user[1], user[3], user[4])
+
+
+def lookup(connector, email):
+    """The Session of the account with this email (ignoring case), or None. No password
+       check: for tools that already have the database file, like the CLI's --user."""
+    user = connector.execute(LOOKUP_SQL, ((email or '').strip(),)).fetchone()
+    return Session(user[0], user[1], user[3], user[4]) if user else None
+
+
+# --- Session ---
+
+def start_session(session):
+    global _session
+    _session = session
+
+
+def current_session():
+    """The logged-in user's Session, or None if the app was started without logging in."""
+    return _session
+
+
+def end_session():
+    global _session
+    _session = None
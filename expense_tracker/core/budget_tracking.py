@@ -0,0 +1,236 @@
+import json
+import sqlite3
+import sys
+
+from .rollups import GROUPS_TABLE, partitioned, user_sql
+
+# Tables the budget subsystem keeps in step with ExpenseTracker (see budgets.py):
+#
+# MonthlySpending holds one row per (user, month, category) with its total and count,
+# so budget-vs-actual for any range of months is a join against a few rows per month.
+# Categories compare without case here, like budget categories do.
+#
+# BudgetAlerts records each time a user's spending in a month crosses a threshold of
+# their budget in force (ALERT_THRESHOLDS). A trigger on MonthlySpending checks this
+# whenever a total grows, comparing the total before and after the change,
+# so alerts cost two index seeks per insert instead of a rescan.
+SPENDING_TABLE = 'MonthlySpending'
+ALERT_TABLE = 'BudgetAlerts'
+ALERT_THRESHOLDS = (0.8, 1.0) # Fractions of the budget
+OVERALL = 'Overall' # The budget category that covers all spending
+
+
+def _bucket(prefix, by_user=True):
+    """Expressions mapping an ExpenseTracker row (prefix 'new.' / 'old.' / '') to its
+       (user, month, category) and amount; rows with an invalid date go to month ''."""
+    return {
+        'UserID': user_sql(prefix, by_user),
+        'Month': f"CASE WHEN {prefix}DateDay IS NULL THEN '' ELSE substr({prefix}Date, 1, 7) END",
+        'Category': f"COALESCE({prefix}Category, '')",
+        'Amount': f"COALESCE({prefix}Amount, 0)",
+    }
+
+
+def budget_in_force_sql(user, category, month):
+    """A SELECT of the (Category, Amount) budget that applies to a user's category in a
+       month: the month's own budget, else the latest recurring one that started before it.
+       `user` is None before Budgets has its UserID column (see rollups.partitioned)."""
+    owner = f"UserID = {user} AND " if user is not None else ""
+    return (f"SELECT Category, Amount FROM Budgets WHERE {owner}Category = {category} AND Period <= {month} "
+            f"AND (Period = {month} OR Recurring) ORDER BY Period DESC LIMIT 1")
+
+
+# --- Spending triggers ---
+
+def _add_row_sql(prefix, by_user):
+    b = _bucket(prefix, by_user)
+    return (
+        f"INSERT INTO {SPENDING_TABLE} (UserID, Month, Category, Total, Count) "
+        f"VALUES ({b['UserID']}, {b['Month']}, {b['Category']}, {b['Amount']}, 1) "
+        "ON CONFLICT (UserID, Month, Category) DO UPDATE SET Total = Total + excluded.Total, Count = Count + 1;"
+    )
+
+
+def _remove_row_sql(prefix, by_user):
+    b = _bucket(prefix, by_user)
+    key = f"UserID = {b['UserID']} AND Month = {b['Month']} AND Category = {b['Category']}"
+    return (
+        f"UPDATE {SPENDING_TABLE} SET Total = Total - {b['Amount']}, Count = Count - 1 WHERE {key};"
+        f"DELETE FROM {SPENDING_TABLE} WHERE {key} AND Count <= 0;"
+    )
+
+
+def create_spending_triggers(connector):
+    """(Re)creates the triggers that keep MonthlySpending in step with ExpenseTracker."""
+    by_user = partitioned(connector)
+    connector.execute(
+        f"CREATE TRIGGER IF NOT EXISTS trg_expense_spending_insert AFTER INSERT ON ExpenseTracker BEGIN "
+        f"{_add_row_sql('new.', by_user)} END"
+    )
+    connector.execute(
+        f"CREATE TRIGGER IF NOT EXISTS trg_expense_spending_delete AFTER DELETE ON ExpenseTracker BEGIN "
+        f"{_remove_row_sql('old.', by_user)} END"
+    )
+    connector.execute(
+        f"CREATE TRIGGER IF NOT EXISTS trg_expense_spending_update AFTER UPDATE OF Date, Amount, Category"
+        f"{', UserID' if by_user else ''} ON ExpenseTracker BEGIN {_remove_row_sql('old.', by_user)} {_add_row_sql('new.', by_user)} END"
+    )
+
+
+def drop_spending_triggers(connector):
+    connector.execute("DROP TRIGGER IF EXISTS trg_expense_spending_insert")
+    connector.execute("DROP TRIGGER IF EXISTS trg_expense_spending_delete")
+    connector.execute("DROP TRIGGER IF EXISTS trg_expense_spending_update")
+
+
+def drop_spending_insert_trigger(connector):
+    """Drops the insert trigger for a bulk load; call add_spending_groups() and
+       create_spending_triggers() afterwards to catch the table up."""
+    connector.execute("DROP TRIGGER IF EXISTS trg_expense_spending_insert")
+
+
+# --- Alert triggers ---
+
+def _raise_alerts_sql(before, by_user):
+    """Records the thresholds a MonthlySpending row's growth from `before` to new.Total
+       crossed, for its user's budget for the category and their 'Overall' budget. An alert
+       that was already raised is raised again only if the budget has changed since."""
+    thresholds = f"json_each('{json.dumps(list(ALERT_THRESHOLDS))}') AS t"
+    user = "new.UserID" if by_user else None
+    upsert = (f"INSERT INTO {ALERT_TABLE} (UserID, Category, Month, Threshold, Spent, Budget, RaisedAt) "
+              "SELECT new.UserID, b.Category, new.Month, t.value, {spent}, b.Amount, datetime('now', 'localtime') "
+              "FROM ({budget}) AS b, {sources} "
+              "WHERE b.Amount > 0 AND {spent} - {growth} < t.value * b.Amount AND {spent} >= t.value * b.Amount "
+              "ON CONFLICT (UserID, Category, Month, Threshold) DO UPDATE SET "
+              "Spent = excluded.Spent, Budget = excluded.Budget, RaisedAt = excluded.RaisedAt, Seen = 0 "
+              "WHERE Budget <> excluded.Budget;")
+    growth = f"(new.Total - {before})"
+    category = upsert.format(spent="new.Total", growth=growth, sources=thresholds,
+                             budget=budget_in_force_sql(user, "new.Category", "new.Month"))
+    overall = upsert.format(spent="m.Spent", growth=growth,
+                            sources=f"(SELECT SUM(Total) AS Spent FROM {SPENDING_TABLE} "
+                                    f"WHERE UserID = new.UserID AND Month = new.Month) AS m, {thresholds}",
+                            budget=budget_in_force_sql(user, f"'{OVERALL}'", "new.Month"))
+    return category + overall
+
+
+def create_alert_triggers(connector):
+    by_user = partitioned(connector)
+    connector.execute(
+        f"CREATE TRIGGER IF NOT EXISTS trg_spending_alert_insert AFTER INSERT ON {SPENDING_TABLE} "
+        f"WHEN new.Total > 0 AND new.Category <> '{OVERALL}' BEGIN {_raise_alerts_sql('0', by_user)} END"
+    )
+    connector.execute(
+        f"CREATE TRIGGER IF NOT EXISTS trg_spending_alert_update AFTER UPDATE OF Total ON {SPENDING_TABLE} "
+        f"WHEN new.Total > old.Total AND new.Category <> '{OVERALL}' BEGIN {_raise_alerts_sql('old.Total', by_user)} END"
+    )
+
+
+def drop_alert_triggers(connector):
+    connector.execute("DROP TRIGGER IF EXISTS trg_spending_alert_insert")
+    connector.execute("DROP TRIGGER IF EXISTS trg_spending_alert_update")
+
+
+# --- Schema ---
+
+def create_budget_tracking_schema(connector):
+    """Creates MonthlySpending, BudgetAlerts and their triggers."""
+    connector.execute(
+        f'''CREATE TABLE IF NOT EXISTS {SPENDING_TABLE} (
+            UserID INTEGER NOT NULL, -- same as ExpenseTracker.UserID
+            Month TEXT NOT NULL, -- "YYYY-MM", '' if the date is invalid
+            Category TEXT NOT NULL COLLATE NOCASE,
+            Total FLOAT NOT NULL,
+            Count INTEGER NOT NULL,
+            PRIMARY KEY (UserID, Month, Category)
+        ) WITHOUT ROWID'''
+    )
+    connector.execute(
+        f'''CREATE TABLE IF NOT EXISTS {ALERT_TABLE} (
+            UserID INTEGER NOT NULL,
+            Category TEXT NOT NULL COLLATE NOCASE,
+            Month TEXT NOT NULL,
+            Threshold FLOAT NOT NULL,
+            Spent FLOAT NOT NULL, -- at the time the alert was raised
+            Budget FLOAT NOT NULL,
+            RaisedAt TEXT NOT NULL,
+            Seen INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (UserID, Category, Month, Threshold)
+        ) WITHOUT ROWID'''
+    )
+    connector.execute(f"CREATE INDEX IF NOT EXISTS idx_budget_alerts_unseen ON {ALERT_TABLE} (UserID, Month) WHERE Seen = 0")
+    create_spending_triggers(connector)
+    create_alert_triggers(connector)
+
+
+def _aggregate_sql(by_user):
+    b = _bucket('', by_user)
+    # GROUP BY with NOCASE so 'Food' and 'food' share a row, as the primary key requires
+    return (f"SELECT {b['UserID']} AS User, {b['Month']} AS Month, {b['Category']} AS Cat, SUM({b['Amount']}), COUNT(*) "
+            "FROM ExpenseTracker GROUP BY User, Month, Cat COLLATE NOCASE")
+
+
+def populate_spending(connector):
+    """Recomputes MonthlySpending from ExpenseTracker, inside the caller's transaction.
+       No alerts are raised for the spending this re-adds."""
+    drop_alert_triggers(connector)
+    connector.execute(f"DELETE FROM {SPENDING_TABLE}")
+    connector.execute(f"INSERT INTO {SPENDING_TABLE} (UserID, Month, Category, Total, Count) "
+                      + _aggregate_sql(partitioned(connector)))
+    create_alert_triggers(connector)
+
+
+def add_spending_groups(connector):
+    """Folds a bulk insert's expenses into MonthlySpending from rollups.GROUPS_TABLE,
+       raising alerts for the thresholds that crosses. Used after bulk inserts made
+       with the insert trigger dropped."""
+    connector.execute(
+        f"INSERT INTO {SPENDING_TABLE} (UserID, Month, Category, Total, Count) "
+        f"SELECT UserID, Month, Category AS Cat, SUM(Total), SUM(Count) FROM {GROUPS_TABLE} "
+        "GROUP BY UserID, Month, Cat COLLATE NOCASE "
+        # ORDER BY keeps 'ON CONFLICT' from being parsed as part of the SELECT (see rollups.py)
+        "ORDER BY UserID ON CONFLICT (UserID, Month, Category) DO UPDATE SET "
+        "Total = Total + excluded.Total, Count = Count + excluded.Count")
+
+
+def rebuild_spending(connector):
+    populate_spending(connector)
+    connector.commit()
+
+
+def verify_spending(connector, tolerance=0.005):
+    """Compares MonthlySpending against a fresh aggregation of ExpenseTracker.
+       Returns a list of ((user, month, category), expected, actual) for every row that drifted."""
+    def key(row):
+        return row[0], row[1], row[2].lower()
+    expected = {key(row): row for row in connector.execute(_aggregate_sql(partitioned(connector)))}
+    actual = {key(row): row for row in connector.execute(f"SELECT UserID, Month, Category, Total, Count FROM {SPENDING_TABLE}")}
+    drift = []
+    for k in sorted(set(expected) | set(actual)):
+        exp, act = expected.get(k), actual.get(k)
+        if exp is None or act is None or exp[4] != act[4] or abs(exp[3] - act[3]) > tolerance:
+            drift.append((k, exp, act))
+    return drift
+
+
+if __name__ == "__main__":
+    # Usage: python -m expense_tracker.core.budget_tracking [verify|rebuild] [database file]
+    command = sys.argv[1] if len(sys.argv) > 1 else "verify"
+    db_path = sys.argv[2] if len(sys.argv) > 2 else "Expense Tracker.db"
+    connector = sqlite3.connect(db_path)
+    try:
+        if command == "rebuild":
+            rebuild_spending(connector)
+            print("Monthly spending rebuilt.")
+        elif command == "verify":
+            drift = verify_spending(connector)
+            for k, exp, act in drift:
+                print(f"Drift in {k}: expected {exp}, found {act}")
+            print("Monthly spending is consistent." if not drift else
+                  f"{len(drift)} row(s) drifted. Run 'python -m expense_tracker.core.budget_tracking rebuild'.")
+            sys.exit(1 if drift else 0)
+        else:
+            print(f"Unknown command '{command}'. Use 'verify' or 'rebuild'.")
+            sys.exit(2)
+    finally:
+        connector.close()
@@ -0,0 +1,143 @@
+import datetime
+import json
+
+from .budget_tracking import ALERT_TABLE, OVERALL, SPENDING_TABLE, budget_in_force_sql
+from .partitions import UNOWNED
+from .query_cache import bump_generation
+
+# Monthly budgets per category ('Overall' covers all spending). A budget is for one
+# YYYY-MM period, or, if recurring, for that period and every later month that has
+# no budget of its own for the category. Each account has its own budgets, checked
+# against its own spending (see partitions.py). Like repository.py, setters raise
+# ValueError for bad input and commit on success.
+#
+# Spending comes from MonthlySpending and alerts from BudgetAlerts, which
+# budget_tracking.py keeps up to date on every write to ExpenseTracker.
+
+
+def _period(value):
+    value = (value or '').strip()
+    try:
+        datetime.datetime.strptime(value, "%Y-%m")
+    except ValueError:
+        raise ValueError("Month format must be YYYY-MM.")
+    return value
+
+
+def _periods(first, last):
+    """Every YYYY-MM from first to last inclusive."""
+    year, month = map(int, first.split('-'))
+    periods = []
+    while f"{year:04d}-{month:02d}" <= last:
+        periods.append(f"{year:04d}-{month:02d}")
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return periods
+
+
+def set_budget(connector, category, period, amount, recurring=False, user_id=UNOWNED):
+    """Sets the budget for a category ('Overall' for all spending) in a YYYY-MM period.
+       A recurring budget also applies to the following months until another one is set."""
+    category = (category or '').strip()
+    if not category:
+        raise ValueError("Enter a category for the budget.")
+    period = _period(period)
+    try:
+        amount = float(amount)
+    except (TypeError, ValueError):
+        raise ValueError("Please enter a valid number for the budget.")
+    if amount < 0:
+        raise ValueError("Budget amount cannot be negative.")
+    connector.execute(
+        "INSERT INTO Budgets (Category, Amount, Period, Recurring, UserID) VALUES (?, ?, ?, ?, ?) "
+        "ON CONFLICT (UserID, Category, Period) DO UPDATE SET Amount = excluded.Amount, Recurring = excluded.Recurring",
+        (category, amount, period, int(bool(recurring)), user_id))
+    connector.commit()
+    bump_generation('budgets')
+    return amount
+
+
+def delete_budget(connector, category, period, user_id=UNOWNED):
+    """Removes the budget set for a category in a period; returns True if there was one."""
+    cursor = connector.execute("DELETE FROM Budgets WHERE UserID = ? AND Category = ? AND Period = ?",
+                               (user_id, (category or '').strip(), period))
+    connector.commit()
+    bump_generation('budgets')
+    return cursor.rowcount > 0
+
+
+def get_budget(connector, category, period, user_id=UNOWNED):
+    """Retrieves the budget that applies to a category in a period (YYYY-MM), recurring ones included."""
+    row = connector.execute(budget_in_force_sql("?3", "?1", "?2"), (category, period, user_id)).fetchone()
+    return row[1] if row else None
+
+
+def list_budgets(connector, user_id=UNOWNED):
+    """Returns [(category, period, amount, recurring)] for every budget set."""
+    return [(category, period, amount, bool(recurring)) for category, period, amount, recurring in
+            connector.execute("SELECT Category, Period, Amount, Recurring FROM Budgets WHERE UserID = ? "
+                              "ORDER BY Category, Period", (user_id,))]
+
+
+# Budget vs. actual for every budgeted category in every month of a range, in one
+# statement: each (month, category) pair picks the user's budget in force with an
+# index seek on Budgets' (UserID, Category, Period) key, then joins that month's
+# spending rows. 'Overall' is joined to the user's rows of every category.
+_BUDGET_VS_ACTUAL_SQL = f"""
+WITH Months(Month) AS (SELECT value FROM json_each(?1)),
+InForce AS MATERIALIZED (
+    SELECT m.Month, c.Category,
+           (SELECT b.Amount FROM ({budget_in_force_sql('?3', 'c.Category', 'm.Month')}) AS b) AS Amount
+    FROM Months AS m, (SELECT DISTINCT Category FROM Budgets WHERE UserID = ?3 AND Period <= ?2) AS c
+)
+SELECT f.Month, f.Category, f.Amount, COALESCE(SUM(s.Total), 0)
+FROM InForce AS f
+LEFT JOIN {SPENDING_TABLE} AS s ON s.UserID = ?3 AND s.Month = f.Month
+                               AND (f.Category = '{OVERALL}' OR s.Category = f.Category)
+WHERE f.Amount IS NOT NULL
+GROUP BY f.Month, f.Category
+ORDER BY f.Month, f.Category
+"""
+
+
+def budget_vs_actual(connector, first_period, last_period=None, user_id=UNOWNED):
+    """Returns [(period, category, budget, spent)] for every budget in force in the
+       YYYY-MM periods from first_period to last_period (default: just the first)."""
+    first_period = _period(first_period)
+    last_period = _period(last_period) if last_period else first_period
+    if last_period < first_period:
+        raise ValueError("The last month must not be before the first.")
+    periods = _periods(first_period, last_period)
+    return connector.execute(_BUDGET_VS_ACTUAL_SQL, (json.dumps(periods), last_period, user_id)).fetchall()
+
+
+def budget_status(connector, period, user_id=UNOWNED):
+    """Returns [(category, budget, spent)] for every budget in force in a YYYY-MM period."""
+    return [(category, budget, spent) for _, category, budget, spent in
+            budget_vs_actual(connector, period, user_id=user_id)]
+
+
+# --- Alerts ---
+
+def unseen_alerts(connector, mark_seen=True, user_id=UNOWNED):
+    """Returns [(category, period, threshold, spent, budget)] for the user's alerts raised
+       since the last call (thresholds are fractions of the budget), oldest first."""
+    rows = connector.execute(
+        f"SELECT Category, Month, Threshold, Spent, Budget FROM {ALERT_TABLE} WHERE UserID = ? AND Seen = 0 "
+        "ORDER BY RaisedAt, Month, Threshold", (user_id,)).fetchall()
+    if rows and mark_seen:
+        connector.execute(f"UPDATE {ALERT_TABLE} SET Seen = 1 WHERE UserID = ? AND Seen = 0", (user_id,))
+        connector.commit()
+    return rows
+
+
+def alerts_for(connector, period, user_id=UNOWNED):
+    """Returns [(category, threshold, spent, budget, raised_at)] for the alerts raised in a period."""
+    return connector.execute(
+        f"SELECT Category, Threshold, Spent, Budget, RaisedAt FROM {ALERT_TABLE} WHERE UserID = ? AND Month = ? "
+        "ORDER BY Category, Threshold", (user_id, _period(period))).fetchall()
+
+
+def describe_alert(category, period, threshold, spent, budget):
+    if threshold >= 1:
+        return f"{category} is over budget for {period}: ₹{spent:.2f} of ₹{budget:.2f}."
+    return f"{category} has used {threshold:.0%} of its {period} budget: ₹{spent:.2f} of ₹{budget:.2f}."
@@ -0,0 +1,188 @@
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+# Every SQLite connection in the app comes from a ConnectionPool, so they all get the
+# same tuning. WAL lets the worker thread (and any other reader) read while the UI
+# thread writes; synchronous=NORMAL is safe in WAL mode and avoids an fsync per commit.
+PRAGMAS = (
+    ("journal_mode", "WAL"),
+    ("synchronous", "NORMAL"),
+    ("cache_size", -8000), # KiB (negative = size, not pages): 8 MB page cache per connection
+    ("mmap_size", 256 * 1024 * 1024), # Read pages through a memory map instead of copying them
+    ("temp_store", "MEMORY"), # Sorts and temporary indexes stay off disk
+)
+DB_PATH = "Expense Tracker.db" # The one database file; see consolidate.py for the older ones
+STATEMENT_CACHE_SIZE = 256 # Prepared statements kept per connection (sqlite3's default is 128)
+DEFAULT_POOL_SIZE = 4 # Idle connections kept for reuse
+PROFILE_ENV = "EXPENSE_TRACKER_SQL_STATS" # Set to 1 to time every statement
+
+
+def configure(connection):
+    """Applies PRAGMAS to a new connection. journal_mode is stored in the database
+       file, so WAL stays on for every later connection too."""
+    for name, value in PRAGMAS:
+        try:
+            connection.execute(f"PRAGMA {name} = {value}")
+        except sqlite3.OperationalError as e: # e.g. WAL on a read-only or network file system
+            print(f"Could not set PRAGMA {name}: {e}")
+
+
+# --- Statement timing ---
+
+class StatementStats:
+    """Call count, total and worst time per SQL text, shared by a pool's connections."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {} # sql -> [calls, total seconds, max seconds]
+
+    def record(self, sql, seconds):
+        with self._lock:
+            entry = self._stats.setdefault(sql, [0, 0.0, 0.0])
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2] = max(entry[2], seconds)
+
+    def top(self, limit=10):
+        """Returns [(sql, calls, total seconds, max seconds)], most total time first."""
+        with self._lock:
+            rows = [(sql, calls, total, worst) for sql, (calls, total, worst) in self._stats.items()]
+        return sorted(rows, key=lambda row: row[2], reverse=True)[:limit]
+
+    def report(self, limit=10):
+        lines = [f"{'calls':>7} {'total ms':>10} {'max ms':>9}  statement"]
+        for sql, calls, total, worst in self.top(limit):
+            text = " ".join(sql.split())
+            lines.append(f"{calls:>7} {total * 1000:>10.1f} {worst * 1000:>9.1f}  {text[:100]}")
+        return "\n".join(lines)
+
+    def clear(self):
+        with self._lock:
+            self._stats.clear()
+
+
+class TimedCursor(sqlite3.Cursor):
+    """Cursor that records how long each execute takes. For a SELECT that covers
+       preparing the statement and producing the first row; later fetches aren't timed."""
+    stats = None # Set on the subclass made for each pool
+
+    def execute(self, sql, parameters=()):
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self.stats.record(sql, time.perf_counter() - start)
+
+    def executemany(self, sql, seq_of_parameters):
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self.stats.record(sql, time.perf_counter() - start)
+
+
+class TimedConnection(sqlite3.Connection):
+    """Connection whose cursors are TimedCursors. The execute() shortcuts are routed
+       through one too, as the built-in ones bypass a Python-level Cursor.execute."""
+    cursor_class = TimedCursor
+
+    def cursor(self, factory=None):
+        return super().cursor(factory or self.cursor_class)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+# --- Pool ---
+
+class ConnectionPool:
+    """Hands out configured connections to one database file and keeps idle ones for
+    reuse, so callers that connect per operation keep their prepared statements.
+
+    A connection is used by one thread at a time: acquire() it (or use `with
+    pool.connection()`), then release() it. Connections may move between threads
+    (check_same_thread=False), which the worker thread relies on.
+    """
+
+    def __init__(self, db_path, size=DEFAULT_POOL_SIZE, timeout=10, profile=None):
+        self.db_path = db_path
+        self.size = size
+        self.timeout = timeout
+        self.profile = os.environ.get(PROFILE_ENV) == "1" if profile is None else profile
+        self.stats = StatementStats()
+        self._idle = []
+        self._lock = threading.Lock()
+        if self.profile:
+            cursor_class = type('PoolCursor', (TimedCursor,), {'stats': self.stats})
+            self._factory = type('PoolConnection', (TimedConnection,), {'cursor_class': cursor_class})
+        else:
+            self._factory = sqlite3.Connection
+
+    def _connect(self):
+        connection = sqlite3.connect(self.db_path, timeout=self.timeout, check_same_thread=False,
+                                     cached_statements=STATEMENT_CACHE_SIZE, factory=self._factory)
+        configure(connection)
+        return connection
+
+    def acquire(self):
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+        return self._connect()
+
+    def release(self, connection):
+        """Returns a connection to the pool; an unfinished transaction is rolled back."""
+        if connection.in_transaction:
+            connection.rollback()
+        with self._lock:
+            if len(self._idle) < self.size:
+                self._idle.append(connection)
+                return
+        connection.close()
+
+    @contextmanager
+    def connection(self):
+        connection = self.acquire()
+        try:
+            yield connection
+        finally:
+            self.release(connection)
+
+    def close(self):
+        """Closes the idle connections, letting SQLite refresh its planner statistics first."""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for connection in idle:
+            try:
+                connection.execute("PRAGMA optimize")
+            except sqlite3.Error:
+                pass
+            connection.close()
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(db_path, **options):
+    """Returns the shared pool for a database file, creating it on first use."""
+    key = os.path.abspath(db_path)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = ConnectionPool(db_path, **options)
+        return pool
+
+
+def close_all():
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
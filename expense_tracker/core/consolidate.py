@@ -0,0 +1,259 @@
+import datetime
+import hashlib
+import os
+import sqlite3
+from collections import namedtuple
+from pathlib import Path
+
+from .passwords import hash_password, is_password_hash
+from .query_cache import bump_generation
+from .search_parser import fold_case
+
+# Copies the older database files into the main one, which since schema version 7
+# holds their tables too (users, Income). Older versions of the app kept logins in
+# expense_tracker.db, and the finance/budget prototypes kept users and transactions
+# in finance_app.db and budget_tracker.db.
+#
+# The copy streams each source table in id order, in batches of one transaction
+# each. Every copied row is recorded in LegacyRowMap (source row -> target row) in
+# the same transaction, so an interrupted run resumes after the last committed
+# batch and a finished one copies nothing more. Afterwards each table is validated:
+# the source row count must equal the mapped row count, and a checksum over the
+# source rows (as converted) must equal one over the rows they became.
+# The source files are opened read-only and never changed.
+
+LEGACY_FILES = ("expense_tracker.db", "finance_app.db", "budget_tracker.db")
+DEFAULT_BATCH_SIZE = 500
+MAP_TABLE = 'LegacyRowMap'
+LOG_TABLE = 'LegacyImports'
+IMPORTED_PAYEE = "Unknown" # The old transactions had no payee or mode of payment
+IMPORTED_MOP = "Other"
+
+
+class TableCheck(namedtuple('TableCheck', 'source table source_rows copied_rows source_checksum target_checksum')):
+    """Validation result for one source table."""
+
+    @property
+    def ok(self):
+        return self.source_rows == self.copied_rows and self.source_checksum == self.target_checksum
+
+
+def create_bookkeeping(connector):
+    connector.execute(
+        f'''CREATE TABLE IF NOT EXISTS {MAP_TABLE} (
+            Source TEXT NOT NULL,
+            TableName TEXT NOT NULL,
+            LegacyID INTEGER NOT NULL,
+            TargetTable TEXT NOT NULL,
+            TargetID INTEGER NOT NULL,
+            PRIMARY KEY (Source, TableName, LegacyID)
+        ) WITHOUT ROWID'''
+    )
+    # One row per source table that copied and validated completely
+    connector.execute(
+        f'''CREATE TABLE IF NOT EXISTS {LOG_TABLE} (
+            Source TEXT NOT NULL,
+            TableName TEXT NOT NULL,
+            Rows INTEGER NOT NULL,
+            Checksum TEXT NOT NULL,
+            ValidatedAt TEXT NOT NULL,
+            PRIMARY KEY (Source, TableName)
+        )'''
+    )
+    connector.commit()
+
+
+# --- users ---
+
+def _users_select(columns):
+    """The SELECT for a users table of any of the old layouts (email or username logins)."""
+    login = 'email' if 'email' in columns else 'username'
+    marital = 'marital_status' if 'marital_status' in columns else "'Single'"
+    role = 'role' if 'role' in columns else 'NULL'
+    return f"SELECT id, {login}, password, {marital}, {role} FROM users WHERE id > ? ORDER BY id LIMIT ?"
+
+
+def _convert_user(source, row):
+    """Returns (legacy id, users values). The prototypes stored passwords in plain text;
+       they are hashed the way the login screen hashes them. Hashes are kept as they are
+       (an old SHA-256 one is upgraded at the user's next login)."""
+    legacy_id, login, password, marital_status, role = row
+    password = str(password or '')
+    if not is_password_hash(password):
+        password = hash_password(password)
+    return legacy_id, (str(login).strip(), password, (marital_status or 'Single').strip().title(), role)
+
+
+def _copy_user(connector, values):
+    """Adds a user unless one with the same email (ignoring case) exists; returns its id."""
+    existing = connector.execute("SELECT id FROM users WHERE email = ? COLLATE NOCASE", (values[0],)).fetchone()
+    if existing:
+        return 'users', existing[0]
+    cursor = connector.execute("INSERT INTO users (email, password, marital_status, role) VALUES (?, ?, ?, ?)", values)
+    return 'users', cursor.lastrowid
+
+
+def _user_check_values(values):
+    # A user that already existed keeps its own password, so only the login is compared
+    return (fold_case(values[0]),)
+
+
+_USERS_TARGET_SQL = (f"SELECT m.LegacyID, lower(u.email) FROM {MAP_TABLE} AS m JOIN users AS u ON u.id = m.TargetID "
+                     "WHERE m.Source = ? AND m.TableName = 'users' ORDER BY m.LegacyID")
+
+
+# --- transactions ---
+
+def _transactions_select(columns):
+    return "SELECT id, type, category, amount, date FROM transactions WHERE id > ? ORDER BY id LIMIT ?"
+
+
+def _convert_transaction(source, row):
+    """Returns (legacy id, (kind, date, amount, category, source)); kind is 'expense' or 'income'."""
+    legacy_id, kind, category, amount, date = row
+    kind = str(kind or '').strip().lower()
+    if kind not in ('expense', 'income'):
+        raise ValueError(f"{source}: transaction {legacy_id} has unknown type '{row[1]}'.")
+    category = str(category or '').strip().title() or "Other"
+    return legacy_id, (kind, str(date or '')[:10], float(amount or 0), category, source)
+
+
+def _copy_transaction(connector, values):
+    kind, date, amount, category, source = values
+    if kind == 'income':
+        cursor = connector.execute(
+            "INSERT INTO Income (Date, Source, Description, Amount, Category) VALUES (?, ?, ?, ?, ?)",
+            (date, None, f"Imported from {source}", amount, category))
+        return 'Income', cursor.lastrowid
+    cursor = connector.execute(
+        'INSERT INTO ExpenseTracker (Date, Payee, Description, Amount, ModeOfPayment, Category, Tags) VALUES (?, ?, ?, ?, ?, ?, ?)',
+        (date, IMPORTED_PAYEE, f"Imported from {source}", amount, IMPORTED_MOP, category, ''))
+    return 'ExpenseTracker', cursor.lastrowid
+
+
+def _transaction_check_values(values):
+    return values[:4]
+
+
+_TRANSACTIONS_TARGET_SQL = (
+    f"SELECT m.LegacyID, 'expense', e.Date, e.Amount, e.Category FROM {MAP_TABLE} AS m "
+    "JOIN ExpenseTracker AS e ON e.ID = m.TargetID "
+    "WHERE m.Source = ?1 AND m.TableName = 'transactions' AND m.TargetTable = 'ExpenseTracker' "
+    f"UNION ALL SELECT m.LegacyID, 'income', i.Date, i.Amount, i.Category FROM {MAP_TABLE} AS m "
+    "JOIN Income AS i ON i.ID = m.TargetID "
+    "WHERE m.Source = ?1 AND m.TableName = 'transactions' AND m.TargetTable = 'Income' "
+    "ORDER BY 1"
+)
+
+# How each legacy table is read, converted, written and checked. Users go first.
+LegacyTable = namedtuple('LegacyTable', 'name select convert copy check_values target_sql')
+LEGACY_TABLES = (
+    LegacyTable('users', _users_select, _convert_user, _copy_user, _user_check_values, _USERS_TARGET_SQL),
+    LegacyTable('transactions', _transactions_select, _convert_transaction, _copy_transaction,
+                _transaction_check_values, _TRANSACTIONS_TARGET_SQL),
+)
+
+
+# --- Copy and validation ---
+
+def _open_read_only(path):
+    return sqlite3.connect(Path(path).resolve().as_uri() + "?mode=ro", uri=True)
+
+
+def _source_rows(source_connector, source, table, columns, batch_size, after_id=0):
+    """Streams (legacy id, converted values) from a source table in id order."""
+    select = table.select(columns)
+    while True:
+        rows = source_connector.execute(select, (after_id, batch_size)).fetchall()
+        if not rows:
+            return
+        for row in rows:
+            yield table.convert(source, row)
+        after_id = rows[-1][0]
+
+
+def copy_table(connector, source_connector, source, table, columns, batch_size=DEFAULT_BATCH_SIZE, progress=None):
+    """Copies the rows not copied yet, one transaction per batch. Returns the number copied."""
+    last_id = connector.execute(f"SELECT MAX(LegacyID) FROM {MAP_TABLE} WHERE Source = ? AND TableName = ?",
+                                (source, table.name)).fetchone()[0] or 0
+    copied = 0
+    batch = []
+    try:
+        for legacy_id, values in _source_rows(source_connector, source, table, columns, batch_size, last_id):
+            target_table, target_id = table.copy(connector, values)
+            batch.append((source, table.name, legacy_id, target_table, target_id))
+            if len(batch) >= batch_size:
+                copied += _commit_batch(connector, batch)
+                if progress:
+                    progress(source, table.name, copied)
+        copied += _commit_batch(connector, batch)
+    except (sqlite3.Error, ValueError):
+        connector.rollback() # Drop the unfinished batch; the next run resumes before it
+        raise
+    return copied
+
+
+def _commit_batch(connector, batch):
+    """Records a batch's row mapping and commits it together with the rows."""
+    connector.executemany(f"INSERT INTO {MAP_TABLE} (Source, TableName, LegacyID, TargetTable, TargetID) "
+                          "VALUES (?, ?, ?, ?, ?)", batch)
+    connector.commit()
+    count = len(batch)
+    batch.clear()
+    return count
+
+
+def _checksum(rows):
+    digest = hashlib.sha256()
+    count = 0
+    for row in rows:
+        digest.update(repr(tuple(row)).encode())
+        count += 1
+    return count, digest.hexdigest()
+
+
+def validate_table(connector, source_connector, source, table, columns, batch_size=DEFAULT_BATCH_SIZE):
+    """Compares a source table with the rows it was copied to; returns a TableCheck."""
+    source_rows, source_checksum = _checksum(
+        (legacy_id,) + table.check_values(values)
+        for legacy_id, values in _source_rows(source_connector, source, table, columns, batch_size))
+    copied_rows, target_checksum = _checksum(connector.execute(table.target_sql, (source,)))
+    return TableCheck(source, table.name, source_rows, copied_rows, source_checksum, target_checksum)
+
+
+def _columns(source_connector, table_name):
+    return {row[1] for row in source_connector.execute(f"PRAGMA table_info({table_name})")}
+
+
+def consolidate(connector, paths=LEGACY_FILES, batch_size=DEFAULT_BATCH_SIZE, progress=None):
+    """Copies every legacy table in paths into the database behind connector and
+       validates it. Missing files are skipped; rerunning only copies what is left.
+       progress(source, table, rows_copied) is called after each batch.
+       Returns a list of TableCheck."""
+    create_bookkeeping(connector)
+    target = connector.execute("PRAGMA database_list").fetchone()[2]
+    checks = []
+    copied_any = False
+    for path in paths:
+        if not os.path.exists(path) or (target and os.path.samefile(path, target)):
+            continue
+        source = os.path.basename(path)
+        source_connector = _open_read_only(path)
+        try:
+            for table in LEGACY_TABLES:
+                columns = _columns(source_connector, table.name)
+                if not columns:
+                    continue
+                copied_any |= copy_table(connector, source_connector, source, table, columns, batch_size, progress) > 0
+                check = validate_table(connector, source_connector, source, table, columns, batch_size)
+                if check.ok:
+                    connector.execute(f"INSERT OR REPLACE INTO {LOG_TABLE} (Source, TableName, Rows, Checksum, ValidatedAt) "
+                                      "VALUES (?, ?, ?, ?, ?)", (source, table.name, check.source_rows,
+                                                                 check.source_checksum, datetime.datetime.now().isoformat(' ', 'seconds')))
+                    connector.commit()
+                checks.append(check)
+        finally:
+            source_connector.close()
+    if copied_any:
+        bump_generation('expenses')
+    return checks
@@ -0,0 +1,114 @@
+import queue
+import threading
+from concurrent.futures import Future
+
+# How often (ms) the Tk main loop checks for finished queries; ~60 fps
+POLL_INTERVAL_MS = 16
+
+
+class DBExecutor:
+    """Runs database work on a single worker thread with a connection of its own,
+    taken from a ConnectionPool (WAL lets it read while the Tk thread writes).
+
+    submit() returns a Future. Results are handed back on the Tk thread: poll()
+    re-arms itself with root.after and runs callbacks there, so callbacks may
+    touch widgets. Work submitted under a key supersedes older work with the
+    same key: a queued task is cancelled, a running one is interrupted, and
+    neither reports back.
+    """
+
+    def __init__(self, pool):
+        self.pool = pool
+        self._tasks = queue.Queue()
+        self._results = queue.Queue()
+        self._latest = {} # key -> newest Future submitted under that key
+        self._running_key = None
+        self._lock = threading.Lock()
+        self._connection = None
+        self._root = None
+        self._thread = threading.Thread(target=self._run, name="DBExecutor", daemon=True)
+        self._thread.start()
+
+    def submit(self, fn, *args, key=None, callback=None, errback=None):
+        """Queues fn(connection, *args) for the worker thread.
+           callback(result) / errback(exception) run on the Tk thread when it finishes."""
+        future = Future()
+        with self._lock:
+            if key is not None:
+                previous = self._latest.get(key)
+                if previous is not None and not previous.cancel() and self._running_key == key:
+                    # Already running: abort the statement in progress
+                    self._connection.interrupt()
+                self._latest[key] = future
+        self._tasks.put((future, key, fn, args, callback, errback))
+        return future
+
+    def cancel(self, key):
+        """Cancels the work queued or running under key; its result is dropped."""
+        with self._lock:
+            previous = self._latest.pop(key, None)
+            if previous is not None and not previous.cancel() and self._running_key == key:
+                self._connection.interrupt()
+
+    def is_current(self, future, key):
+        return key is None or self._latest.get(key) is future
+
+    def start_polling(self, root):
+        """Starts delivering results on the Tk thread of root."""
+        self._root = root
+        self.poll()
+
+    def stop_polling(self):
+        """Stops delivering results, e.g. before the Tk root is destroyed."""
+        self._root = None
+
+    def poll(self):
+        while True:
+            try:
+                future, key, callback, errback = self._results.get_nowait()
+            except queue.Empty:
+                break
+            if future.cancelled() or not self.is_current(future, key):
+                continue # Superseded by newer work with the same key
+            exception = future.exception()
+            try:
+                if exception is None:
+                    if callback: callback(future.result())
+                elif errback:
+                    errback(exception)
+                else:
+                    print(f"Database task failed: {exception}")
+            except Exception as e: # Never let one callback stop result delivery
+                print(f"Error in database callback: {e}")
+        if self._root is not None:
+            self._root.after(POLL_INTERVAL_MS, self.poll)
+
+    def shutdown(self, wait=True):
+        self._tasks.put(None)
+        if wait:
+            self._thread.join()
+
+    def _run(self):
+        self._connection = self.pool.acquire()
+        try:
+            while True:
+                task = self._tasks.get()
+                if task is None:
+                    break
+                future, key, fn, args, callback, errback = task
+                with self._lock:
+                    if not future.set_running_or_notify_cancel():
+                        continue
+                    self._running_key = key
+                try:
+                    future.set_result(fn(self._connection, *args))
+                except BaseException as e:
+                    if self._connection.in_transaction:
+                        self._connection.rollback()
+                    future.set_exception(e)
+                finally:
+                    with self._lock:
+                        self._running_key = None
+                self._results.put((future, key, callback, errback))
+        finally:
+            self.pool.release(self._connection)
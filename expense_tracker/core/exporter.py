@@ -0,0 +1,109 @@
+import csv
+import json
+import os
+
+from .paged_table import EXPENSE_COLUMNS
+
+DEFAULT_CHUNK_SIZE = 1000
+EXPORT_FORMATS = {'.csv': 'csv', '.jsonl': 'jsonl', '.ndjson': 'jsonl', '.parquet': 'parquet', '.txt': 'text'}
+
+
+def iter_rows(connector, query, params=(), chunk_size=DEFAULT_CHUNK_SIZE):
+    """Streams a query's rows with fetchmany, so only one chunk is held in memory at a time."""
+    cursor = connector.execute(query, params)
+    try:
+        while True:
+            chunk = cursor.fetchmany(chunk_size)
+            if not chunk:
+                break
+            yield from chunk
+    finally:
+        cursor.close()
+
+
+def iter_chunks(rows, chunk_size=DEFAULT_CHUNK_SIZE):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+# --- Writers ---
+# Each writer takes an iterable of rows in EXPENSE_COLUMNS order and returns the number written.
+
+def write_csv(rows, path):
+    count = 0
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(EXPENSE_COLUMNS)
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+    return count
+
+
+def write_jsonl(rows, path):
+    count = 0
+    with open(path, 'w', encoding='utf-8') as f:
+        for row in rows:
+            f.write(json.dumps(dict(zip(EXPENSE_COLUMNS, row)), ensure_ascii=False))
+            f.write('\n')
+            count += 1
+    return count
+
+
+def write_parquet(rows, path, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Writes one Parquet row group per chunk. Needs the optional pyarrow package."""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Parquet export needs pyarrow. Please install it: pip install pyarrow")
+
+    schema = pa.schema([('ID', pa.int64()), ('Date', pa.string()), ('Payee', pa.string()),
+                        ('Description', pa.string()), ('Amount', pa.float64()), ('ModeOfPayment', pa.string()),
+                        ('Category', pa.string()), ('Tags', pa.string())])
+    count = 0
+    with pq.ParquetWriter(path, schema) as writer:
+        for chunk in iter_chunks(rows, chunk_size):
+            columns = list(zip(*chunk))
+            writer.write_table(pa.Table.from_arrays([pa.array(col, type=field.type) for col, field in zip(columns, schema)],
+                                                    schema=schema))
+            count += len(chunk)
+    return count
+
+
+def write_text_report(rows, path):
+    count = 0
+    total = 0.0
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write("Expense Report\n----------------\n")
+        for expense_id, date, payee, description, amount, mop, category, tags in rows:
+            amount = float(amount or 0)
+            f.write(f"{date} - ₹{amount:.2f} to {payee} ({description}) via {mop} [{category}]"
+                    + (f" tags: {tags}" if tags else "") + "\n")
+            count += 1
+            total += amount
+        f.write(f"----------------\n{count} expenses, total ₹{total:.2f}\n")
+    return count
+
+
+WRITERS = {'csv': write_csv, 'jsonl': write_jsonl, 'parquet': write_parquet, 'text': write_text_report}
+
+
+def format_for(path, fmt=None):
+    fmt = fmt or EXPORT_FORMATS.get(os.path.splitext(path)[1].lower())
+    if fmt not in WRITERS:
+        raise ValueError(f"Unsupported export format for {path}. Use CSV, JSON Lines, Parquet or text (.txt).")
+    return fmt
+
+
+def export_query(connector, query, params, path, fmt=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Streams the rows of query (selecting EXPENSE_COLUMNS) to path in constant memory.
+       The format comes from fmt or the file extension. Returns the number of rows written."""
+    writer = WRITERS[format_for(path, fmt)]
+    return writer(iter_rows(connector, query, params, chunk_size), path)
@@ -0,0 +1,104 @@
+import sqlite3
+
+# FTS5 index over the free-text columns of ExpenseTracker. It is an external
+# content table (the text lives only in ExpenseTracker) kept in sync by triggers.
+FTS_TABLE = 'ExpenseSearch'
+FTS_COLUMNS = ('Payee', 'Description', 'Category', 'Tags', 'ModeOfPayment')
+
+# Condition to plug into a WHERE clause on ExpenseTracker; takes one MATCH expression parameter
+FTS_MATCH_CONDITION = f"ID IN (SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH ?)"
+
+
+def fts5_supported(connector):
+    """True if the SQLite library was compiled with FTS5."""
+    try:
+        connector.execute("CREATE VIRTUAL TABLE temp.fts5_probe USING fts5(x)")
+        connector.execute("DROP TABLE temp.fts5_probe")
+        return True
+    except sqlite3.OperationalError:
+        return False
+
+
+def fts_available(connector):
+    """True if the search index exists in this database (see migrations.py)."""
+    row = connector.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (FTS_TABLE,)).fetchone()
+    return row is not None
+
+
+def create_search_triggers(connector):
+    """Creates the triggers that mirror every write to ExpenseTracker into the search index."""
+    columns = ", ".join(FTS_COLUMNS)
+    new_values = ", ".join(f"new.{c}" for c in FTS_COLUMNS)
+    old_values = ", ".join(f"old.{c}" for c in FTS_COLUMNS)
+    connector.execute(
+        f"""CREATE TRIGGER IF NOT EXISTS trg_expense_fts_insert AFTER INSERT ON ExpenseTracker BEGIN
+            INSERT INTO {FTS_TABLE}(rowid, {columns}) VALUES (new.ID, {new_values});
+        END"""
+    )
+    connector.execute(
+        f"""CREATE TRIGGER IF NOT EXISTS trg_expense_fts_delete AFTER DELETE ON ExpenseTracker BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {columns}) VALUES ('delete', old.ID, {old_values});
+        END"""
+    )
+    connector.execute(
+        f"""CREATE TRIGGER IF NOT EXISTS trg_expense_fts_update AFTER UPDATE OF {columns} ON ExpenseTracker BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {columns}) VALUES ('delete', old.ID, {old_values});
+            INSERT INTO {FTS_TABLE}(rowid, {columns}) VALUES (new.ID, {new_values});
+        END"""
+    )
+
+
+def drop_search_insert_trigger(connector):
+    """Drops the insert trigger for a bulk load; call index_rows_after() and
+       create_search_triggers() afterwards to catch the index up."""
+    connector.execute("DROP TRIGGER IF EXISTS trg_expense_fts_insert")
+
+
+def index_rows_after(connector, last_id):
+    """Adds every expense with ID > last_id to the search index in one statement."""
+    columns = ", ".join(FTS_COLUMNS)
+    connector.execute(
+        f"INSERT INTO {FTS_TABLE}(rowid, {columns}) SELECT ID, {columns} FROM ExpenseTracker WHERE ID > ?",
+        (last_id,))
+
+
+def fts_column(field):
+    """Maps a search field name like 'modeofpayment' to its FTS column, or None."""
+    for column in FTS_COLUMNS:
+        if column.lower() == field.lower():
+            return column
+    return None
+
+
+def match_phrase(value, column=None, prefix=True):
+    """Builds a MATCH term for a user-typed value: a quoted phrase (so punctuation and
+       FTS keywords are taken literally) whose last word is matched as a prefix.
+       Returns None if the value contains nothing searchable."""
+    value = value.strip()
+    if not any(ch.isalnum() for ch in value):
+        return None
+    term = '"' + value.replace('"', '""') + '"'
+    if prefix:
+        term += ' *'
+    if column:
+        term = f"{column} : {term}"
+    return term
+
+
+def compile_match(terms):
+    """Joins MATCH terms with AND. Returns None if there are no terms."""
+    terms = [t for t in terms if t]
+    return " AND ".join(terms) if terms else None
+
+
+def ranked_search(connector, match_expression, limit=50):
+    """Returns (ID, bm25 score) pairs for the best matches, most relevant first.
+       bm25() scores are negative; lower means a better match."""
+    query = f"SELECT rowid, bm25({FTS_TABLE}) FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH ? ORDER BY rank LIMIT ?"
+    return connector.execute(query, (match_expression, limit)).fetchall()
+
+
+def rebuild_index(connector):
+    """Rebuilds the search index from ExpenseTracker, e.g. after bulk edits with triggers disabled."""
+    connector.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+    connector.commit()
@@ -0,0 +1,379 @@
+import csv
+import datetime
+import itertools
+import json
+import math
+import os
+import re
+
+from .achievements import count_groups, create_achievement_triggers, drop_achievement_insert_trigger
+from .budget_tracking import add_spending_groups, create_spending_triggers, drop_spending_insert_trigger
+from .fts_search import fts_available, create_search_triggers, drop_search_insert_trigger, index_rows_after
+from .ledger import create_ledger_triggers, drop_ledger_insert_trigger, post_expense_groups
+from .partitions import UNOWNED
+from .query_cache import bump_generation
+from .rollups import GROUPS_TABLE, create_rollup_triggers, drop_rollup_insert_trigger, add_groups, group_rows_after
+from .tags import create_tag_triggers, drop_tag_insert_trigger, link_rows_after
+
+DEFAULT_BATCH_SIZE = 5000
+IMPORT_CACHE_KIB = 262_144 # SQLite page cache while importing (the default is 2 MiB)
+DEFAULT_CATEGORY = "Other"
+DEFAULT_MOP = "Online Transfer"
+
+INSERT_SQL = ('INSERT INTO ExpenseTracker (Date, Payee, Description, Amount, ModeOfPayment, Category, Tags, UserID) '
+              'VALUES (?, ?, ?, ?, ?, ?, ?, ?)')
+
+# Source column names (lower-case) recognised for each ExpenseTracker column when no mapping is given,
+# and for Direction: a column telling debits from credits (see DEBIT_MARKERS and CREDIT_MARKERS)
+COLUMN_ALIASES = {
+    'Date': ['date', 'transaction date', 'txn date', 'posted date', 'posting date', 'value date'],
+    'Payee': ['payee', 'merchant', 'name', 'beneficiary', 'counterparty'],
+    'Description': ['description', 'narration', 'memo', 'details', 'particulars', 'remarks'],
+    'Amount': ['amount', 'debit', 'withdrawal', 'withdrawal amount', 'debit amount', 'amount (inr)'],
+    'ModeOfPayment': ['modeofpayment', 'mode of payment', 'mop', 'payment method', 'method'],
+    'Category': ['category'],
+    'Tags': ['tags', 'labels'],
+    'Direction': ['dr/cr', 'cr/dr', 'debit/credit', 'transaction type', 'txn type', 'type'],
+}
+DEBIT_MARKERS = {'dr', 'debit', 'd', 'withdrawal'}
+CREDIT_MARKERS = {'cr', 'credit', 'c', 'deposit', 'refund'} # Direction values of rows that aren't expenses
+
+DATE_MEMO_SIZE = 100_000 # Distinct date strings remembered per import
+DATE_FORMATS = ['%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y', '%m/%d/%Y', '%d/%m/%y', '%d %b %Y', '%d-%b-%Y', '%Y%m%d']
+
+# OFX transaction types -> this app's modes of payment
+OFX_MOP = {'POS': 'Debit Card', 'ATM': 'Cash', 'CHECK': 'Cheque', 'XFER': 'Online Transfer',
+           'DIRECTDEBIT': 'Online Transfer', 'PAYMENT': 'Online Transfer', 'DEBIT': 'Debit Card'}
+
+
+class ProgressReader:
+    """Iterates a text file line by line and keeps count of the characters read,
+       so the importer can report progress against the file size."""
+
+    def __init__(self, path, encoding='utf-8-sig'):
+        self.path = path
+        self.encoding = encoding
+        self.size = max(os.path.getsize(path), 1)
+        self.chars_read = 0
+
+    def __iter__(self):
+        with open(self.path, newline='', encoding=self.encoding, errors='replace') as f:
+            for line in f:
+                self.chars_read += len(line)
+                yield line
+
+    @property
+    def fraction(self):
+        return min(self.chars_read / self.size, 1.0)
+
+
+# --- Readers ---
+# Each reader yields one dict per source record, keyed by ExpenseTracker column names.
+
+def resolve_mapping(header, mapping=None):
+    """Returns {ExpenseTracker column: source column} for a file header.
+       Explicit mapping entries win; the rest are matched against COLUMN_ALIASES."""
+    resolved = dict(mapping or {})
+    lowered = {name.strip().lower(): name for name in header}
+    for column, aliases in COLUMN_ALIASES.items():
+        if column in resolved:
+            continue
+        for alias in aliases:
+            if alias in lowered:
+                resolved[column] = lowered[alias]
+                break
+    return resolved
+
+
+def read_csv(lines, mapping=None):
+    reader = csv.reader(lines)
+    header = next(reader, None) or []
+    width = len(header)
+    index = {name: i for i, name in enumerate(header)} # Last of duplicate names, as csv.DictReader
+    # Columns the header doesn't have read the None appended after the header's width
+    positions = [(column, index.get(source, width)) for column, source in resolve_mapping(header, mapping).items()]
+    for row in reader:
+        if not row:
+            continue # Blank line
+        if len(row) != width:
+            row = (row + [None] * width)[:width]
+        row.append(None)
+        yield {column: row[i] for column, i in positions}
+
+
+def read_jsonl(lines, mapping=None):
+    resolved = {} # Key tuple -> resolve_mapping(); the objects of a file share a handful of layouts
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            obj = json.loads(line)
+        except json.JSONDecodeError:
+            yield None # Counted as skipped
+            continue
+        if not isinstance(obj, dict):
+            yield None
+            continue
+        keys = tuple(obj)
+        columns = resolved.get(keys)
+        if columns is None:
+            columns = resolved[keys] = list(resolve_mapping(keys, mapping).items())
+        yield {column: obj.get(source) for column, source in columns}
+
+
+_OFX_TAG = re.compile(r'<(\w+)>([^<\r\n]*)')
+
+
+def read_ofx(lines, mapping=None):
+    """Reads <STMTTRN> blocks from OFX/QFX files (both the SGML 1.x and XML 2.x flavours).
+       Credits (positive TRNAMT) are income, not expenses, and are skipped."""
+    transaction = None
+    for line in lines:
+        for tag, value in _OFX_TAG.findall(line):
+            tag = tag.upper()
+            if tag == 'STMTTRN':
+                transaction = {}
+            elif transaction is not None:
+                transaction[tag] = value.strip()
+        if transaction is not None and '</STMTTRN>' in line.upper():
+            yield _ofx_record(transaction)
+            transaction = None
+
+
+def _ofx_record(txn):
+    try:
+        amount = float(txn.get('TRNAMT', ''))
+    except ValueError:
+        return None
+    if amount >= 0:
+        return None
+    name = txn.get('NAME') or txn.get('PAYEE') or ''
+    return {
+        'Date': txn.get('DTPOSTED', '')[:8],
+        'Payee': name,
+        'Description': txn.get('MEMO') or name,
+        'Amount': -amount,
+        'ModeOfPayment': OFX_MOP.get(txn.get('TRNTYPE', '').upper(), 'Other'),
+        'Category': DEFAULT_CATEGORY,
+        'Tags': '',
+    }
+
+
+READERS = {'.csv': read_csv, '.jsonl': read_jsonl, '.ndjson': read_jsonl, '.ofx': read_ofx, '.qfx': read_ofx}
+
+
+def reader_for(path):
+    reader = READERS.get(os.path.splitext(path)[1].lower())
+    if reader is None:
+        raise ValueError(f"Unsupported file type: {path}. Use CSV, JSON Lines, OFX or QFX.")
+    return reader
+
+
+# --- Normalization ---
+
+def parse_amount(value):
+    """The amount as a signed float, or None if it isn't a number."""
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        amount = float(value) # Plain numbers, as most files write them
+    except (TypeError, ValueError):
+        cleaned = re.sub(r'[^\d.\-]', '', str(value or '')) # '1,234.50', '₹ -99', '250.00 Dr'
+        try:
+            amount = float(cleaned)
+        except ValueError:
+            return None
+    return amount if math.isfinite(amount) else None
+
+
+def direction(record):
+    """'debit' or 'credit' if the record's Direction column says which, else None."""
+    marker = record.get('Direction')
+    if not marker:
+        return None
+    marker = str(marker).strip().lower()
+    if marker in DEBIT_MARKERS:
+        return 'debit'
+    if marker in CREDIT_MARKERS:
+        return 'credit'
+    return None
+
+
+class RowBuilder:
+    """Turns one file's reader records into INSERT parameter tuples.
+
+    Dates: a file writes all its dates the same way, so the format that matched
+    last is tried first, and each distinct date string is only parsed once.
+    Signs: credits and refunds are skipped, as read_ofx skips credits. A Direction
+    column (Dr/Cr, Type, ...) says which rows they are, where it has a marker.
+    Otherwise the sign does: if any of the file's first records has a negative
+    amount, the file uses bank statement signs and only negative amounts are
+    expenses; if none has (e.g. this app's own export), negative amounts are refunds.
+    """
+
+    def __init__(self, statement_signs=False):
+        self.statement_signs = statement_signs
+        self.formats = list(DATE_FORMATS) # The last one that matched first
+        self.dates = {} # Date string -> 'YYYY-MM-DD', or None if it can't be parsed
+
+    @classmethod
+    def for_records(cls, records, lookahead):
+        """(RowBuilder, records): the sign convention is read from the first lookahead
+           records, which are handed back in front of the rest, still streamed."""
+        records = iter(records)
+        first = list(itertools.islice(records, lookahead))
+        statement_signs = any((parse_amount(record.get('Amount')) or 0) < 0
+                              for record in first if record and direction(record) is None)
+        return cls(statement_signs), itertools.chain(first, records)
+
+    def date(self, value):
+        """value as 'YYYY-MM-DD', or None if no DATE_FORMATS entry reads it."""
+        if value in self.dates:
+            return self.dates[value]
+        if len(self.dates) >= DATE_MEMO_SIZE:
+            self.dates.clear()
+        iso = None
+        # Also try without a trailing time part ('2024-01-31T10:00', '31/01/2024 10:00')
+        for candidate in (value, value.split('T')[0].split(' ')[0]):
+            for fmt in self.formats:
+                try:
+                    iso = datetime.datetime.strptime(candidate, fmt).date().isoformat()
+                except ValueError:
+                    continue
+                self.formats.remove(fmt)
+                self.formats.insert(0, fmt)
+                break
+            if iso:
+                break
+        self.dates[value] = iso
+        return iso
+
+    def amount(self, record):
+        """The record's amount as a positive number if it is an expense, else None."""
+        amount = parse_amount(record.get('Amount'))
+        if not amount:
+            return None
+        side = direction(record)
+        if side is None:
+            side = 'debit' if (amount < 0) == self.statement_signs else 'credit'
+        return abs(amount) if side == 'debit' else None # Debit columns are signed either way
+
+    def row(self, record):
+        """Turns a reader record into an INSERT parameter tuple, or None if it is unusable."""
+        if not record:
+            return None
+        date = self.date(str(record.get('Date') or '').strip())
+        amount = self.amount(record)
+        if date is None or amount is None:
+            return None
+        payee = str(record.get('Payee') or '').strip()
+        description = str(record.get('Description') or '').strip() or payee
+        if not payee:
+            payee = description
+        return (date, payee, description, amount,
+                str(record.get('ModeOfPayment') or '').strip() or DEFAULT_MOP,
+                str(record.get('Category') or '').strip() or DEFAULT_CATEGORY,
+                str(record.get('Tags') or '').strip())
+
+
+# --- Import ---
+
+def _drop_expense_indexes(connector):
+    """Drops ExpenseTracker's secondary indexes, returning the statements that recreate them."""
+    indexes = connector.execute("SELECT name, sql FROM sqlite_master WHERE type = 'index' "
+                                "AND tbl_name = 'ExpenseTracker' AND sql IS NOT NULL").fetchall()
+    for name, _ in indexes:
+        connector.execute(f'DROP INDEX "{name}"')
+    return [sql for _, sql in indexes]
+
+
+def import_expenses(connector, records, batch_size=DEFAULT_BATCH_SIZE, progress=None, user_id=UNOWNED):
+    """Inserts records as user_id's expenses, with batched executemany calls inside a single transaction.
+
+    The per-row search-index, rollup, tag, ledger, monthly spending and achievement
+    insert triggers are dropped for the load and each is caught up with set-based
+    statements at the end (the summary tables from one grouping of the new rows), so
+    the whole import either lands completely (indexes included) or not at all.
+    Once the import outgrows the rows already there, the table's own indexes are dropped
+    too and rebuilt at the end: one sort each instead of a B-tree update per row.
+    Dates, and which records are expenses rather than credits or refunds, are read as
+    RowBuilder describes; credits and refunds count as skipped.
+    progress(rows_imported) is called after each batch.
+    Returns {'imported': n, 'skipped': n}.
+    """
+    if connector.in_transaction:
+        connector.commit()
+    imported = skipped = 0
+    index_sql = None # Set once the indexes are dropped
+    cache_size = connector.execute("PRAGMA cache_size").fetchone()[0]
+    connector.execute(f"PRAGMA cache_size = -{IMPORT_CACHE_KIB}")
+    connector.execute("BEGIN")
+    try:
+        # The new rows' IDs follow last_id, so the catch-up starts there. Whether rebuilding the
+        # indexes beats updating them depends on the row count, which deletes leave below MAX(ID)
+        last_id = connector.execute("SELECT COALESCE(MAX(ID), 0) FROM ExpenseTracker").fetchone()[0]
+        existing = connector.execute("SELECT COUNT(*) FROM ExpenseTracker").fetchone()[0]
+        has_search_index = fts_available(connector)
+        if has_search_index:
+            drop_search_insert_trigger(connector)
+        drop_rollup_insert_trigger(connector)
+        drop_tag_insert_trigger(connector)
+        drop_ledger_insert_trigger(connector)
+        drop_spending_insert_trigger(connector)
+        drop_achievement_insert_trigger(connector)
+
+        rows, records = RowBuilder.for_records(records, batch_size)
+        batch = []
+        for record in records:
+            row = rows.row(record)
+            if row is None:
+                skipped += 1
+                continue
+            batch.append(row + (user_id,))
+            if len(batch) >= batch_size:
+                connector.executemany(INSERT_SQL, batch)
+                imported += len(batch)
+                batch = []
+                if index_sql is None and imported >= existing:
+                    index_sql = _drop_expense_indexes(connector)
+                if progress: progress(imported)
+        if batch:
+            connector.executemany(INSERT_SQL, batch)
+            imported += len(batch)
+            if progress: progress(imported)
+
+        group_rows_after(connector, last_id)
+        add_groups(connector)
+        create_rollup_triggers(connector)
+        post_expense_groups(connector)
+        create_ledger_triggers(connector, ('ExpenseTracker',))
+        add_spending_groups(connector) # Raises the budget alerts the import crossed
+        create_spending_triggers(connector)
+        count_groups(connector)
+        create_achievement_triggers(connector)
+        connector.execute(f"DROP TABLE {GROUPS_TABLE}")
+        link_rows_after(connector, last_id)
+        create_tag_triggers(connector)
+        if has_search_index:
+            index_rows_after(connector, last_id)
+            create_search_triggers(connector)
+        for sql in index_sql or ():
+            connector.execute(sql)
+        connector.commit()
+    except BaseException:
+        connector.rollback() # Also restores the dropped triggers and indexes
+        raise
+    finally:
+        connector.execute(f"PRAGMA cache_size = {cache_size}")
+        bump_generation('expenses')
+    return {'imported': imported, 'skipped': skipped}
+
+
+def import_file(connector, path, mapping=None, batch_size=DEFAULT_BATCH_SIZE, progress=None, user_id=UNOWNED):
+    """Streams a CSV / JSON Lines / OFX / QFX file into ExpenseTracker.
+       progress(fraction_of_file_read, rows_imported) is called after each batch."""
+    reader = reader_for(path)
+    lines = ProgressReader(path)
+    on_batch = (lambda rows: progress(lines.fraction, rows)) if progress else None
+    return import_expenses(connector, reader(lines, mapping), batch_size, on_batch, user_id)
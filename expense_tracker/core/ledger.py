@@ -0,0 +1,319 @@
+import sqlite3
+import sys
+
+from .rollups import GROUPS_TABLE, UNOWNED, partitioned, user_sql
+
+# Cash-flow ledger over Income (money in), ExpenseTracker (money out) and Transfers
+# (money moved between accounts). Two tables hold one row per user and day that had any:
+#
+#   CashFlow         everything together; TotalInflow - TotalOutflow is net worth
+#   AccountBalances  per account: an expense's ModeOfPayment, an income's Account,
+#                    and both ends of a transfer (transfers don't touch CashFlow)
+#
+# Every series (one user's CashFlow rows, or one user's account) runs on its own, so
+# an account named 'Bank' by two users is two accounts (see partitions.py).
+# Besides the day's own Inflow/Outflow each row carries the running totals up to
+# and including that day, so the balance or cash flow for any date is one index
+# seek instead of a SUM over history. Triggers keep both tables up to date: a
+# write adds to its day and to the running totals of the days after it, so
+# back-dated writes cost one row per later day with activity.
+# Rows without a valid date are kept on day -1, before every other day.
+CASH_FLOW_TABLE = 'CashFlow'
+ACCOUNT_TABLE = 'AccountBalances'
+
+# Where each source table's rows are posted: (balance table, account expression, side),
+# the expression written for a 'new.' / 'old.' / '' row prefix {p}.
+_POSTINGS = {
+    'Income': [
+        (CASH_FLOW_TABLE, None, 'Inflow'),
+        (ACCOUNT_TABLE, "COALESCE({p}Account, '')", 'Inflow'),
+    ],
+    'ExpenseTracker': [
+        (CASH_FLOW_TABLE, None, 'Outflow'),
+        (ACCOUNT_TABLE, "COALESCE({p}ModeOfPayment, '')", 'Outflow'),
+    ],
+    'Transfers': [
+        (ACCOUNT_TABLE, "COALESCE({p}FromAccount, '')", 'Outflow'),
+        (ACCOUNT_TABLE, "COALESCE({p}ToAccount, '')", 'Inflow'),
+    ],
+}
+_WATCHED_COLUMNS = {
+    'Income': "Date, Amount, Account",
+    'ExpenseTracker': "Date, Amount, ModeOfPayment",
+    'Transfers': "Date, Amount, FromAccount, ToAccount",
+}
+_TRIGGER_PREFIX = {'Income': 'trg_income_ledger', 'ExpenseTracker': 'trg_expense_ledger', 'Transfers': 'trg_transfer_ledger'}
+
+
+def _key(table, user, account):
+    """WHERE condition selecting one series (all of a user's days in CashFlow, or in one account)."""
+    return f"UserID = {user} AND " + (f"Account = {account} AND " if table == ACCOUNT_TABLE else "")
+
+
+def _post_sql(table, account, side, p, sign, by_user):
+    """Statements adding (sign '+') or removing (sign '-') one row's amount."""
+    day = f"COALESCE({p}DateDay, -1)"
+    amount = f"COALESCE({p}Amount, 0)"
+    user = user_sql(p, by_user)
+    key = _key(table, user, account)
+    statements = []
+    if sign == '+':
+        # A new day starts from the running totals of the day before it
+        key_columns, key_values = ("UserID, Account, ", f"{user}, {account}, ") if table == ACCOUNT_TABLE \
+            else ("UserID, ", f"{user}, ")
+        previous = f"FROM {table} WHERE {key}DateDay < {day} ORDER BY DateDay DESC LIMIT 1"
+        statements.append(
+            f"INSERT OR IGNORE INTO {table} ({key_columns}DateDay, Inflow, Outflow, Entries, TotalInflow, TotalOutflow) "
+            f"VALUES ({key_values}{day}, 0, 0, 0, COALESCE((SELECT TotalInflow {previous}), 0), "
+            f"COALESCE((SELECT TotalOutflow {previous}), 0));")
+    statements.append(f"UPDATE {table} SET {side} = {side} {sign} {amount}, Entries = Entries {sign} 1 "
+                      f"WHERE {key}DateDay = {day};")
+    statements.append(f"UPDATE {table} SET Total{side} = Total{side} {sign} {amount} WHERE {key}DateDay >= {day};")
+    if sign == '-':
+        # An emptied day adds nothing to later totals, so it can simply go
+        statements.append(f"DELETE FROM {table} WHERE {key}DateDay = {day} AND Entries <= 0;")
+    return " ".join(statements)
+
+
+def _postings_sql(source, p, sign, by_user):
+    return " ".join(_post_sql(table, account and account.format(p=p), side, p, sign, by_user)
+                    for table, account, side in _POSTINGS[source])
+
+
+def create_ledger_triggers(connector, sources=tuple(_POSTINGS)):
+    """(Re)creates the triggers that post every write to the balance tables."""
+    by_user = partitioned(connector)
+    for source in sources:
+        prefix = _TRIGGER_PREFIX[source]
+        watched = _WATCHED_COLUMNS[source] + (", UserID" if by_user else "")
+        connector.execute(f"CREATE TRIGGER IF NOT EXISTS {prefix}_insert AFTER INSERT ON {source} BEGIN "
+                          f"{_postings_sql(source, 'new.', '+', by_user)} END")
+        connector.execute(f"CREATE TRIGGER IF NOT EXISTS {prefix}_delete AFTER DELETE ON {source} BEGIN "
+                          f"{_postings_sql(source, 'old.', '-', by_user)} END")
+        connector.execute(f"CREATE TRIGGER IF NOT EXISTS {prefix}_update AFTER UPDATE OF {watched} ON {source} "
+                          f"BEGIN {_postings_sql(source, 'old.', '-', by_user)} {_postings_sql(source, 'new.', '+', by_user)} END")
+
+
+def drop_ledger_triggers(connector):
+    for prefix in _TRIGGER_PREFIX.values():
+        for event in ('insert', 'delete', 'update'):
+            connector.execute(f"DROP TRIGGER IF EXISTS {prefix}_{event}")
+
+
+def drop_ledger_insert_trigger(connector):
+    """Drops the expense insert trigger for a bulk load; call post_expense_groups() and
+       create_ledger_triggers() afterwards to catch the balances up."""
+    connector.execute(f"DROP TRIGGER IF EXISTS {_TRIGGER_PREFIX['ExpenseTracker']}_insert")
+
+
+def create_ledger_schema(connector):
+    """Creates the Transfers table, the balance tables and their triggers."""
+    connector.execute(
+        '''CREATE TABLE IF NOT EXISTS Transfers (
+            ID INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL,
+            Date DATETIME,
+            FromAccount TEXT NOT NULL,
+            ToAccount TEXT NOT NULL,
+            Amount FLOAT NOT NULL,
+            Description TEXT,
+            DateDay INTEGER GENERATED ALWAYS AS (CAST(julianday(substr(Date, 1, 10)) - 2440587.5 AS INTEGER)) VIRTUAL
+        )'''
+    )
+    columns = '''UserID INTEGER NOT NULL, -- the source row's
+            DateDay INTEGER NOT NULL, -- -1 if the date is invalid
+            Inflow FLOAT NOT NULL, -- this day's
+            Outflow FLOAT NOT NULL,
+            Entries INTEGER NOT NULL,
+            TotalInflow FLOAT NOT NULL, -- up to and including this day
+            TotalOutflow FLOAT NOT NULL'''
+    connector.execute(f"CREATE TABLE IF NOT EXISTS {CASH_FLOW_TABLE} ({columns}, PRIMARY KEY (UserID, DateDay)) WITHOUT ROWID")
+    connector.execute(f"CREATE TABLE IF NOT EXISTS {ACCOUNT_TABLE} (Account TEXT NOT NULL, {columns}, "
+                      "PRIMARY KEY (UserID, Account, DateDay)) WITHOUT ROWID")
+    create_ledger_triggers(connector)
+
+
+# --- Set-based maintenance ---
+
+def _movements_sql(table, by_user):
+    """Every posting as (User, Account, Day, Inflow, Outflow) rows, for filling a balance table."""
+    parts = []
+    for source, postings in _POSTINGS.items():
+        for posting_table, account, side in postings:
+            if posting_table != table:
+                continue
+            amount = "COALESCE(Amount, 0)"
+            inflow, outflow = (amount, "0") if side == 'Inflow' else ("0", amount)
+            parts.append(f"SELECT {user_sql('', by_user)} AS User, {account.format(p='') if account else 'NULL'} AS Account, "
+                         "COALESCE(DateDay, -1) AS Day, "
+                         f"{inflow} AS Inflow, {outflow} AS Outflow FROM {source}")
+    return " UNION ALL ".join(parts)
+
+
+def _recompute_totals(connector):
+    """Recomputes the running totals from the daily amounts with one window pass per table."""
+    for table, key in ((CASH_FLOW_TABLE, "UserID"), (ACCOUNT_TABLE, "UserID, Account")):
+        match = "b.UserID = r.UserID AND " + ("b.Account = r.Account AND " if table == ACCOUNT_TABLE else "")
+        connector.execute(
+            f"UPDATE {table} AS b SET TotalInflow = r.RunningIn, TotalOutflow = r.RunningOut FROM "
+            f"(SELECT {key}, DateDay, SUM(Inflow) OVER w AS RunningIn, SUM(Outflow) OVER w AS RunningOut "
+            f"FROM {table} WINDOW w AS (PARTITION BY {key} ORDER BY DateDay)) AS r WHERE {match}b.DateDay = r.DateDay")
+
+
+def populate_ledger(connector):
+    """Recomputes both balance tables from scratch, inside the caller's transaction."""
+    connector.execute(f"DELETE FROM {CASH_FLOW_TABLE}")
+    connector.execute(f"DELETE FROM {ACCOUNT_TABLE}")
+    by_user = partitioned(connector)
+    connector.execute(
+        f"INSERT INTO {CASH_FLOW_TABLE} (UserID, DateDay, Inflow, Outflow, Entries, TotalInflow, TotalOutflow) "
+        f"SELECT User, Day, SUM(Inflow), SUM(Outflow), COUNT(*), 0, 0 FROM ({_movements_sql(CASH_FLOW_TABLE, by_user)}) "
+        "GROUP BY User, Day")
+    connector.execute(
+        f"INSERT INTO {ACCOUNT_TABLE} (UserID, Account, DateDay, Inflow, Outflow, Entries, TotalInflow, TotalOutflow) "
+        f"SELECT User, Account, Day, SUM(Inflow), SUM(Outflow), COUNT(*), 0, 0 FROM ({_movements_sql(ACCOUNT_TABLE, by_user)}) "
+        "GROUP BY User, Account, Day")
+    _recompute_totals(connector)
+
+
+def post_expense_groups(connector):
+    """Posts a bulk insert's expenses from rollups.GROUPS_TABLE, then recomputes the
+       running totals. Used after bulk inserts made with the insert trigger dropped."""
+    upsert = ("ORDER BY 1 " # Separates GROUP BY from ON CONFLICT (see rollups.add_groups)
+              "ON CONFLICT DO UPDATE SET Outflow = Outflow + excluded.Outflow, Entries = Entries + excluded.Entries")
+    connector.execute(
+        f"INSERT INTO {CASH_FLOW_TABLE} (UserID, DateDay, Inflow, Outflow, Entries, TotalInflow, TotalOutflow) "
+        "SELECT UserID, COALESCE(DateDay, -1) AS Day, 0, SUM(Total), SUM(Count), 0, 0 "
+        f"FROM {GROUPS_TABLE} GROUP BY UserID, Day {upsert}")
+    connector.execute(
+        f"INSERT INTO {ACCOUNT_TABLE} (UserID, Account, DateDay, Inflow, Outflow, Entries, TotalInflow, TotalOutflow) "
+        "SELECT UserID, ModeOfPayment AS Acct, COALESCE(DateDay, -1) AS Day, 0, SUM(Total), SUM(Count), 0, 0 "
+        f"FROM {GROUPS_TABLE} GROUP BY UserID, Acct, Day {upsert}")
+    _recompute_totals(connector)
+
+
+def rebuild_ledger(connector):
+    """Recomputes both balance tables and commits."""
+    populate_ledger(connector)
+    connector.commit()
+
+
+def verify_ledger(connector, tolerance=0.005):
+    """Compares the balance tables against a fresh computation.
+       Returns a list of (table, key, expected, actual) for every row that drifted."""
+    columns = "Inflow, Outflow, Entries, TotalInflow, TotalOutflow"
+    current = {
+        CASH_FLOW_TABLE: connector.execute(f"SELECT UserID, NULL, DateDay, {columns} FROM {CASH_FLOW_TABLE}").fetchall(),
+        ACCOUNT_TABLE: connector.execute(f"SELECT UserID, Account, DateDay, {columns} FROM {ACCOUNT_TABLE}").fetchall(),
+    }
+    connector.execute("SAVEPOINT verify_ledger")
+    try:
+        populate_ledger(connector)
+        fresh = {
+            CASH_FLOW_TABLE: connector.execute(f"SELECT UserID, NULL, DateDay, {columns} FROM {CASH_FLOW_TABLE}").fetchall(),
+            ACCOUNT_TABLE: connector.execute(f"SELECT UserID, Account, DateDay, {columns} FROM {ACCOUNT_TABLE}").fetchall(),
+        }
+    finally:
+        connector.execute("ROLLBACK TO verify_ledger")
+        connector.execute("RELEASE verify_ledger")
+
+    drift = []
+    for table in (CASH_FLOW_TABLE, ACCOUNT_TABLE):
+        expected = {row[:3]: row[3:] for row in fresh[table]}
+        actual = {row[:3]: row[3:] for row in current[table]}
+        for key in sorted(set(expected) | set(actual), key=repr):
+            exp, act = expected.get(key), actual.get(key)
+            if exp is None or act is None or any(abs(e - a) > tolerance for e, a in zip(exp, act)):
+                drift.append((table, key, exp, act))
+    return drift
+
+
+# --- Lookups ---
+
+def _day(date_value):
+    from .migrations import day_number # Not at the top: migrations imports this module
+    return day_number(date_value)
+
+
+def _last_day(date_value):
+    """The DateDay to read balances at: the given date, or everything if None."""
+    if date_value is None:
+        return sys.maxsize
+    day = _day(date_value)
+    if day is None:
+        raise ValueError("Date must be in YYYY-MM-DD format.")
+    return day
+
+
+def _totals(connector, day, account=None, user_id=UNOWNED):
+    """(total inflow, total outflow) up to and including day: one index seek."""
+    key = _key(ACCOUNT_TABLE if account is not None else CASH_FLOW_TABLE, "?", "?")
+    table = ACCOUNT_TABLE if account is not None else CASH_FLOW_TABLE
+    params = (user_id,) + ((account,) if account is not None else ()) + (day,)
+    row = connector.execute(f"SELECT TotalInflow, TotalOutflow FROM {table} WHERE {key}DateDay <= ? "
+                            "ORDER BY DateDay DESC LIMIT 1", params).fetchone()
+    return row or (0.0, 0.0)
+
+
+def net_worth(connector, date=None, account=None, user_id=UNOWNED):
+    """Everything a user received minus everything they spent up to and including date
+       (default: all), overall or for one account."""
+    inflow, outflow = _totals(connector, _last_day(date), account, user_id)
+    return inflow - outflow
+
+
+def cash_flow(connector, start_date=None, end_date=None, account=None, user_id=UNOWNED):
+    """Returns a user's (inflow, outflow) between two dates, inclusive, from two index seeks.
+       Either date may be None for no limit on that side."""
+    end_in, end_out = _totals(connector, _last_day(end_date), account, user_id)
+    if start_date is None:
+        return end_in, end_out
+    start_in, start_out = _totals(connector, _last_day(start_date) - 1, account, user_id)
+    return end_in - start_in, end_out - start_out
+
+
+def account_balances(connector, date=None, user_id=UNOWNED):
+    """Returns [(account, balance)] for a user's accounts at date (default: all), one index
+       seek per account."""
+    day = _last_day(date)
+    return connector.execute(
+        f"SELECT Account, (SELECT TotalInflow - TotalOutflow FROM {ACCOUNT_TABLE} AS b "
+        "WHERE b.UserID = ?1 AND b.Account = a.Account AND b.DateDay <= ?2 ORDER BY b.DateDay DESC LIMIT 1) AS Balance "
+        f"FROM (SELECT DISTINCT Account FROM {ACCOUNT_TABLE} WHERE UserID = ?1) AS a WHERE Balance IS NOT NULL ORDER BY Account",
+        (user_id, day)).fetchall()
+
+
+def monthly_cash_flow(connector, start_date=None, end_date=None, user_id=UNOWNED):
+    """Returns [(month, inflow, outflow, net, closing balance, savings rate)] for every month
+       with activity, in one grouped pass over the daily CashFlow rows (not the transactions).
+       The savings rate is net / inflow, or None for a month without income."""
+    first = _last_day(start_date) if start_date else -1
+    rows = connector.execute(
+        # With MAX(), SQLite takes the bare TotalInflow/TotalOutflow from the month's last day
+        "SELECT CASE WHEN DateDay < 0 THEN '' ELSE strftime('%Y-%m', DateDay * 86400, 'unixepoch') END AS Month, "
+        "SUM(Inflow), SUM(Outflow), MAX(DateDay), TotalInflow - TotalOutflow "
+        f"FROM {CASH_FLOW_TABLE} WHERE UserID = ? AND DateDay BETWEEN ? AND ? GROUP BY Month ORDER BY Month",
+        (user_id, first, _last_day(end_date))).fetchall()
+    return [(month, inflow, outflow, inflow - outflow, closing, (inflow - outflow) / inflow if inflow else None)
+            for month, inflow, outflow, _, closing in rows]
+
+
+if __name__ == "__main__":
+    # Usage: python -m expense_tracker.core.ledger [verify|rebuild] [database file]
+    command = sys.argv[1] if len(sys.argv) > 1 else "verify"
+    db_path = sys.argv[2] if len(sys.argv) > 2 else "Expense Tracker.db"
+    connector = sqlite3.connect(db_path)
+    try:
+        if command == "rebuild":
+            rebuild_ledger(connector)
+            print("Balances rebuilt.")
+        elif command == "verify":
+            drift = verify_ledger(connector)
+            for table, key, exp, act in drift[:20]:
+                print(f"Drift in {table} {key}: expected {exp}, found {act}")
+            print("Balances are consistent." if not drift else f"{len(drift)} row(s) drifted. Run 'python -m expense_tracker.core.ledger rebuild'.")
+            sys.exit(1 if drift else 0)
+        else:
+            print(f"Unknown command '{command}'. Use 'verify' or 'rebuild'.")
+            sys.exit(2)
+    finally:
+        connector.close()
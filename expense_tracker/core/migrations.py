@@ -0,0 +1,364 @@
+import datetime
+import sqlite3
+from .achievements import (DAYS_TABLE, STATE_TABLE, create_achievement_schema, drop_achievement_triggers,
+                           populate_state)
+from .budget_tracking import (ALERT_TABLE, SPENDING_TABLE, create_budget_tracking_schema, drop_alert_triggers,
+                              drop_spending_triggers, populate_spending)
+from .fts_search import FTS_TABLE, FTS_COLUMNS, fts5_supported, create_search_triggers
+from .ledger import ACCOUNT_TABLE, CASH_FLOW_TABLE, create_ledger_schema, drop_ledger_triggers, populate_ledger
+from .rollups import ROLLUP_TABLE, create_rollup_schema, drop_rollup_triggers, populate_rollup
+from .tags import create_tag_schema, link_rows_after
+
+# Day numbers in the DateDay column count days since 1970-01-01
+EPOCH_DATE = datetime.date(1970, 1, 1)
+
+
+def day_number(date_value):
+    """Converts a date, datetime or 'YYYY-MM-DD[ ...]' string to the integer day stored in DateDay.
+       Returns None if the value can't be parsed."""
+    if isinstance(date_value, datetime.datetime):
+        date_value = date_value.date()
+    elif isinstance(date_value, str):
+        try:
+            date_value = datetime.datetime.strptime(date_value.strip()[:10], '%Y-%m-%d').date()
+        except ValueError:
+            return None
+    if not isinstance(date_value, datetime.date):
+        return None
+    return (date_value - EPOCH_DATE).days
+
+
+# --- Migrations ---
+# Each migration brings the schema from version N-1 to N, where N is its
+# position in MIGRATIONS (1-based). The current version lives in PRAGMA user_version.
+
+def _create_base_schema(connector):
+    """Version 1: the original tables. Uses IF NOT EXISTS so databases created
+       before versioning was introduced are adopted as-is."""
+    connector.execute(
+        '''CREATE TABLE IF NOT EXISTS ExpenseTracker (
+            ID INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL,
+            Date DATETIME,
+            Payee TEXT,
+            Description TEXT,
+            Amount FLOAT,
+            ModeOfPayment TEXT,
+            Category TEXT,
+            Tags TEXT
+        )'''
+    )
+    # Budget Table
+    connector.execute(
+        '''CREATE TABLE IF NOT EXISTS Budgets (
+            ID INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL,
+            Category TEXT NOT NULL,
+            Amount FLOAT NOT NULL,
+            Period TEXT NOT NULL UNIQUE -- e.g., "YYYY-MM" for monthly budgets
+        )'''
+    )
+    # Saved Report Templates
+    connector.execute(
+        '''CREATE TABLE IF NOT EXISTS ReportTemplates (
+            ID INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL,
+            Name TEXT NOT NULL UNIQUE,
+            SearchTerm TEXT,
+            FilterDateRange TEXT,
+            CustomStartDate TEXT,
+            CustomEndDate TEXT,
+            FilterMoP TEXT,
+            FilterCategory TEXT
+        )'''
+    )
+    # Achievements
+    connector.execute(
+        '''CREATE TABLE IF NOT EXISTS Achievements (
+            ID INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL,
+            Name TEXT NOT NULL UNIQUE,
+            Description TEXT,
+            AchievedDate DATETIME
+        )'''
+    )
+
+
+def _add_date_day_and_indexes(connector):
+    """Version 2: normalizes Date to 'YYYY-MM-DD', adds the integer DateDay column
+       and the indexes used by the filters and sortable columns."""
+    # Older rows may carry a time part; the app only ever deals in whole days
+    connector.execute(
+        "UPDATE ExpenseTracker SET Date = substr(Date, 1, 10) "
+        "WHERE length(Date) > 10 AND date(substr(Date, 1, 10)) IS NOT NULL"
+    )
+    # Virtual generated column: costs nothing to store and can never drift from Date
+    connector.execute(
+        "ALTER TABLE ExpenseTracker ADD COLUMN DateDay INTEGER "
+        "GENERATED ALWAYS AS (CAST(julianday(substr(Date, 1, 10)) - 2440587.5 AS INTEGER)) VIRTUAL"
+    )
+    connector.execute("CREATE INDEX IF NOT EXISTS idx_expense_day_category ON ExpenseTracker (DateDay, Category)")
+    connector.execute("CREATE INDEX IF NOT EXISTS idx_expense_category_day ON ExpenseTracker (Category, DateDay)")
+    connector.execute("CREATE INDEX IF NOT EXISTS idx_expense_mop_day ON ExpenseTracker (ModeOfPayment, DateDay)")
+    # Sort indexes for the keyset-paginated table (the rowid is implicitly the tie-breaker)
+    connector.execute("CREATE INDEX IF NOT EXISTS idx_expense_date ON ExpenseTracker (Date)")
+    connector.execute("CREATE INDEX IF NOT EXISTS idx_expense_amount ON ExpenseTracker (Amount)")
+    connector.execute("CREATE INDEX IF NOT EXISTS idx_expense_payee ON ExpenseTracker (Payee)")
+
+
+def _add_full_text_search(connector):
+    """Version 3: FTS5 index over the text columns, kept in sync by triggers.
+       Skipped on SQLite builds without FTS5; search then falls back to LIKE."""
+    if not fts5_supported(connector):
+        print("SQLite was built without FTS5. Full-text search index not created.")
+        return
+    columns = ", ".join(FTS_COLUMNS)
+    # prefix='2 3' keeps short prefix queries (e.g. 'sta*') on the index instead of scanning terms
+    connector.execute(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5({columns}, "
+        f"content='ExpenseTracker', content_rowid='ID', tokenize='unicode61', prefix='2 3')"
+    )
+    create_search_triggers(connector)
+    # Index the rows that already exist
+    connector.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+
+def _add_spending_rollup(connector):
+    """Version 4: the ExpenseRollup table (see rollups.py), filled from the existing rows."""
+    create_rollup_schema(connector)
+    populate_rollup(connector)
+
+
+def _add_nocase_indexes(connector):
+    """Version 5: NOCASE indexes for case-insensitive whole-value searches like
+       'payee:=uber' (see query_builder.py); they also serve LIKE 'prefix%'."""
+    connector.execute("CREATE INDEX IF NOT EXISTS idx_expense_payee_nocase ON ExpenseTracker (Payee COLLATE NOCASE)")
+    connector.execute("CREATE INDEX IF NOT EXISTS idx_expense_category_nocase ON ExpenseTracker (Category COLLATE NOCASE)")
+
+
+def _add_tag_tables(connector):
+    """Version 6: the Tags / ExpenseTags junction (see tags.py), filled from the Tags column."""
+    create_tag_schema(connector)
+    link_rows_after(connector, 0)
+
+
+def _add_users_and_income(connector):
+    """Version 7: the tables that lived in the other database files, so one file holds
+       everything: users (the login screen's table, same columns) and Income.
+       consolidate.py copies the old files' rows in."""
+    connector.execute(
+        '''CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            email TEXT UNIQUE NOT NULL,
+            password TEXT NOT NULL,
+            marital_status TEXT NOT NULL,
+            role TEXT
+        )'''
+    )
+    connector.execute(
+        '''CREATE TABLE IF NOT EXISTS Income (
+            ID INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL,
+            Date DATETIME,
+            Source TEXT,
+            Description TEXT,
+            Amount FLOAT,
+            Category TEXT,
+            DateDay INTEGER GENERATED ALWAYS AS (CAST(julianday(substr(Date, 1, 10)) - 2440587.5 AS INTEGER)) VIRTUAL
+        )'''
+    )
+    connector.execute("CREATE INDEX IF NOT EXISTS idx_income_day ON Income (DateDay)")
+
+
+def _add_ledger(connector):
+    """Version 8: accounts on Income, the Transfers table and the running balance
+       tables (see ledger.py), filled from the existing rows."""
+    connector.execute("ALTER TABLE Income ADD COLUMN Account TEXT")
+    create_ledger_schema(connector)
+    populate_ledger(connector)
+
+
+def _add_budget_tracking(connector):
+    """Version 9: Budgets keyed on (Category, Period) instead of Period alone, so a
+       month can have a budget per category, with a Recurring flag; plus the
+       MonthlySpending and BudgetAlerts tables (see budget_tracking.py). Alerts
+       start from here on; the existing spending doesn't raise any."""
+    connector.execute(
+        '''CREATE TABLE Budgets_new (
+            ID INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL,
+            Category TEXT NOT NULL COLLATE NOCASE,
+            Amount FLOAT NOT NULL,
+            Period TEXT NOT NULL, -- "YYYY-MM": the month, or the first month of a recurring budget
+            Recurring INTEGER NOT NULL DEFAULT 0, -- 1: also applies to later months without their own budget
+            UNIQUE (Category, Period)
+        )'''
+    )
+    connector.execute("INSERT INTO Budgets_new (ID, Category, Amount, Period) SELECT ID, Category, Amount, Period FROM Budgets")
+    connector.execute("DROP TABLE Budgets")
+    connector.execute("ALTER TABLE Budgets_new RENAME TO Budgets")
+    create_budget_tracking_schema(connector)
+    populate_spending(connector)
+
+
+def _add_achievement_state(connector):
+    """Version 10: the expense/budget counters and the ExpenseDays table that
+       achievements are checked against (see achievements.py)."""
+    create_achievement_schema(connector)
+    populate_state(connector)
+
+
+def _add_user_email_index(connector):
+    """Version 11: NOCASE index for the login lookup (see auth.py); emails compare
+       without case, as consolidate.py's merge of the old user tables already does."""
+    connector.execute("CREATE INDEX IF NOT EXISTS idx_users_email_nocase ON users (email COLLATE NOCASE)")
+
+
+
+# Indexes replaced in version 12 by ones leading with UserID
+_UNPARTITIONED_INDEXES = ('idx_expense_day_category', 'idx_expense_category_day', 'idx_expense_mop_day', 'idx_expense_date',
+                          'idx_expense_amount', 'idx_expense_payee', 'idx_expense_payee_nocase', 'idx_expense_category_nocase')
+
+
+def _add_user_partitioning(connector):
+    """Version 12: the UserID column on ExpenseTracker (see partitions.py), with every
+       index leading with it, and the rollup rebuilt with UserID in its key. If the
+       database has exactly one account, the existing expenses are given to it; otherwise
+       they stay unowned (0) until an account adopts them."""
+    connector.execute("ALTER TABLE ExpenseTracker ADD COLUMN UserID INTEGER NOT NULL DEFAULT 0")
+    connector.execute("UPDATE ExpenseTracker SET UserID = (SELECT MIN(id) FROM users) "
+                      "WHERE (SELECT COUNT(*) FROM users) = 1")
+    for index in _UNPARTITIONED_INDEXES:
+        connector.execute(f"DROP INDEX IF EXISTS {index}")
+    # The plain UserID index keeps a user's rows in ID order (the table's default sort)
+    connector.execute("CREATE INDEX IF NOT EXISTS idx_expense_user ON ExpenseTracker (UserID)")
+    connector.execute("CREATE INDEX IF NOT EXISTS idx_expense_user_day_category ON ExpenseTracker (UserID, DateDay, Category)")
+    connector.execute("CREATE INDEX IF NOT EXISTS idx_expense_user_category_day ON ExpenseTracker (UserID, Category, DateDay)")
+    connector.execute("CREATE INDEX IF NOT EXISTS idx_expense_user_mop_day ON ExpenseTracker (UserID, ModeOfPayment, DateDay)")
+    connector.execute("CREATE INDEX IF NOT EXISTS idx_expense_user_date ON ExpenseTracker (UserID, Date)")
+    connector.execute("CREATE INDEX IF NOT EXISTS idx_expense_user_amount ON ExpenseTracker (UserID, Amount)")
+    connector.execute("CREATE INDEX IF NOT EXISTS idx_expense_user_payee ON ExpenseTracker (UserID, Payee)")
+    connector.execute("CREATE INDEX IF NOT EXISTS idx_expense_user_payee_nocase ON ExpenseTracker (UserID, Payee COLLATE NOCASE)")
+    connector.execute("CREATE INDEX IF NOT EXISTS idx_expense_user_category_nocase ON ExpenseTracker (UserID, Category COLLATE NOCASE)")
+    drop_rollup_triggers(connector)
+    connector.execute(f"DROP TABLE IF EXISTS {ROLLUP_TABLE}")
+    create_rollup_schema(connector)
+    populate_rollup(connector)
+
+
+# Tables version 13 rebuilds with UserID in their unique keys
+_PARTITIONED_TABLES = {
+    'Budgets': '''
+        ID INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL,
+        Category TEXT NOT NULL COLLATE NOCASE,
+        Amount FLOAT NOT NULL,
+        Period TEXT NOT NULL, -- "YYYY-MM": the month, or the first month of a recurring budget
+        Recurring INTEGER NOT NULL DEFAULT 0, -- 1: also applies to later months without their own budget
+        UserID INTEGER NOT NULL DEFAULT 0,
+        UNIQUE (UserID, Category, Period)''',
+    'Achievements': '''
+        ID INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL,
+        Name TEXT NOT NULL,
+        Description TEXT,
+        AchievedDate DATETIME,
+        UserID INTEGER NOT NULL DEFAULT 0,
+        UNIQUE (UserID, Name)''',
+    'ReportTemplates': '''
+        ID INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL,
+        Name TEXT NOT NULL,
+        SearchTerm TEXT,
+        FilterDateRange TEXT,
+        CustomStartDate TEXT,
+        CustomEndDate TEXT,
+        FilterMoP TEXT,
+        FilterCategory TEXT,
+        UserID INTEGER NOT NULL DEFAULT 0,
+        UNIQUE (UserID, Name)''',
+}
+
+
+def _key_entries_by_user(connector):
+    """Version 13: a UserID on the rest of the tables holding an account's entries
+       (Income, Transfers, Budgets, Achievements, ReportTemplates), and the rollup,
+       ledger, monthly spending, alert and achievement tables rebuilt keyed by user, so
+       each account gets its own totals, balances, alerts and achievements. As in
+       version 12, a database with exactly one account gives the rows to it; otherwise
+       they stay unowned until an account adopts them."""
+    owner = connector.execute("SELECT CASE WHEN COUNT(*) = 1 THEN MIN(id) ELSE 0 END FROM users").fetchone()[0]
+    # The old triggers post to the old tables; they're recreated with the new ones below
+    for drop_triggers in (drop_rollup_triggers, drop_ledger_triggers, drop_spending_triggers, drop_alert_triggers,
+                          drop_achievement_triggers):
+        drop_triggers(connector)
+    for table in ('Income', 'Transfers'):
+        connector.execute(f"ALTER TABLE {table} ADD COLUMN UserID INTEGER NOT NULL DEFAULT 0")
+        if owner:
+            connector.execute(f"UPDATE {table} SET UserID = ?", (owner,))
+    # The rebuilt tables' UNIQUE keys lead with UserID, so they index each user's rows
+    for table, columns in _PARTITIONED_TABLES.items():
+        copied = ", ".join(row[1] for row in connector.execute(f"PRAGMA table_info({table})"))
+        connector.execute(f"CREATE TABLE {table}_new ({columns})")
+        connector.execute(f"INSERT INTO {table}_new ({copied}, UserID) SELECT {copied}, ? FROM {table}", (owner,))
+        connector.execute(f"DROP TABLE {table}")
+        connector.execute(f"ALTER TABLE {table}_new RENAME TO {table}")
+    connector.execute("DROP INDEX IF EXISTS idx_income_day")
+    connector.execute("CREATE INDEX IF NOT EXISTS idx_income_user_day ON Income (UserID, DateDay)")
+
+    # Alerts can't be recomputed (they record when they were raised and seen), so they're carried over
+    connector.execute(f"CREATE TEMP TABLE OldAlerts AS SELECT Category, Month, Threshold, Spent, Budget, RaisedAt, Seen "
+                      f"FROM {ALERT_TABLE}")
+    for table in (ROLLUP_TABLE, CASH_FLOW_TABLE, ACCOUNT_TABLE, SPENDING_TABLE, ALERT_TABLE, STATE_TABLE, DAYS_TABLE):
+        connector.execute(f"DROP TABLE IF EXISTS {table}")
+    create_rollup_schema(connector)
+    populate_rollup(connector)
+    create_ledger_schema(connector)
+    populate_ledger(connector)
+    create_budget_tracking_schema(connector)
+    populate_spending(connector)
+    connector.execute(f"INSERT INTO {ALERT_TABLE} (UserID, Category, Month, Threshold, Spent, Budget, RaisedAt, Seen) "
+                      "SELECT ?, * FROM temp.OldAlerts", (owner,))
+    connector.execute("DROP TABLE temp.OldAlerts")
+    create_achievement_schema(connector)
+    populate_state(connector)
+
+
+MIGRATIONS = [
+    _create_base_schema,
+    _add_date_day_and_indexes,
+    _add_full_text_search,
+    _add_spending_rollup,
+    _add_nocase_indexes,
+    _add_tag_tables,
+    _add_users_and_income,
+    _add_ledger,
+    _add_budget_tracking,
+    _add_achievement_state,
+    _add_user_email_index,
+    _add_user_partitioning,
+    _key_entries_by_user,
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def get_schema_version(connector):
+    return connector.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(connector):
+    """Applies all pending migrations, each in its own transaction.
+       Returns the schema version the database ended up at."""
+    version = get_schema_version(connector)
+    if version > SCHEMA_VERSION:
+        raise sqlite3.DatabaseError(
+            f"Database schema version {version} is newer than this app supports ({SCHEMA_VERSION}).")
+
+    if connector.in_transaction:
+        connector.commit()
+    for target_version in range(version + 1, SCHEMA_VERSION + 1):
+        connector.execute("BEGIN")
+        try:
+            MIGRATIONS[target_version - 1](connector)
+            connector.execute(f"PRAGMA user_version = {target_version}")
+            connector.commit()
+        except sqlite3.Error:
+            connector.rollback()
+            raise
+    if version < SCHEMA_VERSION:
+        # Refresh planner statistics once the new indexes exist
+        connector.execute("ANALYZE")
+        connector.commit()
+    return SCHEMA_VERSION
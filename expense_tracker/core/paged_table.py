@@ -0,0 +1,96 @@
+# Columns shown in the expense table, in display order
+EXPENSE_COLUMNS = ('ID', 'Date', 'Payee', 'Description', 'Amount', 'ModeOfPayment', 'Category', 'Tags')
+
+
+class ExpensePager:
+    """Reads a filtered expense query one page at a time using keyset pagination.
+
+    Rows are ordered by (sort_column, ID) so every page can resume from the last
+    key seen instead of using OFFSET, which would rescan all the skipped rows.
+    """
+
+    def __init__(self, connector, where_sql, params, sort_column='ID', sort_direction='ASC', page_size=100):
+        self.connector = connector
+        self.where_sql = where_sql or ''
+        self.params = tuple(params or ())
+        self.sort_column = sort_column if sort_column in EXPENSE_COLUMNS else 'ID'
+        self.sort_direction = 'DESC' if str(sort_direction).upper() == 'DESC' else 'ASC'
+        self.page_size = page_size
+        self.last_key = None # (sort value, ID) of the last row handed out
+        self.exhausted = False
+        self.rows_loaded = 0
+
+    def aggregates(self):
+        """Returns (row count, total amount) for the whole filtered set."""
+        query = f"SELECT COUNT(*), COALESCE(SUM(Amount), 0) FROM ExpenseTracker{self._where()}"
+        count, total = self.connector.execute(query, self.params).fetchone()
+        return count, float(total or 0)
+
+    def next_page(self, limit=None):
+        """Fetches the next page of rows, or an empty list once everything is loaded."""
+        if self.exhausted:
+            return []
+        limit = limit or self.page_size
+        conditions, params = self._keyset_condition()
+        where = self._where(conditions)
+        col = f'"{self.sort_column}"'
+        order = f" ORDER BY {col} {self.sort_direction}" if self.sort_column != 'ID' else ""
+        order = (order + ", " if order else " ORDER BY ") + f"ID {self.sort_direction}"
+        query = f"SELECT {', '.join(EXPENSE_COLUMNS)} FROM ExpenseTracker{where}{order} LIMIT ?"
+        rows = self.connector.execute(query, self.params + tuple(params) + (limit,)).fetchall()
+
+        if len(rows) < limit:
+            self.exhausted = True
+        if rows:
+            last = rows[-1]
+            self.last_key = (last[EXPENSE_COLUMNS.index(self.sort_column)], last[0])
+            self.rows_loaded += len(rows)
+        return rows
+
+    def _where(self, extra_conditions=None):
+        parts = []
+        if self.where_sql:
+            parts.append(f"({self.where_sql})")
+        if extra_conditions:
+            parts.append(f"({extra_conditions})")
+        return " WHERE " + " AND ".join(parts) if parts else ""
+
+    def _keyset_condition(self):
+        """Builds the 'after the last row' condition for the current sort order.
+
+        SQLite sorts NULLs first in ascending order and last in descending order,
+        so a NULL sort value needs its own branch.
+        """
+        if self.last_key is None:
+            return None, []
+        value, last_id = self.last_key
+        cmp = '>' if self.sort_direction == 'ASC' else '<'
+        if self.sort_column == 'ID':
+            return f"ID {cmp} ?", [last_id]
+
+        col = f'"{self.sort_column}"'
+        if value is None:
+            if self.sort_direction == 'ASC':
+                return f"({col} IS NULL AND ID > ?) OR {col} IS NOT NULL", [last_id]
+            return f"{col} IS NULL AND ID < ?", [last_id]
+        condition = f"{col} {cmp} ? OR ({col} = ? AND ID {cmp} ?)"
+        if self.sort_direction == 'DESC':
+            condition += f" OR {col} IS NULL"
+        return condition, [value, value, last_id]
+
+
+class RowListPager:
+    """Pager over rows already in memory, with the same interface as ExpensePager."""
+
+    def __init__(self, rows, page_size=100, start=0):
+        self.rows = rows
+        self.page_size = page_size
+        self.rows_loaded = min(start, len(rows))
+        self.exhausted = self.rows_loaded >= len(rows)
+
+    def next_page(self, limit=None):
+        page = self.rows[self.rows_loaded:self.rows_loaded + (limit or self.page_size)]
+        self.rows_loaded += len(page)
+        self.exhausted = self.rows_loaded >= len(self.rows)
+        return page
+
@@ -0,0 +1,75 @@
+import os
+
+from .achievements import create_achievement_triggers, drop_achievement_triggers, populate_state
+from .budget_tracking import create_spending_triggers, drop_spending_triggers, populate_spending
+from .ledger import create_ledger_triggers, drop_ledger_triggers, populate_ledger
+from .query_cache import bump_generation
+from .rollups import UNOWNED, create_rollup_triggers, drop_rollup_triggers, populate_rollup
+
+# Per-user partitioning. Every row an account enters (expenses, income, transfers,
+# budgets, report templates) carries its UserID, and so does every table derived
+# from them: the rollup, the ledger balances, monthly spending and budget alerts,
+# and the achievement counters, streak days and earned achievements. Each account
+# therefore sees its own totals, balances, alerts and achievements only. Every
+# filter query_builder builds starts with "UserID = ?", and the indexes on
+# ExpenseTracker and ExpenseRollup all lead with UserID (see migrations.py), so a
+# query reads one user's rows rather than the whole household's. Rows entered
+# without logging in (main.py started directly, the CLI without --user) belong to
+# UNOWNED; the first account registered takes them over.
+#
+# With FILE_PER_USER_ENV=1 each account instead gets a database file of its own
+# next to the shared one, which then only holds the accounts. Turning the mode on
+# doesn't move existing rows out of the shared file.
+
+# Tables whose rows belong to an account, besides ExpenseTracker
+_OWNED_TABLES = ('Income', 'Transfers', 'Budgets', 'BudgetAlerts', 'Achievements', 'ReportTemplates')
+
+FILE_PER_USER_ENV = "EXPENSE_TRACKER_FILE_PER_USER" # Set to 1 for a database file per account
+
+
+def user_filter(user_id):
+    """(sql, params) condition restricting ExpenseTracker or ExpenseRollup to one user's rows."""
+    return "UserID = ?", (user_id or UNOWNED,)
+
+
+def file_per_user():
+    return os.environ.get(FILE_PER_USER_ENV) == "1"
+
+
+def database_path(shared_path, user_id):
+    """The file holding user_id's expenses: shared_path itself, or in file-per-user mode
+       a file beside it named after the account ('Expense Tracker.user7.db')."""
+    if not file_per_user() or not user_id:
+        return shared_path
+    root, extension = os.path.splitext(shared_path)
+    return f"{root}.user{int(user_id)}{extension or '.db'}"
+
+
+def adopt_unowned(connector, user_id):
+    """Gives the UNOWNED rows to user_id and commits. Returns how many expenses moved.
+       A budget, alert, achievement or template the account already has its own of stays
+       unowned. The derived tables are recomputed in one pass each instead of moving
+       the rows one by one through the triggers."""
+    if not connector.in_transaction:
+        connector.execute("BEGIN")
+    try:
+        for drop_triggers in (drop_rollup_triggers, drop_ledger_triggers, drop_spending_triggers, drop_achievement_triggers):
+            drop_triggers(connector)
+        moved = connector.execute("UPDATE ExpenseTracker SET UserID = ? WHERE UserID = ?", (user_id, UNOWNED)).rowcount
+        others = sum(connector.execute(f"UPDATE OR IGNORE {table} SET UserID = ? WHERE UserID = ?",
+                                       (user_id, UNOWNED)).rowcount for table in _OWNED_TABLES)
+        if moved or others:
+            populate_rollup(connector)
+            populate_ledger(connector)
+            populate_spending(connector)
+            populate_state(connector)
+        for create_triggers in (create_rollup_triggers, create_ledger_triggers, create_spending_triggers,
+                                create_achievement_triggers):
+            create_triggers(connector)
+        connector.commit()
+    except BaseException:
+        connector.rollback()
+        raise
+    for name in ('expenses', 'income', 'transfers', 'budgets'):
+        bump_generation(name)
+    return moved
@@ -0,0 +1,118 @@
+import base64
+import hashlib
+import hmac
+import os
+import re
+
+# Password hashes are stored as "<algorithm>$<parameters>$<salt>$<hash>", e.g.
+#
+#     scrypt$n=16384,r=8,p=1$<base64 salt>$<base64 hash>
+#     pbkdf2_sha256$i=600000$<base64 salt>$<base64 hash>
+#
+# so the cost can be raised later without breaking existing logins: a hash made with
+# other parameters (or a legacy unsalted SHA-256 hex digest) still verifies, and
+# needs_rehash() tells the login to store a new one.
+#
+# The cost is sized to the machine through COST_ENV, written like the first two
+# fields of a stored hash ("scrypt$n=32768,r=8,p=1"); benchmarks/bench_passwords.py
+# reports hashes per second for each setting. Both algorithms release the GIL.
+
+SCRYPT = 'scrypt'
+PBKDF2 = 'pbkdf2_sha256'
+DEFAULT_COST = "scrypt$n=16384,r=8,p=1" # About 16 MB and tens of ms per hash
+COST_ENV = "EXPENSE_TRACKER_PASSWORD_COST"
+SALT_BYTES = 16
+HASH_BYTES = 32
+
+_LEGACY_SHA256 = re.compile(r'[0-9a-f]{64}')
+_PARAMETER_NAMES = {SCRYPT: ('n', 'r', 'p'), PBKDF2: ('i',)}
+
+
+def parse_cost(cost):
+    """Splits "algorithm$k=v,..." into (algorithm, {k: int}); raises ValueError if malformed."""
+    algorithm, _, parameters = (cost or '').partition('$')
+    names = _PARAMETER_NAMES.get(algorithm)
+    if names is None:
+        raise ValueError(f"Unknown password hash algorithm '{algorithm}'. Use {SCRYPT} or {PBKDF2}.")
+    try:
+        values = {name: int(value) for name, value in (item.split('=') for item in parameters.split(','))}
+    except ValueError:
+        raise ValueError(f"Malformed password hash parameters '{parameters}'.")
+    if set(values) != set(names) or min(values.values()) < 1:
+        raise ValueError(f"{algorithm} needs positive {', '.join(names)}.")
+    if algorithm == SCRYPT and values['n'] & (values['n'] - 1):
+        raise ValueError("scrypt's n must be a power of 2.")
+    return algorithm, values
+
+
+def format_cost(algorithm, values):
+    return f"{algorithm}${','.join(f'{name}={values[name]}' for name in _PARAMETER_NAMES[algorithm])}"
+
+
+def current_cost():
+    """The cost new hashes are made with: COST_ENV if set, else DEFAULT_COST."""
+    return format_cost(*parse_cost(os.environ.get(COST_ENV) or DEFAULT_COST))
+
+
+def _derive(password, salt, algorithm, values):
+    secret = password.encode()
+    if algorithm == SCRYPT:
+        n, r, p = values['n'], values['r'], values['p']
+        # scrypt needs 128 * n * r bytes per lane; OpenSSL's default limit is 32 MB
+        return hashlib.scrypt(secret, salt=salt, n=n, r=r, p=p, maxmem=128 * n * r * p + 1024 * 1024,
+                              dklen=HASH_BYTES)
+    return hashlib.pbkdf2_hmac('sha256', secret, salt, values['i'], dklen=HASH_BYTES)
+
+
+def _b64(data):
+    return base64.b64encode(data).decode('ascii')
+
+
+def hash_password(password, cost=None):
+    """Returns the string to store for a password, with a new random salt."""
+    algorithm, values = parse_cost(cost or current_cost())
+    salt = os.urandom(SALT_BYTES)
+    return f"{format_cost(algorithm, values)}${_b64(salt)}${_b64(_derive(password, salt, algorithm, values))}"
+
+
+def is_legacy_hash(stored):
+    return bool(_LEGACY_SHA256.fullmatch(stored or ''))
+
+
+def is_password_hash(stored):
+    """True for anything verify_password() understands, legacy digests included."""
+    if is_legacy_hash(stored):
+        return True
+    try:
+        _split(stored)
+    except ValueError:
+        return False
+    return True
+
+
+def _split(stored):
+    algorithm, parameters, salt, digest = (stored or '').split('$')
+    algorithm, values = parse_cost(f"{algorithm}${parameters}")
+    return algorithm, values, base64.b64decode(salt, validate=True), base64.b64decode(digest, validate=True)
+
+
+def verify_password(password, stored):
+    """Checks a password against a stored hash of any supported format, in constant time."""
+    if is_legacy_hash(stored):
+        return hmac.compare_digest(hashlib.sha256(password.encode()).hexdigest(), stored)
+    try:
+        algorithm, values, salt, digest = _split(stored)
+    except ValueError: # Includes binascii.Error
+        return False
+    return hmac.compare_digest(_derive(password, salt, algorithm, values), digest)
+
+
+def needs_rehash(stored, cost=None):
+    """True if a stored hash is legacy or was made with a different cost than new ones get."""
+    if is_legacy_hash(stored):
+        return True
+    try:
+        algorithm, values, _, _ = _split(stored)
+    except ValueError:
+        return True
+    return format_cost(algorithm, values) != (format_cost(*parse_cost(cost)) if cost else current_cost())
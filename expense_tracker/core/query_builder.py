@@ -0,0 +1,374 @@
+import datetime
+import functools
+import operator
+import re
+import unicodedata
+
+from .fts_search import FTS_MATCH_CONDITION, FTS_TABLE, fts_column, match_phrase
+from .migrations import day_number
+from .paged_table import EXPENSE_COLUMNS
+from .partitions import UNOWNED, user_filter
+from .search_parser import TEXT_FIELDS, And, Between, Compare, Equals, Not, Or, Tag, Text, fold_case, number_value, parse
+from .tags import TAG_MATCH_CONDITION, split_tags
+
+# Builds SQL for the search box syntax and the filter dropdowns. Kept free of any
+# GUI imports so the desktop app and the command-line interface share it.
+# The search language itself is parsed by search_parser.py.
+
+GENERAL_LIKE_FIELDS = ['Payee', 'Description', 'Category', 'Tags', 'ModeOfPayment']
+FTS_EXCLUDE_CONDITION = f"ID NOT IN (SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH ?)"
+_COLUMN = {name.lower(): name for name in EXPENSE_COLUMNS}
+_TRUE = ('', ()) # Condition that matches every row
+
+
+def _like_contains(value):
+    """LIKE pattern (with ESCAPE '\\') matching value anywhere in the text."""
+    return '%' + re.sub(r'([\\%_])', r'\\\1', value) + '%'
+
+
+# --- Planner ---
+# Turns a search AST into a WHERE clause the indexes can serve:
+#  - text terms go to the FTS5 index; all full-text terms of an AND (including
+#    negated ones and whole OR groups of text) are combined into one MATCH
+#  - amount and date terms become plain comparisons or BETWEEN on Amount and the
+#    indexed DateDay column, never expressions wrapping the column
+#  - tag:x is an indexed lookup in the ExpenseTags junction (see tags.py)
+#  - case-insensitive matches use LIKE (which ignores ASCII case) and
+#    COLLATE NOCASE instead of LOWER(column), so NOCASE indexes apply
+# Without the FTS index (use_fts=False) text terms fall back to LIKE.
+
+def _fts_expression(node):
+    """MATCH expression for a subtree made only of full-text terms, or None."""
+    if isinstance(node, Text):
+        if node.field is None and number_value(node.value) is not None:
+            return None # Also an amount, which isn't in the text index
+        return match_phrase(node.value, column=fts_column(node.field) if node.field else None, prefix=not node.exact)
+    if isinstance(node, (And, Or)):
+        parts = [_fts_expression(child) for child in node.children]
+        if all(parts):
+            return "(" + f" {type(node).__name__.upper()} ".join(parts) + ")"
+    return None
+
+
+def _plan_text(node, use_fts):
+    amount = number_value(node.value) if node.field is None else None
+    if use_fts:
+        column = fts_column(node.field) if node.field else None
+        expression = match_phrase(node.value, column=column, prefix=not node.exact)
+        if expression is None:
+            return _TRUE # Nothing searchable, e.g. only punctuation
+        if amount is None:
+            return FTS_MATCH_CONDITION, (expression,)
+        return f"({FTS_MATCH_CONDITION} OR Amount = ?)", (expression, amount)
+
+    columns = [_COLUMN[node.field]] if node.field else GENERAL_LIKE_FIELDS
+    conditions = [f"{column} LIKE ? ESCAPE '\\'" for column in columns]
+    params = [_like_contains(node.value)] * len(columns)
+    if amount is not None:
+        conditions.append("Amount = ?")
+        params.append(amount)
+    sql = " OR ".join(conditions)
+    return (f"({sql})" if len(conditions) > 1 else sql), tuple(params)
+
+
+def _plan_and(children, use_fts):
+    """Returns the (sql, params) conditions of an AND, with its full-text terms merged into one MATCH."""
+    positive, negative, conditions = [], [], []
+    for child in children:
+        if use_fts:
+            expression = _fts_expression(child)
+            if expression:
+                positive.append(expression)
+                continue
+            if isinstance(child, Not):
+                expression = _fts_expression(child.child)
+                if expression:
+                    negative.append(expression)
+                    continue
+        conditions.append(_plan(child, use_fts))
+
+    if positive:
+        expression = " AND ".join(positive)
+        if negative:
+            expression = f"({expression}) NOT ({' OR '.join(negative)})"
+        conditions.insert(0, (FTS_MATCH_CONDITION, (expression,)))
+    else:
+        conditions[:0] = [(FTS_EXCLUDE_CONDITION, (expression,)) for expression in negative]
+    return [condition for condition in conditions if condition[0]]
+
+
+def _plan(node, use_fts):
+    """Returns (sql, params) for a search AST; sql is '' if the node matches every row."""
+    if isinstance(node, And):
+        conditions = _plan_and(node.children, use_fts)
+        if not conditions:
+            return _TRUE
+        if len(conditions) == 1:
+            return conditions[0]
+        return "(" + " AND ".join(sql for sql, _ in conditions) + ")", tuple(p for _, params in conditions for p in params)
+    if isinstance(node, Or):
+        # Full-text alternatives share one MATCH; the rest are OR-ed next to it
+        expressions, parts = [], []
+        for child in node.children:
+            expression = _fts_expression(child) if use_fts else None
+            amount = number_value(child.value) if isinstance(child, Text) and child.field is None else None
+            if expression:
+                expressions.append(expression)
+            elif use_fts and amount is not None:
+                expressions.append(match_phrase(child.value, prefix=not child.exact))
+                parts.append(("Amount = ?", (amount,)))
+            else:
+                parts.append(_plan(child, use_fts))
+        if expressions:
+            parts.insert(0, (FTS_MATCH_CONDITION, (" OR ".join(expressions),)))
+        if any(not sql for sql, _ in parts):
+            return _TRUE
+        if len(parts) == 1:
+            return parts[0]
+        return "(" + " OR ".join(sql for sql, _ in parts) + ")", tuple(p for _, params in parts for p in params)
+    if isinstance(node, Not):
+        expression = _fts_expression(node.child) if use_fts else None
+        if expression:
+            return FTS_EXCLUDE_CONDITION, (expression,)
+        sql, params = _plan(node.child, use_fts)
+        return (f"NOT ({sql})", params) if sql else ("0", ())
+    if isinstance(node, Text):
+        return _plan_text(node, use_fts)
+    if isinstance(node, Equals):
+        # Collation on the column side, matching the NOCASE indexes. (On the parameter side,
+        # SQLite 3.40 drops it when it rewrites 'a = ? OR a = ?' into an IN lookup.)
+        return f"{_COLUMN[node.field]} COLLATE NOCASE = ?", (node.value,)
+    if isinstance(node, Tag):
+        return TAG_MATCH_CONDITION, (node.name,)
+    if isinstance(node, Compare):
+        return f"{node.column} {node.op} ?", (node.value,)
+    if isinstance(node, Between):
+        return f"{node.column} BETWEEN ? AND ?", (node.low, node.high)
+    raise TypeError(f"Unknown search node: {node!r}")
+
+
+def plan_search(node, use_fts=True):
+    """Returns the list of AND-ed (sql, params) conditions for a parsed search (see search_parser.parse)."""
+    if node is None:
+        return []
+    if isinstance(node, And):
+        return _plan_and(node.children, use_fts)
+    condition = _plan(node, use_fts)
+    return [condition] if condition[0] else []
+
+
+def filter_day_range(filters):
+    """(first day, last day) as DateDay numbers for the date range dropdown in filters,
+       or None for "All Time". Raises ValueError for an invalid custom range."""
+    if not filters or not filters.get('date_range') or filters['date_range'] == "All Time":
+        return None
+    start_date_val, end_date_val = None, None
+    today = datetime.date.today()
+    if filters['date_range'] == "Today":
+        start_date_val = end_date_val = today
+    elif filters['date_range'] == "This Week":
+        start_date_val = today - datetime.timedelta(days=today.weekday())
+        end_date_val = start_date_val + datetime.timedelta(days=6)
+    elif filters['date_range'] == "This Month":
+        start_date_val = today.replace(day=1)
+        try:
+            end_date_val = (start_date_val + datetime.timedelta(days=32)).replace(day=1) - datetime.timedelta(days=1)
+        except ValueError: # Handles months like December
+            end_date_val = start_date_val.replace(month=12, day=31)
+
+    elif filters['date_range'] == "This Year":
+        start_date_val = today.replace(month=1, day=1)
+        end_date_val = today.replace(month=12, day=31)
+    elif filters['date_range'] == "Custom Range" and filters.get('custom_start') and filters.get('custom_end'):
+        try:
+            start_date_str = filters['custom_start']
+            end_date_str = filters['custom_end']
+            start_date_val = datetime.datetime.strptime(start_date_str, '%Y-%m-%d').date()
+            end_date_val = datetime.datetime.strptime(end_date_str, '%Y-%m-%d').date()
+        except ValueError:
+            raise ValueError("Custom date format is invalid. Please use YYYY-MM-DD.")
+
+    if start_date_val and end_date_val:
+        return day_number(start_date_val), day_number(end_date_val)
+    return None
+
+
+def build_filter_clause(search_term=None, filters=None, use_fts=True, user_id=UNOWNED):
+    """Builds the WHERE clause (without the keyword) and parameters for the given search and filters.
+       The search uses the search box language (see search_parser.py), e.g.
+       'category:food AND amount:>50' or 'uber OR ola -work'.
+       Pass use_fts=False for databases without the search index (plain LIKE matching).
+       The clause is always limited to user_id's expenses (see partitions.py).
+       Raises ValueError if the search or filters are invalid."""
+    user_sql, user_params = user_filter(user_id)
+    conditions = [user_sql]
+    params = list(user_params)
+
+    for sql, condition_params in plan_search(parse(search_term), use_fts):
+        conditions.append(sql)
+        params.extend(condition_params)
+
+    # Filters (existing logic)
+    if filters:
+        day_range = filter_day_range(filters)
+        if day_range:
+            conditions.append("DateDay BETWEEN ? AND ?")
+            params.extend(day_range)
+
+        if filters.get('mop') and filters['mop'] != "All":
+            conditions.append("ModeOfPayment = ?")
+            params.append(filters['mop'])
+        if filters.get('category') and filters['category'] != "All":
+            conditions.append("Category = ?")
+            params.append(filters['category'])
+
+    return " AND ".join(conditions), tuple(params)
+
+
+def build_query_and_params(search_term=None, filters=None, sort_column='ID', sort_direction='ASC', use_fts=True,
+                           user_id=UNOWNED):
+    """Helper function to build the SQL query and parameters for fetching expenses."""
+    where_sql, params = build_filter_clause(search_term, filters, use_fts, user_id)
+
+    query = f"SELECT {', '.join(EXPENSE_COLUMNS)} FROM ExpenseTracker"
+    if where_sql:
+        query += " WHERE " + where_sql
+
+    if sort_column not in EXPENSE_COLUMNS: sort_column = 'ID'
+    if sort_direction.upper() not in ['ASC', 'DESC']: sort_direction = 'ASC'
+    query += f' ORDER BY "{sort_column}" {sort_direction.upper()}'
+    
+    return query, params
+
+
+# --- In-memory matching ---
+# Evaluates a search AST against rows that are already loaded (in EXPENSE_COLUMNS
+# order), with the same meaning as the SQL planned above, down to SQL's NULL
+# handling: matchers return True, False or None (unknown). Used to refine a
+# cached result without going back to SQLite.
+
+_COMPARE = {'>=': operator.ge, '<=': operator.le, '>': operator.gt, '<': operator.lt, '=': operator.eq}
+_WORD = re.compile(r'[^\W_]+') # Runs of letters and digits, like FTS5's unicode61 tokenizer
+_POSITION = {name.lower(): i for i, name in enumerate(EXPENSE_COLUMNS)}
+_AMOUNT, _DATE, _TAGS = _POSITION['amount'], _POSITION['date'], _POSITION['tags']
+
+
+def _tokens(text):
+    text = str(text).lower()
+    if not text.isascii(): # unicode61 also folds diacritics ('café' matches 'cafe')
+        text = ''.join(ch for ch in unicodedata.normalize('NFKD', text) if not unicodedata.combining(ch))
+    return _WORD.findall(text)
+
+
+def _phrase_match(text, phrase, prefix=True):
+    """True if the tokens of phrase appear consecutively in text, the last one as a prefix
+       if prefix is set (what MATCH '"phrase" *' does)."""
+    if text is None:
+        return False
+    text = str(text)
+    if text.isascii() and phrase[-1] not in text.lower():
+        return False # Cheap pre-check: most rows don't contain the word at all
+    tokens = _tokens(text)
+    *head, last = phrase
+    for i in range(len(tokens) - len(head)):
+        if tokens[i:i + len(head)] == head and (tokens[i + len(head)].startswith(last) if prefix else tokens[i + len(head)] == last):
+            return True
+    return False
+
+
+def _any(results):
+    """SQL OR over True/False/None values."""
+    results = list(results)
+    return True if True in results else (None if None in results else False)
+
+
+def _all(results):
+    """SQL AND over True/False/None values."""
+    results = list(results)
+    return False if False in results else (None if None in results else True)
+
+
+_day_of = functools.lru_cache(maxsize=4096)(day_number) # Few distinct dates, many rows
+
+
+def _row_day(row):
+    return _day_of(row[_DATE]) if isinstance(row[_DATE], str) else None
+
+
+def _compile(node, use_fts):
+    """Returns a row -> True/False/None function for a search AST."""
+    if isinstance(node, And):
+        matchers = [_compile(child, use_fts) for child in node.children]
+        return lambda row: _all(match(row) for match in matchers)
+    if isinstance(node, Or):
+        matchers = [_compile(child, use_fts) for child in node.children]
+        return lambda row: _any(match(row) for match in matchers)
+    if isinstance(node, Not):
+        match = _compile(node.child, use_fts)
+        def match_not(row):
+            result = match(row)
+            return None if result is None else not result
+        return match_not
+
+    if isinstance(node, Text):
+        amount = number_value(node.value) if node.field is None else None
+        match_amount = lambda row: None if row[_AMOUNT] is None else row[_AMOUNT] == amount
+        if use_fts:
+            phrase = _tokens(node.value)
+            if not phrase:
+                return lambda row: True
+            columns = [_POSITION[node.field]] if node.field else [_POSITION[field] for field in TEXT_FIELDS]
+            match_text = lambda row: any(_phrase_match(row[i], phrase, not node.exact) for i in columns)
+            if amount is None:
+                return match_text
+            return lambda row: _any((match_text(row), match_amount(row)))
+        columns = [_POSITION[node.field]] if node.field else [_POSITION[field.lower()] for field in GENERAL_LIKE_FIELDS]
+        def match_like(row):
+            results = [None if row[i] is None else node.value in fold_case(str(row[i])) for i in columns]
+            if amount is not None:
+                results.append(match_amount(row))
+            return _any(results)
+        return match_like
+
+    if isinstance(node, Equals):
+        index = _POSITION[node.field]
+        return lambda row: None if row[index] is None else fold_case(str(row[index])) == node.value
+    if isinstance(node, Tag):
+        return lambda row: any(fold_case(tag) == node.name for tag in split_tags(row[_TAGS]))
+
+    value_of = (lambda row: row[_AMOUNT]) if node.column == 'Amount' else _row_day
+    if isinstance(node, Compare):
+        compare = _COMPARE[node.op]
+        def match_compare(row):
+            value = value_of(row)
+            return None if value is None else compare(value, node.value)
+        return match_compare
+    if isinstance(node, Between):
+        def match_between(row):
+            value = value_of(row)
+            return None if value is None else node.low <= value <= node.high
+        return match_between
+    raise TypeError(f"Unknown search node: {node!r}")
+
+
+def value_matcher(node, column, use_fts=True):
+    """value -> True/False/None: what a Text, Equals or Tag clause says about a row whose
+       column (an EXPENSE_COLUMNS name) holds value. A Text clause without a field is
+       judged on that column alone; its amount half is left to the caller."""
+    if isinstance(node, Text):
+        node = node._replace(field=column.lower())
+    match = _compile(node, use_fts)
+    row = [None] * len(EXPENSE_COLUMNS)
+    position = EXPENSE_COLUMNS.index(column)
+
+    def match_value(value):
+        row[position] = value
+        return match(row)
+    return match_value
+
+
+def row_matcher(clauses, use_fts=True):
+    """Returns a function telling whether a row matches all the given search clauses
+       (AST nodes, e.g. search_parser.conjuncts(parse(text)))."""
+    match = _compile(And(tuple(clauses)), use_fts)
+    return lambda row: match(row) is True
@@ -0,0 +1,92 @@
+import datetime
+from collections import OrderedDict
+
+from .search_parser import Text, conjuncts, number_value, parse
+
+# Write generation counters: every write path in this package bumps the counter
+# of the table it changed, so cached query results can tell they are stale.
+# They only see writes made through this process.
+_generations = {'expenses': 0, 'budgets': 0, 'income': 0, 'transfers': 0}
+
+
+def bump_generation(table):
+    _generations[table] += 1
+
+
+def generation(table='expenses'):
+    return _generations[table]
+
+
+def cache_key(search_term, filters, sort_column='ID', sort_direction='ASC'):
+    """Normalizes a search into a hashable key: (clauses, filters, sort, today).
+
+    Clauses are the top-level AND-ed parts of the parsed search (see search_parser),
+    so spacing and case don't matter. The date is part of the key because ranges
+    like "This Week" move with it. Raises ValueError if the search can't be parsed.
+    """
+    clauses = conjuncts(parse(search_term))
+    filters = filters or {}
+    date_range = filters.get('date_range') or "All Time"
+    custom = (filters.get('custom_start'), filters.get('custom_end')) if date_range == "Custom Range" else None
+    filter_key = (date_range, custom, filters.get('mop') or "All", filters.get('category') or "All")
+    return clauses, filter_key, (sort_column, str(sort_direction).upper()), datetime.date.today()
+
+
+def _narrows(old, new):
+    """True if clause new can only match rows that clause old matches: the same
+       text search with more characters typed."""
+    if new == old:
+        return True
+    if not (isinstance(old, Text) and isinstance(new, Text)):
+        return False
+    if old.field != new.field or old.exact or new.exact or not new.value.startswith(old.value):
+        return False
+    # A bare number also matches the Amount column exactly, so "1" -> "12" is not narrower
+    return old.field is not None or (number_value(old.value) is None and number_value(new.value) is None)
+
+
+def refinement(old_key, new_key):
+    """If every row matching new_key also matches old_key, returns the clauses of
+       new_key that still have to be checked against old_key's rows. Returns None
+       if new_key isn't a refinement (different filters or sort, or a wider search)."""
+    old_clauses, new_clauses = old_key[0], new_key[0]
+    if old_key[1:] != new_key[1:] or len(new_clauses) < len(old_clauses):
+        return None
+    if not old_clauses:
+        return list(new_clauses)
+    n = len(old_clauses)
+    if new_clauses[:n - 1] != old_clauses[:n - 1] or not _narrows(old_clauses[-1], new_clauses[n - 1]):
+        return None
+    changed = [] if new_clauses[n - 1] == old_clauses[-1] else [new_clauses[n - 1]]
+    return changed + list(new_clauses[n:])
+
+
+class QueryCache:
+    """Small LRU cache of query results. Each entry remembers the expenses write
+    generation it was computed at and is dropped once that generation has passed."""
+
+    def __init__(self, maxsize=32):
+        self.maxsize = maxsize
+        self._entries = OrderedDict() # key -> (generation, value)
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] != generation('expenses'):
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def put(self, key, value, at_generation):
+        """Stores value computed from data at at_generation (read it before running the query)."""
+        if at_generation != generation('expenses'):
+            return # Data changed while the query ran
+        self._entries[key] = (at_generation, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
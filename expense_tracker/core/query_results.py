@@ -0,0 +1,109 @@
+import copy
+
+from .migrations import day_number
+from .paged_table import EXPENSE_COLUMNS, ExpensePager, RowListPager
+from .query_builder import row_matcher
+from .rollups import ROLLUP_TABLE
+
+
+class ExpenseQueryResult:
+    """Everything the UI shows for one search/filter: a pager for the table rows and
+    the aggregates for the totals label and the charts.
+
+    The aggregates come from a single GROUP BY over (Category, month), so the
+    filter is evaluated once no matter how many views consume the result. When the
+    filter only touches DateDay, Category and ModeOfPayment (no search text) the
+    GROUP BY runs over the ExpenseRollup buckets instead of the expense rows.
+
+    Small results can be materialized (all rows kept in memory); a narrower
+    search can then be answered from those rows with refine().
+    """
+
+    def __init__(self, where_sql, params, sort_column='ID', sort_direction='ASC', page_size=100, from_rollup=False):
+        self.where_sql = where_sql
+        self.params = tuple(params)
+        self.sort_column = sort_column
+        self.sort_direction = sort_direction
+        self.page_size = page_size
+        self.from_rollup = from_rollup
+        self.pager = None
+        self.count = 0
+        self.total = 0.0
+        self.by_category = [] # [(category, amount)], largest first
+        self.by_month = [] # [('YYYY-MM', amount)], oldest first
+        self.rows = None # Every row, in sort order, once materialized
+
+    def load(self, connector):
+        where = f" WHERE {self.where_sql}" if self.where_sql else ""
+        # Rows with an unparseable date still count towards the totals, but not towards any month
+        if self.from_rollup:
+            query = (f"SELECT Category, Month, SUM(Count), SUM(Total) FROM {ROLLUP_TABLE}{where} "
+                     "GROUP BY Category, Month")
+        else:
+            query = (
+                "SELECT Category, CASE WHEN DateDay IS NULL THEN NULL ELSE substr(Date, 1, 7) END AS Month, "
+                f"COUNT(*), COALESCE(SUM(Amount), 0) FROM ExpenseTracker{where} GROUP BY Category, Month"
+            )
+        self._aggregate(connector.execute(query, self.params))
+        self.pager = ExpensePager(connector, self.where_sql, self.params, self.sort_column,
+                                  self.sort_direction, page_size=self.page_size)
+        return self
+
+    def _aggregate(self, groups):
+        """Sets count, total, by_category and by_month from (category, month, count, amount) groups."""
+        categories = {}
+        months = {}
+        for category, month, count, amount in groups:
+            amount = float(amount or 0)
+            self.count += count
+            self.total += amount
+            category = category or "Uncategorized"
+            categories[category] = categories.get(category, 0.0) + amount
+            if month:
+                months[month] = months.get(month, 0.0) + amount
+
+        self.by_category = sorted(categories.items(), key=lambda item: item[1], reverse=True)
+        self.by_month = sorted(months.items())
+
+    def materialize(self, max_rows):
+        """Loads every row into memory if there are at most max_rows. Returns True if it did."""
+        if self.rows is None:
+            if self.count > max_rows or self.pager.rows_loaded:
+                return False
+            self.rows = self.pager.next_page(self.count + 1)
+            self.pager = RowListPager(self.rows, self.page_size)
+        return True
+
+    def refine(self, clauses, use_fts=True):
+        """Returns a new, materialized result holding the rows of this one that also match
+           the extra search clauses (see query_builder.row_matcher). No database access."""
+        match = row_matcher(clauses, use_fts)
+        refined = ExpenseQueryResult(self.where_sql, self.params, self.sort_column, self.sort_direction, self.page_size)
+        refined.rows = [row for row in self.rows if match(row)]
+        refined._aggregate(
+            (row[6], row[1][:7] if isinstance(row[1], str) and day_number(row[1]) is not None else None, 1, row[4])
+            for row in refined.rows)
+        refined.pager = RowListPager(refined.rows, self.page_size)
+        return refined
+
+    def restart(self, first_rows):
+        """Returns a copy whose pager continues after first_rows, for showing a cached result again."""
+        again = copy.copy(self)
+        if self.rows is not None:
+            again.pager = RowListPager(self.rows, self.page_size, start=len(first_rows))
+        else:
+            pager = self.pager
+            again.pager = ExpensePager(pager.connector, pager.where_sql, pager.params, pager.sort_column,
+                                       pager.sort_direction, pager.page_size)
+            if first_rows:
+                last = first_rows[-1]
+                again.pager.last_key = (last[EXPENSE_COLUMNS.index(pager.sort_column)], last[0])
+                again.pager.rows_loaded = len(first_rows)
+            again.pager.exhausted = len(first_rows) >= self.count
+        return again
+
+
+def run_expense_query(connector, where_sql, params, sort_column='ID', sort_direction='ASC', page_size=100, from_rollup=False):
+    """Runs the aggregate query for a filter and returns a loaded ExpenseQueryResult.
+       Pass from_rollup=True only if where_sql uses no columns besides DateDay, Category and ModeOfPayment."""
+    return ExpenseQueryResult(where_sql, params, sort_column, sort_direction, page_size, from_rollup).load(connector)
@@ -0,0 +1,39 @@
+from .migrations import day_number
+from .partitions import UNOWNED
+from .rollups import ROLLUP_TABLE
+from .tags import EXPENSE_TAG_TABLE, TAG_TABLE
+
+
+def spending_by_category(connector, start_date, end_date, user_id=UNOWNED):
+    """Returns [(category, total)] for user_id's expenses dated start_date..end_date (inclusive)."""
+    return connector.execute(
+        f"SELECT Category, SUM(Total) FROM {ROLLUP_TABLE} WHERE UserID = ? AND DateDay BETWEEN ? AND ? GROUP BY Category",
+        (user_id, day_number(start_date), day_number(end_date))).fetchall()
+
+
+def total_spending(connector, start_date, end_date, user_id=UNOWNED):
+    row = connector.execute(f"SELECT SUM(Total) FROM {ROLLUP_TABLE} WHERE UserID = ? AND DateDay BETWEEN ? AND ?",
+                            (user_id, day_number(start_date), day_number(end_date))).fetchone()
+    return row[0] or 0.0
+
+
+def spending_by_tag(connector, where_sql='', params=()):
+    """Returns [(tag, count, total)] over the expenses matching where_sql (as built by
+       query_builder.build_filter_clause), largest total first. An expense with several
+       tags counts towards each of them."""
+    where = f" WHERE {where_sql}" if where_sql else ""
+    return connector.execute(
+        f"SELECT t.Name, COUNT(*), COALESCE(SUM(e.Amount), 0) AS Total "
+        f"FROM (SELECT ID, Amount FROM ExpenseTracker{where}) AS e "
+        f"JOIN {EXPENSE_TAG_TABLE} AS et ON et.ExpenseID = e.ID JOIN {TAG_TABLE} AS t ON t.ID = et.TagID "
+        "GROUP BY et.TagID ORDER BY Total DESC", tuple(params)).fetchall()
+
+
+def expense_report_lines(expenses):
+    """Yields the report one line at a time, so large reports can be streamed to a file."""
+    yield "Expense Report\n----------------\n"
+    for expense in expenses:
+        yield f"{expense[1]} - ₹{expense[2]} ({expense[3]}) on {expense[4]}\n"
+
+def generate_expense_report(expenses):
+    return "".join(expense_report_lines(expenses))
@@ -0,0 +1,121 @@
+import datetime
+
+from .partitions import UNOWNED
+from .query_cache import bump_generation
+
+# Write paths for expenses, shared by the desktop app and the command-line
+# interface. Functions validate their input, raise ValueError for bad values
+# and commit on success; sqlite3 errors are left to the caller. Writes only
+# ever touch the given user's rows (see partitions.py).
+
+
+def _expense_values(date, payee, description, amount, mode_of_payment, category, tags):
+    if isinstance(date, (datetime.date, datetime.datetime)):
+        date = date.strftime('%Y-%m-%d')
+    else:
+        try:
+            date = datetime.datetime.strptime(str(date).strip(), '%Y-%m-%d').strftime('%Y-%m-%d')
+        except ValueError:
+            raise ValueError("Date must be in YYYY-MM-DD format.")
+    if not payee or not description or not mode_of_payment or not category:
+        raise ValueError("Fill all mandatory fields (Date, Payee, Description, Amount, MoP, Category).")
+    try:
+        amount = float(amount)
+    except (TypeError, ValueError):
+        raise ValueError("Enter a valid number for amount.")
+    if amount < 0:
+        raise ValueError("Amount cannot be negative.")
+    return (date, payee, description, amount, mode_of_payment, category, tags or '')
+
+
+def add_expense(connector, date, payee, description, amount, mode_of_payment, category, tags='', user_id=UNOWNED):
+    """Inserts one expense for user_id and returns its ID."""
+    values = _expense_values(date, payee, description, amount, mode_of_payment, category, tags)
+    cursor = connector.execute(
+        'INSERT INTO ExpenseTracker (Date, Payee, Description, Amount, ModeOfPayment, Category, Tags, UserID) '
+        'VALUES (?, ?, ?, ?, ?, ?, ?, ?)', values + (user_id,))
+    connector.commit()
+    bump_generation('expenses')
+    return cursor.lastrowid
+
+
+def update_expense(connector, expense_id, date, payee, description, amount, mode_of_payment, category, tags='',
+                   user_id=UNOWNED):
+    values = _expense_values(date, payee, description, amount, mode_of_payment, category, tags)
+    connector.execute(
+        'UPDATE ExpenseTracker SET Date=?, Payee=?, Description=?, Amount=?, ModeOfPayment=?, Category=?, Tags=? '
+        'WHERE ID=? AND UserID=?', values + (expense_id, user_id))
+    connector.commit()
+    bump_generation('expenses')
+
+
+def delete_expense(connector, expense_id, user_id=UNOWNED):
+    connector.execute('DELETE FROM ExpenseTracker WHERE ID=? AND UserID=?', (expense_id, user_id))
+    connector.commit()
+    bump_generation('expenses')
+
+
+def delete_all_expenses(connector, user_id=UNOWNED):
+    """Deletes every expense of user_id; other users' rows are left alone."""
+    connector.execute('DELETE FROM ExpenseTracker WHERE UserID=?', (user_id,))
+    connector.commit()
+    bump_generation('expenses')
+
+
+# --- Income and transfers ---
+
+def _ledger_date(date):
+    if isinstance(date, (datetime.date, datetime.datetime)):
+        return date.strftime('%Y-%m-%d')
+    try:
+        return datetime.datetime.strptime(str(date).strip(), '%Y-%m-%d').strftime('%Y-%m-%d')
+    except ValueError:
+        raise ValueError("Date must be in YYYY-MM-DD format.")
+
+
+def _ledger_amount(amount):
+    try:
+        amount = float(amount)
+    except (TypeError, ValueError):
+        raise ValueError("Enter a valid number for amount.")
+    if amount <= 0:
+        raise ValueError("Amount must be greater than zero.")
+    return amount
+
+
+def add_income(connector, date, source, amount, category, account='', description='', user_id=UNOWNED):
+    """Inserts one income entry for user_id and returns its ID."""
+    if not source or not category:
+        raise ValueError("Fill all mandatory fields (Date, Source, Amount, Category).")
+    cursor = connector.execute(
+        'INSERT INTO Income (Date, Source, Description, Amount, Category, Account, UserID) VALUES (?, ?, ?, ?, ?, ?, ?)',
+        (_ledger_date(date), source, description, _ledger_amount(amount), category, account or '', user_id))
+    connector.commit()
+    bump_generation('income')
+    return cursor.lastrowid
+
+
+def delete_income(connector, income_id, user_id=UNOWNED):
+    connector.execute('DELETE FROM Income WHERE ID=? AND UserID=?', (income_id, user_id))
+    connector.commit()
+    bump_generation('income')
+
+
+def add_transfer(connector, date, from_account, to_account, amount, description='', user_id=UNOWNED):
+    """Records money user_id moved between two of their accounts and returns its ID."""
+    if not from_account or not to_account:
+        raise ValueError("Enter both the account the money leaves and the one it goes to.")
+    if from_account == to_account:
+        raise ValueError("A transfer needs two different accounts.")
+    cursor = connector.execute(
+        'INSERT INTO Transfers (Date, FromAccount, ToAccount, Amount, Description, UserID) VALUES (?, ?, ?, ?, ?, ?)',
+        (_ledger_date(date), from_account, to_account, _ledger_amount(amount), description, user_id))
+    connector.commit()
+    bump_generation('transfers')
+    return cursor.lastrowid
+
+
+def delete_transfer(connector, transfer_id, user_id=UNOWNED):
+    connector.execute('DELETE FROM Transfers WHERE ID=? AND UserID=?', (transfer_id, user_id))
+    connector.commit()
+    bump_generation('transfers')
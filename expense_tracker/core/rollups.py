@@ -0,0 +1,217 @@
+import sqlite3
+import sys
+
+# Materialized spending rollup: one row per (user, day, category, mode of payment)
+# bucket with its total, count, min and max. Month is stored alongside the day
+# so monthly reports can group on it directly. UserID leads the key like it leads
+# the ExpenseTracker indexes (see partitions.py).
+ROLLUP_TABLE = 'ExpenseRollup'
+# Bulk inserts' new rows grouped by bucket (see group_rows_after)
+GROUPS_TABLE = 'temp.NewExpenseGroups'
+# The owner of rows entered without an account (see partitions.py). Defined here
+# because migrations imports this module and the ones built on it.
+UNOWNED = 0 # Never an account ID: users.id starts at 1
+
+
+def partitioned(connector):
+    """Whether ExpenseTracker has its UserID column yet (schema version 12). The
+       migrations before it build this module's tables and those of budget_tracking.py,
+       ledger.py and achievements.py too, putting every row under UNOWNED; version 12
+       rebuilds the rollup by user and version 13, which gives Income and Transfers
+       their UserID, rebuilds the rest."""
+    return any(row[1] == 'UserID' for row in connector.execute("PRAGMA table_info(ExpenseTracker)"))
+
+
+def user_sql(prefix, by_user=True):
+    """The UserID of a row (prefix 'new.' / 'old.' / ''), or UNOWNED if not partitioned yet."""
+    return f"{prefix}UserID" if by_user else str(UNOWNED)
+
+
+# Expressions mapping an ExpenseTracker row (prefix 'new.' / 'old.' / '') to its bucket.
+# Rows whose date can't be parsed go to day -1 / month '' so they still count towards totals.
+def _bucket(prefix, by_user=True):
+    return {
+        'UserID': user_sql(prefix, by_user),
+        'Month': f"CASE WHEN {prefix}DateDay IS NULL THEN '' ELSE substr({prefix}Date, 1, 7) END",
+        'DateDay': f"COALESCE({prefix}DateDay, -1)",
+        'Category': f"COALESCE({prefix}Category, '')",
+        'ModeOfPayment': f"COALESCE({prefix}ModeOfPayment, '')",
+        'Amount': f"COALESCE({prefix}Amount, 0)",
+    }
+
+
+def _add_row_sql(prefix, by_user):
+    b = _bucket(prefix, by_user)
+    return (
+        f"INSERT INTO {ROLLUP_TABLE} (UserID, Month, DateDay, Category, ModeOfPayment, Total, Count, MinAmount, MaxAmount) "
+        f"VALUES ({b['UserID']}, {b['Month']}, {b['DateDay']}, {b['Category']}, {b['ModeOfPayment']}, {b['Amount']}, 1, {b['Amount']}, {b['Amount']}) "
+        "ON CONFLICT (UserID, DateDay, Category, ModeOfPayment) DO UPDATE SET "
+        "Total = Total + excluded.Total, Count = Count + 1, "
+        "MinAmount = min(MinAmount, excluded.MinAmount), MaxAmount = max(MaxAmount, excluded.MaxAmount);"
+    )
+
+
+def _remove_row_sql(prefix, by_user):
+    b = _bucket(prefix, by_user)
+    key = f"UserID = {b['UserID']} AND DateDay = {b['DateDay']} AND Category = {b['Category']} AND ModeOfPayment = {b['ModeOfPayment']}"
+    # Min/max can't be "subtracted", so rescan the bucket's rows (an index seek on
+    # (UserID, DateDay)) only when the removed amount was one of the extremes.
+    user = f"UserID = {prefix}UserID AND " if by_user else ""
+    source = (f"FROM ExpenseTracker WHERE {user}DateDay IS {prefix}DateDay "
+              f"AND COALESCE(Category, '') = {b['Category']} AND COALESCE(ModeOfPayment, '') = {b['ModeOfPayment']}")
+    return (
+        f"UPDATE {ROLLUP_TABLE} SET Total = Total - {b['Amount']}, Count = Count - 1 WHERE {key};"
+        f"UPDATE {ROLLUP_TABLE} SET MinAmount = (SELECT MIN(COALESCE(Amount, 0)) {source}), "
+        f"MaxAmount = (SELECT MAX(COALESCE(Amount, 0)) {source}) "
+        f"WHERE {key} AND Count > 0 AND (MinAmount >= {b['Amount']} OR MaxAmount <= {b['Amount']});"
+        f"DELETE FROM {ROLLUP_TABLE} WHERE {key} AND Count <= 0;"
+    )
+
+
+def create_rollup_triggers(connector):
+    """(Re)creates the triggers that keep the rollup in step with every write to ExpenseTracker."""
+    by_user = partitioned(connector)
+    connector.execute(
+        f"CREATE TRIGGER IF NOT EXISTS trg_expense_rollup_insert AFTER INSERT ON ExpenseTracker BEGIN "
+        f"{_add_row_sql('new.', by_user)} END"
+    )
+    connector.execute(
+        f"CREATE TRIGGER IF NOT EXISTS trg_expense_rollup_delete AFTER DELETE ON ExpenseTracker BEGIN "
+        f"{_remove_row_sql('old.', by_user)} END"
+    )
+    connector.execute(
+        f"CREATE TRIGGER IF NOT EXISTS trg_expense_rollup_update AFTER UPDATE OF Date, Amount, Category, ModeOfPayment"
+        f"{', UserID' if by_user else ''} ON ExpenseTracker BEGIN {_remove_row_sql('old.', by_user)} {_add_row_sql('new.', by_user)} END"
+    )
+
+
+def drop_rollup_triggers(connector):
+    connector.execute("DROP TRIGGER IF EXISTS trg_expense_rollup_insert")
+    connector.execute("DROP TRIGGER IF EXISTS trg_expense_rollup_delete")
+    connector.execute("DROP TRIGGER IF EXISTS trg_expense_rollup_update")
+
+
+def drop_rollup_insert_trigger(connector):
+    """Drops the insert trigger for a bulk load; call group_rows_after(), add_groups()
+       and create_rollup_triggers() afterwards to catch the rollup up."""
+    connector.execute("DROP TRIGGER IF EXISTS trg_expense_rollup_insert")
+
+
+def create_rollup_schema(connector):
+    """Creates the rollup table, its month index and the maintenance triggers."""
+    connector.execute(
+        f'''CREATE TABLE IF NOT EXISTS {ROLLUP_TABLE} (
+            UserID INTEGER NOT NULL, -- same as ExpenseTracker.UserID
+            Month TEXT NOT NULL, -- "YYYY-MM", '' if the date is invalid
+            DateDay INTEGER NOT NULL, -- same day number as ExpenseTracker.DateDay, -1 if invalid
+            Category TEXT NOT NULL,
+            ModeOfPayment TEXT NOT NULL,
+            Total FLOAT NOT NULL,
+            Count INTEGER NOT NULL,
+            MinAmount FLOAT,
+            MaxAmount FLOAT,
+            PRIMARY KEY (UserID, DateDay, Category, ModeOfPayment)
+        ) WITHOUT ROWID'''
+    )
+    connector.execute(f"CREATE INDEX IF NOT EXISTS idx_rollup_month_category ON {ROLLUP_TABLE} (UserID, Month, Category)")
+    # Category filters without a date range (the key leads with the day)
+    connector.execute(f"CREATE INDEX IF NOT EXISTS idx_rollup_category_day ON {ROLLUP_TABLE} (UserID, Category, DateDay)")
+    create_rollup_triggers(connector)
+
+
+def _aggregate_sql(by_user):
+    b = _bucket('', by_user)
+    return (
+        f"SELECT {b['UserID']} AS User, {b['Month']} AS Month, {b['DateDay']} AS Day, {b['Category']} AS Cat, "
+        f"{b['ModeOfPayment']} AS MoP, SUM({b['Amount']}), COUNT(*), MIN({b['Amount']}), MAX({b['Amount']}) "
+        "FROM ExpenseTracker GROUP BY User, Day, Cat, MoP"
+    )
+
+
+def populate_rollup(connector):
+    """Recomputes the whole rollup from ExpenseTracker in one pass, inside the caller's transaction."""
+    connector.execute(f"DELETE FROM {ROLLUP_TABLE}")
+    connector.execute(
+        f"INSERT INTO {ROLLUP_TABLE} (UserID, Month, DateDay, Category, ModeOfPayment, Total, Count, MinAmount, MaxAmount) "
+        + _aggregate_sql(partitioned(connector))
+    )
+
+
+def group_rows_after(connector, last_id):
+    """Groups every expense with ID > last_id by bucket into GROUPS_TABLE, replacing it;
+       DateDay stays NULL for invalid dates. After a bulk insert made with the insert
+       triggers dropped, the rollup and the ledger, monthly spending and achievement
+       tables are caught up from these groups in one sort of the new rows, not one each."""
+    b = _bucket('')
+    connector.execute(f"DROP TABLE IF EXISTS {GROUPS_TABLE}")
+    connector.execute(
+        f'''CREATE TABLE {GROUPS_TABLE} (
+            UserID INTEGER, Month TEXT, DateDay INTEGER, Category TEXT, ModeOfPayment TEXT,
+            Total FLOAT, Count INTEGER, MinAmount FLOAT, MaxAmount FLOAT
+        )'''
+    )
+    connector.execute(
+        f"INSERT INTO {GROUPS_TABLE} "
+        f"SELECT UserID, {b['Month']}, DateDay AS Day, {b['Category']} AS Cat, {b['ModeOfPayment']} AS MoP, "
+        f"SUM({b['Amount']}), COUNT(*), MIN({b['Amount']}), MAX({b['Amount']}) "
+        "FROM ExpenseTracker WHERE ID > ? GROUP BY UserID, Day, Cat, MoP",
+        (last_id,))
+
+
+def add_groups(connector):
+    """Folds GROUPS_TABLE into the rollup."""
+    connector.execute(
+        f"INSERT INTO {ROLLUP_TABLE} (UserID, Month, DateDay, Category, ModeOfPayment, Total, Count, MinAmount, MaxAmount) "
+        f"SELECT UserID, Month, COALESCE(DateDay, -1), Category, ModeOfPayment, Total, Count, MinAmount, MaxAmount "
+        f"FROM {GROUPS_TABLE} "
+        # 'ON CONFLICT' right after FROM would be parsed as a join constraint; the
+        # ORDER BY separates the two (see SQLite's upsert docs on parsing ambiguity)
+        "ORDER BY DateDay "
+        "ON CONFLICT (UserID, DateDay, Category, ModeOfPayment) DO UPDATE SET "
+        "Total = Total + excluded.Total, Count = Count + excluded.Count, "
+        "MinAmount = min(MinAmount, excluded.MinAmount), MaxAmount = max(MaxAmount, excluded.MaxAmount)")
+
+
+def rebuild_rollup(connector):
+    """Recomputes the whole rollup and commits."""
+    populate_rollup(connector)
+    connector.commit()
+
+
+def verify_rollup(connector, tolerance=0.005):
+    """Compares the rollup against a fresh aggregation of ExpenseTracker.
+       Returns a list of (bucket key, expected, actual) for every bucket that drifted."""
+    bucket_key = lambda row: (row[0],) + row[2:5] # (UserID, DateDay, Category, ModeOfPayment)
+    expected = {bucket_key(row): row for row in connector.execute(_aggregate_sql(partitioned(connector)))}
+    actual = {bucket_key(row): row for row in connector.execute(
+        f"SELECT UserID, Month, DateDay, Category, ModeOfPayment, Total, Count, MinAmount, MaxAmount FROM {ROLLUP_TABLE}")}
+
+    drift = []
+    for key in sorted(set(expected) | set(actual), key=repr):
+        exp, act = expected.get(key), actual.get(key)
+        if exp is None or act is None or exp[1] != act[1] or exp[6] != act[6] \
+                or any(abs((e or 0) - (a or 0)) > tolerance for e, a in zip((exp[5], exp[7], exp[8]), (act[5], act[7], act[8]))):
+            drift.append((key, exp, act))
+    return drift
+
+
+if __name__ == "__main__":
+    # Usage: python -m expense_tracker.core.rollups [verify|rebuild] [database file]
+    command = sys.argv[1] if len(sys.argv) > 1 else "verify"
+    db_path = sys.argv[2] if len(sys.argv) > 2 else "Expense Tracker.db"
+    connector = sqlite3.connect(db_path)
+    try:
+        if command == "rebuild":
+            rebuild_rollup(connector)
+            print("Rollup rebuilt.")
+        elif command == "verify":
+            drift = verify_rollup(connector)
+            for key, exp, act in drift:
+                print(f"Drift in bucket {key}: expected {exp}, found {act}")
+            print("Rollup is consistent." if not drift else f"{len(drift)} bucket(s) drifted. Run 'python -m expense_tracker.core.rollups rebuild'.")
+            sys.exit(1 if drift else 0)
+        else:
+            print(f"Unknown command '{command}'. Use 'verify' or 'rebuild'.")
+            sys.exit(2)
+    finally:
+        connector.close()
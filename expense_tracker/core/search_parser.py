@@ -0,0 +1,261 @@
+import datetime
+import re
+from collections import namedtuple
+
+from .migrations import day_number
+
+# Parser for the search box language. Turns text like
+#
+#     starbucks OR (payee:uber AND NOT tag:work) amount:10..50 date:2024-03
+#
+# into a small AST that query_builder plans into SQL (and evaluates in memory).
+#
+#   words          phrase search in any text column; the last word matches as a prefix
+#   "quoted text"  phrase search on whole words
+#   field:value    search one column: payee, description, category, tags, modeofpayment
+#   field:=value   whole-column match, ignoring case
+#   tag:name       expenses carrying that tag
+#   amount:>100    also >=, <, <=, =, and ranges amount:10..50, amount:..50, amount:10..
+#   date:2024-03   a day, month (YYYY-MM) or year (YYYY); takes the same operators and ranges
+#   AND, OR, NOT   upper case only; NOT can also be written as a leading '-'
+#   ( )            grouping
+#
+# Terms next to each other are AND-ed, so 'AND' is optional between field terms.
+# Lower-case 'and'/'or' are ordinary words ("fish and chips").
+
+TEXT_FIELDS = ('payee', 'description', 'category', 'tags', 'modeofpayment')
+FIELD_ALIASES = {'mop': 'modeofpayment', 'desc': 'description'}
+SEARCH_FIELDS = TEXT_FIELDS + ('tag', 'amount', 'date') + tuple(FIELD_ALIASES)
+COMPARISON_OPERATORS = ('>=', '<=', '>', '<', '=') # Longest first
+
+_ASCII_LOWER = str.maketrans('ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz')
+
+
+def fold_case(text):
+    """Lower-cases ASCII letters only, which is how SQLite's LIKE and NOCASE ignore case."""
+    return text.translate(_ASCII_LOWER)
+
+
+_NUMBER = re.compile(r'[-+]?(?:\d+\.?\d*|\.\d+)')
+
+
+def number_value(text):
+    """The amount a general search term also stands for ('42' searches text and amounts),
+       or None if it isn't a plain number."""
+    return float(text) if _NUMBER.fullmatch(text) else None
+
+
+# --- AST ---
+# Plain tuples, so trees are hashable and compare by value (query_cache keys on them).
+# Text, Equals and Tag values are case-folded: every text match ignores case.
+
+Text = namedtuple('Text', 'field value exact') # field None = any text column; exact = whole words
+Equals = namedtuple('Equals', 'field value') # Whole column equals value
+Tag = namedtuple('Tag', 'name')
+Compare = namedtuple('Compare', 'column op value') # column 'Amount' or 'DateDay'
+Between = namedtuple('Between', 'column low high') # Inclusive
+Not = namedtuple('Not', 'child')
+And = namedtuple('And', 'children') # children is a tuple
+Or = namedtuple('Or', 'children')
+
+# --- Tokenizer ---
+
+_TOKEN = re.compile(r'\s*(?:(?P<paren>[()])|"(?P<quoted>(?:[^"]|"")*)"|(?P<word>[^\s()"]+))')
+
+
+def tokenize(search_term):
+    """Splits search text into (kind, text) tokens. Kinds: '(' ')' AND OR NOT field quoted word.
+       Raises ValueError for an unterminated quote."""
+    tokens = []
+    position = 0
+    text = search_term.rstrip()
+    while position < len(text):
+        match = _TOKEN.match(text, position)
+        if match is None:
+            raise ValueError("Unterminated quote in search.")
+        position = match.end()
+        if match.group('paren'):
+            tokens.append((match.group('paren'), match.group('paren')))
+            continue
+        if match.group('quoted') is not None:
+            tokens.append(('quoted', match.group('quoted').replace('""', '"')))
+            continue
+        word = match.group('word')
+        field, colon, rest = word.partition(':')
+        if colon and field.lower() in SEARCH_FIELDS:
+            tokens.append(('field', field.lower()))
+            position -= len(rest) # The value is read as the following token(s)
+        elif word in ('AND', 'OR', 'NOT'):
+            tokens.append((word, word))
+        elif word.startswith('-') and len(word) > 1 and not word[1].isdigit() and word[1] != '-':
+            tokens.append(('NOT', '-'))
+            position -= len(word) - 1 # Re-read the rest of the word as its own token
+        else:
+            tokens.append(('word', word))
+    return tokens
+
+
+# --- Parser ---
+# or_expr  := and_expr ('OR' and_expr)*
+# and_expr := unary (['AND'] unary)*
+# unary    := ('NOT' | '-') unary | '(' or_expr ')' | term
+
+class _Parser:
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.position = 0
+
+    def peek(self):
+        return self.tokens[self.position][0] if self.position < len(self.tokens) else None
+
+    def take(self):
+        token = self.tokens[self.position]
+        self.position += 1
+        return token
+
+    def parse(self):
+        node = self.or_expr()
+        if self.peek() is not None:
+            raise ValueError("Unbalanced ')' in search.")
+        return node
+
+    def or_expr(self):
+        children = [self.and_expr()]
+        while self.peek() == 'OR':
+            self.take()
+            children.append(self.and_expr())
+        return _combine(Or, children)
+
+    def and_expr(self):
+        children = [self.unary()]
+        while self.peek() not in (None, 'OR', ')'):
+            if self.peek() == 'AND':
+                self.take()
+            children.append(self.unary())
+        return _combine(And, children)
+
+    def unary(self):
+        kind = self.peek()
+        if kind == 'NOT':
+            if self.take()[1] == '-' and self.peek() == 'word':
+                return Not(Text(None, fold_case(self.take()[1]), False)) # '-' negates one word, not a phrase
+            return Not(self.unary())
+        if kind == '(':
+            self.take()
+            node = self.or_expr()
+            if self.peek() != ')':
+                raise ValueError("Missing ')' in search.")
+            self.take()
+            return node
+        if kind == 'field':
+            return self.field_term(self.take()[1])
+        if kind == 'quoted':
+            return Text(None, fold_case(self.take()[1]), True)
+        if kind == 'word':
+            return Text(None, self.words(), False)
+        raise ValueError("Search is incomplete: expected a search term" + (f" before '{kind}'." if kind else " at the end."))
+
+    def words(self):
+        """Joins consecutive plain words into one phrase."""
+        words = []
+        while self.peek() == 'word':
+            words.append(self.take()[1])
+        return fold_case(" ".join(words))
+
+    def field_term(self, field):
+        field = FIELD_ALIASES.get(field, field)
+        if self.peek() == 'quoted':
+            value, quoted = self.take()[1], True
+        elif self.peek() == 'word':
+            value, quoted = self.words(), False
+        else:
+            raise ValueError(f"Missing value after '{field}:' in search.")
+        if field == 'amount':
+            return _value_condition('Amount', value, _parse_amount)
+        if field == 'date':
+            return _value_condition('DateDay', value, _parse_date)
+        if field == 'tag':
+            if not value.strip():
+                raise ValueError("Missing value after 'tag:' in search.")
+            return Tag(fold_case(value.strip()))
+        if value.startswith('=') and not quoted:
+            return Equals(field, fold_case(value[1:].strip()))
+        return Text(field, fold_case(value), quoted)
+
+
+def _combine(kind, children):
+    """Builds And/Or, flattening nested nodes of the same kind; a single child stands alone."""
+    flat = []
+    for child in children:
+        flat.extend(child.children if isinstance(child, kind) else (child,))
+    return flat[0] if len(flat) == 1 else kind(tuple(flat))
+
+
+def _parse_amount(value):
+    """Returns (low, high) for an amount; both are the same number."""
+    try:
+        amount = float(value.strip().lstrip('₹').replace(',', ''))
+    except ValueError:
+        raise ValueError(f"Invalid amount in search: '{value}'.")
+    return amount, amount
+
+
+def _parse_date(value):
+    """Returns the (first, last) DateDay of a day, month or year."""
+    value = value.strip()
+    try:
+        if re.fullmatch(r'\d{4}', value):
+            year = int(value)
+            return day_number(datetime.date(year, 1, 1)), day_number(datetime.date(year, 12, 31))
+        if re.fullmatch(r'\d{4}-\d{1,2}', value):
+            first = datetime.datetime.strptime(value, '%Y-%m').date()
+            following = (first.replace(day=28) + datetime.timedelta(days=4)).replace(day=1)
+            return day_number(first), day_number(following) - 1
+    except ValueError:
+        pass
+    day = day_number(value)
+    if day is None:
+        raise ValueError(f"Invalid date in search: '{value}'. Use YYYY-MM-DD, YYYY-MM or YYYY.")
+    return day, day
+
+
+def _value_condition(column, value, parse):
+    """Builds the node for an amount or date value: a comparison, a range (low..high,
+       either end optional) or an exact value. parse returns the (first, last) span of a value."""
+    if '..' in value:
+        low_text, high_text = value.split('..', 1)
+        low = parse(low_text)[0] if low_text.strip() else None
+        high = parse(high_text)[1] if high_text.strip() else None
+        if low is None and high is None:
+            raise ValueError(f"Invalid range in search: '{value}'.")
+        if low is None:
+            return Compare(column, '<=', high)
+        if high is None:
+            return Compare(column, '>=', low)
+        return Between(column, low, high)
+
+    op = '='
+    for candidate in COMPARISON_OPERATORS:
+        if value.startswith(candidate):
+            op, value = candidate, value[len(candidate):]
+            break
+    first, last = parse(value)
+    if op == '=':
+        return Compare(column, '=', first) if first == last else Between(column, first, last)
+    # A month or year compares by its first or last day, whichever keeps the meaning
+    return Compare(column, op, first if op in ('>=', '<') else last)
+
+
+def parse(search_term):
+    """Parses search text into an AST. Returns None for an empty search.
+       Raises ValueError with a user-facing message if the text can't be parsed."""
+    if not search_term or not search_term.strip():
+        return None
+    return _Parser(tokenize(search_term)).parse()
+
+
+def conjuncts(node):
+    """The top-level AND-ed parts of a search, as a tuple (empty for no search)."""
+    if node is None:
+        return ()
+    return node.children if isinstance(node, And) else (node,)
@@ -0,0 +1,641 @@
+import bisect
+import math
+import os
+from operator import itemgetter
+
+from .paged_table import EXPENSE_COLUMNS, RowListPager
+from .partitions import UNOWNED
+from .query_builder import filter_day_range, value_matcher
+from .query_cache import generation
+from .query_results import ExpenseQueryResult
+from .search_parser import TEXT_FIELDS, And, Between, Compare, Equals, Not, Or, Tag, Text, number_value, parse
+
+# Columnar in-memory copy of one user's ExpenseTracker rows, so the Manage and
+# Reports tabs can filter, sort and pivot without going back to SQLite.
+#
+# Each column is one NumPy array indexed by position; rows are kept in ID order.
+# Text columns (Date, Payee, Description, ModeOfPayment, Category, Tags) are
+# dictionary-encoded: an int32 code per row into the column's distinct values, so
+# a text clause is evaluated once per distinct value and spread to the rows by
+# their codes. Amount is float64 (NaN for NULL), DateDay int32 (NO_DAY for NULL).
+#
+# The snapshot is loaded once, on the database worker thread, and afterwards
+# patched on the Tk thread after each write made through the app: appended to
+# after an add or an import, one row re-read after an edit, a row dropped after a
+# delete. Deleted rows stay in the arrays, marked dead. A snapshot only trusts
+# itself while its write generation (see query_cache.py) is the current one: a
+# write it was not patched for leaves it stale, and it has to be loaded again.
+#
+# Amount totals and row counts per (Category, ModeOfPayment, day) are also kept,
+# pre-aggregated and patched with the rows, so the totals and charts of a query
+# without search text (the filter dropdowns only) add up a few thousand cells
+# instead of every matching row.
+#
+# Filters and searches mean what they mean in SQL (see query_builder.py), down to
+# NULLs; sorting follows SQLite's (NULLs first, ties by ID). Needs numpy, and is
+# only used when SNAPSHOT_ENV is set to 1.
+
+SNAPSHOT_ENV = "EXPENSE_TRACKER_SNAPSHOT" # Set to 1 to serve the expense table and charts from memory
+LOAD_CHUNK_SIZE = 50_000
+SORT_IN_MAX_ROWS = 100 # Appends of more rows than this drop the sort orders instead of patching them
+NO_DAY = -2 ** 31 # DateDay of a row whose date can't be parsed
+NO_MONTH = 2 ** 31 - 1 # Its month: after every real one
+PIVOT_DIMENSIONS = ('Category', 'ModeOfPayment', 'Payee', 'Month')
+CUBE_DIMENSIONS = ('Category', 'ModeOfPayment', 'Month') # Pivots the pre-aggregated totals can answer
+CUBE_MAX_CELLS = 4_000_000 # Above this many (Category, ModeOfPayment, day) cells, totals are added up per row
+_TEXT_COLUMNS = ('Date', 'Payee', 'Description', 'ModeOfPayment', 'Category', 'Tags')
+_COLUMN = {name.lower(): name for name in EXPENSE_COLUMNS}
+
+LOAD_SQL = (f"SELECT ID, COALESCE(DateDay, {NO_DAY}), CAST(Amount AS REAL), {', '.join(_TEXT_COLUMNS)} "
+            "FROM ExpenseTracker WHERE UserID = ?")
+
+
+def enabled():
+    return os.environ.get(SNAPSHOT_ENV) == "1"
+
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise RuntimeError("The in-memory expense snapshot needs numpy. Please install it: pip install numpy")
+    return numpy
+
+
+def _sql_order(value):
+    """Sort key putting values in SQLite's order: NULL, then numbers, then text."""
+    if value is None:
+        return (0, 0)
+    if isinstance(value, (int, float)):
+        return (1, value)
+    return (2, value)
+
+
+# Three-valued logic over (true, unknown) pairs of boolean arrays. unknown is None
+# when no row is unknown, the usual case, and true may be np.False_ when no row is
+# true; both save whole-array passes.
+
+def _false(np, part):
+    return part[0] is np.False_ and part[1] is None
+
+
+def _any(np, parts):
+    """SQL OR: true if any part is, unknown if none is but some part is unknown."""
+    parts = [part for part in parts if not _false(np, part)] or [(np.False_, None)]
+    true, unknown = parts[0]
+    for part_true, part_unknown in parts[1:]:
+        true = true | part_true
+        if part_unknown is not None:
+            unknown = part_unknown if unknown is None else unknown | part_unknown
+    return true, None if unknown is None else unknown & ~true
+
+
+def _all(np, parts):
+    """SQL AND: true if every part is, unknown if none is false but some part is unknown."""
+    if any(_false(np, part) for part in parts):
+        return np.False_, None
+    true = parts[0][0]
+    for part_true, _ in parts[1:]:
+        true = true & part_true
+    if all(part_unknown is None for _, part_unknown in parts):
+        return true, None
+    unknown = possible = None # Some part unknown; and no part false
+    for part_true, part_unknown in parts:
+        if part_unknown is not None:
+            unknown = part_unknown if unknown is None else unknown | part_unknown
+            part_true = part_true | part_unknown
+        possible = part_true if possible is None else possible & part_true
+    return true, unknown & possible & ~true
+
+
+def _month_label(month):
+    """'YYYY-MM' for a month counted from 1970-01."""
+    return f"{month // 12 + 1970}-{month % 12 + 1:02d}"
+
+
+def _used(row_labels, column_labels, totals, counts):
+    """A pivot without the rows and columns that hold no expenses."""
+    used_rows, used_columns = counts.any(axis=1), counts.any(axis=0)
+    return ([label for label, used in zip(row_labels, used_rows) if used],
+            [label for label, used in zip(column_labels, used_columns) if used],
+            totals[used_rows][:, used_columns], counts[used_rows][:, used_columns])
+
+
+class _Dictionary:
+    """The distinct values of one text column, in order of first appearance."""
+
+    def __init__(self):
+        self.values = []
+        self.codes = {}
+        self._matches = {} # (clause, use_fts) -> (true, unknown) arrays over the values seen so far
+
+    def encode(self, np, values):
+        """Returns the int32 codes of values (a list), adding the new ones."""
+        try:
+            return np.fromiter(map(self.codes.__getitem__, values), dtype=np.int32, count=len(values))
+        except KeyError:
+            for value in dict.fromkeys(values):
+                if value not in self.codes:
+                    self.codes[value] = len(self.values)
+                    self.values.append(value)
+            return np.fromiter(map(self.codes.__getitem__, values), dtype=np.int32, count=len(values))
+
+    def match(self, np, clause, use_fts, column):
+        """(true, unknown) boolean arrays over the codes for a text, equals or tag clause.
+           Kept per clause and extended when values are added, so live search only
+           evaluates the values it hasn't seen yet."""
+        key = (clause, use_fts)
+        true, unknown = self._matches.get(key, (np.empty(0, bool), np.empty(0, bool)))
+        if len(true) < len(self.values):
+            match = value_matcher(clause, column, use_fts)
+            results = [match(value) for value in self.values[len(true):]]
+            true = np.concatenate((true, np.array([result is True for result in results], dtype=bool)))
+            unknown = np.concatenate((unknown, np.array([result is None for result in results], dtype=bool)))
+            if len(self._matches) >= 64:
+                self._matches.clear()
+            self._matches[key] = (true, unknown)
+        return true, unknown
+
+
+class SnapshotRows:
+    """The table rows at some snapshot positions, built when they are asked for.
+       Sliced like a list, so RowListPager can page through them."""
+
+    def __init__(self, snapshot, positions):
+        self.snapshot = snapshot
+        self.positions = positions
+
+    def __len__(self):
+        return len(self.positions)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self.snapshot.rows(self.positions[index])
+        return self.snapshot.rows(self.positions[index:index + 1 or None])[0]
+
+    def __iter__(self):
+        for start in range(0, len(self.positions), LOAD_CHUNK_SIZE):
+            yield from self.snapshot.rows(self.positions[start:start + LOAD_CHUNK_SIZE])
+
+
+class LedgerSnapshot:
+    """user_id's expenses as columns. Build one with load()."""
+
+    def __init__(self, user_id=UNOWNED):
+        np = self.np = _numpy()
+        self.user_id = user_id
+        self.generation = None # Expenses write generation the contents match
+        self.size = 0 # Positions in use, dead rows included
+        self.ids = np.empty(0, np.int64)
+        self.days = np.empty(0, np.int32)
+        self.months = np.empty(0, np.int32) # Months since 1970-01, NO_MONTH without a date
+        self.amounts = np.empty(0, np.float64)
+        self.live = np.empty(0, bool)
+        self.codes = {column: np.empty(0, np.int32) for column in _TEXT_COLUMNS}
+        self.dictionaries = {column: _Dictionary() for column in _TEXT_COLUMNS}
+        self.month_range = None # (first, last) month of any dated row written, for pivots
+        self.day_range = None # (first, last) day of the same
+        self.null_amounts = False # Whether any row was written with a NULL Amount
+        self.undated = False # Whether any row was written without a date
+        self._orders = {} # Sort column -> live positions in (column, ID) order
+        self._ranks = {} # Sort column -> each position's index in _orders[column]
+        self._cube = None # (first day, totals, counts) per (Category, ModeOfPayment, day), last day slot undated
+
+    @classmethod
+    def load(cls, connector, user_id=UNOWNED):
+        """Reads all of user_id's expenses, LOAD_CHUNK_SIZE rows at a time, and adds up the
+           pre-aggregated totals, so the first query doesn't have to."""
+        snapshot = cls(user_id)
+        snapshot.generation = generation('expenses') # Before reading: a write during the load leaves it stale
+        snapshot._append_after(connector, 0)
+        snapshot._cube_cells()
+        return snapshot
+
+    def is_current(self):
+        return self.generation == generation('expenses')
+
+    def __len__(self):
+        return int(self.np.count_nonzero(self.live[:self.size]))
+
+    # --- Patching ---
+    # Called right after the write they mirror. The snapshot stays current only if
+    # it was current before that write (one generation behind now).
+
+    def _patched(self):
+        if self.generation == generation('expenses') - 1:
+            self.generation = generation('expenses')
+
+    def expenses_added(self, connector):
+        """After an add or an import: appends the rows with IDs above every loaded one."""
+        self._append_after(connector, int(self.ids[self.size - 1]) if self.size else 0)
+        self._patched()
+
+    def expense_updated(self, connector, expense_id):
+        position = self._position(expense_id)
+        if position is not None:
+            row = connector.execute(LOAD_SQL + " AND ID = ?", (self.user_id, expense_id)).fetchone()
+            self._unsort(position)
+            self._count(position, -1)
+            if row is None:
+                self.live[position] = False
+            else:
+                self._write(slice(position, position + 1), [row])
+                self._sort_in(position)
+                self._count(position, 1)
+        self._patched()
+
+    def expense_deleted(self, expense_id):
+        position = self._position(expense_id)
+        if position is not None:
+            self._unsort(position)
+            self._count(position, -1)
+            self.live[position] = False
+        self._patched()
+
+    def expenses_cleared(self):
+        """After delete_all_expenses."""
+        self.live[:self.size] = False
+        self._orders.clear()
+        self._ranks.clear()
+        self._cube = None
+        self._patched()
+
+    def _position(self, expense_id):
+        position = int(self.np.searchsorted(self.ids[:self.size], expense_id))
+        if position < self.size and self.ids[position] == expense_id and self.live[position]:
+            return position
+        return None
+
+    def _append_after(self, connector, last_id):
+        cursor = connector.execute(LOAD_SQL + " AND ID > ? ORDER BY ID", (self.user_id, last_id))
+        while True:
+            rows = cursor.fetchmany(LOAD_CHUNK_SIZE)
+            if not rows:
+                break
+            start = self.size
+            self._reserve(start + len(rows))
+            self.size += len(rows)
+            self._write(slice(start, self.size), rows)
+            if len(rows) > SORT_IN_MAX_ROWS:
+                self._orders.clear() # Cheaper to sort again and add up again when next needed
+                self._ranks.clear()
+                self._cube = None
+            for position in range(start, self.size) if self._orders or self._cube else ():
+                self._sort_in(position)
+                self._count(position, 1)
+
+    def _reserve(self, size):
+        """Grows the arrays to hold size rows, doubling so appends stay cheap."""
+        if size <= len(self.ids):
+            return
+        np = self.np
+        capacity = max(size, 2 * len(self.ids), 1024)
+
+        def grown(array):
+            bigger = np.zeros(capacity, array.dtype)
+            bigger[:self.size] = array[:self.size]
+            return bigger
+        self.ids, self.days, self.months, self.amounts, self.live = (
+            grown(self.ids), grown(self.days), grown(self.months), grown(self.amounts), grown(self.live))
+        self.codes = {column: grown(codes) for column, codes in self.codes.items()}
+
+    def _write(self, positions, rows):
+        """Stores rows (in LOAD_SQL's column order) at positions, a slice."""
+        np = self.np
+        count = len(rows)
+        self.ids[positions] = np.fromiter(map(itemgetter(0), rows), dtype=np.int64, count=count)
+        days = np.fromiter(map(itemgetter(1), rows), dtype=np.int32, count=count)
+        self.days[positions] = days
+        dated = days != NO_DAY
+        months = days.astype('datetime64[D]').astype('datetime64[M]').astype(np.int32)
+        self.months[positions] = np.where(dated, months, NO_MONTH)
+        if dated.any():
+            first, last = int(days[dated].min()), int(days[dated].max())
+            if self.day_range:
+                first, last = min(first, self.day_range[0]), max(last, self.day_range[1])
+            self.day_range = (first, last)
+            self.month_range = tuple(int(month) for month in
+                                     self.np.array(self.day_range).astype('datetime64[D]').astype('datetime64[M]').astype(np.int32))
+        self.undated = self.undated or not dated.all()
+        amounts = np.array(list(map(itemgetter(2), rows)), dtype=np.float64) # None -> NaN
+        self.null_amounts = self.null_amounts or bool(np.isnan(amounts).any())
+        self.amounts[positions] = amounts
+        self.live[positions] = True
+        for offset, column in enumerate(_TEXT_COLUMNS, start=3):
+            self.codes[column][positions] = self.dictionaries[column].encode(np, list(map(itemgetter(offset), rows)))
+
+    def rows(self, positions):
+        """The table rows at positions (an array), in EXPENSE_COLUMNS order. Each column is
+           gathered once for all of them rather than read row by row."""
+        date, payee, description, mop, category, tags = [
+            list(map(self.dictionaries[column].values.__getitem__, self.codes[column][positions].tolist()))
+            for column in _TEXT_COLUMNS]
+        amounts = [None if math.isnan(amount) else amount for amount in self.amounts[positions].tolist()]
+        return list(zip(self.ids[positions].tolist(), date, payee, description, amounts, mop, category, tags))
+
+    # --- Sorting ---
+    # Each sort column's order is built on first use and then kept up to date:
+    # a patched row is taken out of and put back into it by binary search.
+    # ID order needs none: it is the order of the positions.
+
+    def _sort_key(self, column):
+        """position -> key in SQLite's ORDER BY column, ID order."""
+        if column == 'Amount':
+            return lambda position: (_sql_order(None if math.isnan(self.amounts[position]) else float(self.amounts[position])),
+                                     int(self.ids[position]))
+        values, codes = self.dictionaries[column].values, self.codes[column]
+        return lambda position: (_sql_order(values[codes[position]]), int(self.ids[position]))
+
+    def _order(self, column):
+        order = self._orders.get(column)
+        if order is None:
+            np = self.np
+            positions = np.flatnonzero(self.live[:self.size])
+            if column == 'Amount':
+                amounts = self.amounts[positions]
+                keys = np.where(np.isnan(amounts), -np.inf, amounts) # NULLs first
+            else:
+                values = self.dictionaries[column].values
+                ranks = np.empty(len(values), np.int32)
+                ranks[sorted(range(len(values)), key=lambda code: _sql_order(values[code]))] = np.arange(len(values))
+                keys = ranks[self.codes[column][positions]]
+            order = self._orders[column] = positions[np.argsort(keys, kind='stable')] # Stable: ties stay in ID order
+        return order
+
+    def _rank(self, column):
+        rank = self._ranks.get(column)
+        if rank is None:
+            order = self._order(column)
+            rank = self._ranks[column] = self.np.empty(self.size, self.np.int32) # Sorts faster than int64
+            rank[order] = self.np.arange(len(order))
+        return rank
+
+    def _sort_in(self, position):
+        for column, order in self._orders.items():
+            key = self._sort_key(column)
+            self._orders[column] = self.np.insert(order, bisect.bisect_left(order, key(position), key=key), position)
+        self._ranks.clear()
+
+    def _unsort(self, position):
+        for column, order in self._orders.items():
+            key = self._sort_key(column)
+            index = bisect.bisect_left(order, key(position), key=key)
+            if index < len(order) and order[index] == position:
+                self._orders[column] = self.np.delete(order, index)
+        self._ranks.clear()
+
+    def sorted_positions(self, mask, sort_column='ID'):
+        """Positions of the rows in mask, in ascending (sort_column, ID) order. Picks the
+           cheaper way: the sort order filtered by mask, or, when they are few enough that
+           sorting them beats reading the whole order, mask's rows looked up by their
+           sorted ranks (each row's index in the order, so no argsort is needed)."""
+        np = self.np
+        if sort_column not in EXPENSE_COLUMNS or sort_column == 'ID':
+            return np.flatnonzero(mask)
+        count = np.count_nonzero(mask)
+        order = self._order(sort_column)
+        if count * 4 > self.size:
+            return order if count == len(order) else order[np.take(mask, order)]
+        return order[np.sort(np.take(self._rank(sort_column), np.flatnonzero(mask)))]
+
+    # --- Filtering ---
+
+    def _spread(self, flags, codes):
+        """flags (one per dictionary value) as a boolean array over the rows with those codes."""
+        np = self.np
+        matched = np.flatnonzero(flags)
+        if not len(matched):
+            return np.False_ # Most clauses match few of a column's values, and none of most columns'
+        if len(matched) == 1:
+            return codes == matched[0] # Cheaper than a gather
+        return np.take(flags, codes) # Faster than flags[codes], which converts codes to intp first
+
+    def _text_match(self, clause, column, use_fts):
+        true, unknown = self.dictionaries[column].match(self.np, clause, use_fts, column)
+        codes = self.codes[column][:self.size]
+        unknown = self._spread(unknown, codes)
+        return self._spread(true, codes), None if unknown is self.np.False_ else unknown
+
+    def _compare(self, column, test):
+        """(true, unknown) for a comparison on Amount or DateDay; NULLs are unknown."""
+        if column == 'Amount':
+            values = self.amounts[:self.size]
+            unknown = self.np.isnan(values) if self.null_amounts else None # NaN compares false anyway
+            return test(values), unknown
+        values = self.days[:self.size]
+        if not self.undated:
+            return test(values), None
+        unknown = values == NO_DAY
+        return test(values) & ~unknown, unknown
+
+    def _evaluate(self, node, use_fts):
+        """(true, unknown) boolean arrays over all positions for a search AST: SQL's
+           three-valued logic, as query_builder.row_matcher evaluates it per row."""
+        np = self.np
+        if isinstance(node, And):
+            return _all(np, [self._evaluate(child, use_fts) for child in node.children])
+        if isinstance(node, Or):
+            return _any(np, [self._evaluate(child, use_fts) for child in node.children])
+        if isinstance(node, Not):
+            true, unknown = self._evaluate(node.child, use_fts)
+            return ~(true if unknown is None else true | unknown), unknown
+        if isinstance(node, Text) and node.field is None:
+            parts = [self._text_match(node, _COLUMN[field], use_fts) for field in TEXT_FIELDS]
+            amount = number_value(node.value)
+            if amount is not None:
+                parts.append(self._compare('Amount', lambda values: values == amount))
+            return _any(np, parts)
+        if isinstance(node, (Text, Equals)):
+            return self._text_match(node, _COLUMN[node.field], use_fts)
+        if isinstance(node, Tag):
+            return self._text_match(node, 'Tags', use_fts)
+        if isinstance(node, Compare):
+            compare = {'>=': np.greater_equal, '<=': np.less_equal, '>': np.greater, '<': np.less, '=': np.equal}[node.op]
+            return self._compare(node.column, lambda values: compare(values, node.value))
+        if isinstance(node, Between):
+            return self._compare(node.column, lambda values: (values >= node.low) & (values <= node.high))
+        raise TypeError(f"Unknown search node: {node!r}")
+
+    def _equals(self, column, value):
+        """Rows whose column is exactly value (SQL '=', case-sensitive)."""
+        code = self.dictionaries[column].codes.get(value)
+        if code is None:
+            return self.np.zeros(self.size, bool)
+        return self.codes[column][:self.size] == code
+
+    def matching(self, search_term=None, filters=None, use_fts=True):
+        """Boolean array over positions: the live rows matching a search and the filter
+           dropdowns, as query_builder.build_filter_clause would select them.
+           Raises ValueError if the search or filters are invalid."""
+        mask = self.live[:self.size].copy()
+        node = parse(search_term)
+        if node is not None:
+            mask &= self._evaluate(node, use_fts)[0] # A scalar if nothing matched
+        if filters:
+            day_range = filter_day_range(filters)
+            if day_range:
+                days = self.days[:self.size]
+                mask &= (days >= day_range[0]) & (days <= day_range[1])
+            if filters.get('mop') and filters['mop'] != "All":
+                mask &= self._equals('ModeOfPayment', filters['mop'])
+            if filters.get('category') and filters['category'] != "All":
+                mask &= self._equals('Category', filters['category'])
+        return mask
+
+    # --- Pivots ---
+
+    def _dimension(self, name, positions):
+        """(int codes at positions, labels) for a PIVOT_DIMENSIONS name. Month labels are
+           'YYYY-MM', with None last for rows without a date."""
+        if name == 'Month':
+            first, last = self.month_range or (0, -1)
+            codes = self.np.minimum(self.months[positions], last + 1) - first # NO_MONTH -> the None column
+            return codes, [_month_label(month) for month in range(first, last + 1)] + [None]
+        if name not in PIVOT_DIMENSIONS:
+            raise ValueError(f"Can't pivot by {name}; use one of {', '.join(PIVOT_DIMENSIONS)}.")
+        return self.codes[name][positions], self.dictionaries[name].values
+
+    def pivot(self, positions=None, rows='Category', columns='Month'):
+        """Total amount per (rows, columns) pair: (row labels, column labels, totals, counts),
+           with totals and counts 2-D arrays. Labels without any rows are left out.
+           Over the rows at positions (e.g. a query result's positions), the rows a
+           matching() mask selects, or, if None, every row."""
+        np = self.np
+        if positions is None:
+            pivoted = self.filtered_pivot(None, rows, columns)
+            if pivoted is not None:
+                return pivoted
+            positions = np.flatnonzero(self.live[:self.size])
+        elif positions.dtype == bool:
+            positions = np.flatnonzero(positions)
+        row_codes, row_labels = self._dimension(rows, positions)
+        column_codes, column_labels = self._dimension(columns, positions)
+        cells = row_codes.astype(np.int64) * len(column_labels) + column_codes
+        shape = (len(row_labels), len(column_labels))
+        amounts = self.amounts[positions]
+        if self.null_amounts:
+            amounts = np.where(np.isnan(amounts), 0.0, amounts) # SUM skips NULLs
+        counts = np.bincount(cells, minlength=shape[0] * shape[1]).reshape(shape)
+        totals = np.bincount(cells, weights=amounts, minlength=shape[0] * shape[1]).reshape(shape)
+        return _used(row_labels, column_labels, totals, counts)
+
+    # --- Pre-aggregated totals ---
+    # Built on first use and patched row by row; dropped, to be added up again when
+    # next needed, when a row brings a new category, payment mode or day with it.
+
+    def _cube_cells(self):
+        """(first day, totals, counts) per (Category, ModeOfPayment, day) cell, the last
+           day slot holding the undated rows. None if there would be too many cells."""
+        if self._cube is None:
+            np = self.np
+            first, last = self.day_range or (0, -1)
+            shape = (len(self.dictionaries['Category'].values), len(self.dictionaries['ModeOfPayment'].values),
+                     last - first + 2)
+            if shape[0] * shape[1] * shape[2] > CUBE_MAX_CELLS:
+                return None
+            positions = np.flatnonzero(self.live[:self.size])
+            days = self.days[positions].astype(np.int64)
+            slots = np.where(days == NO_DAY, shape[2] - 1, days - first)
+            cells = (self.codes['Category'][positions].astype(np.int64) * shape[1]
+                     + self.codes['ModeOfPayment'][positions]) * shape[2] + slots
+            amounts = self.amounts[positions]
+            if self.null_amounts:
+                amounts = np.where(np.isnan(amounts), 0.0, amounts)
+            size = shape[0] * shape[1] * shape[2]
+            self._cube = (first, np.bincount(cells, weights=amounts, minlength=size).reshape(shape),
+                          np.bincount(cells, minlength=size).reshape(shape))
+        return self._cube
+
+    def _count(self, position, sign):
+        """Adds the row at position to the pre-aggregated totals (sign 1), or takes it out (-1)."""
+        if self._cube is None:
+            return
+        first, totals, counts = self._cube
+        category, mop = int(self.codes['Category'][position]), int(self.codes['ModeOfPayment'][position])
+        day = int(self.days[position])
+        slot = totals.shape[2] - 1 if day == NO_DAY else day - first
+        if category >= totals.shape[0] or mop >= totals.shape[1] or (day != NO_DAY and not 0 <= slot < totals.shape[2] - 1):
+            self._cube = None
+            return
+        amount = float(self.amounts[position])
+        totals[category, mop, slot] += 0.0 if math.isnan(amount) else sign * amount
+        counts[category, mop, slot] += sign
+
+    def filtered_pivot(self, filters=None, rows='Category', columns='Month'):
+        """pivot() over the rows passing the filter dropdowns alone, from the pre-aggregated
+           totals. None if rows or columns isn't one of CUBE_DIMENSIONS or there are too
+           many cells to keep them. Raises ValueError if the filters are invalid."""
+        if rows not in CUBE_DIMENSIONS or columns not in CUBE_DIMENSIONS or rows == columns:
+            return None
+        cube = self._cube_cells()
+        if cube is None:
+            return None
+        np = self.np
+        first, totals, counts = cube
+        labels = [self.dictionaries['Category'].values[:totals.shape[0]],
+                  self.dictionaries['ModeOfPayment'].values[:totals.shape[1]]]
+        undated = totals.shape[2] - 1 # Slot of the rows without a date; the ones before it are days from first
+        start, end, with_undated = 0, undated, True
+        day_range = filter_day_range(filters) if filters else None
+        if day_range:
+            start = min(max(day_range[0] - first, 0), undated)
+            end = max(min(day_range[1] - first + 1, undated), start)
+            with_undated = False
+        for axis, key, column in ((0, 'category', 'Category'), (1, 'mop', 'ModeOfPayment')):
+            value = filters.get(key) if filters else None
+            if value and value != "All":
+                code = self.dictionaries[column].codes.get(value)
+                keep = [code] if code is not None and code < totals.shape[axis] else []
+                totals, counts = totals.take(keep, axis=axis), counts.take(keep, axis=axis)
+                labels[axis] = [labels[axis][code] for code in keep]
+
+        # Days to months: each month is a run of consecutive day slots
+        months = np.arange(first + start, first + end).astype('datetime64[D]').astype('datetime64[M]').astype(np.int32)
+        runs = np.concatenate(([0], np.flatnonzero(np.diff(months)) + 1)) if len(months) else np.empty(0, np.int64)
+
+        def by_month(cells):
+            monthly = np.add.reduceat(cells[:, :, start:end], runs, axis=2) if len(runs) else cells[:, :, :0]
+            return np.concatenate((monthly, cells[:, :, undated:] if with_undated else cells[:, :, :0]), axis=2)
+        totals, counts = by_month(totals), by_month(counts)
+        labels.append([_month_label(int(month)) for month in months[runs]] + ([None] if with_undated else []))
+
+        row_axis, column_axis = CUBE_DIMENSIONS.index(rows), CUBE_DIMENSIONS.index(columns)
+        other = 3 - row_axis - column_axis
+        totals, counts = totals.sum(axis=other), counts.sum(axis=other)
+        if row_axis > column_axis:
+            totals, counts = totals.T, counts.T
+        return _used(labels[row_axis], labels[column_axis], totals, counts)
+
+    # --- Queries ---
+
+    def query(self, search_term=None, filters=None, sort_column='ID', sort_direction='ASC', use_fts=True, page_size=100):
+        """Answers a search the way query_results.run_expense_query does, from memory:
+           an ExpenseQueryResult with count, total, by_category, by_month and a pager
+           over the rows in sort order. Its rows are built as they are paged through.
+           Raises ValueError if the search or filters are invalid."""
+        sort_column = sort_column if sort_column in EXPENSE_COLUMNS else 'ID'
+        descending = str(sort_direction).upper() == 'DESC'
+        mask = self.matching(search_term, filters, use_fts)
+        positions = self.sorted_positions(mask, sort_column)
+        if descending:
+            positions = positions[::-1] # ORDER BY column DESC, ID DESC is the ascending order reversed
+
+        result = ExpenseQueryResult('', (), sort_column, 'DESC' if descending else 'ASC', page_size)
+        pivoted = self.filtered_pivot(filters) if parse(search_term) is None else None
+        if pivoted is None:
+            pivoted = self.pivot(positions)
+        categories, months, totals, counts = pivoted
+        by_category, by_month = {}, {}
+        for category, total in zip(categories, totals.sum(axis=1).tolist()):
+            category = category or "Uncategorized"
+            by_category[category] = by_category.get(category, 0.0) + total
+        for month, total in zip(months, totals.sum(axis=0).tolist()):
+            if month:
+                by_month[month] = total
+        result.count = len(positions)
+        result.total = float(totals.sum())
+        result.by_category = sorted(by_category.items(), key=lambda item: item[1], reverse=True)
+        result.by_month = sorted(by_month.items())
+        result.rows = SnapshotRows(self, positions)
+        result.pager = RowListPager(result.rows, page_size)
+        return result
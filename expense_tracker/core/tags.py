@@ -0,0 +1,159 @@
+from .rollups import UNOWNED
+
+# Normalized tag storage: one Tags row per distinct tag (case-insensitive) and an
+# ExpenseTags junction row per (expense, tag). ExpenseTracker.Tags stays the text
+# the user typed ('work, eating out'); triggers split it into the junction on every
+# write, the same way the search index and the rollup are maintained. Tag names are
+# one list for the whole file; what a user sees is counted from their own expenses.
+TAG_TABLE = 'Tags'
+EXPENSE_TAG_TABLE = 'ExpenseTags'
+
+# Condition to plug into a WHERE clause on ExpenseTracker; takes one tag name parameter.
+# An index seek on Tags.Name, then a range of the (TagID, ExpenseID) index.
+TAG_MATCH_CONDITION = (f"ID IN (SELECT ExpenseID FROM {EXPENSE_TAG_TABLE} WHERE TagID = "
+                       f"(SELECT ID FROM {TAG_TABLE} WHERE Name = ?))")
+
+
+def _tag_values(column):
+    """json_each() source yielding the comma-separated parts of a Tags value. The text is
+       turned into a JSON array in SQL, as triggers can't use a recursive CTE to split it."""
+    text = f"replace(replace(replace(replace(replace({column}, char(9), ' '), char(10), ' '), char(13), ' '), '\\', '\\\\'), '\"', '\\\"')"
+    array = f"'[\"' || replace({text}, ',', '\",\"') || '\"]'"
+    return f"json_each(CASE WHEN json_valid({array}) THEN {array} ELSE '[]' END)"
+
+
+def split_tags(text):
+    """The tags in a Tags value, as the triggers see them: comma-separated, trimmed, non-empty."""
+    if not text:
+        return []
+    text = str(text).replace('\t', ' ').replace('\n', ' ').replace('\r', ' ')
+    return [part.strip(' ') for part in text.split(',') if part.strip(' ')]
+
+
+def _link_sql(prefix):
+    """Statements adding the junction rows (and any new Tags rows) for one expense."""
+    values = _tag_values(f"{prefix}Tags")
+    return (
+        f"INSERT OR IGNORE INTO {TAG_TABLE} (Name) SELECT trim(value) FROM {values} WHERE trim(value) != '';"
+        f"INSERT OR IGNORE INTO {EXPENSE_TAG_TABLE} (ExpenseID, TagID) "
+        f"SELECT {prefix}ID, t.ID FROM {values} AS v JOIN {TAG_TABLE} AS t ON t.Name = trim(v.value);"
+    )
+
+
+def create_tag_triggers(connector):
+    """(Re)creates the triggers that keep ExpenseTags in step with ExpenseTracker.Tags."""
+    connector.execute(
+        f"CREATE TRIGGER IF NOT EXISTS trg_expense_tags_insert AFTER INSERT ON ExpenseTracker "
+        f"WHEN new.Tags IS NOT NULL AND new.Tags != '' BEGIN {_link_sql('new.')} END"
+    )
+    connector.execute(
+        f"CREATE TRIGGER IF NOT EXISTS trg_expense_tags_delete AFTER DELETE ON ExpenseTracker BEGIN "
+        f"DELETE FROM {EXPENSE_TAG_TABLE} WHERE ExpenseID = old.ID; END"
+    )
+    connector.execute(
+        f"CREATE TRIGGER IF NOT EXISTS trg_expense_tags_update AFTER UPDATE OF Tags ON ExpenseTracker BEGIN "
+        f"DELETE FROM {EXPENSE_TAG_TABLE} WHERE ExpenseID = old.ID; {_link_sql('new.')} END"
+    )
+
+
+def drop_tag_insert_trigger(connector):
+    """Drops the insert trigger for a bulk load; call link_rows_after() and
+       create_tag_triggers() afterwards to catch the junction up."""
+    connector.execute("DROP TRIGGER IF EXISTS trg_expense_tags_insert")
+
+
+def create_tag_schema(connector):
+    """Creates the tag tables, their indexes and the maintenance triggers."""
+    connector.execute(
+        f'''CREATE TABLE IF NOT EXISTS {TAG_TABLE} (
+            ID INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL,
+            Name TEXT NOT NULL UNIQUE COLLATE NOCASE
+        )'''
+    )
+    connector.execute(
+        f'''CREATE TABLE IF NOT EXISTS {EXPENSE_TAG_TABLE} (
+            ExpenseID INTEGER NOT NULL,
+            TagID INTEGER NOT NULL,
+            PRIMARY KEY (ExpenseID, TagID)
+        ) WITHOUT ROWID'''
+    )
+    # Tag filters and per-tag totals go from a tag to its expenses
+    connector.execute(f"CREATE INDEX IF NOT EXISTS idx_expense_tags_tag ON {EXPENSE_TAG_TABLE} (TagID, ExpenseID)")
+    create_tag_triggers(connector)
+
+
+def link_rows_after(connector, last_id):
+    """Splits the Tags of every expense with ID > last_id into the tag tables in two
+       set-based statements. Used after bulk inserts and to fill the tables initially.
+       Each distinct Tags value is split once: a ledger repeats a few hundred of them."""
+    split = (f"WITH split AS MATERIALIZED (SELECT s.Tags, trim(v.value) AS Name "
+             f"FROM (SELECT DISTINCT Tags FROM ExpenseTracker WHERE ID > ? AND Tags != '') AS s, "
+             f"{_tag_values('s.Tags')} AS v WHERE trim(v.value) != '') ")
+    connector.execute(split + f"INSERT OR IGNORE INTO {TAG_TABLE} (Name) SELECT Name FROM split", (last_id,))
+    connector.execute(
+        split + f"INSERT OR IGNORE INTO {EXPENSE_TAG_TABLE} (ExpenseID, TagID) "
+        f"SELECT e.ID, t.ID FROM ExpenseTracker AS e JOIN split ON split.Tags = e.Tags "
+        f"JOIN {TAG_TABLE} AS t ON t.Name = split.Name WHERE e.ID > ?", (last_id, last_id))
+
+
+def rebuild_tags(connector):
+    """Recomputes the junction from ExpenseTracker.Tags and commits. Unused tags are dropped."""
+    connector.execute(f"DELETE FROM {EXPENSE_TAG_TABLE}")
+    connector.execute(f"DELETE FROM {TAG_TABLE}")
+    link_rows_after(connector, 0)
+    connector.commit()
+
+
+def tag_counts(connector, user_id=UNOWNED):
+    """Returns [(tag, number of expenses)] for every tag on a user's expenses, most used first."""
+    return connector.execute(
+        f"SELECT t.Name, COUNT(*) AS Uses FROM ExpenseTracker AS e "
+        f"JOIN {EXPENSE_TAG_TABLE} AS et ON et.ExpenseID = e.ID JOIN {TAG_TABLE} AS t ON t.ID = et.TagID "
+        "WHERE e.UserID = ? GROUP BY et.TagID ORDER BY Uses DESC, t.Name", (user_id,)).fetchall()
+
+
+# --- Autocomplete ---
+
+class TagTrie:
+    """Prefix tree over tag names for autocompletion. Each node keeps its `limit` most
+    used completions, so a lookup costs only the length of the prefix. Matching
+    ignores case; completions keep the stored spelling.
+
+    Counts change with every write, so build a new trie (from_connector) rather
+    than updating one.
+    """
+
+    def __init__(self, limit=10):
+        self.limit = limit
+        self.root = {}
+        self.size = 0
+
+    def insert(self, name, count=0):
+        """Adds a tag. Insert in order of decreasing count: nodes keep the first `limit` they see."""
+        node = self.root
+        self._offer(node, name, count)
+        for ch in name.lower():
+            node = node.setdefault(ch, {})
+            self._offer(node, name, count)
+        self.size += 1
+
+    def _offer(self, node, name, count):
+        top = node.setdefault('', [])
+        if len(top) < self.limit:
+            top.append((name, count))
+
+    def complete(self, prefix, limit=None):
+        """Returns up to limit tag names starting with prefix (ignoring case), most used first."""
+        node = self.root
+        for ch in prefix.lower():
+            node = node.get(ch)
+            if node is None:
+                return []
+        return [name for name, _ in node.get('', [])[:limit or self.limit]]
+
+    @classmethod
+    def from_connector(cls, connector, limit=10, user_id=UNOWNED):
+        trie = cls(limit)
+        for name, count in tag_counts(connector, user_id):
+            trie.insert(name, count)
+        return trie
@@ -1,73 +1,65 @@
 import datetime
 import sqlite3
-from tkcalendar import DateEntry
 from tkinter import *
 import tkinter.messagebox as mb
 import tkinter.ttk as ttk
 from tkinter import simpledialog
+from tkinter import filedialog
 from tkinter import Toplevel
 import json # For saving/loading report templates
-
-# Attempt to import Matplotlib
-try:
-    from matplotlib.figure import Figure
-    from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-    import matplotlib.pyplot as plt # Though direct pyplot might not be used, good to have for colormaps etc.
-    MATPLOTLIB_AVAILABLE = True
-except ImportError:
-    MATPLOTLIB_AVAILABLE = False
-    print("Matplotlib not found. Charts will not be available. Please install it: pip install matplotlib")
-
-
-# Connecting to the Database
-connector = sqlite3.connect("Expense Tracker.db")
+from expense_tracker.core import achievements, analytics, auth, budgets, ledger, query_builder, reports, repository, snapshot
+from expense_tracker.core.connection_pool import DB_PATH, close_all, get_pool
+from expense_tracker.core.db_worker import DBExecutor
+from expense_tracker.core.exporter import export_query, format_for
+from expense_tracker.core.fts_search import fts_available
+from expense_tracker.core.importer import import_file
+from expense_tracker.core.migrations import migrate
+from expense_tracker.core.partitions import UNOWNED, database_path
+from expense_tracker.core.query_cache import QueryCache, cache_key, generation, refinement
+from expense_tracker.core.query_results import run_expense_query
+from expense_tracker.core.snapshot import LedgerSnapshot, SnapshotRows
+from expense_tracker.core.tags import TagTrie
+
+# Matplotlib and tkcalendar are slow to import, so they are only loaded when a
+# chart or date picker is first needed (see load_matplotlib and make_date_entry)
+MATPLOTLIB_AVAILABLE = None # Not known until the Reports tab is first opened
+Figure = FigureCanvasTkAgg = ChartManager = None
+
+def load_matplotlib():
+    """Imports Matplotlib on first use. Returns True if it is available."""
+    global MATPLOTLIB_AVAILABLE, Figure, FigureCanvasTkAgg, ChartManager
+    if MATPLOTLIB_AVAILABLE is None:
+        try:
+            from matplotlib.figure import Figure
+            from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+            from charts import ChartManager
+            MATPLOTLIB_AVAILABLE = True
+        except ImportError:
+            MATPLOTLIB_AVAILABLE = False
+            print("Matplotlib not found. Charts will not be available. Please install it: pip install matplotlib")
+    return MATPLOTLIB_AVAILABLE
+
+def make_date_entry(parent, **options):
+    """Creates a tkcalendar DateEntry (YYYY-MM-DD), importing tkcalendar on first use."""
+    from tkcalendar import DateEntry
+    return DateEntry(parent, date_pattern='y-mm-dd', **options)
+
+
+# The account logged in through register.py; main.py started directly works on the unowned expenses
+session = auth.current_session()
+user_id = session.user_id if session else UNOWNED
+
+# Connecting to the Database (the account's own file in file-per-user mode, see partitions.py)
+db_pool = get_pool(database_path(DB_PATH, user_id)) # WAL mode, tuned pragmas and a larger prepared-statement cache
+connector = db_pool.acquire()
 cursor = connector.cursor()
 
-# Updated table schema
-cursor.execute(
-    '''CREATE TABLE IF NOT EXISTS ExpenseTracker (
-        ID INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL,
-        Date DATETIME,
-        Payee TEXT,
-        Description TEXT,
-        Amount FLOAT,
-        ModeOfPayment TEXT,
-        Category TEXT,
-        Tags TEXT
-    )'''
-)
-# Budget Table
-cursor.execute(
-    '''CREATE TABLE IF NOT EXISTS Budgets (
-        ID INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL,
-        Category TEXT NOT NULL,
-        Amount FLOAT NOT NULL,
-        Period TEXT NOT NULL UNIQUE -- e.g., "YYYY-MM" for monthly budgets
-    )'''
-)
-# New table for Saved Report Templates
-cursor.execute(
-    '''CREATE TABLE IF NOT EXISTS ReportTemplates (
-        ID INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL,
-        Name TEXT NOT NULL UNIQUE,
-        SearchTerm TEXT,
-        FilterDateRange TEXT,
-        CustomStartDate TEXT,
-        CustomEndDate TEXT,
-        FilterMoP TEXT,
-        FilterCategory TEXT
-    )'''
-)
-# New table for Achievements
-cursor.execute(
-    '''CREATE TABLE IF NOT EXISTS Achievements (
-        ID INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL,
-        Name TEXT NOT NULL UNIQUE,
-        Description TEXT,
-        AchievedDate DATETIME
-    )'''
-)
-connector.commit()
+# Create or upgrade the schema (tables, DateDay column, indexes, search index, spending rollup)
+migrate(connector)
+search_uses_fts = fts_available(connector) # Falls back to LIKE on SQLite builds without FTS5
+
+# Slow reads (table, totals, charts, achievements) run on a worker thread with its own connection
+db_executor = DBExecutor(db_pool)
 
 # --- Global Variables for UI and Logic ---
 # For sorting
@@ -77,7 +69,8 @@ current_sort_direction = 'ASC'
 # To store available categories
 available_categories = ["All", "Food", "Travel", "Utilities", "Entertainment", "Education", "Shopping", "Health", "Salary", "Gifts", "Other"]
 try:
-    cursor.execute("SELECT DISTINCT Category FROM ExpenseTracker WHERE Category IS NOT NULL AND Category != ''")
+    cursor.execute("SELECT DISTINCT Category FROM ExpenseTracker WHERE UserID = ? AND Category IS NOT NULL AND Category != ''",
+                   (user_id,))
     db_categories = [row[0] for row in cursor.fetchall()]
     for cat in db_categories:
         if cat not in available_categories:
@@ -93,6 +86,7 @@ root = Tk()
 root.title('Enhanced Expense Tracker')
 root.geometry('1450x800') # Increased window size for tabs
 root.resizable(True, True)
+db_executor.start_polling(root) # Deliver worker results on the Tk thread
 
 # --- Initialize Tkinter Variables AFTER root window is created ---
 desc = StringVar()
@@ -180,11 +174,45 @@ custom_start_date_label = None
 custom_start_date = None
 custom_end_date_label = None
 custom_end_date = None
-pie_chart_canvas_agg = None # For Matplotlib canvas
-bar_chart_canvas_agg = None # For Matplotlib canvas
-pie_ax = None
-bar_ax = None
+chart_manager = None # Draws the Reports tab's charts once it is built (see build_reports_tab)
+date_entry = None # Expense date picker, created once the window is up (see finish_startup)
+recommendation_label = None # Reports tab widgets, built on first view (see build_reports_tab)
+savings_progress_bar = None
+achievements_tree = None # Achievements tab table, built on first view
+lazy_tab_builders = {} # Notebook tab -> function that builds it the first time it is selected
 notebook = None # Reference to the main notebook widget
+current_result = None # ExpenseQueryResult for the current filter (table rows, totals, chart data)
+page_request_pending = False # True while the next table page is being fetched
+
+# Expense table paging: rows fetched per page, extra rows fetched up front, and
+# how far down the scrollbar (0-1) has to be before the next page is loaded
+TABLE_PAGE_SIZE = 100
+TABLE_PREFETCH_ROWS = 100
+TABLE_PREFETCH_THRESHOLD = 0.9
+
+IMPORT_BATCH_SIZE = 5000 # Rows per executemany call when importing files
+
+# Live search: wait this long after the last keystroke before searching. Results with
+# up to REFINE_MAX_ROWS rows are kept in memory, so a narrower search (more characters,
+# another AND clause) filters them instead of querying SQLite again.
+SEARCH_DEBOUNCE_MS = 200
+REFINE_MAX_ROWS = 5000
+query_cache = QueryCache() # (search, filters, sort) -> (result, first rows), until the next write
+current_query_key = None # cache_key and write generation of current_result
+current_query_generation = None
+live_search_after_id = None # Pending debounced search (root.after id)
+
+# In-memory columnar copy of the ledger (see snapshot.py), when EXPENSE_TRACKER_SNAPSHOT=1.
+# Filters, sorts and charts are answered from it on the Tk thread while it is current;
+# otherwise a fresh one loads in the background and SQLite answers meanwhile.
+snapshot_enabled = snapshot.enabled()
+expense_snapshot = None # LedgerSnapshot, once loaded
+snapshot_loading = False
+
+TAG_SUGGESTION_LIMIT = 6 # Tag autocomplete entries shown under the Tags field
+tag_trie = None # TagTrie of the tags in use, rebuilt after writes (see current_tag_trie)
+tag_trie_generation = None
+tag_popup = None # Suggestion list under the Tags field, while shown
 
 # --- Tooltip Class ---
 class ToolTip(object):
@@ -285,29 +313,22 @@ def apply_theme(theme_name):
     table.tag_configure('evenrow', background=current_theme["table_even_row"])
     table.tag_configure('oddrow', background=current_theme["table_odd_row"])
     
-    # Redraw charts to apply new background/colors if Matplotlib is available
-    if MATPLOTLIB_AVAILABLE:
-        pie_ax.set_facecolor(current_theme["table_odd_row"])
-        bar_ax.set_facecolor(current_theme["table_odd_row"])
-        pie_ax.tick_params(axis='x', colors=text_color)
-        pie_ax.tick_params(axis='y', colors=text_color)
-        bar_ax.tick_params(axis='x', colors=text_color)
-        bar_ax.tick_params(axis='y', colors=text_color)
-        bar_ax.xaxis.label.set_color(text_color)
-        bar_ax.yaxis.label.set_color(text_color)
-        pie_ax.title.set_color(text_color)
-        bar_ax.title.set_color(text_color)
-        if pie_chart_canvas_agg: pie_chart_canvas_agg.draw()
-        if bar_chart_canvas_agg: bar_chart_canvas_agg.draw()
+    # Restyle the charts (redrawn now if the Reports tab is showing, else when it is next shown)
+    if chart_manager:
+        chart_manager.set_colors(text_color, current_theme["table_odd_row"], primary_color)
 
 
-def get_all_categories_from_db():
-    """Fetches all unique categories from the database and updates available_categories global list."""
+def fetch_categories(conn):
+    """Worker-thread half of get_all_categories_from_db: the categories the user's expenses use."""
+    return [row[0] for row in conn.execute(
+        "SELECT DISTINCT Category FROM ExpenseTracker WHERE UserID = ? AND Category IS NOT NULL AND Category != '' "
+        "ORDER BY Category", (user_id,))]
+
+
+def show_categories(db_categories):
+    """Updates the available_categories global list and the category dropdowns."""
     global available_categories
     try:
-        cursor.execute("SELECT DISTINCT Category FROM ExpenseTracker WHERE Category IS NOT NULL AND Category != '' ORDER BY Category")
-        db_categories = [row[0] for row in cursor.fetchall()]
-        
         # Start with "All" and then unique categories
         # Use a temporary set to ensure "Other", "Food etc. from default list are also included if not in DB yet.
         current_defaults = set(["Food", "Travel", "Utilities", "Entertainment", "Education", "Shopping", "Health", "Salary", "Gifts", "Other"])
@@ -323,175 +344,192 @@ def get_all_categories_from_db():
         if category_entry_dropdown and isinstance(category_entry_dropdown, ttk.Combobox):
             category_entry_dropdown['values'] = [cat for cat in available_categories if cat != "All"]
 
-    except sqlite3.Error as e:
-        print(f"Database error fetching categories: {e}")
     except Exception as e: # Catch other potential Tkinter errors if widgets are not ready
         print(f"Error updating category dropdowns: {e}")
-    return available_categories
+
+
+def get_all_categories_from_db():
+    """Refreshes the category lists from the database on the worker thread. Only writes
+       change them, so it's called after each write rather than after every query."""
+    db_executor.submit(fetch_categories, key='categories', callback=show_categories,
+                       errback=lambda e: print(f"Database error fetching categories: {e}"))
+
+
+def build_filter_clause(search_term=None, filters=None, show_errors=True):
+    """Builds the WHERE clause for the search box and filters (see query_builder.py).
+       Shows an error (unless show_errors is False) and returns (None, None) if the filters are invalid."""
+    try:
+        return query_builder.build_filter_clause(search_term, filters, search_uses_fts, user_id)
+    except ValueError as e:
+        if show_errors: mb.showerror("Invalid Search", str(e))
+        return None, None
 
 
 def build_query_and_params(search_term=None, filters=None, sort_column='ID', sort_direction='ASC'):
-    """Helper function to build the SQL query and parameters for fetching expenses.
-       Supports enhanced search syntax (e.g., 'amount > 50', 'category:food')."""
-    query = 'SELECT * FROM ExpenseTracker'
-    conditions = []
-    params = []
-
-    # Enhanced Search
-    if search_term:
-        search_parts = search_term.split(' AND ') # Basic support for AND
-        for part in search_parts:
-            part = part.strip()
-            if ':' in part: # Field-specific search (e.g., 'category:food', 'payee:starbucks')
-                field, value = part.split(':', 1)
-                field = field.strip().lower()
-                value = value.strip().lower()
-                
-                if field in ['payee', 'description', 'category', 'tags', 'modeofpayment']:
-                    conditions.append(f"LOWER({field}) LIKE ?")
-                    params.append(f'%{value}%')
-                elif field == 'amount': # Amount specific search (e.g., 'amount:>100', 'amount:<50', 'amount:=25')
-                    if value.startswith('>='):
-                        conditions.append("Amount >= ?")
-                        params.append(float(value[2:]))
-                    elif value.startswith('>'):
-                        conditions.append("Amount > ?")
-                        params.append(float(value[1:]))
-                    elif value.startswith('<='):
-                        conditions.append("Amount <= ?")
-                        params.append(float(value[2:]))
-                    elif value.startswith('<'):
-                        conditions.append("Amount < ?")
-                        params.append(float(value[1:]))
-                    elif value.startswith('='):
-                        conditions.append("Amount = ?")
-                        params.append(float(value[1:]))
-                    else: # Exact amount
-                        conditions.append("Amount = ?")
-                        params.append(float(value))
-                elif field == 'date': # Date specific search (e.g., 'date:2023-01-15', 'date:>=2023-01-01')
-                    if value.startswith('>='):
-                        conditions.append("Date >= ?")
-                        params.append(value[2:])
-                    elif value.startswith('>'):
-                        conditions.append("Date > ?")
-                        params.append(value[1:])
-                    elif value.startswith('<='):
-                        conditions.append("Date <= ?")
-                        params.append(value[2:])
-                    elif value.startswith('<'):
-                        conditions.append("Date < ?")
-                        params.append(value[1:])
-                    elif value.startswith('='):
-                        conditions.append("Date = ?")
-                        params.append(value[1:])
-                    else: # Exact date
-                        conditions.append("Date = ?")
-                        params.append(value)
-            else: # General search across multiple fields if no specific field is given
-                search_conditions_list = []
-                search_params_list = []
-                general_search_fields = ['Payee', 'Description', 'Amount', 'Category', 'Tags', 'ModeOfPayment']
-                for field in general_search_fields:
-                    search_conditions_list.append(f"LOWER({field}) LIKE ?")
-                    search_params_list.append(f'%{part.lower()}%')
-                if search_conditions_list:
-                    conditions.append("(" + " OR ".join(search_conditions_list) + ")")
-                    params.extend(search_params_list)
-            
-    # Filters (existing logic)
-    if filters:
-        if filters.get('date_range') and filters['date_range'] != "All Time":
-            start_date_val, end_date_val = None, None
-            today = datetime.date.today()
-            if filters['date_range'] == "Today":
-                start_date_val = end_date_val = today
-            elif filters['date_range'] == "This Week":
-                start_date_val = today - datetime.timedelta(days=today.weekday())
-                end_date_val = start_date_val + datetime.timedelta(days=6)
-            elif filters['date_range'] == "This Month":
-                start_date_val = today.replace(day=1)
-                try:
-                    end_date_val = (start_date_val + datetime.timedelta(days=32)).replace(day=1) - datetime.timedelta(days=1)
-                except ValueError: # Handles months like December
-                    end_date_val = start_date_val.replace(month=12, day=31)
-
-            elif filters['date_range'] == "This Year":
-                start_date_val = today.replace(month=1, day=1)
-                end_date_val = today.replace(month=12, day=31)
-            elif filters['date_range'] == "Custom Range" and filters.get('custom_start') and filters.get('custom_end'):
-                try:
-                    start_date_str = filters['custom_start']
-                    end_date_str = filters['custom_end']
-                    start_date_val = datetime.datetime.strptime(start_date_str, '%Y-%m-%d').date()
-                    end_date_val = datetime.datetime.strptime(end_date_str, '%Y-%m-%d').date()
-                except ValueError:
-                    mb.showerror("Invalid Date", "Custom date format is invalid. Please use YYYY-MM-DD.")
-                    return None, None # Indicate error
-
-            if start_date_val and end_date_val:
-                conditions.append("Date BETWEEN ? AND ?")
-                params.extend([start_date_val.strftime('%Y-%m-%d'), end_date_val.strftime('%Y-%m-%d 23:59:59')])
-
-        if filters.get('mop') and filters['mop'] != "All":
-            conditions.append("ModeOfPayment = ?")
-            params.append(filters['mop'])
-        if filters.get('category') and filters['category'] != "All":
-            conditions.append("Category = ?")
-            params.append(filters['category'])
-
-    if conditions:
-        query += " WHERE " + " AND ".join(conditions)
-
-    valid_sort_columns = ['ID', 'Date', 'Payee', 'Description', 'Amount', 'ModeOfPayment', 'Category', 'Tags']
-    if sort_column not in valid_sort_columns: sort_column = 'ID'
-    if sort_direction.upper() not in ['ASC', 'DESC']: sort_direction = 'ASC'
-    query += f' ORDER BY "{sort_column}" {sort_direction.upper()}'
-    
-    return query, tuple(params)
+    """Helper function to build the SQL query and parameters for fetching expenses."""
+    try:
+        return query_builder.build_query_and_params(search_term, filters, sort_column, sort_direction, search_uses_fts, user_id)
+    except ValueError as e:
+        mb.showerror("Invalid Search", str(e))
+        return None, None
+
+
+def fetch_expense_result(conn, where_sql, params, sort_column, sort_direction, from_rollup):
+    """Worker-thread half of list_all_expenses: runs the filter and fetches the first page."""
+    result = run_expense_query(conn, where_sql, params, sort_column, sort_direction,
+                               page_size=TABLE_PAGE_SIZE, from_rollup=from_rollup)
+    result.materialize(REFINE_MAX_ROWS)
+    first_rows = result.pager.next_page(TABLE_PAGE_SIZE + TABLE_PREFETCH_ROWS)
+    return result, first_rows
 
 
-def list_all_expenses(search_term=None, filters=None, sort_column='ID', sort_direction='ASC'):
-    global connector, table
+def refine_expense_result(conn, base_result, clauses):
+    """Worker-thread half of a refinement: filters the in-memory rows of base_result (no SQL)."""
+    result = base_result.refine(clauses, search_uses_fts)
+    return result, result.pager.next_page(TABLE_PAGE_SIZE + TABLE_PREFETCH_ROWS)
+
+
+def load_expense_snapshot():
+    """Loads a fresh expense snapshot on the database worker thread, unless one is already loading."""
+    global snapshot_loading
+    if not snapshot_enabled or snapshot_loading: return
+    snapshot_loading = True
+
+    def on_loaded(loaded):
+        global expense_snapshot, snapshot_loading
+        expense_snapshot, snapshot_loading = loaded, False
+
+    def on_error(e):
+        global snapshot_enabled, snapshot_loading
+        snapshot_loading = False
+        if isinstance(e, RuntimeError): # numpy is missing: stay with SQLite
+            snapshot_enabled = False
+        print(f"Loading the expense snapshot failed: {e}")
+
+    db_executor.submit(LedgerSnapshot.load, user_id, key='snapshot', callback=on_loaded, errback=on_error)
+
+
+def current_snapshot():
+    """The expense snapshot if it matches the database, else None (and a fresh one starts loading)."""
+    if not snapshot_enabled: return None
+    if expense_snapshot is not None and expense_snapshot.is_current():
+        return expense_snapshot
+    load_expense_snapshot()
+    return None
+
+
+def list_all_expenses(search_term=None, filters=None, sort_column='ID', sort_direction='ASC', show_errors=True):
+    """Runs the search/filter once, on the database worker thread, and hands the result to
+       every view that shows it (see show_expense_result). Applying a new filter while the
+       previous one is still running cancels the previous one.
+       Results are reused from query_cache until the next write, and a search that narrows
+       the one on screen is answered from its rows in memory."""
     if not table: return # Table not initialized yet
+    
+    where_sql, params = build_filter_clause(search_term, filters, show_errors)
+    if where_sql is None: return # Error in building query (e.g. bad custom date)
+
+    key = cache_key(search_term, filters, sort_column, sort_direction)
+    at_generation = generation('expenses')
+
+    def on_result(result_and_rows):
+        global current_query_key, current_query_generation
+        query_cache.put(key, result_and_rows, at_generation)
+        current_query_key, current_query_generation = key, at_generation
+        show_expense_result(result_and_rows)
+
+    cached = query_cache.get(key)
+    if cached is not None:
+        db_executor.cancel('expenses') # An older query still running must not replace this
+        result, first_rows = cached
+        on_result((result.restart(first_rows), first_rows))
+        return
+
+    ledger_snapshot = current_snapshot()
+    if ledger_snapshot is not None:
+        db_executor.cancel('expenses')
+        result = ledger_snapshot.query(search_term, filters, sort_column, sort_direction, search_uses_fts, TABLE_PAGE_SIZE)
+        on_result((result, result.pager.next_page(TABLE_PAGE_SIZE + TABLE_PREFETCH_ROWS)))
+        return
+
+    on_error = lambda e: mb.showerror("Database Error", f"Fetching expenses failed: {e}\nWhere: {where_sql}\nParams: {params}")
+    clauses = None
+    if current_result is not None and current_result.rows is not None and current_query_generation == at_generation:
+        clauses = refinement(current_query_key, key)
+    if clauses is not None:
+        db_executor.submit(refine_expense_result, current_result, clauses, key='expenses', callback=on_result, errback=on_error)
+        return
+
+    # Without search text the filter only touches rollup columns, so totals and charts can use the rollup
+    uses_rollup = not (search_term and search_term.strip())
+    total_expenses_var.set("Total Expenses (Filtered): loading...")
+    db_executor.submit(fetch_expense_result, where_sql, params, sort_column, sort_direction, uses_rollup,
+                       key='expenses', callback=on_result, errback=on_error)
+
+
+def show_expense_result(result_and_rows):
+    """Shows a finished query result: the expense table (first page; more pages load on
+       scroll, see on_table_scroll), the totals label and the charts."""
+    global current_result, page_request_pending
+    current_result, first_rows = result_and_rows
+    page_request_pending = False
 
     table.delete(*table.get_children())
+    insert_expense_rows(first_rows, 0)
+    # Changed currency symbol to ₹
+    total_expenses_var.set(f"Total Expenses (Filtered): ₹{current_result.total:.2f} ({current_result.count} entries)")
     
-    query, params = build_query_and_params(search_term, filters, sort_column, sort_direction)
-    if query is None: return # Error in building query (e.g. bad custom date)
+    update_charts(current_result)
 
-    current_total_expenses = 0.0
-    try:
-        all_data = connector.execute(query, params)
-        data_for_table = all_data.fetchall() # Fetch all for table display
-
-        for i, values in enumerate(data_for_table):
-            if len(values) == 8:
-                display_date = values[1]
-                if isinstance(display_date, str) and len(display_date) > 10: # Check if it's a full datetime string
-                    try:
-                        display_date = datetime.datetime.strptime(display_date.split(" ")[0], '%Y-%m-%d').strftime('%Y-%m-%d')
-                    except ValueError: pass # Keep original if parsing fails
-                
-                amount_val = values[4]
-                current_total_expenses += float(amount_val if amount_val else 0)
-
-                # Changed currency symbol to ₹
-                formatted_values = (values[0], display_date, values[2], values[3], f"₹{float(amount_val if amount_val else 0):.2f}", values[5], values[6], values[7])
-                table.insert('', END, values=formatted_values, tags=('evenrow' if i % 2 == 0 else 'oddrow',))
-            else:
-                print(f"Warning: Row has unexpected columns: {values}")
-        
+
+def insert_expense_rows(rows, start_index):
+    for i, values in enumerate(rows, start=start_index):
+        display_date = values[1]
+        if isinstance(display_date, str) and len(display_date) > 10: # Check if it's a full datetime string
+            try:
+                display_date = datetime.datetime.strptime(display_date.split(" ")[0], '%Y-%m-%d').strftime('%Y-%m-%d')
+            except ValueError: pass # Keep original if parsing fails
+        amount_val = values[4]
         # Changed currency symbol to ₹
-        total_expenses_var.set(f"Total Expenses (Filtered): ₹{current_total_expenses:.2f}")
+        formatted_values = (values[0], display_date, values[2], values[3], f"₹{float(amount_val if amount_val else 0):.2f}", values[5], values[6], values[7])
+        table.insert('', END, values=formatted_values, tags=('evenrow' if i % 2 == 0 else 'oddrow',))
+
+
+def load_more_expenses():
+    """Requests the next page of the current result set from the worker thread."""
+    global page_request_pending
+    if not table or not current_result or current_result.pager.exhausted or page_request_pending: return
+    pager = current_result.pager
+    page_request_pending = True
+
+    def on_page(rows):
+        global page_request_pending
+        if not current_result or current_result.pager is not pager: return # A newer filter replaced this result
+        page_request_pending = False
+        insert_expense_rows(rows, len(table.get_children()))
+
+    def on_error(e):
+        global page_request_pending
+        page_request_pending = False
+        mb.showerror("Database Error", f"Fetching expenses failed: {e}")
+
+    if isinstance(current_result.rows, SnapshotRows): # In memory, and only the Tk thread touches the snapshot
+        on_page(pager.next_page())
+        return
+    db_executor.submit(lambda conn: pager.next_page(), callback=on_page, errback=on_error)
 
-    except sqlite3.Error as e:
-        mb.showerror("Database Error", f"Fetching expenses failed: {e}\nQuery: {query}\nParams: {params}")
-    
-    get_all_categories_from_db()
 
+def on_table_scroll(first, last):
+    """yscrollcommand for the expense table: updates the scrollbar and prefetches
+       the next page once the view gets close to the last loaded row."""
+    ys.set(first, last)
+    if current_result and not current_result.pager.exhausted and float(last) >= TABLE_PREFETCH_THRESHOLD:
+        root.after_idle(load_more_expenses)
 
-def apply_search_and_filters():
+
+def get_current_filters():
+    """Reads the search box and filter widgets into (search_term, filters).
+       Returns (None, None) if the custom date range can't be read."""
     search_term = search_query_var.get()
     filters = {
         'date_range': filter_date_range_var.get(),
@@ -505,12 +543,43 @@ def apply_search_and_filters():
                 filters['custom_end'] = custom_end_date.get_date().strftime('%Y-%m-%d')
             except AttributeError:
                  mb.showerror("Custom Date Error", "Please select valid start and end dates.")
-                 return
+                 return None, None
         else: # Should not happen if UI is built correctly
             mb.showerror("UI Error", "Custom date pickers not found.")
-            return
+            return None, None
+    return search_term, filters
+
+
+def on_search_typed(*args):
+    """Live search: runs the search once typing has paused for SEARCH_DEBOUNCE_MS."""
+    global live_search_after_id
+    cancel_live_search()
+    live_search_after_id = root.after(SEARCH_DEBOUNCE_MS, run_live_search)
+
+
+def cancel_live_search():
+    global live_search_after_id
+    if live_search_after_id:
+        root.after_cancel(live_search_after_id)
+        live_search_after_id = None
+
+
+def run_live_search():
+    global live_search_after_id
+    live_search_after_id = None
+    search_term, filters = get_current_filters()
+    if filters is None: return
+    # Half-typed searches like 'amount:>' are normal while typing, so no error popups
+    list_all_expenses(search_term=search_term, filters=filters, sort_column=current_sort_column,
+                      sort_direction=current_sort_direction, show_errors=False)
+
+
+def apply_search_and_filters():
+    cancel_live_search()
+    search_term, filters = get_current_filters()
+    if filters is None: return
+    # Also refreshes the totals and charts from the same result
     list_all_expenses(search_term=search_term, filters=filters, sort_column=current_sort_column, sort_direction=current_sort_direction)
-    update_charts() # Auto-update charts on filter change
 
 
 def reset_search_and_filters():
@@ -521,8 +590,8 @@ def reset_search_and_filters():
     if custom_start_date: custom_start_date.set_date(datetime.date.today())
     if custom_end_date: custom_end_date.set_date(datetime.date.today())
     toggle_custom_date_fields()
+    cancel_live_search() # Clearing the search box scheduled one
     list_all_expenses(sort_column=current_sort_column, sort_direction=current_sort_direction)
-    update_charts() # Auto-update charts
 
 
 def sort_by_column_header(column_name):
@@ -562,11 +631,12 @@ def remove_expense_from_db():
 
     if mb.askyesno('Confirm Delete', f'Delete expense for {payee_name} (ID: {expense_id})?'):
         try:
-            connector.execute('DELETE FROM ExpenseTracker WHERE ID=?', (expense_id,))
-            connector.commit()
+            repository.delete_expense(connector, expense_id, user_id)
+            if expense_snapshot is not None: expense_snapshot.expense_deleted(expense_id)
+            get_all_categories_from_db()
             apply_search_and_filters()
             mb.showinfo('Success', 'Expense deleted successfully.')
-            check_and_award_achievements() # Check achievements after deletion
+            check_and_award_achievements(achievements.EXPENSE_DELETED)
         except sqlite3.Error as e:
             mb.showerror("Database Error", f"Could not delete: {e}")
 
@@ -575,18 +645,19 @@ def remove_all_expenses_from_db():
     if mb.askyesno('Confirm Delete All', 'DELETE ALL expenses from the database? This cannot be undone.', icon='warning'):
         try:
             if table: table.delete(*table.get_children())
-            connector.execute('DELETE FROM ExpenseTracker')
-            connector.commit()
+            repository.delete_all_expenses(connector, user_id)
+            if expense_snapshot is not None: expense_snapshot.expenses_cleared()
+            get_all_categories_from_db()
             clear_entry_fields()
             apply_search_and_filters()
             mb.showinfo('Success', 'All expenses deleted.')
-            check_and_award_achievements() # Check achievements after deletion
+            check_and_award_achievements(achievements.EXPENSE_DELETED)
         except sqlite3.Error as e:
             mb.showerror("Database Error", f"Could not delete all: {e}")
 
 
 def add_expense_to_db():
-    if not date_entry.get_date() or not payee.get() or not desc.get() or not amnt.get() or not MoP.get() or not category_var.get():
+    if not date_entry or not date_entry.get_date() or not payee.get() or not desc.get() or not amnt.get() or not MoP.get() or not category_var.get():
         mb.showerror('Fields Empty', "Fill all mandatory fields (Date, Payee, Description, Amount, MoP, Category).")
         return
     try:
@@ -600,19 +671,19 @@ def add_expense_to_db():
     
     current_cat = category_var.get()
     if current_cat and current_cat not in available_categories and current_cat != "All":
-        available_categories.append(current_cat)
-        get_all_categories_from_db() # This will sort and update dropdowns
+        available_categories.append(current_cat) # Sorted into the dropdowns once the expense is saved
 
+    expense_date = date_entry.get_date()
     try:
-        connector.execute(
-            'INSERT INTO ExpenseTracker (Date, Payee, Description, Amount, ModeOfPayment, Category, Tags) VALUES (?, ?, ?, ?, ?, ?, ?)',
-            (date_entry.get_date().strftime('%Y-%m-%d'), payee.get(), desc.get(), amnt.get(), MoP.get(), current_cat, tags_var.get())
-        )
-        connector.commit()
+        repository.add_expense(connector, expense_date, payee.get(), desc.get(), amount_val, MoP.get(), current_cat, tags_var.get(),
+                               user_id)
+        if expense_snapshot is not None: expense_snapshot.expenses_added(connector)
+        get_all_categories_from_db() # This will sort and update dropdowns
         clear_entry_fields()
         apply_search_and_filters()
         mb.showinfo('Success', 'Expense added.')
-        check_and_award_achievements() # Check achievements after adding
+        check_and_award_achievements(achievements.EXPENSE_ADDED, expense_date)
+        show_budget_alerts()
         display_personalized_recommendation() # Show recommendation after adding
     except sqlite3.Error as e:
         mb.showerror("Database Error", f"Could not add: {e}")
@@ -640,7 +711,8 @@ def open_edit_save_dialog(expense_id_to_edit=None):
     # Populate fields if editing
     if expense_id_to_edit:
         try:
-            cursor.execute("SELECT Date, Payee, Description, Amount, ModeOfPayment, Category, Tags FROM ExpenseTracker WHERE ID = ?", (expense_id_to_edit,))
+            cursor.execute("SELECT Date, Payee, Description, Amount, ModeOfPayment, Category, Tags FROM ExpenseTracker "
+                           "WHERE ID = ? AND UserID = ?", (expense_id_to_edit, user_id))
             data = cursor.fetchone()
             if data:
                 # Format date correctly for DateEntry
@@ -671,7 +743,7 @@ def open_edit_save_dialog(expense_id_to_edit=None):
     form_frame.pack(fill=BOTH, expand=True)
 
     Label(form_frame, text="Date:", font=lbl_font, bg=background_color).grid(row=0, column=0, sticky=W, pady=2)
-    dlg_date_entry = DateEntry(form_frame, date_pattern='y-mm-dd', font=entry_font, width=35, selectmode='day', relief=SOLID, borderwidth=1)
+    dlg_date_entry = make_date_entry(form_frame, font=entry_font, width=35, selectmode='day', relief=SOLID, borderwidth=1)
     if expense_id_to_edit and data: dlg_date_entry.set_date(date_obj)
     else: dlg_date_entry.set_date(datetime.date.today())
     dlg_date_entry.grid(row=1, column=0, columnspan=2, sticky=W+E, pady=(0,10))
@@ -712,23 +784,22 @@ def open_edit_save_dialog(expense_id_to_edit=None):
 
         new_cat = dlg_cat_var.get()
         if new_cat and new_cat not in available_categories and new_cat != "All":
-            available_categories.append(new_cat)
-            get_all_categories_from_db() # Update global list and other dropdowns
+            available_categories.append(new_cat) # Added to the other dropdowns once the expense is saved
 
+        expense_date = dlg_date_entry.get_date()
         try:
             if expense_id_to_edit:
-                connector.execute(
-                    'UPDATE ExpenseTracker SET Date=?, Payee=?, Description=?, Amount=?, ModeOfPayment=?, Category=?, Tags=? WHERE ID=?',
-                    (dlg_date_entry.get_date().strftime('%Y-%m-%d'), dlg_payee_var.get(), dlg_desc_var.get(), dlg_amnt_var.get(),
-                     dlg_mop_var.get(), new_cat, dlg_tags_var.get(), expense_id_to_edit)
-                )
+                repository.update_expense(connector, expense_id_to_edit, expense_date, dlg_payee_var.get(), dlg_desc_var.get(),
+                                          amount_val, dlg_mop_var.get(), new_cat, dlg_tags_var.get(), user_id)
+                if expense_snapshot is not None: expense_snapshot.expense_updated(connector, expense_id_to_edit)
             else: # This part is not currently used as "Add" uses the main panel. Kept for potential future use.
-                pass # connector.execute('INSERT INTO ...')
-            connector.commit()
+                pass # repository.add_expense(connector, ...)
+            get_all_categories_from_db() # Update global list and other dropdowns
             apply_search_and_filters() # Refresh main table
             mb.showinfo("Success", "Expense saved successfully.", parent=dialog)
             dialog.destroy()
-            check_and_award_achievements() # Check achievements after editing
+            check_and_award_achievements(achievements.EXPENSE_EDITED, expense_date)
+            show_budget_alerts()
         except sqlite3.Error as e:
             mb.showerror("Database Error", f"Could not save: {e}", parent=dialog)
 
@@ -763,7 +834,7 @@ def selected_expense_to_words_action():
 
 
 def expense_to_words_before_adding_action():
-    if not date_entry.get_date() or not desc.get() or not amnt.get() or not payee.get() or not MoP.get() or not category_var.get():
+    if not date_entry or not date_entry.get_date() or not desc.get() or not amnt.get() or not payee.get() or not MoP.get() or not category_var.get():
         mb.showerror('Incomplete data', 'Fill all mandatory fields first!')
         return
     try:
@@ -777,9 +848,24 @@ def expense_to_words_before_adding_action():
         add_expense_to_db()
 
 
+def build_custom_date_fields():
+    """Creates the From/To date pickers the first time "Custom Range" is selected."""
+    global custom_start_date_label, custom_start_date, custom_end_date_label, custom_end_date
+    custom_start_date_label = Label(sf_inner, text="From:", font=lbl_font, bg=background_color)
+    custom_start_date = make_date_entry(sf_inner, font=entry_font, width=10, relief=SOLID, borderwidth=1)
+    custom_end_date_label = Label(sf_inner, text="To:", font=lbl_font, bg=background_color)
+    custom_end_date = make_date_entry(sf_inner, font=entry_font, width=10, relief=SOLID, borderwidth=1)
+    custom_start_date_label.grid(row=1, column=2, padx=(5,0), pady=3, sticky=E)
+    custom_start_date.grid(row=1, column=3, padx=3, pady=3, sticky=W)
+    custom_end_date_label.grid(row=1, column=4, padx=(5,0), pady=3, sticky=E)
+    custom_end_date.grid(row=1, column=5, padx=3, pady=3, sticky=W)
+
+
 def toggle_custom_date_fields(event=None):
     if not (custom_start_date_label and custom_start_date and custom_end_date_label and custom_end_date):
-        return # Widgets not initialized
+        if filter_date_range_var.get() != "Custom Range":
+            return # Not needed yet
+        build_custom_date_fields()
     if filter_date_range_var.get() == "Custom Range":
         custom_start_date_label.grid()
         custom_start_date.grid()
@@ -792,136 +878,14 @@ def toggle_custom_date_fields(event=None):
         custom_end_date.grid_remove()
 
 # --- Charting Functions ---
-def update_charts():
-    if not MATPLOTLIB_AVAILABLE:
-        # mb.showwarning("Charting Disabled", "Matplotlib library is not installed. Charts cannot be displayed.")
-        return
-
-    # Fetch currently filtered data for charts
-    search_term = search_query_var.get()
-    filters = {
-        'date_range': filter_date_range_var.get(),
-        'mop': filter_mop_var.get(),
-        'category': filter_category_var.get()
-    }
-    if filters['date_range'] == "Custom Range":
-        if custom_start_date and custom_end_date:
-            try:
-                filters['custom_start'] = custom_start_date.get_date().strftime('%Y-%m-%d')
-                filters['custom_end'] = custom_end_date.get_date().strftime('%Y-%m-%d')
-            except AttributeError: return # Not ready
-        else: return # Not ready
-    
-    query, params = build_query_and_params(search_term, filters)
-    if query is None: return
-
-    try:
-        cursor.execute(query, params)
-        all_filtered_data = cursor.fetchall()
-    except sqlite3.Error as e:
-        mb.showerror("Chart Data Error", f"Could not fetch data for charts: {e}")
-        return
-
-    plot_category_pie_chart(all_filtered_data)
-    plot_monthly_bar_chart(all_filtered_data)
-
-
-def plot_category_pie_chart(data):
-    global pie_ax, pie_chart_canvas_agg
-    if not MATPLOTLIB_AVAILABLE or not pie_ax or not pie_chart_canvas_agg: return
-
-    pie_ax.clear() # Clear previous plot
-    if not data:
-        pie_ax.text(0.5, 0.5, "No data for pie chart.", ha='center', va='center', color=text_color)
-        pie_chart_canvas_agg.draw()
-        return
-
-    category_spending = {}
-    for row in data: # ID, Date, Payee, Description, Amount, ModeOfPayment, Category, Tags
-        # Ensure row has enough columns before accessing index 6 and 4
-        if len(row) > 6:  # Check if index 6 (Category) is accessible
-            category = row[6] if row[6] else "Uncategorized"
-        else:
-            category = "Unknown Category" # Default or handle as appropriate for missing data
-            # print(f"Warning: Row has insufficient columns for category: {row}") # Log unexpected row structure
-
-        if len(row) > 4: # Check if index 4 (Amount) is accessible
-            amount = float(row[4] if row[4] else 0)
-        else:
-            amount = 0.0 # Default or handle as appropriate for missing data
-            # print(f"Warning: Row has insufficient columns for amount: {row}") # Log unexpected row structure
-            continue # Skip this row if amount is critical and missing
-
-        category_spending[category] = category_spending.get(category, 0) + amount
-    
-    if not category_spending:
-        pie_ax.text(0.5, 0.5, "No category spending to display.", ha='center', va='center', color=text_color)
-        pie_chart_canvas_agg.draw()
-        return
-
-    labels = category_spending.keys()
-    sizes = category_spending.values()
-    
-    # Use a Matplotlib colormap for diverse colors
-    colors = plt.cm.get_cmap('viridis', len(labels)) # 'viridis' is a good default
-
-    pie_ax.pie(sizes, labels=labels, autopct='%1.1f%%', startangle=90, colors=[colors(i) for i in range(len(labels))])
-    pie_ax.axis('equal')  # Equal aspect ratio ensures that pie is drawn as a circle.
-    pie_ax.set_title("Spending by Category", fontsize=10, color=text_color)
-    pie_chart_canvas_agg.draw()
-
-
-def plot_monthly_bar_chart(data):
-    global bar_ax, bar_chart_canvas_agg
-    if not MATPLOTLIB_AVAILABLE or not bar_ax or not bar_chart_canvas_agg: return
-    
-    bar_ax.clear()
-    if not data:
-        bar_ax.text(0.5, 0.5, "No data for bar chart.", ha='center', va='center', color=text_color)
-        bar_chart_canvas_agg.draw()
-        return
-
-    monthly_spending = {} # Key: "YYYY-MM", Value: total_amount
-    for row in data:
-        try:
-            # Ensure row has enough columns before accessing index 1 and 4
-            if len(row) > 1: # Check if index 1 (Date) is accessible
-                date_obj = datetime.datetime.strptime(row[1].split(" ")[0], '%Y-%m-%d')
-                month_year = date_obj.strftime("%Y-%m")
-            else:
-                # print(f"Warning: Row has insufficient columns for date: {row}")
-                continue # Skip if date is missing
-
-            if len(row) > 4: # Check if index 4 (Amount) is accessible
-                amount = float(row[4] if row[4] else 0)
-            else:
-                amount = 0.0
-                # print(f"Warning: Row has insufficient columns for amount: {row}")
-                continue # Skip if amount is missing
-
-            monthly_spending[month_year] = monthly_spending.get(month_year, 0) + amount
-        except ValueError:
-            # print(f"Warning: Could not parse date or amount for row: {row}")
-            continue # Skip if date is malformed
-
-    if not monthly_spending:
-        bar_ax.text(0.5, 0.5, "No monthly spending to display.", ha='center', va='center', color=text_color)
-        bar_chart_canvas_agg.draw()
-        return
-        
-    sorted_months = sorted(monthly_spending.keys())
-    amounts = [monthly_spending[month] for month in sorted_months]
-    
-    bar_ax.bar(sorted_months, amounts, color=primary_color)
-    bar_ax.set_xlabel("Month (YYYY-MM)", fontsize=8, color=text_color)
-    # Changed currency symbol to ₹
-    bar_ax.set_ylabel("Total Spending (₹)", fontsize=8, color=text_color)
-    bar_ax.set_title("Monthly Spending Trend", fontsize=10, color=text_color)
-    bar_ax.tick_params(axis='x', rotation=45, labelsize=7, colors=text_color)
-    bar_ax.tick_params(axis='y', labelsize=7, colors=text_color)
-    bar_ax.grid(axis='y', linestyle='--', alpha=0.7, color=text_color)
-    plt.tight_layout() # Adjust layout to prevent labels from overlapping (for the bar chart figure)
-    bar_chart_canvas_agg.draw()
+def update_charts(result=None):
+    """Shows the aggregates of a query result (defaults to the result currently shown in
+       the table) in the charts. See charts.ChartManager: unchanged aggregates aren't
+       redrawn, and nothing is drawn while the Reports tab is hidden."""
+    if not chart_manager: return # Reports tab not built yet, or Matplotlib missing
+    result = result or current_result
+    if result is None: return # No valid filter applied yet
+    chart_manager.update(result.by_category, result.by_month)
 
 # --- Budgeting Functions (Basic) ---
 def manage_budgets():
@@ -947,14 +911,15 @@ def manage_budgets():
         mb.showerror("Invalid Amount", "Please enter a valid number for the budget.", parent=root)
         return
 
+    recurring = mb.askyesno("Set Budget", f"Use this budget for every month after {month_year} too?", parent=root)
+
     try:
-        # Use INSERT OR REPLACE to update if exists, or insert if new for that period-category
-        cursor.execute("INSERT OR REPLACE INTO Budgets (Category, Amount, Period) VALUES (?, ?, ?)",
-                       (category.strip(), amount, month_year.strip()))
-        connector.commit()
+        budgets.set_budget(connector, category, month_year, amount, recurring, user_id)
         # Changed currency symbol to ₹
-        mb.showinfo("Budget Set", f"Budget for {category} in {month_year} set to ₹{amount:.2f}.", parent=root)
+        every = " and every month after" if recurring else ""
+        mb.showinfo("Budget Set", f"Budget for {category} in {month_year}{every} set to ₹{amount:.2f}.", parent=root)
         update_progress_visualization() # Update progress after budget change
+        check_and_award_achievements(achievements.BUDGET_SET)
     except sqlite3.Error as e:
         mb.showerror("Database Error", f"Could not set budget: {e}", parent=root)
 
@@ -962,13 +927,22 @@ def manage_budgets():
 def get_budget_for_category(category, period_yyyy_mm):
     """Retrieves budget for a given category and period (YYYY-MM)."""
     try:
-        cursor.execute("SELECT Amount FROM Budgets WHERE Category = ? AND Period = ?", (category, period_yyyy_mm))
-        result = cursor.fetchone()
-        return result[0] if result else None
+        return budgets.get_budget(connector, category, period_yyyy_mm, user_id)
     except sqlite3.Error as e:
         print(f"Error fetching budget for {category} in {period_yyyy_mm}: {e}")
         return None
 
+
+def show_budget_alerts():
+    """Shows the budget thresholds that the latest writes crossed (see budget_tracking.py)."""
+    try:
+        alerts = budgets.unseen_alerts(connector, user_id=user_id)
+    except sqlite3.Error as e:
+        print(f"Error reading budget alerts: {e}")
+        return
+    if alerts:
+        mb.showwarning("Budget Alert", "\n".join(budgets.describe_alert(*alert) for alert in alerts))
+
 # --- Custom Reporting Templates ---
 def save_current_report_template():
     template_name = simpledialog.askstring("Save Report Template", "Enter a name for this report template:", parent=root)
@@ -985,10 +959,10 @@ def save_current_report_template():
     }
 
     try:
-        cursor.execute("INSERT OR REPLACE INTO ReportTemplates (Name, SearchTerm, FilterDateRange, CustomStartDate, CustomEndDate, FilterMoP, FilterCategory) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        cursor.execute("INSERT OR REPLACE INTO ReportTemplates (Name, SearchTerm, FilterDateRange, CustomStartDate, CustomEndDate, FilterMoP, FilterCategory, UserID) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
                        (template_name, current_filters['SearchTerm'], current_filters['FilterDateRange'],
                         current_filters['CustomStartDate'], current_filters['CustomEndDate'],
-                        current_filters['FilterMoP'], current_filters['FilterCategory']))
+                        current_filters['FilterMoP'], current_filters['FilterCategory'], user_id))
         connector.commit()
         mb.showinfo("Template Saved", f"Report template '{template_name}' saved successfully.")
     except sqlite3.Error as e:
@@ -996,7 +970,7 @@ def save_current_report_template():
 
 def load_report_template():
     try:
-        cursor.execute("SELECT Name FROM ReportTemplates ORDER BY Name")
+        cursor.execute("SELECT Name FROM ReportTemplates WHERE UserID = ? ORDER BY Name", (user_id,))
         templates = [row[0] for row in cursor.fetchall()]
         if not templates:
             mb.showinfo("No Templates", "No saved report templates found.")
@@ -1006,15 +980,15 @@ def load_report_template():
         if not selected_template or selected_template not in templates:
             return
 
-        cursor.execute("SELECT SearchTerm, FilterDateRange, CustomStartDate, CustomEndDate, FilterMoP, FilterCategory FROM ReportTemplates WHERE Name = ?", (selected_template,))
+        cursor.execute("SELECT SearchTerm, FilterDateRange, CustomStartDate, CustomEndDate, FilterMoP, FilterCategory FROM ReportTemplates WHERE UserID = ? AND Name = ?", (user_id, selected_template))
         template_data = cursor.fetchone()
         if template_data:
             search_query_var.set(template_data[0])
             filter_date_range_var.set(template_data[1])
+            toggle_custom_date_fields() # Ensure custom date fields are shown/hidden correctly
             if template_data[1] == "Custom Range":
                 if custom_start_date: custom_start_date.set_date(datetime.datetime.strptime(template_data[2], '%Y-%m-%d').date())
                 if custom_end_date: custom_end_date.set_date(datetime.datetime.strptime(template_data[3], '%Y-%m-%d').date())
-            toggle_custom_date_fields() # Ensure custom date fields are shown/hidden correctly
             filter_mop_var.set(template_data[4])
             filter_category_var.set(template_data[5])
             apply_search_and_filters()
@@ -1026,22 +1000,109 @@ def load_report_template():
     except ValueError as e:
         mb.showerror("Date Error", f"Error parsing date in template: {e}")
 
+# --- Bulk Import ---
+def import_statement_file():
+    """Imports a CSV / JSON Lines / OFX / QFX file on the database worker thread with a progress dialog.
+       Categories, the table, charts and achievements are refreshed once at the end."""
+    path = filedialog.askopenfilename(parent=root, title="Import Expenses",
+                                      filetypes=[("Statements", "*.csv *.jsonl *.ndjson *.ofx *.qfx"), ("All files", "*.*")])
+    if not path: return
+
+    progress_state = {'fraction': 0.0, 'rows': 0} # Written by the worker thread, read by the Tk thread
+    dialog = Toplevel(root)
+    dialog.transient(root)
+    dialog.grab_set()
+    dialog.title("Importing...")
+    dialog.resizable(False, False)
+    dialog.configure(bg=background_color, padx=20, pady=20)
+    progress_label = Label(dialog, text=f"Reading {path}", font=lbl_font, bg=background_color, fg=text_color)
+    progress_label.pack(pady=(0, 10))
+    progress_bar = ttk.Progressbar(dialog, orient="horizontal", length=300, mode="determinate")
+    progress_bar.pack()
+
+    def on_progress(fraction, rows):
+        progress_state['fraction'] = fraction
+        progress_state['rows'] = rows
+
+    def refresh_progress():
+        if not dialog.winfo_exists(): return
+        progress_bar['value'] = progress_state['fraction'] * 100
+        progress_label.config(text=f"Imported {progress_state['rows']} expenses...")
+        dialog.after(100, refresh_progress)
+
+    def on_done(summary):
+        dialog.destroy()
+        mb.showinfo("Import Complete", f"Imported {summary['imported']} expenses.\nSkipped {summary['skipped']} unusable records.")
+        get_all_categories_from_db()
+        apply_search_and_filters()
+        check_and_award_achievements(achievements.EXPENSES_IMPORTED)
+        show_budget_alerts()
+        display_personalized_recommendation()
+
+    def on_error(e):
+        dialog.destroy()
+        mb.showerror("Import Failed", f"Nothing was imported: {e}")
+
+    refresh_progress()
+    db_executor.submit(import_file, path, None, IMPORT_BATCH_SIZE, on_progress, user_id, callback=on_done, errback=on_error)
+
+# --- Export ---
+def export_filtered_expenses():
+    """Exports the currently filtered and sorted expenses on the database worker thread.
+       The format follows the chosen file extension."""
+    search_term, filters = get_current_filters()
+    if filters is None: return
+    query, params = build_query_and_params(search_term, filters, current_sort_column, current_sort_direction)
+    if query is None: return
+
+    path = filedialog.asksaveasfilename(parent=root, title="Export Expenses", defaultextension=".csv",
+                                        filetypes=[("CSV", "*.csv"), ("JSON Lines", "*.jsonl"), ("Parquet", "*.parquet"), ("Text report", "*.txt")])
+    if not path: return
+    try:
+        format_for(path)
+    except ValueError as e:
+        mb.showerror("Export Failed", str(e))
+        return
+
+    db_executor.submit(export_query, query, params, path,
+                       callback=lambda count: mb.showinfo("Export Complete", f"Exported {count} expenses to {path}."),
+                       errback=lambda e: mb.showerror("Export Failed", f"Could not export: {e}"))
+
 # --- Personalized Recommendations ---
-def get_spending_summary():
+# The tip reads a year of the user's expenses into arrays (see analytics.py), so it's
+# worked out on the database worker thread and only the label is set on the Tk thread.
+def get_spending_summary(conn):
     """Calculates total spending per category for the last 30 days."""
     end_date = datetime.date.today()
     start_date = end_date - datetime.timedelta(days=30)
-    query = "SELECT Category, SUM(Amount) FROM ExpenseTracker WHERE Date BETWEEN ? AND ? GROUP BY Category"
     try:
-        cursor.execute(query, (start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d 23:59:59')))
-        return cursor.fetchall()
+        return reports.spending_by_category(conn, start_date, end_date, user_id)
     except sqlite3.Error as e:
         print(f"Error fetching spending summary for recommendations: {e}")
         return []
 
-def display_personalized_recommendation():
-    """Analyzes spending and provides a simple recommendation."""
-    spending_summary = get_spending_summary()
+def get_unusual_expense(conn):
+    """(amount, date, category, typical amount) for the most unusual expense of the last 30 days,
+       judged against the past year of its category. None if nothing stands out or numpy isn't installed."""
+    today = datetime.date.today()
+    try:
+        columns = analytics.load_user_columns(conn, today - datetime.timedelta(days=365), today, user_id)
+        index = analytics.most_unusual(columns, since=today - datetime.timedelta(days=30))
+        if index is None:
+            return None
+        code = columns.codes[index]
+        median = analytics.category_percentiles(columns, (50,))[code, 0]
+        return float(columns.amounts[index]), str(columns.dates[index]), columns.categories[code], float(median)
+    except RuntimeError: # numpy not installed
+        return None
+    except sqlite3.Error as e:
+        print(f"Error analysing spending for recommendations: {e}")
+        return None
+
+def build_recommendation(conn):
+    """Worker-thread half of display_personalized_recommendation: analyzes spending and
+       returns a simple recommendation."""
+    spending_summary = get_spending_summary(conn)
     total_spending = sum(amount for _, amount in spending_summary)
 
     recommendation_text = "No specific recommendations yet. Keep tracking your expenses!"
@@ -1055,7 +1116,11 @@ def display_personalized_recommendation():
                 max_spending = amount
                 most_spent_category = category
         
-        if most_spent_category:
+        unusual = get_unusual_expense(conn)
+        if unusual:
+            amount, date, category, typical = unusual
+            recommendation_text = f"Your ₹{amount:.2f} '{category}' expense on {date} is well above your usual ₹{typical:.2f} for that category. Worth a second look?"
+        elif most_spent_category:
             # Simple rule-based recommendation
             if most_spent_category.lower() in ["food", "entertainment", "shopping"] and max_spending / total_spending > 0.3:
                 recommendation_text = f"You spend a significant amount on '{most_spent_category}'. Consider setting a budget for this category or looking for alternatives to save money!"
@@ -1064,72 +1129,55 @@ def display_personalized_recommendation():
             else:
                 recommendation_text = "Great job tracking your expenses! Keep an eye on your spending in different categories."
     
+    return recommendation_text
+
+def show_recommendation(recommendation_text):
     # Display recommendation in a small, non-intrusive way, e.g., a temporary label or a dedicated section.
     # For now, let's use a messagebox for simplicity. In a real app, this would be a small pop-up or a dashboard widget.
     # mb.showinfo("Personalized Tip", recommendation_text)
     # Or update a label on the reports tab:
-    if hasattr(root, 'recommendation_label'): # Check if label exists
-        root.recommendation_label.config(text=f"Tip: {recommendation_text}")
-    else:
-        print(f"Tip: {recommendation_text}") # Fallback to print if UI element not ready
+    recommendation_label.config(text=f"Tip: {recommendation_text}")
+
+def display_personalized_recommendation():
+    """Works out a recommendation in the background and shows it on the Reports tab."""
+    if recommendation_label is None: return # Shown on the Reports tab; computed when it is first opened
+    # Keyed: a newer add or import supersedes a tip still being worked out
+    db_executor.submit(build_recommendation, key='recommendation', callback=show_recommendation)
 
 # --- Gamification: Achievements ---
-achievements_list = [
-    {"name": "First Step", "description": "Add your first expense.", "condition": lambda: get_expense_count() >= 1},
-    {"name": "Budget Setter", "description": "Set your first budget.", "condition": lambda: get_budget_count() >= 1},
-    {"name": "Fifty Expenses", "description": "Log 50 expenses.", "condition": lambda: get_expense_count() >= 50},
-    {"name": "Monthly Tracker", "description": "Log expenses for 30 consecutive days (at least one per day).", "condition": lambda: check_consecutive_days_logged(30)},
-    {"name": "Zero Debt Day", "description": "Have zero expenses for a day (requires no expenses logged today).", "condition": lambda: check_zero_expense_today()}
-]
-
-def get_expense_count():
-    cursor.execute("SELECT COUNT(*) FROM ExpenseTracker")
-    return cursor.fetchone()[0]
-
-def get_budget_count():
-    cursor.execute("SELECT COUNT(*) FROM Budgets")
-    return cursor.fetchone()[0]
-
-def check_consecutive_days_logged(days):
-    # This is a simplified check. A more robust one would need to check for actual daily entries.
-    # For now, just check if total expenses are high enough to imply consistent usage.
-    # This needs actual date logic for proper implementation.
-    # For demonstration, let's just use total expenses as a proxy.
-    return get_expense_count() >= days * 2 # Assuming at least 2 expenses per day for 'days' days
-
-def check_zero_expense_today():
-    today_str = datetime.date.today().strftime('%Y-%m-%d')
-    cursor.execute("SELECT COUNT(*) FROM ExpenseTracker WHERE Date = ?", (today_str,))
-    return cursor.fetchone()[0] == 0
-
-def check_and_award_achievements():
-    """Checks conditions for all achievements and awards them if not already achieved."""
-    for achievement in achievements_list:
-        name = achievement["name"]
-        description = achievement["description"]
-        condition_func = achievement["condition"]
-
-        cursor.execute("SELECT AchievedDate FROM Achievements WHERE Name = ?", (name,))
-        if cursor.fetchone() is None: # Not yet achieved
-            if condition_func():
-                try:
-                    achieved_date = datetime.date.today().strftime('%Y-%m-%d')
-                    cursor.execute("INSERT INTO Achievements (Name, Description, AchievedDate) VALUES (?, ?, ?)",
-                                   (name, description, achieved_date))
-                    connector.commit()
-                    mb.showinfo("Achievement Unlocked!", f"Congratulations! You unlocked: {name}\n\n{description}")
-                    update_achievements_display() # Refresh achievements tab
-                except sqlite3.Error as e:
-                    print(f"Error awarding achievement {name}: {e}")
+# Each write reports what it did; only the achievements that event can affect are
+# checked, against counters kept by triggers (see expense_tracker/core/achievements.py).
+# Checks run on the database worker thread and get its connection.
+
+def award_pending_achievements(conn, event, date=None):
+    """Worker-thread half of check_and_award_achievements: records every achievement the
+       event earned and returns them as (name, description) pairs."""
+    try:
+        return achievements.evaluate(conn, event, date, user_id)
+    except sqlite3.Error as e:
+        print(f"Error checking achievements: {e}")
+        return []
+
+def announce_achievements(awarded):
+    for name, description in awarded:
+        mb.showinfo("Achievement Unlocked!", f"Congratulations! You unlocked: {name}\n\n{description}")
+    if awarded:
+        update_achievements_display() # Refresh achievements tab
+
+def check_and_award_achievements(event=achievements.STARTUP, date=None):
+    """Checks the achievements an event (see achievements.py) can affect in the background
+       and announces new ones. date is the expense date an add or edit touched."""
+    # No key: every check must report back, or an award could go unannounced
+    db_executor.submit(award_pending_achievements, event, date, callback=announce_achievements)
 
 def get_achievements():
     """Fetches all achieved achievements from the database."""
-    cursor.execute("SELECT Name, Description, AchievedDate FROM Achievements ORDER BY AchievedDate DESC")
+    cursor.execute("SELECT Name, Description, AchievedDate FROM Achievements WHERE UserID = ? ORDER BY AchievedDate DESC", (user_id,))
     return cursor.fetchall()
 
 def update_achievements_display():
     """Refreshes the display on the Achievements tab."""
-    if 'achievements_tree' in globals() and achievements_tree:
+    if achievements_tree: # Built when the Achievements tab is first opened
         achievements_tree.delete(*achievements_tree.get_children())
         achieved_data = get_achievements()
         for i, (name, desc, date) in enumerate(achieved_data):
@@ -1143,19 +1191,25 @@ savings_goal_var = StringVar(value=f"Savings Goal: ₹0.00 / ₹{savings_goal_am
 
 def update_progress_visualization():
     global savings_goal_current
-    # For simplicity, let's define "savings" as total income minus total expenses
-    # assuming income is tracked, or just total expenses for a "reduce spending" goal.
-    # Here, let's make it a "reduce spending by X" challenge.
-    # Or, if we had an income field, we could calculate actual savings.
+    if savings_progress_bar is None: return # Shown on the Reports tab; computed when it is first opened
+    today = datetime.date.today()
+    # With income recorded this month, "savings" is income minus spending (two lookups in the ledger's running totals)
+    try:
+        month_income, month_spending = ledger.cash_flow(connector, today.replace(day=1), today, user_id=user_id)
+    except sqlite3.Error as e:
+        print(f"Error reading cash flow: {e}")
+        month_income = month_spending = 0.0
+    if month_income > 0:
+        saved = month_income - month_spending
+        savings_goal_var.set(f"Saved this month: ₹{saved:.2f} of ₹{month_income:.2f} income ({saved / month_income:.0%})")
+        savings_progress_bar['value'] = max(0.0, min(saved / month_income, 1.0)) * 100
+        return
 
-    # Let's assume a "No-Spend Week" challenge for simplicity:
+    # Without income, fall back to a "No-Spend Week" challenge:
     # Calculate spending for the last 7 days. If it's below a certain threshold, consider it "successful".
-    today = datetime.date.today()
     seven_days_ago = today - datetime.timedelta(days=7)
     
-    cursor.execute("SELECT SUM(Amount) FROM ExpenseTracker WHERE Date BETWEEN ? AND ?",
-                   (seven_days_ago.strftime('%Y-%m-%d'), today.strftime('%Y-%m-%d 23:59:59')))
-    last_week_spending = cursor.fetchone()[0] or 0.0
+    last_week_spending = reports.total_spending(connector, seven_days_ago, today, user_id)
 
     challenge_threshold = 100.0 # Example: Spend less than ₹100 last week
     
@@ -1168,12 +1222,92 @@ def update_progress_visualization():
         savings_goal_var.set(f"No-Spend Week Challenge: Current: ₹{last_week_spending:.2f} (Target: <₹{challenge_threshold:.2f})")
     
     # Update a progress bar if available
-    if 'savings_progress_bar' in globals() and savings_progress_bar:
+    if savings_progress_bar:
         # Map spending to progress bar (inverse logic: lower spending = higher progress)
         max_val = 200 # Max spending for progress bar scale
         progress_val = max(0, min(max_val - last_week_spending, max_val)) # Invert for savings
         savings_progress_bar['value'] = (progress_val / max_val) * 100 # Convert to percentage
 
+# --- Tag Autocomplete ---
+
+def current_tag_trie():
+    """The tag trie, rebuilt from the database after any write to the expenses."""
+    global tag_trie, tag_trie_generation
+    if tag_trie is None or tag_trie_generation != generation('expenses'):
+        try:
+            tag_trie = TagTrie.from_connector(connector, limit=TAG_SUGGESTION_LIMIT, user_id=user_id)
+            tag_trie_generation = generation('expenses')
+        except sqlite3.Error as e:
+            print(f"Error loading tags for autocomplete: {e}")
+            return None
+    return tag_trie
+
+
+def hide_tag_suggestions(event=None):
+    global tag_popup
+    if tag_popup:
+        tag_popup.destroy()
+        tag_popup = None
+
+
+def accept_tag_suggestion(name):
+    """Replaces the tag being typed with name, ready for the next one."""
+    done = [part.strip() for part in tags_var.get().split(',')[:-1] if part.strip()]
+    tags_var.set(', '.join(done + [name]) + ', ')
+    tags_entry.focus_set()
+    tags_entry.icursor(END)
+    hide_tag_suggestions()
+
+
+def show_tag_suggestions(event=None):
+    """Lists the most used tags starting with the tag being typed (the text after the last comma)."""
+    global tag_popup
+    if event is not None and event.keysym in ('Down', 'Up', 'Return', 'Tab', 'Escape'):
+        return
+    *done, typing = tags_var.get().split(',')
+    typing = typing.strip()
+    trie = current_tag_trie() if typing else None
+    used = {part.strip().lower() for part in done}
+    suggestions = [name for name in trie.complete(typing) if name.lower() not in used] if trie else []
+    hide_tag_suggestions()
+    if not suggestions or suggestions == [typing]: return
+
+    tag_popup = Toplevel(tags_entry)
+    tag_popup.wm_overrideredirect(1)
+    tag_popup.wm_geometry("+%d+%d" % (tags_entry.winfo_rootx(), tags_entry.winfo_rooty() + tags_entry.winfo_height()))
+    listbox = Listbox(tag_popup, height=len(suggestions), width=tags_entry.cget('width'), font=entry_font,
+                      relief=SOLID, borderwidth=1, exportselection=False)
+    for name in suggestions:
+        listbox.insert(END, name)
+    listbox.pack(fill=BOTH)
+    listbox.bind('<ButtonRelease-1>', lambda e: accept_tag_suggestion(listbox.get(listbox.nearest(e.y))))
+    listbox.bind('<Return>', lambda e: accept_tag_suggestion(listbox.get(ACTIVE)))
+    listbox.bind('<Escape>', lambda e: (hide_tag_suggestions(), tags_entry.focus_set()))
+    tag_popup.listbox = listbox
+
+
+def focus_tag_suggestions(event=None):
+    if tag_popup:
+        tag_popup.listbox.focus_set()
+        tag_popup.listbox.selection_set(0)
+        tag_popup.listbox.activate(0)
+
+
+def complete_first_tag(event=None):
+    """Tab accepts the top suggestion while the list is shown."""
+    if tag_popup:
+        accept_tag_suggestion(tag_popup.listbox.get(0))
+        return "break"
+
+
+def on_tags_focus_out(event=None):
+    # Give a click on the list time to land before closing it
+    def hide_unless_in_list():
+        if tag_popup and str(root.focus_get()) != str(tag_popup.listbox):
+            hide_tag_suggestions()
+    root.after(200, hide_unless_in_list)
+
+
 # --- UI Setup ---
 root.configure(bg=background_color)
 header_label = Label(root, text='EXPENSE TRACKER', font=(font_family, heading_font_size + 2, 'bold'), bg=primary_color, fg=button_text_color,
@@ -1197,9 +1331,7 @@ right_content_frame.place(x=320, y=0, relwidth=0.75, relheight=1.0) # Adjusted r
 
 # Data Entry (Left Panel on Manage Tab)
 Label(data_entry_frame, text='Date (YYYY-MM-DD):', font=lbl_font, bg=background_color).grid(row=0, column=0, sticky=W, pady=(0,2))
-date_entry = DateEntry(data_entry_frame, date_pattern='y-mm-dd', font=entry_font, width=28, relief=SOLID, borderwidth=1)
-date_entry.grid(row=1, column=0, sticky=W+E, pady=(0,8))
-create_tooltip(date_entry, "Select the date of the expense.")
+# The date picker itself (row 1) is added by finish_startup
 
 Label(data_entry_frame, text='Payee:', font=lbl_font, bg=background_color).grid(row=2, column=0, sticky=W, pady=(0,2))
 payee_entry = Entry(data_entry_frame, font=entry_font, width=30, textvariable=payee, relief=SOLID, borderwidth=1)
@@ -1234,6 +1366,11 @@ Label(data_entry_frame, text='Tags (comma-separated):', font=lbl_font, bg=backgr
 tags_entry = Entry(data_entry_frame, font=entry_font, width=30, textvariable=tags_var, relief=SOLID, borderwidth=1)
 tags_entry.grid(row=13, column=0, sticky=W+E, pady=(0,12))
 create_tooltip(tags_entry, "Add keywords (e.g., 'travel', 'vacation').")
+tags_entry.bind('<KeyRelease>', show_tag_suggestions)
+tags_entry.bind('<Down>', focus_tag_suggestions)
+tags_entry.bind('<Tab>', complete_first_tag)
+tags_entry.bind('<Escape>', hide_tag_suggestions)
+tags_entry.bind('<FocusOut>', on_tags_focus_out)
 
 add_btn = Button(data_entry_frame, text='Add Expense', command=add_expense_to_db, font=btn_font, width=28, bg=hlb_btn_bg, fg=button_text_color, relief=RAISED, bd=2)
 add_btn.grid(row=14, column=0, sticky=W+E, pady=4)
@@ -1254,6 +1391,7 @@ Label(sf_inner, text="Search:", font=lbl_font, bg=background_color).grid(row=0,
 search_box = Entry(sf_inner, textvariable=search_query_var, font=entry_font, width=25, relief=SOLID, borderwidth=1)
 search_box.grid(row=0, column=1, padx=3, pady=3, sticky=W)
 search_box.bind("<Return>", lambda e: apply_search_and_filters())
+search_query_var.trace_add('write', on_search_typed)
 create_tooltip(search_box, "Search by keyword or use 'field:value' (e.g., 'amount:>100', 'category:food').")
 
 Label(sf_inner, text="Date:", font=lbl_font, bg=background_color).grid(row=1, column=0, padx=3, pady=3, sticky=E)
@@ -1263,15 +1401,7 @@ date_filter_dd.grid(row=1, column=1, padx=3, pady=3, sticky=W)
 date_filter_dd.bind("<<ComboboxSelected>>", toggle_custom_date_fields)
 create_tooltip(date_filter_dd, "Filter expenses by date range.")
 
-custom_start_date_label = Label(sf_inner, text="From:", font=lbl_font, bg=background_color)
-custom_start_date = DateEntry(sf_inner, date_pattern='y-mm-dd', font=entry_font, width=10, relief=SOLID, borderwidth=1)
-custom_end_date_label = Label(sf_inner, text="To:", font=lbl_font, bg=background_color)
-custom_end_date = DateEntry(sf_inner, date_pattern='y-mm-dd', font=entry_font, width=10, relief=SOLID, borderwidth=1)
-custom_start_date_label.grid(row=1, column=2, padx=(5,0), pady=3, sticky=E)
-custom_start_date.grid(row=1, column=3, padx=3, pady=3, sticky=W)
-custom_end_date_label.grid(row=1, column=4, padx=(5,0), pady=3, sticky=E)
-custom_end_date.grid(row=1, column=5, padx=3, pady=3, sticky=W)
-toggle_custom_date_fields() # Initial hide/show
+# The From/To pickers are created when "Custom Range" is first selected (see toggle_custom_date_fields)
 
 Label(sf_inner, text="MoP:", font=lbl_font, bg=background_color).grid(row=0, column=2, padx=(10,0), pady=3, sticky=E)
 mop_filter_dd = ttk.Combobox(sf_inner, textvariable=filter_mop_var, values=available_mops, font=entry_font, width=12, state='readonly')
@@ -1296,6 +1426,12 @@ template_buttons_frame = Frame(search_filter_controls_frame, bg=background_color
 template_buttons_frame.pack(side=BOTTOM, fill=X)
 Button(template_buttons_frame, text="Save Template", command=save_current_report_template, font=btn_font, bg=hlb_btn_bg, fg=button_text_color, relief=RAISED, bd=1, padx=5).pack(side=LEFT, padx=3)
 Button(template_buttons_frame, text="Load Template", command=load_report_template, font=btn_font, bg=hlb_btn_bg, fg=button_text_color, relief=RAISED, bd=1, padx=3).pack(side=LEFT, padx=3)
+import_btn = Button(template_buttons_frame, text="Import File", command=import_statement_file, font=btn_font, bg=hlb_btn_bg, fg=button_text_color, relief=RAISED, bd=1, padx=3)
+import_btn.pack(side=LEFT, padx=3)
+create_tooltip(import_btn, "Import expenses from a CSV, JSON Lines, OFX or QFX bank statement.")
+export_btn = Button(template_buttons_frame, text="Export", command=export_filtered_expenses, font=btn_font, bg=hlb_btn_bg, fg=button_text_color, relief=RAISED, bd=1, padx=3)
+export_btn.pack(side=LEFT, padx=3)
+create_tooltip(export_btn, "Export the filtered expenses to CSV, JSON Lines, Parquet or a text report.")
 
 
 # Action Buttons (Right Panel on Manage Tab, Middle)
@@ -1344,7 +1480,7 @@ for c in cols:
 
 ys = Scrollbar(tree_display_frame, orient=VERTICAL, command=table.yview)
 xs = Scrollbar(tree_display_frame, orient=HORIZONTAL, command=table.xview)
-table.configure(yscrollcommand=ys.set, xscrollcommand=xs.set)
+table.configure(yscrollcommand=on_table_scroll, xscrollcommand=xs.set)
 ys.pack(side=RIGHT, fill=Y)
 xs.pack(side=BOTTOM, fill=X)
 table.pack(side=LEFT, fill=BOTH, expand=True)
@@ -1357,77 +1493,102 @@ root.bind('<Control-r>', lambda e: reset_search_and_filters()) # Ctrl+R to Reset
 root.bind('<F5>', lambda e: apply_search_and_filters()) # F5 to Apply Filters
 
 
-# Tab 2: Reports & Summary
+# Tab 2: Reports & Summary (built on first view)
 reports_tab = Frame(notebook, bg=background_color, padx=20, pady=20)
 notebook.add(reports_tab, text=' Reports & Summary ')
 
-summary_frame = Frame(reports_tab, bg=background_color)
-summary_frame.pack(side=TOP, fill=X, pady=(0,10))
-Label(summary_frame, textvariable=total_expenses_var, font=(font_family, body_font_size, 'bold'), bg=background_color, fg=text_color).pack(side=LEFT)
-
-# Personalized Recommendation Label
-root.recommendation_label = Label(summary_frame, text="Tip: Analyzing your spending...", font=(font_family, body_font_size, 'italic'), bg=background_color, fg=text_color, wraplength=400, justify=LEFT)
-root.recommendation_label.pack(side=RIGHT, padx=10)
-
-
-charts_actions_frame = Frame(reports_tab, bg=background_color)
-charts_actions_frame.pack(side=TOP, fill=X, pady=5)
-Button(charts_actions_frame, text="Update Charts", command=update_charts, font=btn_font, bg=hlb_btn_bg, fg=button_text_color).pack(side=LEFT, padx=5)
-Button(charts_actions_frame, text="Manage Budgets", command=manage_budgets, font=btn_font, bg=secondary_color, fg=text_color).pack(side=LEFT, padx=5)
-
-# Progress Visualization (Example: No-Spend Week Challenge)
-savings_progress_frame = Frame(reports_tab, bg=background_color, pady=10)
-savings_progress_frame.pack(side=TOP, fill=X)
-Label(savings_progress_frame, textvariable=savings_goal_var, font=lbl_font, bg=background_color, fg=text_color).pack(side=LEFT, padx=5)
-savings_progress_bar = ttk.Progressbar(savings_progress_frame, orient="horizontal", length=200, mode="determinate")
-savings_progress_bar.pack(side=LEFT, padx=5)
-
-
-charts_display_frame = Frame(reports_tab, bg=background_color)
-charts_display_frame.pack(side=TOP, fill=BOTH, expand=True, pady=10)
-
-if MATPLOTLIB_AVAILABLE:
-    # Pie Chart Frame (Left)
-    pie_chart_frame = Frame(charts_display_frame, bg='white', relief=SUNKEN, borderwidth=1)
-    pie_chart_frame.pack(side=LEFT, fill=BOTH, expand=True, padx=5)
-    pie_fig = Figure(figsize=(5, 4), dpi=100) # width, height
-    pie_ax = pie_fig.add_subplot(111)
-    pie_chart_canvas_agg = FigureCanvasTkAgg(pie_fig, master=pie_chart_frame)
-    pie_chart_canvas_agg.draw()
-    pie_chart_canvas_agg.get_tk_widget().pack(side=TOP, fill=BOTH, expand=True)
-
-    # Bar Chart Frame (Right)
-    bar_chart_frame = Frame(charts_display_frame, bg='white', relief=SUNKEN, borderwidth=1)
-    bar_chart_frame.pack(side=RIGHT, fill=BOTH, expand=True, padx=5)
-    bar_fig = Figure(figsize=(5, 4), dpi=100)
-    bar_ax = bar_fig.add_subplot(111)
-    bar_chart_canvas_agg = FigureCanvasTkAgg(bar_fig, master=bar_chart_frame)
-    bar_chart_canvas_agg.draw()
-    bar_chart_canvas_agg.get_tk_widget().pack(side=TOP, fill=BOTH, expand=True)
-else:
-    Label(charts_display_frame, text="Matplotlib not installed. Charts are unavailable.", font=lbl_font, bg=background_color, fg=error_color).pack(pady=20)
-
-
-# Tab 3: Achievements
+def build_reports_tab():
+    """Builds the Reports & Summary tab and computes its contents the first time it is shown.
+       Matplotlib is imported here rather than at startup."""
+    global recommendation_label, savings_progress_bar, chart_manager
+    summary_frame = Frame(reports_tab, bg=background_color)
+    summary_frame.pack(side=TOP, fill=X, pady=(0,10))
+    Label(summary_frame, textvariable=total_expenses_var, font=(font_family, body_font_size, 'bold'), bg=background_color, fg=text_color).pack(side=LEFT)
+
+    # Personalized Recommendation Label
+    recommendation_label = Label(summary_frame, text="Tip: Analyzing your spending...", font=(font_family, body_font_size, 'italic'), bg=background_color, fg=text_color, wraplength=400, justify=LEFT)
+    recommendation_label.pack(side=RIGHT, padx=10)
+
+
+    charts_actions_frame = Frame(reports_tab, bg=background_color)
+    charts_actions_frame.pack(side=TOP, fill=X, pady=5)
+    Button(charts_actions_frame, text="Update Charts", command=update_charts, font=btn_font, bg=hlb_btn_bg, fg=button_text_color).pack(side=LEFT, padx=5)
+    Button(charts_actions_frame, text="Manage Budgets", command=manage_budgets, font=btn_font, bg=secondary_color, fg=text_color).pack(side=LEFT, padx=5)
+
+    # Progress Visualization (Example: No-Spend Week Challenge)
+    savings_progress_frame = Frame(reports_tab, bg=background_color, pady=10)
+    savings_progress_frame.pack(side=TOP, fill=X)
+    Label(savings_progress_frame, textvariable=savings_goal_var, font=lbl_font, bg=background_color, fg=text_color).pack(side=LEFT, padx=5)
+    savings_progress_bar = ttk.Progressbar(savings_progress_frame, orient="horizontal", length=200, mode="determinate")
+    savings_progress_bar.pack(side=LEFT, padx=5)
+
+
+    charts_display_frame = Frame(reports_tab, bg=background_color)
+    charts_display_frame.pack(side=TOP, fill=BOTH, expand=True, pady=10)
+
+    if load_matplotlib():
+        # Pie Chart Frame (Left)
+        pie_chart_frame = Frame(charts_display_frame, bg='white', relief=SUNKEN, borderwidth=1)
+        pie_chart_frame.pack(side=LEFT, fill=BOTH, expand=True, padx=5)
+        pie_fig = Figure(figsize=(5, 4), dpi=100) # width, height
+        pie_ax = pie_fig.add_subplot(111)
+        pie_chart_canvas_agg = FigureCanvasTkAgg(pie_fig, master=pie_chart_frame)
+        pie_chart_canvas_agg.get_tk_widget().pack(side=TOP, fill=BOTH, expand=True)
+
+        # Bar Chart Frame (Right)
+        bar_chart_frame = Frame(charts_display_frame, bg='white', relief=SUNKEN, borderwidth=1)
+        bar_chart_frame.pack(side=RIGHT, fill=BOTH, expand=True, padx=5)
+        bar_fig = Figure(figsize=(5, 4), dpi=100)
+        bar_ax = bar_fig.add_subplot(111)
+        bar_chart_canvas_agg = FigureCanvasTkAgg(bar_fig, master=bar_chart_frame)
+        bar_chart_canvas_agg.get_tk_widget().pack(side=TOP, fill=BOTH, expand=True)
+
+        chart_manager = ChartManager(pie_ax, bar_ax, text_color, themes[current_theme_name.get()]["table_odd_row"], primary_color)
+        chart_manager.set_visible(True) # Built when the tab is first shown
+    else:
+        Label(charts_display_frame, text="Matplotlib not installed. Charts are unavailable.", font=lbl_font, bg=background_color, fg=error_color).pack(pady=20)
+
+    update_charts(current_result)
+    update_progress_visualization()
+    display_personalized_recommendation()
+
+lazy_tab_builders[str(reports_tab)] = build_reports_tab
+
+
+# Tab 3: Achievements (built on first view)
 achievements_tab = Frame(notebook, bg=background_color, padx=20, pady=20)
 notebook.add(achievements_tab, text=' Achievements ')
 
-achievements_tree_frame = Frame(achievements_tab, relief='groove', borderwidth=1)
-achievements_tree_frame.pack(side=TOP, fill=BOTH, expand=True, pady=(5,0))
+def build_achievements_tab():
+    global achievements_tree
+    achievements_tree_frame = Frame(achievements_tab, relief='groove', borderwidth=1)
+    achievements_tree_frame.pack(side=TOP, fill=BOTH, expand=True, pady=(5,0))
+
+    achievements_cols = ('Name', 'Description', 'Achieved Date')
+    achievements_tree = ttk.Treeview(achievements_tree_frame, columns=achievements_cols, show='headings', style="Custom.Treeview", selectmode=NONE)
+    achievements_tree.tag_configure('evenrow', background=themes[current_theme_name.get()]["table_even_row"])
+    achievements_tree.tag_configure('oddrow', background=themes[current_theme_name.get()]["table_odd_row"])
 
-achievements_cols = ('Name', 'Description', 'Achieved Date')
-achievements_tree = ttk.Treeview(achievements_tree_frame, columns=achievements_cols, show='headings', style="Custom.Treeview", selectmode=NONE)
-achievements_tree.tag_configure('evenrow', background=themes[current_theme_name.get()]["table_even_row"])
-achievements_tree.tag_configure('oddrow', background=themes[current_theme_name.get()]["table_odd_row"])
+    for c in achievements_cols:
+        achievements_tree.heading(c, text=c, anchor=CENTER)
+        achievements_tree.column(c, width=250, stretch=YES, anchor=CENTER)
 
-for c in achievements_cols:
-    achievements_tree.heading(c, text=c, anchor=CENTER)
-    achievements_tree.column(c, width=250, stretch=YES, anchor=CENTER)
+    achievements_ys = Scrollbar(achievements_tree_frame, orient=VERTICAL, command=achievements_tree.yview)
+    achievements_tree.configure(yscrollcommand=achievements_ys.set)
+    achievements_ys.pack(side=RIGHT, fill=Y)
+    achievements_tree.pack(side=LEFT, fill=BOTH, expand=True)
 
-achievements_ys = Scrollbar(achievements_tree_frame, orient=VERTICAL, command=achievements_tree.yview)
-achievements_tree.configure(yscrollcommand=achievements_ys.set)
-achievements_ys.pack(side=RIGHT, fill=Y)
-achievements_tree.pack(side=LEFT, fill=BOTH, expand=True)
+    update_achievements_display()
+
+lazy_tab_builders[str(achievements_tab)] = build_achievements_tab
+
+def on_tab_changed(event=None):
+    builder = lazy_tab_builders.pop(notebook.select(), None)
+    if builder: builder()
+    if chart_manager: # Charts only draw while their tab is showing
+        chart_manager.set_visible(notebook.select() == str(reports_tab))
+
+notebook.bind("<<NotebookTabChanged>>", on_tab_changed)
 
 
 # Tab 4: Settings
@@ -1450,14 +1611,34 @@ if category_filter_dropdown: category_filter_dropdown['values'] = available_cate
 if mop_filter_dd: mop_filter_dd['values'] = available_mops
 if mop_dropdown_entry: mop_dropdown_entry['values'] = [m for m in available_mops if m != "All"]
 
-list_all_expenses(sort_column=current_sort_column, sort_direction=current_sort_direction)
-sort_by_column_header(current_sort_column) # To set initial sort indicator
-update_charts() # Initial chart draw
-check_and_award_achievements() # Check achievements on startup
-update_achievements_display() # Display achievements
-update_progress_visualization() # Initial update for progress bar
-display_personalized_recommendation() # Initial recommendation
-
-root.mainloop()
-
-connector.close()
+sort_by_column_header(current_sort_column) # Sets the initial sort indicator and loads the table and totals
+# The Reports and Achievements tabs compute their contents when first opened (see on_tab_changed)
+
+def finish_startup():
+    """Work that can wait until the window is on screen: the tkcalendar date picker, the achievements
+       check and loading the expense snapshot."""
+    global date_entry
+    date_entry = make_date_entry(data_entry_frame, font=entry_font, width=28, relief=SOLID, borderwidth=1)
+    date_entry.grid(row=1, column=0, sticky=W+E, pady=(0,8))
+    create_tooltip(date_entry, "Select the date of the expense.")
+    check_and_award_achievements() # Check achievements on startup
+    load_expense_snapshot()
+
+def start_main_app(session=None):
+    """Shows the window and runs the app until it is closed. register.py calls this
+       after a login (the import above has built the window by then); running
+       main.py directly starts without one."""
+    if session:
+        root.title(f'Enhanced Expense Tracker - {session.email}')
+    root.after_idle(finish_startup)
+    root.mainloop()
+
+    db_executor.shutdown()
+    db_pool.release(connector)
+    if db_pool.profile: # EXPENSE_TRACKER_SQL_STATS=1
+        print(db_pool.stats.report())
+    close_all()
+
+
+if __name__ == "__main__":
+    start_main_app()
@@ -1,14 +1,16 @@
 import tkinter as tk
 from tkinter import messagebox, font, ttk
-import sqlite3
-import hashlib
 import colorsys
+import functools
 import json
 import os
 import time  # Import the time module
+from expense_tracker.core import auth
+from expense_tracker.core.connection_pool import DB_PATH, get_pool
+from expense_tracker.core.db_worker import DBExecutor
 
 # --- Constants ---
-DB_NAME = "expense_tracker.db"
+DB_NAME = DB_PATH  # Shared with the main app (users table since schema version 7)
 THEME_FILE = "theme_pref.json"
 DEFAULT_FONT = "Segoe UI"  # Default font
 LABEL_FONT_SIZE = 11
@@ -16,68 +18,18 @@ ENTRY_FONT_SIZE = 11
 BUTTON_FONT_SIZE = 11
 HEADING_FONT = "Arial Black"
 HEADING_FONT_SIZE = 20
-GRADIENT_ANIMATION_SPEED = 100
+GRADIENT_FPS = 10  # Frame-rate cap for the background animation
 GRADIENT_LINES = 100
-DEFAULT_GRADIENT_COLORS = [(255, 192, 203), (135, 206, 250)]
+GRADIENT_HUE_STEPS = 360  # One frame per degree of hue, then the cycle repeats
 
 # --- Global Variables ---
 is_dark_mode = False
-gradient_canvas = None
-gradient_colors = DEFAULT_GRADIENT_COLORS
+gradient = None  # GradientBackground of the login window
+auth_executor = None  # Worker thread for logins and registrations (password hashing is slow on purpose)
+auth_pending = False  # A login or registration is running
+logged_in_session = None  # auth.Session of a successful login; main() opens the main app with it
 root = None
 
-# --- Helper Functions ---
-def get_database_connection():
-    conn = None
-    try:
-        conn = sqlite3.connect(DB_NAME, timeout=10)  # Add a timeout
-        return conn
-    except Exception as e:
-        messagebox.showerror("Database Error", f"Failed to connect to the database: {e}")
-        if conn:
-            conn.close()
-        return None
-
-def execute_query(conn, query, params=()):
-    cursor = None
-    try:
-        if conn is None:
-            return None
-        cursor = conn.cursor()
-        cursor.execute(query, params)
-        if query.lower().startswith("insert") or query.lower().startswith("update") or query.lower().startswith("delete"):
-            conn.commit()
-        return cursor
-    except Exception as e:
-        messagebox.showerror("Database Error", f"Error executing query: {e}")
-        if cursor:
-            cursor.close()
-        if conn:
-            conn.rollback()
-        return None
-
-def fetch_one(cursor):
-    try:
-        if cursor is None:
-            return None
-        return cursor.fetchone()
-    except Exception as e:
-        messagebox.showerror("Database Error", f"Error fetching data: {e}")
-        return None
-
-def fetch_all(cursor):
-    try:
-        if cursor is None:
-            return []
-        return cursor.fetchall()
-    except Exception as e:
-        messagebox.showerror("Database Error", f"Error fetching data: {e}")
-        return []
-
-# --- Password Hashing ---
-def hash_password(password):
-    return hashlib.sha256(password.encode()).hexdigest()
-
 # --- Theme Preference ---
 def save_theme_preference():
     try:
@@ -102,40 +54,114 @@ def load_theme_preference():
         is_dark_mode = False
 
 # --- Gradient Drawing ---
-def create_gradient_canvas(root):
-    global gradient_canvas
-    gradient_canvas = tk.Canvas(root, highlightthickness=0)
-    gradient_canvas.place(x=0, y=0, relwidth=1, relheight=1)
-
-def draw_gradient(root):
-    global gradient_canvas
-    if gradient_canvas:
-        gradient_canvas.delete("all")
-        width = root.winfo_width()
-        height = root.winfo_height()
-        r1, g1, b1 = gradient_colors[0]
-        r2, g2, b2 = gradient_colors[1]
-
-        for i in range(GRADIENT_LINES):
-            r = int(r1 + (r2 - r1) * i / GRADIENT_LINES)
-            g = int(g1 + (g2 - g1) * i / GRADIENT_LINES)
-            b = int(b1 + (b2 - b1) * i / GRADIENT_LINES)
-            color = f'#{r:02x}{g:02x}{b:02x}'
-            y1 = int(i * height / GRADIENT_LINES)
-            y2 = int((i + 1) * height / GRADIENT_LINES)
-            gradient_canvas.create_rectangle(0, y1, width, y2, outline="", fill=color)
-
-def animate_gradient(root, step=0):
-    global gradient_colors
-    h1 = (step % 360) / 360
-    h2 = ((step + 60) % 360) / 360
+@functools.lru_cache(maxsize=GRADIENT_HUE_STEPS)
+def gradient_band_colors(step, lines=GRADIENT_LINES):
+    """The fill colour of each band for one hue step, top to bottom. Cached, so after
+       the first cycle a frame computes no colours at all."""
+    h1 = (step % GRADIENT_HUE_STEPS) / GRADIENT_HUE_STEPS
+    h2 = ((step + 60) % GRADIENT_HUE_STEPS) / GRADIENT_HUE_STEPS
     r1, g1, b1 = [int(x * 255) for x in colorsys.hsv_to_rgb(h1, 0.4, 1)]
     r2, g2, b2 = [int(x * 255) for x in colorsys.hsv_to_rgb(h2, 0.4, 1)]
-    gradient_colors[0] = (r1, g1, b1)
-    gradient_colors[1] = (r2, g2, b2)
-    if not is_dark_mode and gradient_canvas:
-        draw_gradient(root)
-    root.after(GRADIENT_ANIMATION_SPEED, lambda: animate_gradient(root, step + 1))
+    colors = []
+    for i in range(lines):
+        r = int(r1 + (r2 - r1) * i / lines)
+        g = int(g1 + (g2 - g1) * i / lines)
+        b = int(b1 + (b2 - b1) * i / lines)
+        colors.append(f'#{r:02x}{g:02x}{b:02x}')
+    return tuple(colors)
+
+
+class GradientBackground:
+    """Animated gradient behind the login window.
+
+    The bands are canvas rectangles created once: a frame only recolours them, a
+    resize only moves them. Frames are capped at GRADIENT_FPS, and the animation
+    stops while the window is unfocused or minimized, or the dark theme is on.
+    """
+
+    def __init__(self, root, lines=GRADIENT_LINES, fps=GRADIENT_FPS):
+        self.root = root
+        self.canvas = tk.Canvas(root, highlightthickness=0)
+        self.canvas.place(x=0, y=0, relwidth=1, relheight=1)
+        self.bands = [self.canvas.create_rectangle(0, 0, 0, 0, outline="") for _ in range(lines)]
+        self.interval = max(1, round(1000 / fps))
+        self.step = 0
+        self.size = None
+        self.visible = True
+        self.focused = True
+        self.mapped = True
+        self.job = None
+        self.frames = 0  # Frames drawn, for profiling
+        root.bind("<Configure>", self.on_configure, add="+")
+        root.bind("<FocusIn>", lambda event: self.after_focus_change(), add="+")
+        root.bind("<FocusOut>", lambda event: self.after_focus_change(), add="+")
+        root.bind("<Map>", lambda event: self.set_mapped(True), add="+")
+        root.bind("<Unmap>", lambda event: self.set_mapped(False), add="+")
+
+    def layout(self):
+        width, height = self.root.winfo_width(), self.root.winfo_height()
+        if (width, height) == self.size:
+            return
+        self.size = (width, height)
+        lines = len(self.bands)
+        for i, band in enumerate(self.bands):
+            self.canvas.coords(band, 0, int(i * height / lines), width, int((i + 1) * height / lines))
+
+    def draw(self):
+        for band, color in zip(self.bands, gradient_band_colors(self.step, len(self.bands))):
+            self.canvas.itemconfigure(band, fill=color)
+        self.frames += 1
+
+    def on_configure(self, event):
+        # <Configure> on the root also fires for every child widget; only the window matters
+        if event.widget is self.root:
+            self.layout()
+
+    @property
+    def running(self):
+        return self.visible and self.focused and self.mapped
+
+    def tick(self):
+        self.job = None
+        if not self.running:
+            return
+        self.step = (self.step + 1) % GRADIENT_HUE_STEPS
+        self.draw()
+        self.job = self.root.after(self.interval, self.tick)
+
+    def update_running(self):
+        """Starts or stops the frame loop to match the window state."""
+        if self.running and self.job is None:
+            self.job = self.root.after(self.interval, self.tick)
+        elif not self.running and self.job is not None:
+            self.root.after_cancel(self.job)
+            self.job = None
+
+    def after_focus_change(self):
+        # Focus moving between widgets also sends FocusOut; check where it ended up once it settles
+        self.root.after_idle(self.check_focus)
+
+    def check_focus(self):
+        try:
+            self.focused = self.root.focus_get() is not None
+        except KeyError:  # Focus is on a ttk popdown, which has no Python widget
+            self.focused = True
+        self.update_running()
+
+    def set_mapped(self, mapped):
+        self.mapped = mapped
+        self.update_running()
+
+    def set_visible(self, visible):
+        """Shows or hides the gradient (the dark theme has a plain background)."""
+        self.visible = visible
+        if visible:
+            self.canvas.place(x=0, y=0, relwidth=1, relheight=1)
+            self.layout()
+            self.draw()
+        else:
+            self.canvas.place_forget()
+        self.update_running()
 
 def toggle_theme(root):
     global is_dark_mode
@@ -144,7 +170,6 @@ def toggle_theme(root):
     apply_theme(root)
 
 def apply_theme(root):
-    global gradient_canvas
     bg = "#2E2E2E" if is_dark_mode else "#FFFFFF"
     fg = "#FFFFFF" if is_dark_mode else "#000000"
     btn_bg = "#444" if is_dark_mode else "#E0E0E0"
@@ -153,12 +178,8 @@ def apply_theme(root):
 
     root.configure(bg=bg)
 
-    if gradient_canvas:
-        if is_dark_mode:
-            gradient_canvas.place_forget()
-        else:
-            gradient_canvas.place(x=0, y=0, relwidth=1, relheight=1)
-        draw_gradient(root)
+    if gradient:
+        gradient.set_visible(not is_dark_mode)
 
     for frame in [login_frame, register_frame]:
         frame.configure(bg=bg)
@@ -288,6 +309,35 @@ class RoundedButton(tk.Canvas):
         self.draw_button()
 
 # --- User Authentication Functions ---
+# The database work and hashing (expense_tracker/core/auth.py) run on auth_executor's
+# thread, which keeps one pooled connection; the callbacks run back on the Tk thread.
+def submit_auth(fn, *args, callback):
+    """Runs fn(conn, *args) on auth_executor; one login or registration at a time."""
+    global auth_pending
+    if auth_pending:
+        return
+    auth_pending = True
+    root.config(cursor="watch")
+
+    def finish():
+        global auth_pending
+        auth_pending = False
+        if root.winfo_exists():
+            root.config(cursor="")
+
+    def on_result(result):
+        finish()
+        callback(result)
+
+    def on_error(e):
+        finish()
+        if isinstance(e, ValueError):
+            messagebox.showerror("Error", str(e))
+        else:
+            messagebox.showerror("Database Error", str(e))
+
+    auth_executor.submit(fn, *args, callback=on_result, errback=on_error)
+
 def register_user():
     email = reg_entry.get()
     password = reg_entry_password.get()
@@ -305,33 +355,14 @@ def register_user():
         messagebox.showerror("Error", "Password must be at least 8 characters")
         return
 
-    hashed_pw = hash_password(password)
-    conn = get_database_connection()
-    if conn is None:
-        return
-    try:
-        cursor = conn.cursor()
-        cursor.execute("""CREATE TABLE IF NOT EXISTS users (
-                            id INTEGER PRIMARY KEY AUTOINCREMENT,
-                            email TEXT UNIQUE NOT NULL,
-                            password TEXT NOT NULL,
-                            marital_status TEXT NOT NULL,  
-                            role TEXT
-                            )""")
-        cursor.execute("SELECT * FROM users WHERE email = ?", (email,))
-        if cursor.fetchone():
-            messagebox.showerror("Error", "Email already registered")
-        else:
-            cursor.execute("INSERT INTO users (email, password, marital_status, role) VALUES (?, ?, ?, ?)",
-                            (email, hashed_pw, marital_status, None)) #Added marital status to insert
-            conn.commit()
+    def on_registered(created):
+        if created:
             messagebox.showinfo("Success", "Registration successful! Please login.")
             switch_to_login()
-    except Exception as e:
-        messagebox.showerror("Database Error", str(e))
-    finally:
-        if conn:  # Ensure connection is closed
-            conn.close()
+        else:
+            messagebox.showerror("Error", "Email already registered")
+
+    submit_auth(auth.create_account, email, password, marital_status, callback=on_registered)
 
 def login_user():
     email = login_entry.get()
@@ -339,28 +370,33 @@ def login_user():
     if not email or not password:
         messagebox.showerror("Error", "Please enter both email and password")
         return
-    hashed_pw = hash_password(password)
-    conn = get_database_connection()
-    if conn is None:
-        return
-    try:
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM users WHERE email = ? AND password = ?",
-                        (email, hashed_pw))
-        user = cursor.fetchone()
-        conn.close()
-        if user:
+
+    def on_login(session):
+        if session:
             messagebox.showinfo("Success", "Login successful!")
-            root.destroy()
-            import main
-            main.start_main_app(user)
+            finish_login(session)
         else:
             messagebox.showerror("Login Failed", "Invalid email or password")
-    except Exception as e:
-        messagebox.showerror("Database Error", str(e))
-    finally:
-        if conn: #ensure conn is closed
-            conn.close()
+
+    submit_auth(auth.authenticate, email, password, callback=on_login)
+
+def finish_login(session):
+    """Keeps the session and ends the login window's mainloop; main() then opens the main app."""
+    global logged_in_session
+    logged_in_session = session
+    root.quit()
+
+def open_main_app(session):
+    """Hands over to the main app in this process, once the login window's mainloop has
+       returned (so the app's mainloop isn't nested inside it). The schema is already
+       current and the worker's warmed-up connection goes back to the shared pool for the
+       app to reuse, so the dashboard opens without reconnecting or migrating."""
+    auth.start_session(session)
+    auth_executor.stop_polling()
+    auth_executor.shutdown()  # Idle, so this returns at once with the connection back in the pool
+    root.destroy()
+    import main as main_app  # Builds the main window
+    main_app.start_main_app(session)
 
 # --- UI Control Helpers ---
 def toggle_register_pw():
@@ -379,7 +415,7 @@ def switch_to_register():
 
 # --- Main Application ---
 def main():
-    global root, login_frame, register_frame, reg_entry, reg_entry_password, \
+    global root, gradient, auth_executor, login_frame, register_frame, reg_entry, reg_entry_password, \
         var_marital, login_entry, login_entry_password, btn_theme
 
     root = tk.Tk()
@@ -399,9 +435,11 @@ def main():
     custom_font = font.Font(family=DEFAULT_FONT, size=BUTTON_FONT_SIZE)  # Changed to BUTTON_FONT_SIZE
     heading_font = font.Font(family=HEADING_FONT, size=HEADING_FONT_SIZE)
 
-    create_gradient_canvas(root)
-    draw_gradient(root)
-    animate_gradient(root)
+    gradient = GradientBackground(root)
+    auth_executor = DBExecutor(get_pool(DB_NAME))
+    auth_executor.start_polling(root)
+    # Schema setup once, while the user types; a failure is reported like any other
+    auth_executor.submit(auth.setup, errback=lambda e: messagebox.showerror("Database Error", str(e)))
 
     btn_theme = tk.Button(root, text="Toggle Theme",
                             command=lambda: toggle_theme(root))
@@ -469,8 +507,9 @@ def main():
     # --- Initial Setup ---
     switch_to_login()
     apply_theme(root)
-    root.bind("<Configure>", lambda event: draw_gradient(root))
     root.mainloop()
+    if logged_in_session:  # Otherwise the login window was closed
+        open_main_app(logged_in_session)
 
 if __name__ == "__main__":
     main()
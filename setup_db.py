@@ -1,44 +1,26 @@
 import sqlite3
+from expense_tracker.core.connection_pool import DB_PATH, get_pool
+from expense_tracker.core.consolidate import consolidate
+from expense_tracker.core.migrations import migrate
 
 def setup_database():
     """
-    Connects to the SQLite database and creates the necessary tables
-    if they do not already exist.
+    Connects to the SQLite database (switching it to WAL mode), creates or
+    upgrades the necessary tables and indexes to the current schema version and
+    copies in the data of the older database files (see consolidate.py).
     """
+    pool = get_pool(DB_PATH)
     try:
-        connector = sqlite3.connect("Expense Tracker.db")
-        cursor = connector.cursor()
-
-        # Create ExpenseTracker table
-        cursor.execute(
-            '''CREATE TABLE IF NOT EXISTS ExpenseTracker (
-                ID INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL,
-                Date DATETIME,
-                Payee TEXT,
-                Description TEXT,
-                Amount FLOAT,
-                ModeOfPayment TEXT,
-                Category TEXT,
-                Tags TEXT
-            )'''
-        )
-
-        # Create Budget Table
-        cursor.execute(
-            '''CREATE TABLE IF NOT EXISTS Budgets (
-                ID INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL,
-                Category TEXT NOT NULL,
-                Amount FLOAT NOT NULL,
-                Period TEXT NOT NULL UNIQUE -- e.g., "YYYY-MM" for monthly budgets
-            )'''
-        )
-        connector.commit()
-        print("Database tables checked/created successfully.")
-    except sqlite3.Error as e:
+        with pool.connection() as connector:
+            version = migrate(connector)
+            print(f"Database tables checked/created successfully (schema version {version}).")
+            for check in consolidate(connector):
+                status = "OK" if check.ok else "MISMATCH"
+                print(f"{check.source} {check.table}: {check.copied_rows}/{check.source_rows} rows, checksum {status}")
+    except (sqlite3.Error, ValueError) as e:
         print(f"Error setting up database: {e}")
     finally:
-        if connector:
-            connector.close()
+        pool.close()
 
 if __name__ == "__main__":
     setup_database()
@@ -0,0 +1,83 @@
+import sqlite3
+import unittest
+
+from expense_tracker.core import achievements, budget_tracking, budgets, ledger, rollups
+from expense_tracker.core.migrations import MIGRATIONS, SCHEMA_VERSION, migrate
+
+
+def _migrate_to(connector, version):
+    """Applies the pending migrations up to `version`, leaving the database where a
+       release that stopped at that version left it."""
+    current = connector.execute("PRAGMA user_version").fetchone()[0]
+    for target_version in range(current + 1, version + 1):
+        MIGRATIONS[target_version - 1](connector)
+        connector.execute(f"PRAGMA user_version = {target_version}")
+    connector.commit()
+
+
+def _version_12_database(users):
+    """A database at the version 12 that shipped before version 13: ExpenseTracker has
+       its UserID, nothing else does yet."""
+    connector = sqlite3.connect(":memory:")
+    _migrate_to(connector, 11)
+    for user in range(users):
+        connector.execute("INSERT INTO users (email, password, marital_status) VALUES (?, 'x', 'single')",
+                          (f"user{user}@example.com",))
+    _migrate_to(connector, 12)
+    connector.execute("INSERT INTO Budgets (Category, Amount, Period, Recurring) VALUES ('Food', 100, '2024-01', 1)")
+    connector.executemany("INSERT INTO ExpenseTracker (Date, Payee, Amount, ModeOfPayment, Category, UserID) "
+                          "SELECT ?, 'Shop', ?, 'Cash', 'Food', CASE WHEN COUNT(*) = 1 THEN MIN(id) ELSE 0 END FROM users",
+                          [('2024-01-03', 50), ('2024-01-04', 40)])
+    connector.execute("INSERT INTO Income (Date, Source, Amount, Category, Account) "
+                      "VALUES ('2024-01-01', 'Acme', 1000, 'Salary', 'Bank')")
+    connector.execute("INSERT INTO Transfers (Date, FromAccount, ToAccount, Amount) VALUES ('2024-01-02', 'Bank', 'Cash', 200)")
+    connector.execute("INSERT INTO Achievements (Name, Description, AchievedDate) "
+                      "VALUES ('First Step', 'Add your first expense.', '2024-01-03')")
+    connector.execute("INSERT INTO ReportTemplates (Name, SearchTerm) VALUES ('Groceries', 'food')")
+    connector.commit()
+    return connector
+
+
+class UpgradeFromVersion12Test(unittest.TestCase):
+
+    def assert_consistent(self, connector):
+        self.assertEqual(rollups.verify_rollup(connector), [])
+        self.assertEqual(ledger.verify_ledger(connector), [])
+        self.assertEqual(budget_tracking.verify_spending(connector), [])
+        self.assertEqual(achievements.verify_state(connector), [])
+
+    def test_single_account_takes_the_rows(self):
+        connector = _version_12_database(users=1)
+        self.assertEqual(migrate(connector), SCHEMA_VERSION)
+        self.assert_consistent(connector)
+
+        self.assertEqual(budgets.budget_status(connector, '2024-01', user_id=1), [('Food', 100.0, 90.0)])
+        self.assertEqual(ledger.net_worth(connector, user_id=1), 910.0)
+        self.assertEqual([alert[:3] for alert in budgets.unseen_alerts(connector, mark_seen=False, user_id=1)],
+                         [('Food', '2024-01', 0.8)])
+        self.assertNotIn('First Step', [name for name, _ in achievements.evaluate(connector, achievements.STARTUP, user_id=1)])
+        self.assertEqual(connector.execute("SELECT UserID FROM ReportTemplates").fetchall(), [(1,)])
+
+        budgets.set_budget(connector, 'Travel', '2024-02', 50, user_id=1)
+        self.assertEqual(budgets.get_budget(connector, 'Travel', '2024-02', user_id=1), 50.0)
+        self.assert_consistent(connector)
+
+    def test_several_accounts_leave_the_rows_unowned(self):
+        connector = _version_12_database(users=2)
+        self.assertEqual(migrate(connector), SCHEMA_VERSION)
+        self.assert_consistent(connector)
+
+        self.assertEqual(budgets.budget_status(connector, '2024-01'), [('Food', 100.0, 90.0)])
+        self.assertEqual(ledger.net_worth(connector), 910.0)
+        self.assertEqual(budgets.budget_status(connector, '2024-01', user_id=2), [])
+        self.assertEqual(ledger.net_worth(connector, user_id=2), 0.0)
+
+        budgets.set_budget(connector, 'Food', '2024-01', 10, user_id=2)
+        self.assertEqual(budgets.budget_status(connector, '2024-01', user_id=2), [('Food', 10.0, 0)])
+        self.assertEqual(budgets.budget_status(connector, '2024-01'), [('Food', 100.0, 90.0)])
+        self.assertIn('Budget Setter', [name for name, _ in achievements.evaluate(connector, achievements.STARTUP, user_id=2)])
+        self.assert_consistent(connector)
+
+
+if __name__ == '__main__':
+    unittest.main()